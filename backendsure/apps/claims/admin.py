@@ -1,3 +1,15 @@
 from django.contrib import admin
 
+from apps.claims.models import Claim, ClaimQueueCount
+
 # Register your models here.
+@admin.register(Claim)
+class ClaimAdmin(admin.ModelAdmin):
+    list_display = ["id", "claim_number", "policy", "status", "risk_score", "device_outlet", "created_at"]
+    list_filter = ["status"]
+    list_select_related = ["policy", "device_outlet"]
+
+
+@admin.register(ClaimQueueCount)
+class ClaimQueueCountAdmin(admin.ModelAdmin):
+    list_display = ["id", "status", "device_outlet", "count", "updated_at"]
\ No newline at end of file
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ClaimsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.claims"
+
+    def ready(self):
+        from apps.claims import risk
+        risk.connect_signals()
@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+
+from apps.claims.models import Claim, ClaimDocumentUpload
+from apps.claims.uploads import ChunkedClaimDocumentUpload
+from apps.policies.models import Policy
+
+
+class RandomStream:
+    """A request body of ``size`` random bytes, produced as it is read."""
+
+    def __init__(self, size: int) -> None:
+        self.remaining = size
+
+    def read(self, size: int = -1) -> bytes:
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        self.remaining -= size
+        return os.urandom(size)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time a chunked claim document upload end to end and report its throughput and peak "
+        "Python memory. Runs in a transaction that is rolled back, against a temporary media directory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size-mb", type=int, default=50, help="Size of the uploaded document")
+        parser.add_argument(
+            "--chunk-mb", type=int, default=settings.CLAIM_DOCUMENT_CHUNK_MAX_SIZE // (1024 * 1024),
+            help="Size of each PUT chunk",
+        )
+
+    def handle(self, *args, **options):
+        size = options["size_mb"] * 1024 * 1024
+        chunk_size = options["chunk_mb"] * 1024 * 1024
+        if size <= 0 or chunk_size <= 0:
+            raise CommandError("--size-mb and --chunk-mb must be positive")
+
+        media = tempfile.mkdtemp()
+        try:
+            with override_settings(
+                MEDIA_ROOT=media,
+                CLAIM_DOCUMENT_UPLOAD_TEMP_DIR=os.path.join(media, "parts"),
+                CLAIM_DOCUMENT_MAX_SIZE=max(size, settings.CLAIM_DOCUMENT_MAX_SIZE),
+                CLAIM_DOCUMENT_CHUNK_MAX_SIZE=chunk_size,
+            ):
+                chunk_seconds, complete_seconds, peak = self.run(size, chunk_size)
+        finally:
+            shutil.rmtree(media, ignore_errors=True)
+
+        total = sum(chunk_seconds) + complete_seconds
+        self.stdout.write(f"Upload:      {size / 2**20:.0f} MB in {len(chunk_seconds)} chunks of {chunk_size / 2**20:.0f} MB")
+        self.stdout.write(f"Chunks:      {sum(chunk_seconds):.2f}s ({max(chunk_seconds) * 1000:.0f} ms slowest)")
+        self.stdout.write(f"Completion:  {complete_seconds:.2f}s (hash and store)")
+        self.stdout.write(f"Throughput:  {size / 2**20 / total:.1f} MB/s")
+        self.stdout.write(f"Peak memory: {peak / 2**20:.1f} MB of Python allocations")
+
+    def run(self, size: int, chunk_size: int):
+        chunk_seconds = []
+        complete_seconds = []
+        tracemalloc.start()
+        try:
+            with transaction.atomic():
+                policy = Policy.objects.create(policy_number="BENCHMARK", status="Active")
+                claim = Claim.objects.create(
+                    policy=policy, description="Upload benchmark", claim_type="Damage", incident_date=date.today()
+                )
+                upload = ChunkedClaimDocumentUpload(ClaimDocumentUpload.objects.create(
+                    claim=claim, document_name="Benchmark", file_name="benchmark.bin", total_size=size,
+                ))
+                complete = upload._complete
+
+                def timed_complete():
+                    started = time.perf_counter()
+                    try:
+                        return complete()
+                    finally:
+                        complete_seconds.append(time.perf_counter() - started)
+
+                upload._complete = timed_complete
+                tracemalloc.reset_peak()
+                offset = 0
+                document = None
+                while offset < size:
+                    length = min(chunk_size, size - offset)
+                    started = time.perf_counter()
+                    document = upload.write_chunk(RandomStream(length), offset, length)
+                    chunk_seconds.append(time.perf_counter() - started)
+                    offset += length
+                _, peak = tracemalloc.get_traced_memory()
+                if document is None:
+                    raise CommandError("The upload did not complete")
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            tracemalloc.stop()
+        # The last chunk's time includes completing the upload; report the two apart.
+        chunk_seconds[-1] -= complete_seconds[0]
+        return chunk_seconds, complete_seconds[0], peak
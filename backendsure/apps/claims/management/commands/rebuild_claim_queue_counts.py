@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.claims.models import ClaimQueueCount
+
+
+class Command(BaseCommand):
+    help = "Recount the claim queue counters from the claims table (e.g. after bulk updates)."
+
+    def handle(self, *args, **options):
+        queues = ClaimQueueCount.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {queues} claim queues"))
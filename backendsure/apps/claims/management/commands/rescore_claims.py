@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.claims.models import Claim
+from apps.claims.risk import assess, rebuild_activity
+
+
+class Command(BaseCommand):
+    help = "Score claims again with the current risk rules, optionally recounting their history first."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--status", action="append", help="Only claims with this status")
+        parser.add_argument("--unscored", action="store_true", help="Only claims that have no score yet")
+        parser.add_argument("--rebuild-aggregates", action="store_true",
+                            help="Recount claim history per device, customer and outlet before scoring")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Claims scored per query")
+
+    def handle(self, *args, **options):
+        if options["rebuild_aggregates"]:
+            rows = rebuild_activity(chunk_size=options["chunk_size"])
+            self.stdout.write(f"Rebuilt {rows} claim history counters")
+
+        claims = Claim.objects.all()
+        if options["status"]:
+            claims = claims.filter(status__in=options["status"])
+        if options["unscored"]:
+            claims = claims.filter(risk_score__isnull=True)
+
+        scored = 0
+        last_id = 0
+        while True:
+            chunk = list(claims.filter(id__gt=last_id).order_by("id")[:options["chunk_size"]])
+            if not chunk:
+                break
+            now = timezone.now()
+            for claim, assessment in zip(chunk, assess(chunk, exclude_self=True)):
+                claim.risk_score = assessment.score
+                claim.risk_reasons = assessment.reasons
+                claim.risk_scored_at = now
+            Claim.objects.bulk_update(chunk, ["risk_score", "risk_reasons", "risk_scored_at"])
+            scored += len(chunk)
+            last_id = chunk[-1].id
+        self.stdout.write(self.style.SUCCESS(f"Scored {scored} claims"))
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def seed_claim_queue_counts(apps, schema_editor):
+    Claim = apps.get_model("claims", "Claim")
+    ClaimQueueCount = apps.get_model("claims", "ClaimQueueCount")
+    totals = Claim.objects.values("status", "device_outlet_id").annotate(total=Count("id")).order_by()
+    ClaimQueueCount.objects.bulk_create([
+        ClaimQueueCount(status=row["status"], device_outlet_id=row["device_outlet_id"], count=row["total"])
+        for row in totals
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('claims', '0002_claim_verified_alter_claim_status'),
+        ('gadgets', '0016_deviceoutlet_api_key_hash'),
+        ('policies', '0014_policy_policy_status_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaimNumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('year', models.IntegerField(unique=True)),
+                ('last_value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ClaimQueueCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('status', models.CharField(max_length=255)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='claim',
+            name='claim_number',
+            field=models.CharField(blank=True, db_index=True, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='claim',
+            index=models.Index(fields=['status', 'created_at'], name='claim_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='claim',
+            index=models.Index(fields=['device_outlet', 'status', 'created_at'], name='claim_outlet_status_idx'),
+        ),
+        migrations.AddField(
+            model_name='claimqueuecount',
+            name='device_outlet',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='gadgets.deviceoutlet'),
+        ),
+        migrations.AddConstraint(
+            model_name='claimqueuecount',
+            constraint=models.UniqueConstraint(condition=models.Q(('device_outlet__isnull', False)), fields=('status', 'device_outlet'), name='unique_claim_queue_outlet'),
+        ),
+        migrations.AddConstraint(
+            model_name='claimqueuecount',
+            constraint=models.UniqueConstraint(condition=models.Q(('device_outlet__isnull', True)), fields=('status',), name='unique_claim_queue_no_outlet'),
+        ),
+        migrations.RunPython(seed_claim_queue_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:12
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('claims', '0003_claim_queues_and_number_sequence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='claimdocument',
+            name='content_sha256',
+            field=models.CharField(db_index=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='claimdocument',
+            name='size',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.CreateModel(
+            name='ClaimDocumentUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('upload_id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('document_name', models.CharField(max_length=255)),
+                ('file_name', models.CharField(max_length=255)),
+                ('total_size', models.BigIntegerField()),
+                ('received_size', models.BigIntegerField(default=0)),
+                ('expected_sha256', models.CharField(max_length=64, null=True)),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Completed', 'Completed'), ('Failed', 'Failed')], default='Pending', max_length=32)),
+                ('claim', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_uploads', to='claims.claim')),
+                ('document', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='claims.claimdocument')),
+                ('uploaded_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
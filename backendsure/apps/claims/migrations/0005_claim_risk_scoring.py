@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('claims', '0004_claimdocument_content_sha256_claimdocument_size_and_more'),
+        ('gadgets', '0017_outlet_performance'),
+        ('policies', '0015_policy_policy_document_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaimActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=120)),
+                ('day', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='claim',
+            name='risk_keys',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='claim',
+            name='risk_reasons',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='claim',
+            name='risk_score',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='claim',
+            name='risk_scored_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name='claim',
+            index=models.Index(fields=['status', 'risk_score'], name='claim_status_risk_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='claimactivity',
+            constraint=models.UniqueConstraint(fields=('key', 'day'), name='unique_claim_activity_key_day'),
+        ),
+    ]
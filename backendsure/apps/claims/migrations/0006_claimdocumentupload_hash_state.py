@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('claims', '0005_claim_risk_scoring'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='claimdocumentupload',
+            name='hash_state',
+            field=models.BinaryField(null=True),
+        ),
+    ]
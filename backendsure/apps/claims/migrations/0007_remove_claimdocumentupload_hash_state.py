@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('claims', '0006_claimdocumentupload_hash_state'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='claimdocumentupload',
+            name='hash_state',
+        ),
+    ]
@@ -1,28 +1,259 @@
-from django.db import models
+from collections import Counter
+from django.conf import settings
+from django.db import models, transaction, IntegrityError
+from django.db.models import Case, F, Q, When
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
 from decimal import Decimal
+import uuid
 
 from apps.core.models import AbstractBaseModel
+from apps.core.constants import ClaimStatuses
+from apps.gadgets.models import OutletPerformance
 # Create your models here.
+# Claim fields that decide which ClaimQueueCount queue (and outlet) a claim counts towards.
+QUEUE_FIELDS = {"status", "device_outlet", "device_outlet_id"}
+
+
+class ClaimQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """
+        ``update()`` that keeps ClaimQueueCount and the outlets' claim counts in
+        step when ``status`` or ``device_outlet`` changes, so bulk status changes
+        cannot drift the queues. Other updates run as a plain UPDATE.
+        """
+        if QUEUE_FIELDS.isdisjoint(kwargs):
+            return super().update(**kwargs)
+        with transaction.atomic():
+            before = {
+                claim_id: (queue_status, device_outlet_id, created_at)
+                for claim_id, queue_status, device_outlet_id, created_at in self.select_for_update().values_list(
+                    "id", "status", "device_outlet_id", "created_at"
+                )
+            }
+            if not before:
+                return 0
+            moved = self.model._base_manager.filter(id__in=before)
+            updated = models.QuerySet.update(moved, **kwargs)
+            after = moved.values_list("id", "status", "device_outlet_id")
+            queues = Counter()
+            for claim_id, queue_status, device_outlet_id in after:
+                previous_status, previous_outlet, created_at = before[claim_id]
+                queues[(previous_status, previous_outlet)] -= 1
+                queues[(queue_status, device_outlet_id)] += 1
+                if previous_outlet != device_outlet_id:
+                    OutletPerformance.count_claim(previous_outlet, created_at, -1)
+                    OutletPerformance.count_claim(device_outlet_id, created_at, 1)
+            ClaimQueueCount.apply(queues)
+        return updated
+
+
 class Claim(AbstractBaseModel):
-    claim_number = models.CharField(max_length=255)
+    claim_number = models.CharField(max_length=255, blank=True, db_index=True)
     policy = models.ForeignKey("policies.Policy", on_delete=models.CASCADE, related_name="policy_claims")
     description = models.TextField()
     claim_type = models.CharField(max_length=255)
     estimated_cost = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0'))
     incident_date = models.DateField()
     device_outlet = models.ForeignKey("gadgets.DeviceOutlet", on_delete=models.SET_NULL, null=True)
-    status = models.CharField(max_length=255, default="Pending Verification")
+    status = models.CharField(max_length=255, default=ClaimStatuses.PENDING_VERIFICATION.value)
     verified = models.BooleanField(default=False)
+    # Set by apps.claims.risk when the claim is lodged or re-scored.
+    risk_score = models.PositiveSmallIntegerField(null=True)
+    risk_reasons = models.JSONField(default=list, blank=True)
+    risk_scored_at = models.DateTimeField(null=True)
+    risk_keys = models.JSONField(default=list, blank=True, editable=False)
+
+    objects = ClaimQuerySet.as_manager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="claim_status_created_idx"),
+            models.Index(fields=["device_outlet", "status", "created_at"], name="claim_outlet_status_idx"),
+            models.Index(fields=["status", "risk_score"], name="claim_status_risk_idx"),
+        ]
 
     def __str__(self):
         return self.claim_number
-    
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_queue = instance.queue_key()
+        return instance
+
+    def queue_key(self):
+        return (self.status, self.device_outlet_id)
+
+    def save(self, *args, **kwargs):
+        created = self._state.adding
+        if not self.claim_number:
+            self.claim_number = ClaimNumberSequence.next_claim_number()
+        super().save(*args, **kwargs)
+
+        previous = None if created else getattr(self, "_loaded_queue", None)
+        current = self.queue_key()
+        if previous == current:
+            return
+        queues = Counter({current: 1})
+        if previous is not None:
+            queues[previous] -= 1
+        ClaimQueueCount.apply(queues)
+        if created:
+            OutletPerformance.count_claim(self.device_outlet_id, self.created_at, 1)
+        elif previous is not None and previous[1] != current[1]:
+            OutletPerformance.count_claim(previous[1], self.created_at, -1)
+            OutletPerformance.count_claim(current[1], self.created_at, 1)
+        self._loaded_queue = current
+
 
 class ClaimDocument(AbstractBaseModel):
     claim = models.ForeignKey(Claim, on_delete=models.CASCADE, related_name="claim_documents")
     document_name = models.CharField(max_length=255)
     document_file = models.FileField(upload_to="claim_documents/")
+    content_sha256 = models.CharField(max_length=64, null=True, db_index=True)
+    size = models.BigIntegerField(null=True)
+
+    def __str__(self):
+        return self.document_name
+
+
+class ClaimDocumentUpload(AbstractBaseModel):
+    """A resumable claim document upload in progress."""
+    PENDING = "Pending"
+    COMPLETED = "Completed"
+    FAILED = "Failed"
+
+    upload_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    claim = models.ForeignKey(Claim, on_delete=models.CASCADE, related_name="document_uploads")
+    uploaded_by = models.ForeignKey("users.User", on_delete=models.SET_NULL, null=True)
+    document_name = models.CharField(max_length=255)
+    file_name = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    received_size = models.BigIntegerField(default=0)
+    expected_sha256 = models.CharField(max_length=64, null=True)
+    status = models.CharField(
+        max_length=32,
+        choices=((PENDING, PENDING), (COMPLETED, COMPLETED), (FAILED, FAILED)),
+        default=PENDING
+    )
+    document = models.ForeignKey(ClaimDocument, on_delete=models.SET_NULL, null=True)
+
+    def __str__(self):
+        return f"{self.document_name} ({self.received_size}/{self.total_size})"
+
+
+class ClaimNumberSequence(AbstractBaseModel):
+    year = models.IntegerField(unique=True)
+    last_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.year}: {self.last_value}"
+
+    @classmethod
+    def next_claim_number(cls) -> str:
+        """
+        Allocate the next claim number for the current year.
+
+        The increment is a single ``UPDATE ... SET last_value = last_value + 1``,
+        which holds the row lock until the surrounding transaction ends, so
+        concurrent claims never receive the same number.
+        """
+        year = timezone.now().year
+        with transaction.atomic():
+            if not cls.objects.filter(year=year).update(last_value=F("last_value") + 1):
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(year=year, last_value=1)
+                except IntegrityError:
+                    cls.objects.filter(year=year).update(last_value=F("last_value") + 1)
+            value = cls.objects.filter(year=year).values_list("last_value", flat=True).get()
+        return f"{settings.CLAIM_NUMBER_PREFIX}-{year}-{value:06d}"
+
+
+class ClaimQueueCount(AbstractBaseModel):
+    """
+    Running count of claims per (status, outlet) queue, kept current by
+    ``Claim.save``, ``Claim.objects.update`` and claim deletes. Writes that go
+    around them (raw SQL, ``bulk_update``) need ``rebuild_claim_queue_counts``.
+    """
+    status = models.CharField(max_length=255)
+    device_outlet = models.ForeignKey("gadgets.DeviceOutlet", on_delete=models.CASCADE, null=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["status", "device_outlet"],
+                condition=Q(device_outlet__isnull=False),
+                name="unique_claim_queue_outlet",
+            ),
+            models.UniqueConstraint(
+                fields=["status"],
+                condition=Q(device_outlet__isnull=True),
+                name="unique_claim_queue_no_outlet",
+            ),
+        ]
 
     def __str__(self):
-        return self.document_name
\ No newline at end of file
+        return f"{self.status}: {self.count}"
+
+    @classmethod
+    def apply(cls, changes) -> None:
+        """
+        Add ``{(status, device_outlet_id): delta}`` to the queues: make sure
+        every queue exists, then add to all of them with a single UPDATE.
+        """
+        changes = {queue: delta for queue, delta in changes.items() if delta}
+        if not changes:
+            return
+        cls.objects.bulk_create(
+            [cls(status=status, device_outlet_id=device_outlet_id) for status, device_outlet_id in changes],
+            ignore_conflicts=True,
+        )
+        matching = Q()
+        deltas = []
+        for (status, device_outlet_id), delta in changes.items():
+            queue = Q(status=status, device_outlet_id=device_outlet_id)
+            matching |= queue
+            deltas.append(When(queue, then=delta))
+        cls.objects.filter(matching).update(count=F("count") + Case(*deltas, output_field=models.IntegerField()))
+
+    @classmethod
+    def rebuild(cls) -> int:
+        """Recount every queue from the claims table; returns the number of queues."""
+        totals = (
+            Claim.objects.values("status", "device_outlet_id")
+            .annotate(total=models.Count("id"))
+            .order_by()
+        )
+        with transaction.atomic():
+            cls.objects.all().delete()
+            queues = cls.objects.bulk_create([
+                cls(status=row["status"], device_outlet_id=row["device_outlet_id"], count=row["total"])
+                for row in totals
+            ])
+        return len(queues)
+
+
+class ClaimActivity(models.Model):
+    """Claims lodged per day against one device (IMEI), customer or outlet; see ``apps.claims.risk``."""
+    key = models.CharField(max_length=120)
+    day = models.DateField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["key", "day"], name="unique_claim_activity_key_day"),
+        ]
+
+    def __str__(self):
+        return f"{self.key} {self.day}: {self.count}"
+
+
+@receiver(post_delete, sender=Claim)
+def claim_deleted(sender, instance, **kwargs):
+    queue = getattr(instance, "_loaded_queue", None) or instance.queue_key()
+    ClaimQueueCount.apply({queue: -1})
+    OutletPerformance.count_claim(queue[1], instance.created_at, -1)
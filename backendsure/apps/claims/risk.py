@@ -0,0 +1,235 @@
+"""
+Fraud and risk scoring of claims.
+
+Every claim is scored as it is lodged, from two kinds of signal:
+
+* timing: an incident before, or within CLAIM_RISK_EARLY_DAYS of, the policy
+  start date, and an incident before, or shortly after, the insured device
+  was bought;
+* history: earlier claims on the same device (by IMEI), by the same customer
+  and through the same outlet, over the windows in the CLAIM_RISK_* settings.
+
+History is not counted from the claims table. ``ClaimActivity`` keeps the
+number of claims lodged per day for every ``imei:``, ``customer:`` and
+``outlet:`` key, updated as claims are created and deleted, so scoring a claim
+reads a few dozen counter rows. The points each signal adds are set in
+CLAIM_RISK_POINTS; the score is their sum, capped at 100, and is stored on the
+claim with the reasons behind it.
+
+``assess`` scores any number of claims with one query each for their
+policies, devices and history, which is what ``python manage.py rescore_claims``
+uses to re-score claims in bulk after the rules change.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from django.conf import settings
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from apps.claims.models import Claim, ClaimActivity
+from apps.gadgets.models import InsuredGadget
+from apps.policies.models import Policy
+
+
+@dataclass
+class Assessment:
+    score: int
+    reasons: List[Dict[str, Any]]
+    keys: List[str]
+
+
+def _as_date(value: Any) -> date:
+    """A date field's value as a ``date``: a saved instance still holds the string it was created with."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return parse_date(value)
+    return value
+
+
+def _lodged_on(claim: Claim) -> date:
+    return timezone.localdate(claim.created_at) if claim.created_at else timezone.localdate()
+
+
+def _devices_by_policy(claims: Sequence[Claim]) -> Dict[int, List[Dict[str, Any]]]:
+    devices = defaultdict(list)
+    rows = InsuredGadget.objects.filter(policy_id__in={claim.policy_id for claim in claims}).values(
+        "policy_id", "imei_number", "serial_number", "purchase_date"
+    )
+    for row in rows:
+        devices[row["policy_id"]].append(row)
+    return devices
+
+
+def _policies(claims: Sequence[Claim]) -> Dict[int, Dict[str, Any]]:
+    rows = Policy.objects.filter(id__in={claim.policy_id for claim in claims}).values(
+        "id", "start_date", "policy_owner_id"
+    )
+    return {row["id"]: row for row in rows}
+
+
+def activity_keys(claim: Claim, policy: Dict[str, Any], devices: Iterable[Dict[str, Any]]) -> List[str]:
+    """The ``ClaimActivity`` keys a claim counts towards."""
+    keys = []
+    for device in devices:
+        identifier = str(device["imei_number"] or device["serial_number"] or "").strip().upper()
+        if identifier:
+            keys.append(f"imei:{identifier}")
+    if policy["policy_owner_id"]:
+        keys.append(f"customer:{policy['policy_owner_id']}")
+    if claim.device_outlet_id:
+        keys.append(f"outlet:{claim.device_outlet_id}")
+    return sorted(set(keys))
+
+
+def _windows() -> Dict[str, Tuple[int, int]]:
+    """Per key kind, (window in days, claims in the window that count as a signal)."""
+    return {
+        "imei": (settings.CLAIM_RISK_IMEI_WINDOW_DAYS, 1),
+        "customer": (settings.CLAIM_RISK_CUSTOMER_VELOCITY["days"], settings.CLAIM_RISK_CUSTOMER_VELOCITY["claims"]),
+        "outlet": (settings.CLAIM_RISK_OUTLET_VELOCITY["days"], settings.CLAIM_RISK_OUTLET_VELOCITY["claims"]),
+    }
+
+
+def assess(claims: Sequence[Claim], exclude_self: bool = False) -> List[Assessment]:
+    """
+    Score ``claims`` against the claims lodged on or before the day each was
+    lodged. With ``exclude_self`` a claim's own
+    recorded activity is left out of its history, for re-scoring claims that
+    are already counted. History is kept per day, so a re-scored claim also
+    sees the claims lodged later on its own day.
+    """
+    if not claims:
+        return []
+    points = settings.CLAIM_RISK_POINTS
+    early_days = settings.CLAIM_RISK_EARLY_DAYS
+    windows = _windows()
+    policies = _policies(claims)
+    devices = _devices_by_policy(claims)
+
+    claim_keys = [activity_keys(claim, policies[claim.policy_id], devices[claim.policy_id]) for claim in claims]
+    lodged = [_lodged_on(claim) for claim in claims]
+    longest = max(days for days, _ in windows.values())
+    history: Dict[str, Dict[date, int]] = defaultdict(dict)
+    all_keys = {key for keys in claim_keys for key in keys}
+    if all_keys:
+        rows = ClaimActivity.objects.filter(
+            key__in=all_keys, day__gte=min(lodged) - timedelta(days=longest), day__lte=max(lodged)
+        ).values_list("key", "day", "count")
+        for key, day, count in rows:
+            history[key][day] = count
+
+    assessments = []
+    for claim, keys, day in zip(claims, claim_keys, lodged):
+        reasons = []
+
+        def flag(code: str, detail: str) -> None:
+            reasons.append({"code": code, "points": points[code], "detail": detail})
+
+        incident = _as_date(claim.incident_date)
+        start_date = policies[claim.policy_id]["start_date"]
+        if start_date:
+            days_covered = (incident - start_date).days
+            if days_covered < 0:
+                flag("incident_before_cover", f"Incident {-days_covered} days before the policy started")
+            elif days_covered <= early_days:
+                flag("early_incident", f"Incident {days_covered} days after the policy started")
+        for device in devices[claim.policy_id]:
+            days_owned = (incident - device["purchase_date"]).days
+            if days_owned < 0:
+                flag("incident_before_purchase", f"Incident {-days_owned} days before the device was bought")
+                break
+            if days_owned <= early_days:
+                flag("recent_device_purchase", f"Device bought {days_owned} days before the incident")
+                break
+
+        recorded = set(claim.risk_keys or []) if exclude_self else set()
+        for key in keys:
+            kind = key.split(":", 1)[0]
+            days, threshold = windows[kind]
+            since = day - timedelta(days=days)
+            earlier = sum(count for when, count in history[key].items() if since <= when <= day)
+            if key in recorded:
+                earlier -= 1
+            if earlier >= threshold:
+                if kind == "imei":
+                    flag("repeat_imei", f"Device {key[5:]} already claimed {earlier} times in {days} days")
+                elif kind == "customer":
+                    flag("customer_velocity", f"Customer lodged {earlier} other claims in {days} days")
+                else:
+                    flag("outlet_velocity", f"Outlet lodged {earlier} other claims in {days} days")
+
+        score = min(100, sum(reason["points"] for reason in reasons))
+        assessments.append(Assessment(score=score, reasons=reasons, keys=keys))
+    return assessments
+
+
+def record_activity(keys: Iterable[str], day: date, delta: int) -> None:
+    keys = list(keys)
+    if not keys:
+        return
+    ClaimActivity.objects.bulk_create(
+        [ClaimActivity(key=key, day=day) for key in keys], ignore_conflicts=True
+    )
+    ClaimActivity.objects.filter(key__in=keys, day=day).update(count=F("count") + delta)
+
+
+def rebuild_activity(chunk_size: int = 2000) -> int:
+    """
+    Recount ``ClaimActivity`` from every claim and record each claim's keys on
+    it; returns the number of counter rows.
+    """
+    counts: Dict[Tuple[str, date], int] = defaultdict(int)
+    last_id = 0
+    while True:
+        claims = list(Claim.objects.filter(id__gt=last_id).order_by("id")[:chunk_size])
+        if not claims:
+            break
+        policies = _policies(claims)
+        devices = _devices_by_policy(claims)
+        for claim in claims:
+            claim.risk_keys = activity_keys(claim, policies[claim.policy_id], devices[claim.policy_id])
+            for key in claim.risk_keys:
+                counts[(key, _lodged_on(claim))] += 1
+        Claim.objects.bulk_update(claims, ["risk_keys"])
+        last_id = claims[-1].id
+
+    ClaimActivity.objects.all().delete()
+    rows = ClaimActivity.objects.bulk_create(
+        [ClaimActivity(key=key, day=day, count=count) for (key, day), count in counts.items()],
+        batch_size=chunk_size,
+    )
+    return len(rows)
+
+
+def claim_lodged(sender, instance: Claim, created: bool, raw: bool = False, **kwargs) -> None:
+    """Score a claim once, when it is created; later saves and fixture loads are not re-scored."""
+    if not created or raw:
+        return
+    [assessment] = assess([instance])
+    instance.risk_score = assessment.score
+    instance.risk_reasons = assessment.reasons
+    instance.risk_keys = assessment.keys
+    instance.risk_scored_at = timezone.now()
+    Claim.objects.filter(pk=instance.pk).update(
+        risk_score=instance.risk_score,
+        risk_reasons=instance.risk_reasons,
+        risk_keys=instance.risk_keys,
+        risk_scored_at=instance.risk_scored_at,
+    )
+    # Counted after scoring, so a claim is not part of its own history.
+    record_activity(assessment.keys, _lodged_on(instance), 1)
+
+
+def claim_removed(sender, instance: Claim, **kwargs) -> None:
+    record_activity(instance.risk_keys or [], _lodged_on(instance), -1)
+
+
+def connect_signals() -> None:
+    post_save.connect(claim_lodged, sender=Claim, dispatch_uid="claims.risk.claim_lodged")
+    post_delete.connect(claim_removed, sender=Claim, dispatch_uid="claims.risk.claim_removed")
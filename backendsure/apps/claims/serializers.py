@@ -1,11 +1,54 @@
+from django.conf import settings
 from rest_framework import serializers
 
-from apps.claims.models import Claim, ClaimDocument
+from apps.claims.models import Claim, ClaimDocument, ClaimQueueCount, ClaimDocumentUpload
+from apps.claims.uploads import store_claim_document
 
 class ClaimDocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = ClaimDocument
         fields = "__all__"
+        read_only_fields = ("content_sha256", "size")
+
+    def validate_document_file(self, value):
+        if value.size > settings.CLAIM_DOCUMENT_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"Claim documents may not exceed {settings.CLAIM_DOCUMENT_MAX_SIZE} bytes."
+            )
+        return value
+
+    def create(self, validated_data):
+        return store_claim_document(
+            claim=validated_data["claim"],
+            document_name=validated_data["document_name"],
+            file=validated_data["document_file"],
+        )
+
+
+class ClaimDocumentUploadSerializer(serializers.ModelSerializer):
+    sha256 = serializers.RegexField(
+        r"^[0-9a-fA-F]{64}$", source="expected_sha256", required=False, allow_null=True
+    )
+
+    class Meta:
+        model = ClaimDocumentUpload
+        fields = (
+            "upload_id", "claim", "document_name", "file_name", "total_size", "sha256",
+            "received_size", "status", "document",
+        )
+        read_only_fields = ("upload_id", "received_size", "status", "document")
+
+    def validate_total_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("total_size must be greater than zero.")
+        if value > settings.CLAIM_DOCUMENT_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"Claim documents may not exceed {settings.CLAIM_DOCUMENT_MAX_SIZE} bytes."
+            )
+        return value
+
+    def validate_sha256(self, value):
+        return value.lower() if value else value
 
 
 class ClaimSerializer(serializers.ModelSerializer):
@@ -14,6 +57,7 @@ class ClaimSerializer(serializers.ModelSerializer):
     class Meta:
         model = Claim
         fields = "__all__"
+        read_only_fields = ("claim_number", "risk_score", "risk_reasons", "risk_scored_at")
 
     
     def get_policy_number(self, obj):
@@ -29,6 +73,7 @@ class ClaimDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Claim
         fields = "__all__"
+        read_only_fields = ("risk_score", "risk_reasons", "risk_scored_at")
 
     
     def get_policy_number(self, obj):
@@ -39,4 +84,46 @@ class ClaimDetailSerializer(serializers.ModelSerializer):
         return obj.device_outlet.name if obj.device_outlet else ""
     
     def get_claim_owner(self, obj):
-        return f"{obj.policy.policy_owner.first_name} {obj.policy.policy_owner.last_name}" if obj.policy.policy_owner else "Group Claim"
\ No newline at end of file
+        return f"{obj.policy.policy_owner.first_name} {obj.policy.policy_owner.last_name}" if obj.policy.policy_owner else "Group Claim"
+
+
+class ClaimWorklistQuerySerializer(serializers.Serializer):
+    status = serializers.CharField(required=False)
+    outlet = serializers.IntegerField(min_value=1, required=False)
+    min_risk_score = serializers.IntegerField(min_value=0, max_value=100, required=False)
+    min_age_days = serializers.IntegerField(min_value=0, required=False)
+    max_age_days = serializers.IntegerField(min_value=0, required=False)
+
+
+class ClaimWorklistSerializer(serializers.ModelSerializer):
+    """Flat worklist row; expects policy owner and outlet to be select_related."""
+    policy_number = serializers.CharField(source="policy.policy_number", read_only=True)
+    claim_owner = serializers.SerializerMethodField()
+    device_outlet_name = serializers.SerializerMethodField()
+    age_days = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Claim
+        fields = (
+            "id", "claim_number", "policy", "policy_number", "claim_owner", "claim_type",
+            "estimated_cost", "incident_date", "device_outlet", "device_outlet_name",
+            "status", "verified", "risk_score", "risk_reasons", "age_days", "created_at",
+        )
+
+    def get_claim_owner(self, obj):
+        owner = obj.policy.policy_owner
+        return f"{owner.first_name} {owner.last_name}" if owner else "Group Claim"
+
+    def get_device_outlet_name(self, obj):
+        return obj.device_outlet.name if obj.device_outlet else ""
+
+    def get_age_days(self, obj):
+        return (self.context["now"] - obj.created_at).days
+
+
+class ClaimQueueCountSerializer(serializers.ModelSerializer):
+    device_outlet_name = serializers.CharField(source="device_outlet.name", default="", read_only=True)
+
+    class Meta:
+        model = ClaimQueueCount
+        fields = ("status", "device_outlet", "device_outlet_name", "count")
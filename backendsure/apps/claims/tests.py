@@ -1,3 +1,292 @@
-from django.test import TestCase
+import hashlib
+import io
+import shutil
+import tempfile
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.claims.models import Claim, ClaimDocument, ClaimDocumentUpload, ClaimQueueCount
+from apps.claims.risk import assess
+from apps.claims.uploads import file_sha256
+from apps.claims.views import ClaimWorklistPagination
+from apps.gadgets.models import DeviceOutlet, InsuredGadget, OutletPerformance
+from apps.policies.models import Policy
+from apps.pricing.models import GadgetPricing
+from apps.products.models import Product
+from apps.schemes.models import Scheme, SchemeGroup
+from apps.users.models import Membership, User
+
+
+class ClaimTestCase(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create(username="jane", email="jane@example.com", role="Policy Owner")
+        self.policy = Policy.objects.create(policy_number="GDT_1", policy_owner=self.customer, status="Active")
+        self.claim = self.lodge(self.policy)
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def lodge(self, policy, **fields):
+        return Claim.objects.create(
+            policy=policy, description="Cracked screen", claim_type="Damage", incident_date=date(2026, 3, 1), **fields
+        )
+
+
+class ClaimDocumentUploadTests(ClaimTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings = override_settings(
+            MEDIA_ROOT=media,
+            CLAIM_DOCUMENT_UPLOAD_TEMP_DIR=f"{media}/parts",
+            CLAIM_DOCUMENT_CHUNK_MAX_SIZE=1024,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.content = bytes(range(256)) * 10
+
+    def start(self, client=None, claim=None, **fields):
+        response = (client or self.client).post("/claims/claim-documents/uploads/", {
+            "claim": (claim or self.claim).id,
+            "document_name": "Photo",
+            "file_name": "photo.jpg",
+            "total_size": len(self.content),
+            **fields,
+        }, format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def put(self, upload_id, offset, data):
+        return self.client.generic(
+            "PUT", f"/claims/claim-documents/uploads/{upload_id}/", data,
+            content_type="application/octet-stream", HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_chunks_resume_from_the_stored_offset(self):
+        upload_id = self.start()["upload_id"]
+
+        self.assertEqual(self.put(upload_id, 0, self.content[:1000]).data["received_size"], 1000)
+        response = self.client.get(f"/claims/claim-documents/uploads/{upload_id}/")
+        self.assertEqual(response.data["received_size"], 1000)
+
+        response = self.put(upload_id, 1000, self.content[1000:2000])
+        self.assertEqual(response.status_code, 200)
+        # The file is hashed once, when the last chunk completes it.
+        with mock.patch("apps.claims.uploads.file_sha256", wraps=file_sha256) as hashed:
+            response = self.put(upload_id, 2000, self.content[2000:])
+        self.assertEqual(response.data["status"], ClaimDocumentUpload.COMPLETED)
+        self.assertEqual(hashed.call_count, 1)
+
+        document = ClaimDocument.objects.get(claim=self.claim)
+        self.assertEqual(document.content_sha256, hashlib.sha256(self.content).hexdigest())
+        with document.document_file.open("rb") as stored:
+            self.assertEqual(stored.read(), self.content)
+
+    def test_chunk_at_the_wrong_offset_is_refused(self):
+        upload_id = self.start()["upload_id"]
+        self.put(upload_id, 0, self.content[:1000])
+
+        response = self.put(upload_id, 0, self.content[:1000])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["received_size"], 1000)
+        response = self.put(upload_id, 1500, self.content[1500:2500])
+        self.assertEqual(response.status_code, 409)
+
+    def test_content_not_matching_the_declared_hash_fails(self):
+        upload_id = self.start(sha256="0" * 64)["upload_id"]
+        self.put(upload_id, 0, self.content[:1024])
+        self.put(upload_id, 1024, self.content[1024:2048])
+
+        response = self.put(upload_id, 2048, self.content[2048:])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["status"], ClaimDocumentUpload.FAILED)
+        self.assertFalse(ClaimDocument.objects.exists())
+
+    def test_known_hash_completes_without_bytes_only_for_the_same_owner(self):
+        sha256 = hashlib.sha256(self.content).hexdigest()
+        upload_id = self.start()["upload_id"]
+        for offset in range(0, len(self.content), 1024):
+            self.put(upload_id, offset, self.content[offset:offset + 1024])
+
+        second_claim = self.lodge(self.policy)
+        self.assertEqual(self.start(claim=second_claim, sha256=sha256)["status"], ClaimDocumentUpload.COMPLETED)
+
+        other = User.objects.create(username="sam", email="sam@example.com", role="Policy Owner")
+        other_claim = self.lodge(Policy.objects.create(policy_number="GDT_2", policy_owner=other, status="Active"))
+        other_client = APIClient()
+        other_client.force_authenticate(other)
+        started = self.start(client=other_client, claim=other_claim, sha256=sha256)
+        self.assertEqual(started["status"], ClaimDocumentUpload.PENDING)
+        self.assertFalse(ClaimDocument.objects.filter(claim=other_claim).exists())
+
+
+class ClaimWorklistTests(ClaimTestCase):
+    def setUp(self):
+        super().setUp()
+        admin = User.objects.create(username="admin", email="admin@example.com", role="Admin")
+        self.client.force_authenticate(admin)
+
+    def test_filters_by_age(self):
+        response = self.client.get("/claims/worklist/", {"max_age_days": 1})
+        self.assertEqual([row["id"] for row in response.data["results"]], [self.claim.id])
+        response = self.client.get("/claims/worklist/", {"min_age_days": 1})
+        self.assertEqual(response.data["results"], [])
+
+    def test_filters_by_risk_score(self):
+        Claim.objects.filter(pk=self.claim.pk).update(risk_score=40)
+        response = self.client.get("/claims/worklist/", {"min_risk_score": 40})
+        self.assertEqual([row["id"] for row in response.data["results"]], [self.claim.id])
+        response = self.client.get("/claims/worklist/", {"min_risk_score": 41})
+        self.assertEqual(response.data["results"], [])
+
+    def test_risky_claims_are_queued_oldest_first(self):
+        now = timezone.now()
+        older, risky, newest = self.claim, self.lodge(self.policy), self.lodge(self.policy)
+        for claim, score, age in ((older, 60, 3), (risky, 90, 2), (newest, 70, 1), (self.lodge(self.policy), 10, 0)):
+            Claim.objects.filter(pk=claim.pk).update(risk_score=score, created_at=now - timedelta(days=age))
+
+        with mock.patch.object(ClaimWorklistPagination, "page_size", 2):
+            first = self.client.get("/claims/worklist/", {"min_risk_score": 50}).data
+            second = self.client.get(first["next"]).data
+
+        self.assertEqual([row["id"] for row in first["results"]], [older.id, risky.id])
+        self.assertEqual([row["id"] for row in second["results"]], [newest.id])
+        self.assertIsNone(second["next"])
+
+    def test_bad_filters_are_a_bad_request(self):
+        for params in ({"min_age_days": "soon"}, {"max_age_days": "-1"}, {"outlet": "shop"}, {"min_risk_score": "high"}):
+            self.assertEqual(self.client.get("/claims/worklist/", params).status_code, 400, params)
+        self.assertEqual(self.client.get("/claims/queues/", {"outlet": "shop"}).status_code, 400)
+
+
+class ClaimQueueCountTests(ClaimTestCase):
+    def setUp(self):
+        super().setUp()
+        self.outlet = DeviceOutlet.objects.create(
+            agent_type="Repair", outlet_number="REP1", name="Fixit", phone_number="1",
+            location="Moi Avenue", city="Nairobi",
+        )
+
+    def queues(self):
+        return dict(
+            ((queue.status, queue.device_outlet_id), queue.count)
+            for queue in ClaimQueueCount.objects.filter(count__gt=0)
+        )
+
+    def test_save_moves_the_claim_between_queues(self):
+        claim = Claim.objects.get(pk=self.claim.pk)
+        claim.status = "Pending"
+        claim.device_outlet = self.outlet
+        # The claim UPDATE, the queue rows and one UPDATE across both queues, then the outlet's claim rows.
+        with self.assertNumQueries(5):
+            claim.save()
+
+        self.assertEqual(self.queues(), {("Pending", self.outlet.id): 1})
+        self.assertEqual(OutletPerformance.objects.filter(device_outlet=self.outlet, claims=1).count(), 2)
+
+    def test_queryset_update_keeps_the_queues(self):
+        self.lodge(self.policy)
+        self.lodge(self.policy, status="Paid")
+
+        self.assertEqual(Claim.objects.filter(status="Pending Verification").update(status="Paid"), 2)
+        self.assertEqual(self.queues(), {("Paid", None): 3})
+
+        Claim.objects.filter(status="Paid").update(device_outlet=self.outlet)
+        self.assertEqual(self.queues(), {("Paid", self.outlet.id): 3})
+        self.assertEqual(
+            OutletPerformance.objects.filter(device_outlet=self.outlet).values_list("claims", flat=True).distinct().get(),
+            3,
+        )
+
+    def test_rebuild_recounts_writes_that_skipped_the_counts(self):
+        Claim.objects.bulk_update([Claim(pk=self.claim.pk, status="Failed")], ["status"])
+        call_command("rebuild_claim_queue_counts", stdout=io.StringIO())
+        self.assertEqual(self.queues(), {("Failed", None): 1})
+
+
+class ClaimRiskTests(TestCase):
+    """Phone cover from 1 January 2026 on a phone bought on 1 December 2025."""
+
+    def setUp(self):
+        scheme = Scheme.objects.create(name="Gadget", scheme_type="Individual")
+        product = Product.objects.create(name="Phone Cover", scheme=scheme, policy_number_prefix="GDT")
+        pricing = GadgetPricing.objects.create(product=product, cover_percentage=10)
+        self.customer = User.objects.create(username="jane", email="jane@example.com", role="Policy Owner")
+        self.outlet = DeviceOutlet.objects.create(
+            agent_type="Seller", outlet_number="OUT1", name="Shop", phone_number="1", location="Moi Avenue", city="Nairobi",
+        )
+        self.policy = Policy.objects.create(
+            policy_number="GDT_1", policy_owner=self.customer, status="Active", start_date=date(2026, 1, 1)
+        )
+        scheme_group = SchemeGroup.objects.create(scheme=scheme, policy=self.policy)
+        membership = Membership.objects.create(user=self.customer, policy=self.policy, scheme_group=scheme_group)
+        InsuredGadget.objects.create(
+            policy=self.policy, membership=membership, pricing=pricing, device_type="smartphone", device_model="14",
+            imei_number=" 356789 ", purchase_date=date(2025, 12, 1),
+        )
+
+    def lodge(self, incident_date=date(2026, 6, 1), **fields):
+        return Claim.objects.create(
+            policy=self.policy, description="Cracked screen", claim_type="Damage", incident_date=incident_date, **fields
+        )
+
+    def codes(self, incident_date):
+        [assessment] = assess([Claim(policy=self.policy, incident_date=incident_date)])
+        return assessment.score, [reason["code"] for reason in assessment.reasons]
+
+    def test_timing_signals(self):
+        self.assertEqual(self.codes(date(2026, 6, 1)), (0, []))
+        self.assertEqual(self.codes(date(2026, 1, 20)), (30, ["early_incident"]))
+        self.assertEqual(self.codes(date(2025, 12, 20)), (65, ["incident_before_cover", "recent_device_purchase"]))
+        self.assertEqual(
+            self.codes(date(2025, 11, 30)), (90, ["incident_before_cover", "incident_before_purchase"])
+        )
+
+    def test_history_signals(self):
+        first = self.lodge()
+        second = self.lodge()
+        third = self.lodge(device_outlet=self.outlet)
+
+        self.assertEqual((first.risk_score, first.risk_reasons), (0, []))
+        self.assertEqual(first.risk_keys, ["customer:%d" % self.customer.id, "imei:356789"])
+        self.assertEqual([reason["code"] for reason in second.risk_reasons], ["repeat_imei"])
+        self.assertEqual(
+            (third.risk_score, [reason["code"] for reason in third.risk_reasons]),
+            (55, ["customer_velocity", "repeat_imei"]),
+        )
+        self.assertEqual(Claim.objects.get(pk=third.pk).risk_score, 55)
+
+    @override_settings(CLAIM_RISK_OUTLET_VELOCITY={"days": 30, "claims": 1})
+    def test_outlet_velocity_and_the_cap(self):
+        self.lodge(device_outlet=self.outlet)
+        self.lodge(device_outlet=self.outlet)
+
+        claim = self.lodge(incident_date=date(2025, 11, 30), device_outlet=self.outlet)
+
+        self.assertEqual(
+            [reason["code"] for reason in claim.risk_reasons],
+            ["incident_before_cover", "incident_before_purchase", "customer_velocity", "repeat_imei", "outlet_velocity"],
+        )
+        self.assertEqual(claim.risk_score, 100)
+
+    def test_an_incident_date_given_as_text_is_scored(self):
+        claim = self.lodge(incident_date="2025-12-20")
+
+        self.assertEqual(Claim.objects.get(pk=claim.pk).risk_score, 65)
+
+    def test_only_a_new_claim_is_scored(self):
+        claim = self.lodge(incident_date="2026-01-20")
+        scored_at = claim.risk_scored_at
+
+        with mock.patch("apps.claims.risk.assess") as assessed:
+            claim.description = "Cracked screen and back"
+            claim.save()
+
+        assessed.assert_not_called()
+        claim.refresh_from_db()
+        self.assertEqual((claim.risk_score, claim.risk_scored_at), (30, scored_at))
@@ -0,0 +1,160 @@
+import hashlib
+import os
+from typing import IO, Optional
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from apps.claims.models import Claim, ClaimDocument, ClaimDocumentUpload
+
+
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+class UploadError(Exception):
+    """Raised when an upload chunk or finalisation is rejected."""
+    pass
+
+
+def content_path(sha256: str, extension: str) -> str:
+    """Content addressed location of a claim document under ``media/claim_documents``."""
+    return f"claim_documents/{sha256[:2]}/{sha256}{extension.lower()}"
+
+
+def file_sha256(file: IO[bytes]) -> str:
+    hasher = hashlib.sha256()
+    for block in iter(lambda: file.read(READ_BLOCK_SIZE), b""):
+        hasher.update(block)
+    return hasher.hexdigest()
+
+
+def existing_document_path(sha256: str) -> Optional[str]:
+    return (
+        ClaimDocument.objects.filter(content_sha256=sha256)
+        .values_list("document_file", flat=True)
+        .first()
+    )
+
+
+def store_claim_document(claim: Claim, document_name: str, file: File, sha256: Optional[str] = None) -> ClaimDocument:
+    """
+    Attach ``file`` to ``claim``, storing its bytes once per distinct content.
+
+    When identical content was uploaded before (a retried upload, or the same
+    photo on two claims) the new document points at the stored copy instead of
+    writing it again.
+    """
+    if sha256 is None:
+        file.seek(0)
+        sha256 = file_sha256(file)
+
+    path = existing_document_path(sha256)
+    if path is None:
+        path = content_path(sha256, os.path.splitext(file.name or "")[1])
+        if not default_storage.exists(path):
+            file.seek(0)
+            path = default_storage.save(path, file)
+
+    return ClaimDocument.objects.create(
+        claim=claim,
+        document_name=document_name,
+        document_file=path,
+        content_sha256=sha256,
+        size=file.size,
+    )
+
+
+class ChunkedClaimDocumentUpload:
+    """
+    Resumable upload of one claim document, written straight to a temp file.
+
+    Chunks must arrive at the session's current offset; a client that lost its
+    connection asks for the offset and carries on from there. Each chunk is
+    written with the upload row locked, so two requests for the same offset
+    cannot both append. The request body is copied to disk in small blocks, and
+    the assembled file is hashed once, block by block, when the last chunk
+    arrives. Memory use does not grow with the file size.
+    """
+
+    def __init__(self, upload: ClaimDocumentUpload) -> None:
+        self.upload = upload
+
+    @property
+    def temp_path(self) -> str:
+        return os.path.join(settings.CLAIM_DOCUMENT_UPLOAD_TEMP_DIR, f"{self.upload.upload_id}.part")
+
+    def write_chunk(self, stream: IO[bytes], offset: int, length: int) -> Optional[ClaimDocument]:
+        """Append ``length`` bytes from ``stream``; returns the document once the upload is complete."""
+        with transaction.atomic():
+            self.upload.refresh_from_db(from_queryset=ClaimDocumentUpload.objects.select_for_update())
+            try:
+                return self._write_chunk(stream, offset, length)
+            except UploadError as error:
+                # Keep what was recorded before the rejection, such as a reset offset.
+                failure = error
+        raise failure
+
+    def _write_chunk(self, stream: IO[bytes], offset: int, length: int) -> Optional[ClaimDocument]:
+        upload = self.upload
+        if upload.status != ClaimDocumentUpload.PENDING:
+            raise UploadError("This upload has already been completed.")
+        if offset != upload.received_size:
+            raise UploadError(f"Expected a chunk at offset {upload.received_size}.")
+        if length > settings.CLAIM_DOCUMENT_CHUNK_MAX_SIZE:
+            raise UploadError(f"Chunks may not exceed {settings.CLAIM_DOCUMENT_CHUNK_MAX_SIZE} bytes.")
+        if offset + length > upload.total_size:
+            raise UploadError("Chunk extends past the declared file size.")
+
+        if offset and not os.path.exists(self.temp_path):
+            upload.received_size = 0
+            upload.save(update_fields=["received_size", "updated_at"])
+            raise UploadError("Uploaded data was lost; restart the upload from offset 0.")
+
+        os.makedirs(settings.CLAIM_DOCUMENT_UPLOAD_TEMP_DIR, exist_ok=True)
+        written = 0
+        with open(self.temp_path, "r+b" if offset else "wb") as temp_file:
+            temp_file.seek(offset)
+            temp_file.truncate()
+            while written < length:
+                block = stream.read(min(READ_BLOCK_SIZE, length - written))
+                if not block:
+                    break
+                temp_file.write(block)
+                written += len(block)
+
+        if written != length:
+            raise UploadError("The chunk ended before its declared length; resend it.")
+
+        upload.received_size = offset + written
+        upload.save(update_fields=["received_size", "updated_at"])
+
+        if upload.received_size < upload.total_size:
+            return None
+        return self._complete()
+
+    def _complete(self) -> ClaimDocument:
+        upload = self.upload
+        try:
+            with open(self.temp_path, "rb") as temp_file:
+                sha256 = file_sha256(temp_file)
+                if upload.expected_sha256 and upload.expected_sha256 != sha256:
+                    upload.status = ClaimDocumentUpload.FAILED
+                    upload.save(update_fields=["status", "updated_at"])
+                    raise UploadError("Uploaded content does not match the declared SHA-256.")
+
+                document = store_claim_document(
+                    claim=upload.claim,
+                    document_name=upload.document_name,
+                    file=File(temp_file, name=upload.file_name),
+                    sha256=sha256,
+                )
+        finally:
+            if os.path.exists(self.temp_path):
+                os.remove(self.temp_path)
+
+        upload.status = ClaimDocumentUpload.COMPLETED
+        upload.document = document
+        upload.save(update_fields=["status", "document", "updated_at"])
+        return document
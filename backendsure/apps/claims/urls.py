@@ -2,11 +2,17 @@ from django.urls import path
 
 from apps.claims.views import (
     ClaimAPIView, ClaimDetailAPIView,
-    ClaimDocumentAPIView
+    ClaimDocumentAPIView, ClaimWorklistAPIView, ClaimQueueCountAPIView,
+    ClaimDocumentUploadAPIView, ClaimDocumentUploadDetailAPIView, CustomerClaimAPIView
 )
 
 urlpatterns = [
     path("", ClaimAPIView.as_view(), name="claims"),
+    path("my-claims/", CustomerClaimAPIView.as_view(), name="customer-claims"),
     path("<int:pk>/details/", ClaimDetailAPIView.as_view(), name="claim-details"),
     path("claim-documents/", ClaimDocumentAPIView.as_view(), name="claim-documents"),
+    path("claim-documents/uploads/", ClaimDocumentUploadAPIView.as_view(), name="claim-document-uploads"),
+    path("claim-documents/uploads/<uuid:upload_id>/", ClaimDocumentUploadDetailAPIView.as_view(), name="claim-document-upload-detail"),
+    path("worklist/", ClaimWorklistAPIView.as_view(), name="claims-worklist"),
+    path("queues/", ClaimQueueCountAPIView.as_view(), name="claims-queues"),
 ]
\ No newline at end of file
@@ -1,17 +1,32 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q, Sum
+from django.utils import timezone
 from rest_framework import status, generics
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
 
-from apps.claims.models import Claim, ClaimDocument
-from apps.claims.serializers import ClaimSerializer, ClaimDetailSerializer, ClaimDocumentSerializer
+from apps.claims.models import Claim, ClaimDocument, ClaimQueueCount, ClaimDocumentUpload
+from apps.claims.serializers import (
+    ClaimSerializer, ClaimDetailSerializer, ClaimDocumentSerializer,
+    ClaimWorklistSerializer, ClaimWorklistQuerySerializer, ClaimQueueCountSerializer, ClaimDocumentUploadSerializer
+)
+from apps.claims.uploads import ChunkedClaimDocumentUpload, UploadError
+from apps.core.async_views import AsyncAPIView
+from apps.core.audit import record_action, snapshot, diff
+from apps.core.idempotency import idempotent
+from apps.core.constants import UserActionTypes
 # Create your views here.
 class ClaimAPIView(generics.ListCreateAPIView):
     serializer_class = ClaimSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        queryset = Claim.objects.all().order_by("-created_at")
+        queryset = Claim.objects.select_related("policy").order_by("-created_at")
         user = self.request.user
 
         if user.role != "Admin":
@@ -19,15 +34,211 @@ class ClaimAPIView(generics.ListCreateAPIView):
 
         return queryset
 
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        return self.create(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        claim = serializer.save()
+        record_action("Claim lodged", UserActionTypes.CREATED.value, actor=self.request.user, target=claim)
+
+
+class CustomerClaimAPIView(AsyncAPIView):
+    """Claims on the signed in customer's own policies."""
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request, *args, **kwargs):
+        queryset = Claim.objects.select_related("policy").filter(
+            policy__policy_owner=request.user
+        ).order_by("-created_at")
+        return await self.paginate(queryset, ClaimSerializer)
+
 
 class ClaimDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Claim.objects.all().order_by("-created_at")
+    queryset = Claim.objects.select_related("policy__policy_owner", "device_outlet").order_by("-created_at")
     serializer_class  = ClaimDetailSerializer
 
     lookup_field = "pk"
 
+    def perform_update(self, serializer):
+        before = snapshot(serializer.instance)
+        claim = serializer.save()
+        changes = diff(before, snapshot(claim))
+        if changes:
+            record_action("Claim updated", UserActionTypes.UPDATED.value, actor=self.request.user, target=claim, changes=changes)
+
+    def perform_destroy(self, instance):
+        record_action("Claim deleted", UserActionTypes.DELETE.value, actor=self.request.user, target=instance, changes=snapshot(instance))
+        instance.delete()
+
 
 
 class ClaimDocumentAPIView(generics.CreateAPIView):
     queryset = ClaimDocument.objects.all()
     serializer_class = ClaimDocumentSerializer
+
+
+class ClaimDocumentUploadAPIView(generics.CreateAPIView):
+    """
+    Start a resumable claim document upload.
+
+    When the client sends the file's SHA-256 and the same content is already
+    attached to one of the claim owner's claims, the document is attached
+    straight away and no bytes need to be uploaded. Content held only by other
+    customers has to be uploaded, since knowing a hash is not having the file.
+    """
+    serializer_class = ClaimDocumentUploadSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        claim = serializer.validated_data["claim"]
+        if request.user.role != "Admin" and claim.policy.policy_owner_id != request.user.id:
+            return Response(
+                {"detail": "You can only upload documents to your own claims."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        upload = serializer.save(uploaded_by=request.user)
+        document = None
+        if upload.expected_sha256:
+            owned = Q(claim=claim)
+            if claim.policy.policy_owner_id:
+                owned |= Q(claim__policy__policy_owner_id=claim.policy.policy_owner_id)
+            document = ClaimDocument.objects.filter(owned, content_sha256=upload.expected_sha256).first()
+        if document:
+            upload.document = ClaimDocument.objects.create(
+                claim=claim,
+                document_name=upload.document_name,
+                document_file=document.document_file.name,
+                content_sha256=document.content_sha256,
+                size=document.size,
+            )
+            upload.received_size = upload.total_size
+            upload.status = ClaimDocumentUpload.COMPLETED
+            upload.save(update_fields=["document", "received_size", "status", "updated_at"])
+
+        return Response(self.get_serializer(upload).data, status=status.HTTP_201_CREATED)
+
+
+class ClaimDocumentUploadDetailAPIView(generics.RetrieveAPIView):
+    """
+    GET reports the offset to resume from; PUT appends the raw request body at
+    the ``Upload-Offset`` header position.
+    """
+    serializer_class = ClaimDocumentUploadSerializer
+    permission_classes = [IsAuthenticated]
+
+    lookup_field = "upload_id"
+
+    def get_queryset(self):
+        queryset = ClaimDocumentUpload.objects.select_related("claim")
+        if self.request.user.role != "Admin":
+            queryset = queryset.filter(uploaded_by=self.request.user)
+        return queryset
+
+    def put(self, request, *args, **kwargs):
+        upload = self.get_object()
+        try:
+            offset = int(request.headers.get("Upload-Offset", ""))
+            length = int(request.headers.get("Content-Length") or 0)
+        except ValueError:
+            return Response(
+                {"detail": "Upload-Offset and Content-Length headers are required."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            ChunkedClaimDocumentUpload(upload).write_chunk(request.stream, offset, length)
+        except UploadError as e:
+            return Response(
+                {"detail": str(e), **self.get_serializer(upload).data},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        return Response(self.get_serializer(upload).data, status=status.HTTP_200_OK)
+
+
+class ClaimWorklistPagination(CursorPagination):
+    page_size = settings.CLAIMS_WORKLIST_PAGE_SIZE
+    ordering = ("created_at", "id")
+
+
+def _require_admin(user):
+    if user.role != "Admin":
+        raise PermissionDenied("You do not have permission to view the claims workbench.")
+
+
+def _worklist_query(request):
+    """Validated worklist filters; bad values are a 400 rather than a server error."""
+    query = ClaimWorklistQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+    return query.validated_data
+
+
+class ClaimWorklistAPIView(generics.ListAPIView):
+    """
+    Oldest-first claims queue for assessors.
+
+    Filters map onto the (status, created_at) and (device_outlet, status,
+    created_at) indexes, and pages are keyset (cursor) based so deep pages cost
+    the same as the first one.
+    """
+    serializer_class = ClaimWorklistSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = ClaimWorklistPagination
+
+    def get_queryset(self):
+        _require_admin(self.request.user)
+        params = _worklist_query(self.request)
+        queryset = Claim.objects.select_related("policy__policy_owner", "device_outlet")
+
+        if params.get("status"):
+            queryset = queryset.filter(status=params["status"])
+        if params.get("outlet"):
+            queryset = queryset.filter(device_outlet_id=params["outlet"])
+        if params.get("min_risk_score") is not None:
+            queryset = queryset.filter(risk_score__gte=params["min_risk_score"])
+
+        now = timezone.now()
+        if params.get("min_age_days") is not None:
+            queryset = queryset.filter(created_at__lte=now - timedelta(days=params["min_age_days"]))
+        if params.get("max_age_days") is not None:
+            queryset = queryset.filter(created_at__gte=now - timedelta(days=params["max_age_days"]))
+
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["now"] = timezone.now()
+        return context
+
+
+class ClaimQueueCountAPIView(generics.ListAPIView):
+    """Per-queue claim counts read from the incrementally maintained counters."""
+    serializer_class = ClaimQueueCountSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = None
+
+    def get_queryset(self):
+        _require_admin(self.request.user)
+        params = _worklist_query(self.request)
+        queryset = ClaimQueueCount.objects.select_related("device_outlet").filter(count__gt=0)
+        if params.get("outlet"):
+            queryset = queryset.filter(device_outlet_id=params["outlet"])
+        return queryset.order_by("status", "device_outlet_id")
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        by_status = {
+            row["status"]: row["total"]
+            for row in queryset.values("status").annotate(total=Sum("count")).order_by()
+        }
+        return Response(
+            {
+                "by_status": by_status,
+                "queues": self.get_serializer(queryset, many=True).data,
+            },
+            status=status.HTTP_200_OK
+        )
@@ -1,12 +1,18 @@
 from dataclasses import dataclass
-from typing import Optional
-from apps.core.models import UserAction
+from typing import Any, Dict, Optional
+
+from django.db.models import Model
+
+from apps.core.audit import record_action
 
 @dataclass
 class UserActionData:
     action_title: str
     action_type: str
     action_description: Optional[str] = None  # Made optional with default value
+    actor: Any = None
+    target: Optional[Model] = None
+    changes: Optional[Dict[str, Any]] = None
     
     
 class UserActionLogger:
@@ -14,9 +20,13 @@ class UserActionLogger:
         self.action = action
         
     def log_user_action(self):
-        UserAction.objects.create(
+        # Buffered: the row is written by the audit log writer thread, not in this request.
+        record_action(
             action_title=self.action.action_title,
             action_type=self.action.action_type,
+            actor=self.action.actor,
+            target=self.action.target,
+            changes=self.action.changes,
             action_description=self.action.action_description
         )
 
@@ -24,8 +34,10 @@ class UserActionLogger:
 #action_data = UserActionData(
 #    action_title="Created new policy",
 #    action_type="Create",
-#    action_description="James has created a new credit life policy for customer"
+#    action_description="James has created a new credit life policy for customer",
+#    actor=request.user,
+#    target=policy,
 #)
 
 #logger = UserActionLogger(action_data)
-#logger.log_user_action()
\ No newline at end of file
+#logger.log_user_action()
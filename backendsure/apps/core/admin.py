@@ -1,3 +1,26 @@
 from django.contrib import admin
 
+from apps.core.models import UserAction, IdempotencyKey, ArchiveSegment
+
 # Register your models here.
+@admin.register(UserAction)
+class UserActionAdmin(admin.ModelAdmin):
+    list_display = ["id", "occurred_at", "action_title", "action_type", "actor", "object_type", "object_id"]
+    list_filter = ["action_type"]
+    date_hierarchy = "occurred_at"
+    list_select_related = ["actor"]
+
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ["id", "key", "status", "response_status", "created_at", "expires_at"]
+    list_filter = ["status"]
+    search_fields = ["key"]
+
+
+
+@admin.register(ArchiveSegment)
+class ArchiveSegmentAdmin(admin.ModelAdmin):
+    list_display = ["id", "model_label", "row_count", "oldest_at", "newest_at", "size", "file"]
+    list_filter = ["model_label"]
@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.core"
+
+    def ready(self):
+        from apps.core import reference_data
+        reference_data.connect_signals()
+        if settings.PERF_PROFILER_ENABLED:
+            from django.db.backends.signals import connection_created
+            from apps.core.profiling import install_query_recorder
+            connection_created.connect(install_query_recorder, dispatch_uid="core.install_query_recorder")
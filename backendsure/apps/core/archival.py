@@ -0,0 +1,269 @@
+"""
+Archival of append-only tables.
+
+Rows older than a table's hot horizon are moved, oldest first and
+ARCHIVE_CHUNK_SIZE at a time, into gzip compressed JSONL files in the default
+storage. Each file is recorded as an ``ArchiveSegment`` (id and time range,
+size, checksum) with one ``ArchiveIndexEntry`` per lookup key it contains, so
+archived rows for a policy, user or audited object can be found again
+without opening every file. A chunk's file is written first; the segment,
+its index entries and the deletion of the hot rows then commit together, so
+a failure at any point leaves the rows either hot or archived, never lost.
+
+The horizon, an optional cap on hot rows and how long archive files are kept
+are set per table in ARCHIVE_POLICIES. A table partitioned by month (the
+audit log) only goes cold a whole partition at a time.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+import gzip
+import hashlib
+import json
+import logging
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.core.models import ArchiveSegment, ArchiveIndexEntry
+
+logger = logging.getLogger(__name__)
+
+
+class ArchivedTable:
+    """How one model is archived: which timestamp ages its rows and what they are looked up by."""
+    model_label: str
+    date_field = "created_at"
+    # A date column holding the first day of each row's month, for tables
+    # partitioned by month; cold rows are then whole partitions.
+    partition_field: Optional[str] = None
+
+    @property
+    def model(self) -> type:
+        return apps.get_model(self.model_label)
+
+    def queryset(self) -> QuerySet:
+        return self.model.objects.all()
+
+    def lookup_key(self, row: Dict[str, Any]) -> Optional[str]:
+        raise NotImplementedError
+
+
+class NotificationLogArchive(ArchivedTable):
+    model_label = "notifications.notificationlog"
+
+    def lookup_key(self, row):
+        return f"user:{row['user_id']}" if row["user_id"] else None
+
+
+class NotificationStorageArchive(ArchivedTable):
+    model_label = "notifications.notificationstorage"
+    # Pending and failed notifications are still waiting to go out, however old.
+    delivered_statuses = ["Sent", "Read"]
+
+    def queryset(self):
+        # Deleting a notification cascades to its logs, so only notifications
+        # whose logs have all been archived already can go.
+        return super().queryset().filter(status__in=self.delivered_statuses, notification_logs__isnull=True)
+
+    def lookup_key(self, row):
+        return f"policy:{row['policy_id']}"
+
+
+class PolicyStatusUpdateArchive(ArchivedTable):
+    model_label = "policies.policystatusupdate"
+
+    def lookup_key(self, row):
+        return f"policy:{row['policy_id']}"
+
+
+class MembershipStatusUpdateArchive(ArchivedTable):
+    model_label = "users.membershipstatusupdate"
+
+    def lookup_key(self, row):
+        return f"membership:{row['membership_id']}"
+
+
+class UserActionArchive(ArchivedTable):
+    model_label = "core.useraction"
+    date_field = "occurred_at"
+    partition_field = "partition_month"
+
+    def lookup_key(self, row):
+        if row["object_type"] and row["object_id"]:
+            return f"{row['object_type']}:{row['object_id']}"
+        return f"actor:{row['actor_id']}" if row["actor_id"] else None
+
+
+# In dependency order: logs before the notifications they belong to.
+ARCHIVED_TABLES = [
+    NotificationLogArchive(),
+    NotificationStorageArchive(),
+    PolicyStatusUpdateArchive(),
+    MembershipStatusUpdateArchive(),
+    UserActionArchive(),
+]
+ARCHIVED_TABLES_BY_LABEL = {table.model_label: table for table in ARCHIVED_TABLES}
+
+
+@dataclass
+class ArchiveResult:
+    model_label: str
+    archived: int = 0
+    segments: int = 0
+    purged_segments: int = 0
+
+
+class Archiver:
+    """
+    Moves the cold rows of one table into archive segments and drops segments
+    past their retention.
+    """
+
+    def __init__(self, table: ArchivedTable, chunk_size: Optional[int] = None, now: Optional[datetime] = None) -> None:
+        self.table = table
+        self.policy = settings.ARCHIVE_POLICIES[table.model_label]
+        self.chunk_size = chunk_size or settings.ARCHIVE_CHUNK_SIZE
+        self.now = now or timezone.now()
+
+    def cold_rows(self) -> QuerySet:
+        """Rows past the hot horizon, plus the oldest rows beyond max_hot_rows."""
+        table = self.table
+        queryset = table.queryset()
+        horizon = self.now - timedelta(days=self.policy["hot_days"])
+        if table.partition_field:
+            # Only the partitions that end before the horizon.
+            cold = queryset.filter(**{f"{table.partition_field}__lt": timezone.localdate(horizon).replace(day=1)})
+        else:
+            cold = queryset.filter(**{f"{table.date_field}__lt": horizon})
+
+        max_hot_rows = self.policy.get("max_hot_rows")
+        if max_hot_rows:
+            # Append-only, so ids follow time: everything but the newest
+            # max_hot_rows ids is cold as well.
+            boundary = queryset.order_by("-id")[max_hot_rows:max_hot_rows + 1]
+            if table.partition_field:
+                # Partitions older than the one the boundary falls in.
+                boundary_month = boundary.values_list(table.partition_field, flat=True).first()
+                if boundary_month is not None:
+                    cold = queryset.filter(**{f"{table.partition_field}__lt": boundary_month}) | cold
+            else:
+                boundary_id = boundary.values_list("id", flat=True).first()
+                if boundary_id is not None:
+                    cold = queryset.filter(id__lte=boundary_id) | cold
+        return cold
+
+    def run(self, dry_run: bool = False) -> ArchiveResult:
+        result = ArchiveResult(self.table.model_label)
+        cold = self.cold_rows()
+        if dry_run:
+            result.archived = cold.count()
+            return result
+        for rows in self._chunks(cold):
+            self._archive_chunk(rows)
+            result.archived += len(rows)
+            result.segments += 1
+        result.purged_segments = self.purge_expired()
+        return result
+
+    def purge_expired(self) -> int:
+        """Delete archive files (and their index) older than the table's retention."""
+        retention_days = self.policy.get("retention_days")
+        if not retention_days:
+            return 0
+        expired = ArchiveSegment.objects.filter(
+            model_label=self.table.model_label,
+            newest_at__lt=self.now - timedelta(days=retention_days),
+        )
+        purged = 0
+        for segment in expired.iterator():
+            default_storage.delete(segment.file)
+            segment.delete()
+            purged += 1
+        return purged
+
+    def _chunks(self, cold: QuerySet) -> Iterator[List[Dict[str, Any]]]:
+        fields = [field.attname for field in self.table.model._meta.concrete_fields]
+        last_id = 0
+        while True:
+            rows = list(cold.filter(id__gt=last_id).order_by("id").values(*fields)[:self.chunk_size])
+            if not rows:
+                return
+            yield rows
+            last_id = rows[-1]["id"]
+
+    def _archive_chunk(self, rows: List[Dict[str, Any]]) -> None:
+        table = self.table
+        payload = "".join(json.dumps(row, cls=DjangoJSONEncoder) + "\n" for row in rows).encode()
+        compressed = gzip.compress(payload)
+        dates = [row[table.date_field] for row in rows]
+        name = default_storage.save(
+            f"{settings.ARCHIVE_STORAGE_PREFIX}/{table.model_label}/"
+            f"{min(dates):%Y/%m}/{rows[0]['id']}-{rows[-1]['id']}.jsonl.gz",
+            ContentFile(compressed),
+        )
+        try:
+            with transaction.atomic():
+                segment = ArchiveSegment.objects.create(
+                    model_label=table.model_label,
+                    file=name,
+                    row_count=len(rows),
+                    first_id=rows[0]["id"],
+                    last_id=rows[-1]["id"],
+                    oldest_at=min(dates),
+                    newest_at=max(dates),
+                    size=len(compressed),
+                    sha256=hashlib.sha256(compressed).hexdigest(),
+                )
+                keys = {table.lookup_key(row) for row in rows} - {None}
+                ArchiveIndexEntry.objects.bulk_create(
+                    [ArchiveIndexEntry(segment=segment, key=key) for key in sorted(keys)]
+                )
+                table.model.objects.filter(id__in=[row["id"] for row in rows]).delete()
+        except Exception:
+            default_storage.delete(name)
+            raise
+        logger.info(f"Archived {len(rows)} {table.model_label} rows to {name}")
+
+
+def read_segment(segment: ArchiveSegment) -> Iterator[Dict[str, Any]]:
+    with default_storage.open(segment.file, "rb") as f:
+        for line in gzip.decompress(f.read()).splitlines():
+            yield json.loads(line)
+
+
+def find_archived(
+    model_label: str,
+    key: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Archived rows of a table, optionally only those for a lookup key and/or
+    within ``[since, until)``. The index narrows the search to the segments
+    that can contain matches; only those files are read.
+    """
+    table = ARCHIVED_TABLES_BY_LABEL[model_label]
+    segments = ArchiveSegment.objects.filter(model_label=model_label)
+    if key is not None:
+        segments = segments.filter(index_entries__key=key)
+    if since is not None:
+        segments = segments.filter(newest_at__gte=since)
+    if until is not None:
+        segments = segments.filter(oldest_at__lt=until)
+
+    for segment in segments.order_by("first_id"):
+        for row in read_segment(segment):
+            if key is not None and table.lookup_key(row) != key:
+                continue
+            moment = parse_datetime(row[table.date_field])
+            if (since is not None and moment < since) or (until is not None and moment >= until):
+                continue
+            yield row
@@ -0,0 +1,70 @@
+"""
+Async read endpoints.
+
+``AsyncAPIView`` is a DRF ``APIView`` whose handlers are coroutines. Served
+through ``backend.asgi`` (``uvicorn backend.asgi:application``), a request
+waiting on the database does not hold a worker thread; under WSGI Django runs
+the same view in an event loop per request.
+
+Everything except the handler is DRF's own: authentication, permissions and
+throttles run through ``APIView.initial`` in a single ``sync_to_async`` call,
+errors go through the configured exception handler, responses are rendered by
+the configured renderers and ``paginate`` produces the configured pagination
+class's page. The handlers use Django's async ORM (``aaggregate``,
+``acount``, ``async for``), which runs every query of a request on that
+request's one connection. Serializers run on the event loop, so querysets must
+load everything the serializer touches up front.
+"""
+import inspect
+from typing import Any
+
+from asgiref.sync import sync_to_async
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    http_method_names = ["get", "head", "options"]
+    pagination_class = api_settings.DEFAULT_PAGINATION_CLASS
+
+    async def dispatch(self, request, *args, **kwargs):
+        """``APIView.dispatch`` with the checks run off the event loop and the handler awaited."""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def paginate(self, queryset, serializer_class) -> Any:
+        """The paginated response DRF's pagination class would give for ``queryset``, read through the async ORM."""
+        paginator = self.pagination_class()
+        paginator.request = self.request
+        django_paginator = paginator.django_paginator_class(queryset, paginator.get_page_size(self.request))
+        # Paginator.count would run the COUNT synchronously on the event loop.
+        django_paginator.count = await queryset.acount()
+        page_number = paginator.get_page_number(self.request, django_paginator)
+        try:
+            paginator.page = django_paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(paginator.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        paginator.page.object_list = [obj async for obj in paginator.page.object_list]
+
+        serializer = serializer_class(paginator.page.object_list, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
+    def get_serializer_context(self):
+        return {"request": self.request, "format": self.format_kwarg, "view": self}
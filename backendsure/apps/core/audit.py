@@ -0,0 +1,198 @@
+"""
+Buffered audit log.
+
+``record_action`` appends a plain tuple to an in-process ring buffer and
+returns; a background thread turns the buffered entries into ``UserAction``
+rows with ``bulk_create`` whenever AUDIT_FLUSH_BATCH_SIZE entries are waiting
+or AUDIT_FLUSH_INTERVAL_SECONDS have passed, and whatever is left is written
+when the process exits. The request path never touches the database.
+
+The buffer holds at most AUDIT_BUFFER_MAX_SIZE entries. If the database falls
+that far behind the oldest entries are dropped (and counted) rather than
+letting memory grow without bound.
+
+The log is partitioned by month on ``UserAction.partition_month``. Queries
+name the partitions their window covers (``partition_months``), so they only
+read those months of the (partition_month, occurred_at) index. The archiver
+moves whole months out of the table once they are past the hot horizon
+(``core.useraction`` in ARCHIVE_POLICIES).
+"""
+from collections import deque
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+import atexit
+import logging
+import os
+import threading
+import uuid
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Model
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+AuditEntry = Tuple[datetime, str, str, Optional[str], Optional[int], Optional[str], Optional[str], Optional[Dict[str, Any]]]
+
+
+class AuditLogBuffer:
+    def __init__(self, max_size: int, batch_size: int, flush_interval: float) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._entries: deque = deque(maxlen=max_size)
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def record(self, entry: AuditEntry) -> None:
+        if self._pid != os.getpid():
+            self._start()
+        entries = self._entries
+        if len(entries) == entries.maxlen:
+            self.dropped += 1
+        entries.append(entry)
+        if len(entries) >= self.batch_size:
+            self._wakeup.set()
+
+    def pending(self) -> int:
+        return len(self._entries)
+
+    def flush(self) -> int:
+        """Write everything buffered so far; returns the number of rows written."""
+        from apps.core.models import UserAction, partition_of
+
+        written = 0
+        with self._flush_lock:
+            while self._entries:
+                batch: List[AuditEntry] = []
+                try:
+                    while len(batch) < self.batch_size:
+                        batch.append(self._entries.popleft())
+                except IndexError:
+                    pass
+                try:
+                    UserAction.objects.bulk_create([
+                        UserAction(
+                            occurred_at=occurred_at,
+                            partition_month=partition_of(occurred_at),
+                            action_title=action_title,
+                            action_type=action_type,
+                            action_description=action_description,
+                            actor_id=actor_id,
+                            object_type=object_type,
+                            object_id=object_id,
+                            changes=changes,
+                        )
+                        for occurred_at, action_title, action_type, action_description,
+                            actor_id, object_type, object_id, changes in batch
+                    ])
+                except Exception:
+                    self.dropped += len(batch)
+                    logger.exception(f"Failed to write {len(batch)} audit log entries")
+                    break
+                written += len(batch)
+        return written
+
+    def shutdown(self) -> None:
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def _start(self) -> None:
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # First entry in this process (or in a freshly forked worker): the
+            # parent's thread did not survive the fork, so start our own.
+            self._pid = os.getpid()
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def _run(self) -> None:
+        while not self._stopping:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                close_old_connections()
+                self.flush()
+            except Exception:
+                logger.exception("Audit log flush failed")
+
+
+audit_log_buffer = AuditLogBuffer(
+    max_size=settings.AUDIT_BUFFER_MAX_SIZE,
+    batch_size=settings.AUDIT_FLUSH_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL_SECONDS,
+)
+
+
+def partition_months(since: datetime, until: datetime) -> List[date]:
+    """The audit log partitions (months) a query over ``[since, until)`` has to read."""
+    from apps.core.models import partition_of
+
+    month, last = partition_of(since), partition_of(until)
+    months = []
+    while month <= last:
+        months.append(month)
+        month = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return months
+
+
+def _json_value(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (Decimal, date, datetime, uuid.UUID)):
+        return str(value)
+    if hasattr(value, "name") and hasattr(value, "storage"):
+        return value.name or None
+    return str(value)
+
+
+def snapshot(instance: Model) -> Dict[str, Any]:
+    """JSON friendly copy of an instance's concrete field values, for diffing."""
+    return {
+        field.attname: _json_value(getattr(instance, field.attname))
+        for field in instance._meta.concrete_fields
+        if field.attname not in ("created_at", "updated_at")
+    }
+
+
+def diff(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, List[Any]]:
+    """``{field: [old, new]}`` for every field whose value changed."""
+    return {
+        field: [before.get(field), value]
+        for field, value in after.items()
+        if before.get(field) != value
+    }
+
+
+def record_action(
+    action_title: str,
+    action_type: str,
+    actor: Any = None,
+    target: Optional[Model] = None,
+    changes: Optional[Dict[str, Any]] = None,
+    action_description: Optional[str] = None,
+) -> None:
+    """Queue an audit log entry; ``actor`` is a user (anonymous users are recorded as no actor)."""
+    audit_log_buffer.record((
+        timezone.now(),
+        action_title,
+        action_type,
+        action_description,
+        actor.pk if actor is not None and actor.is_authenticated else None,
+        target._meta.label_lower if target is not None else None,
+        str(target.pk) if target is not None else None,
+        changes,
+    ))
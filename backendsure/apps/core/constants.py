@@ -107,4 +107,54 @@ class ClaimStatuses(Enum):
     
     @classmethod
     def choices(cls):
-        return [(key.value, key.value) for key in cls]
\ No newline at end of file
+        return [(key.value, key.value) for key in cls]
+
+class DocumentTypes(Enum):
+    POLICY_SCHEDULE = "Policy Schedule"
+    MEMBERSHIP_CERTIFICATE = "Membership Certificate"
+    
+    @classmethod
+    def choices(cls):
+        return [(key.value, key.value) for key in cls]
+
+
+class DocumentBatchStatuses(Enum):
+    PENDING = "Pending"
+    RUNNING = "Running"
+    COMPLETED = "Completed"
+    FAILED = "Failed"
+    
+    @classmethod
+    def choices(cls):
+        return [(key.value, key.value) for key in cls]
+
+
+class IdempotencyKeyStatuses(Enum):
+    PROCESSING = "Processing"
+    COMPLETED = "Completed"
+    
+    @classmethod
+    def choices(cls):
+        return [(key.value, key.value) for key in cls]
+
+
+class RollupPeriods(Enum):
+    DAY = "Day"
+    MONTH = "Month"
+    
+    @classmethod
+    def choices(cls):
+        return [(key.value, key.value) for key in cls]
+        
+
+class AnalyticsDimensions(Enum):
+    PRODUCT = "product"
+    GADGET_PRICING = "gadget_pricing"
+    MONTH = "month"
+    OUTLET = "outlet"
+    DEVICE_BRAND = "device_brand"
+    DEVICE_TYPE = "device_type"
+    
+    @classmethod
+    def choices(cls):
+        return [(key.value, key.value) for key in cls]
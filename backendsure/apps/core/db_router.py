@@ -0,0 +1,187 @@
+"""
+Primary/replica database routing.
+
+Reads in safe (GET/HEAD/OPTIONS) requests go to one of the DATABASE_REPLICAS
+aliases; everything else uses ``default``:
+
+* writes, and reads inside a ``transaction.atomic`` block on the primary;
+* every query of an unsafe (POST/PUT/PATCH/DELETE) request;
+* reads in a request after it has written anything;
+* reads from a client that wrote within the last READ_YOUR_WRITES_SECONDS, so
+  a customer who just bought a policy sees it on the next page load. Clients
+  are recognised by the user id in their access token, so every token and
+  device of a user shares the pin, or by their outlet API key (pinned in the
+  cache), and anonymous browsers by a short lived cookie;
+* anything outside a request (management commands, shell), unless wrapped in
+  ``use_replicas()``;
+* the database cache table, which is not replicated and whose writes are not
+  the request's (a throttle bucket update does not pin the client).
+
+With no replicas configured every query goes to ``default``.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+import hashlib
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+
+PRIMARY_PIN_COOKIE = "db_primary_pin"
+OUTLET_API_KEY_HEADER = "HTTP_X_OUTLET_API_KEY"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+@dataclass
+class RoutingState:
+    use_replicas: bool
+    wrote: bool = False
+
+
+_routing_state: ContextVar[Optional[RoutingState]] = ContextVar("db_routing_state", default=None)
+
+
+@contextmanager
+def use_primary():
+    """Send every query in the block to the primary, e.g. to re-read something just written elsewhere."""
+    token = _routing_state.set(RoutingState(use_replicas=False))
+    try:
+        yield
+    finally:
+        _routing_state.reset(token)
+
+
+@contextmanager
+def use_replicas():
+    """Allow replica reads outside a request, e.g. for a reporting command."""
+    token = _routing_state.set(RoutingState(use_replicas=True))
+    try:
+        yield
+    finally:
+        _routing_state.reset(token)
+
+
+# app_label of the model DatabaseCache queries through.
+CACHE_APP_LABEL = "django_cache"
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or model._meta.app_label == CACHE_APP_LABEL:
+            return DEFAULT_DB_ALIAS
+
+        # Related lookups and refresh_from_db stay on the database the instance came from.
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+
+        state = _routing_state.get()
+        if state is None or not state.use_replicas or state.wrote:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None and model._meta.app_label != CACHE_APP_LABEL:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        # Databases outside the primary/replica set are left to Django's default rule.
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema through replication.
+        return db not in settings.DATABASE_REPLICAS
+
+
+def _token_user_id(request) -> Optional[str]:
+    """The user id in the request's access token, read without looking the user up."""
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else None
+    if raw_token is None:
+        return None
+    try:
+        token = authentication.get_validated_token(raw_token)
+    except InvalidToken:
+        return None
+    user_id = token.get(jwt_settings.USER_ID_CLAIM)
+    return None if user_id is None else str(user_id)
+
+
+def _client_key(request) -> Optional[str]:
+    user_id = _token_user_id(request)
+    if user_id is not None:
+        return f"db-primary-pin:user:{user_id}"
+    api_key = request.META.get(OUTLET_API_KEY_HEADER)
+    if api_key:
+        return "db-primary-pin:outlet:" + hashlib.sha256(api_key.encode()).hexdigest()
+    return None
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        client_key = _client_key(request)
+        pinned = request.COOKIES.get(PRIMARY_PIN_COOKIE) or (client_key and cache.get(client_key))
+        state, token = self._start(request, pinned)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing_state.reset(token)
+        if state.wrote:
+            if client_key:
+                cache.set(client_key, True, settings.READ_YOUR_WRITES_SECONDS)
+            self._pin_cookie(response)
+        return response
+
+    async def __acall__(self, request):
+        client_key = _client_key(request)
+        pinned = request.COOKIES.get(PRIMARY_PIN_COOKIE) or (client_key and await cache.aget(client_key))
+        state, token = self._start(request, pinned)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing_state.reset(token)
+        if state.wrote:
+            if client_key:
+                await cache.aset(client_key, True, settings.READ_YOUR_WRITES_SECONDS)
+            self._pin_cookie(response)
+        return response
+
+    def _start(self, request, pinned):
+        state = RoutingState(use_replicas=request.method in SAFE_METHODS and not pinned)
+        return state, _routing_state.set(state)
+
+    def _pin_cookie(self, response):
+        response.set_cookie(
+            PRIMARY_PIN_COOKIE, "1",
+            max_age=settings.READ_YOUR_WRITES_SECONDS, httponly=True, samesite="Lax"
+        )
@@ -0,0 +1,257 @@
+"""
+``Idempotency-Key`` support for endpoints that create things.
+
+A client that may retry a request (the mobile app on a flaky network) sends
+the same ``Idempotency-Key`` header with every attempt. The first attempt
+claims the key by inserting an ``IdempotencyKey`` row, runs the view and
+stores its response; every later attempt with that key gets the stored
+response back, marked with ``Idempotent-Replayed: true``, without the view
+running again. Completed keys are also kept in the cache, so a retry is
+served with a single cache lookup.
+
+* A duplicate that arrives while the first attempt is still running waits
+  up to IDEMPOTENCY_WAIT_SECONDS for it to finish and then replays its
+  response, so concurrent duplicates result in a single execution. If it is
+  still running after that the duplicate gets a 409. Duplicates in the same
+  process are woken as soon as the first attempt finishes; duplicates in
+  other workers re-read the key with a backing off poll.
+* Reusing a key with a different request body is a client error (422).
+* Only successful (2xx) responses are stored. When the view fails, raises a
+  validation error or returns any other status the key is released, since
+  nothing was created and the retry should be run for real.
+* A key left processing for IDEMPOTENCY_LOCK_SECONDS (the worker died) can
+  be claimed again.
+
+Keys are scoped to the endpoint and the caller (user or outlet) and expire
+after IDEMPOTENCY_KEY_TTL_HOURS.
+"""
+from datetime import timedelta
+from functools import wraps
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Model
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from apps.core.constants import IdempotencyKeyStatuses
+from apps.core.models import IdempotencyKey
+
+
+IDEMPOTENCY_KEY_HEADER = "HTTP_IDEMPOTENCY_KEY"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+def _scope(request) -> str:
+    if isinstance(request.auth, Model):
+        caller = f"{request.auth._meta.label_lower}:{request.auth.pk}"
+    elif request.user and request.user.is_authenticated:
+        caller = f"user:{request.user.pk}"
+    else:
+        caller = "anonymous"
+    return hashlib.sha256(f"{request.method} {request.path}|{caller}".encode()).hexdigest()
+
+
+def _request_hash(request) -> str:
+    def describe(value):
+        # Uploaded files are compared by name and size rather than read again.
+        if hasattr(value, "read") and hasattr(value, "size"):
+            return {"file": value.name, "size": value.size}
+        return value
+
+    data = request.data
+    if hasattr(data, "lists"):
+        data = {key: [describe(value) for value in values] for key, values in data.lists()}
+    payload = json.dumps(data, sort_keys=True, cls=JSONEncoder, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _cache_key(scope: str, key: str) -> str:
+    return "idempotency:" + hashlib.sha256(f"{scope}|{key}".encode()).hexdigest()
+
+
+def _replay(response_status: int, body: Any) -> Response:
+    response = Response(body, status=response_status)
+    response[REPLAYED_HEADER] = "true"
+    return response
+
+
+def _error(detail: str, response_status: int) -> Response:
+    return Response({"detail": detail}, status=response_status)
+
+
+class IdempotencyStore:
+    """Claims, completes and looks up keys; the view side is ``idempotent``."""
+
+    MAX_POLL_INTERVAL_SECONDS = 2.0
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # (scope, key) -> (event set when the request holding the key finishes, number of waiters)
+        self._finished: Dict[Tuple[str, str], Tuple[threading.Event, int]] = {}
+
+    def lookup(self, scope: str, key: str) -> Optional[Tuple[str, int, Any]]:
+        """``(request_hash, status, body)`` of a completed key, from the cache."""
+        return cache.get(_cache_key(scope, key))
+
+    def claim(self, scope: str, key: str, request_hash: str) -> Optional[IdempotencyKey]:
+        """Insert the key as processing; returns None if another request already holds it."""
+        now = timezone.now()
+        IdempotencyKey.objects.filter(scope=scope, key=key, expires_at__lte=now).delete()
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(
+                    scope=scope,
+                    key=key,
+                    request_hash=request_hash,
+                    expires_at=now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS),
+                )
+        except IntegrityError:
+            return None
+
+    def take_over(self, record: IdempotencyKey) -> bool:
+        """Claim a key whose request has been processing for longer than the lock lasts."""
+        stale_before = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+        return IdempotencyKey.objects.filter(
+            id=record.id,
+            status=IdempotencyKeyStatuses.PROCESSING.value,
+            updated_at__lt=stale_before,
+        ).update(updated_at=timezone.now()) == 1
+
+    def complete(self, record: IdempotencyKey, response: Response) -> None:
+        body = json.loads(json.dumps(response.data, cls=JSONEncoder))
+        record.status = IdempotencyKeyStatuses.COMPLETED.value
+        record.response_status = response.status_code
+        record.response_body = body
+        record.save(update_fields=["status", "response_status", "response_body", "updated_at"])
+        self._cache(record)
+        self._notify(record)
+
+    def release(self, record: IdempotencyKey) -> None:
+        IdempotencyKey.objects.filter(id=record.id).delete()
+        self._notify(record)
+
+    def wait(self, scope: str, key: str) -> Optional[IdempotencyKey]:
+        """Poll for the request holding a key to finish; returns the row as last seen."""
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        interval = settings.IDEMPOTENCY_POLL_INTERVAL_SECONDS
+        finished = self._add_waiter((scope, key))
+        try:
+            while True:
+                record = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+                if record is None or record.status == IdempotencyKeyStatuses.COMPLETED.value:
+                    if record is not None:
+                        self._cache(record)
+                    return record
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return record
+                finished.wait(min(interval, remaining))
+                interval = min(interval * 2, self.MAX_POLL_INTERVAL_SECONDS)
+        finally:
+            self._remove_waiter((scope, key), finished)
+
+    def _add_waiter(self, item: Tuple[str, str]) -> threading.Event:
+        with self._lock:
+            finished, waiters = self._finished.get(item, (None, 0))
+            if finished is None:
+                finished = threading.Event()
+            self._finished[item] = (finished, waiters + 1)
+        return finished
+
+    def _remove_waiter(self, item: Tuple[str, str], finished: threading.Event) -> None:
+        """Drop the key's event once its last waiter gives up, so keys never finished in this process do not pile up."""
+        with self._lock:
+            current, waiters = self._finished.get(item, (None, 0))
+            if current is not finished:
+                return
+            if waiters > 1:
+                self._finished[item] = (finished, waiters - 1)
+            else:
+                del self._finished[item]
+
+    def _notify(self, record: IdempotencyKey) -> None:
+        with self._lock:
+            finished, _ = self._finished.pop((record.scope, record.key), (None, 0))
+        if finished is not None:
+            finished.set()
+
+    def _cache(self, record: IdempotencyKey) -> None:
+        timeout = (record.expires_at - timezone.now()).total_seconds()
+        if timeout > 0:
+            cache.set(
+                _cache_key(record.scope, record.key),
+                (record.request_hash, record.response_status, record.response_body),
+                timeout,
+            )
+
+
+idempotency_store = IdempotencyStore()
+
+
+def idempotent(handler):
+    """
+    Decorator for a DRF view method (``post``) that honours ``Idempotency-Key``.
+
+    Requests without the header run as before.
+    """
+    @wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.META.get(IDEMPOTENCY_KEY_HEADER)
+        if not key:
+            return handler(self, request, *args, **kwargs)
+        if len(key) > IdempotencyKey._meta.get_field("key").max_length:
+            return _error("Idempotency-Key must be at most 255 characters.", status.HTTP_400_BAD_REQUEST)
+
+        store = idempotency_store
+        scope = _scope(request)
+        request_hash = _request_hash(request)
+        mismatch = _error(
+            "This Idempotency-Key was already used with a different request.",
+            status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+
+        cached = store.lookup(scope, key)
+        if cached is not None:
+            cached_hash, response_status, body = cached
+            return _replay(response_status, body) if cached_hash == request_hash else mismatch
+
+        record = store.claim(scope, key, request_hash)
+        while record is None:
+            existing = store.wait(scope, key)
+            if existing is None:
+                # The other request failed and released the key.
+                record = store.claim(scope, key, request_hash)
+                continue
+            if existing.request_hash != request_hash:
+                return mismatch
+            if existing.status == IdempotencyKeyStatuses.COMPLETED.value:
+                return _replay(existing.response_status, existing.response_body)
+            if store.take_over(existing):
+                record = existing
+                break
+            return _error(
+                "A request with this Idempotency-Key is still being processed.",
+                status.HTTP_409_CONFLICT
+            )
+
+        try:
+            response = handler(self, request, *args, **kwargs)
+        except BaseException:
+            store.release(record)
+            raise
+        if status.is_success(response.status_code):
+            store.complete(record, response)
+        else:
+            store.release(record)
+        return response
+
+    return wrapper
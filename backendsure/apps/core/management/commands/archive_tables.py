@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.archival import ARCHIVED_TABLES, ARCHIVED_TABLES_BY_LABEL, Archiver
+
+
+class Command(BaseCommand):
+    help = (
+        "Move rows past their hot horizon out of the append-only tables into "
+        "compressed archive files, and delete archives past their retention."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", action="append", help="Only this table, e.g. notifications.notificationlog")
+        parser.add_argument("--chunk-size", type=int, help="Rows per archive file and transaction")
+        parser.add_argument("--dry-run", action="store_true", help="Only count the rows that would be archived")
+
+    def handle(self, *args, **options):
+        tables = ARCHIVED_TABLES
+        if options["model"]:
+            unknown = set(options["model"]) - set(ARCHIVED_TABLES_BY_LABEL)
+            if unknown:
+                raise CommandError(f"Not an archived table: {', '.join(sorted(unknown))}")
+            tables = [table for table in ARCHIVED_TABLES if table.model_label in options["model"]]
+
+        for table in tables:
+            result = Archiver(table, chunk_size=options["chunk_size"]).run(dry_run=options["dry_run"])
+            if options["dry_run"]:
+                self.stdout.write(f"{table.model_label}: {result.archived} rows would be archived")
+            else:
+                self.stdout.write(
+                    f"{table.model_label}: {result.archived} rows archived in {result.segments} segments, "
+                    f"{result.purged_segments} expired segments deleted"
+                )
@@ -0,0 +1,87 @@
+import asyncio
+import statistics
+import time
+from collections import Counter
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test running servers with many concurrent clients, e.g. to compare the "
+        "WSGI (gunicorn) and ASGI (uvicorn) deployments of the same endpoints."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("urls", nargs="+", help="Absolute http:// URLs to request, round robin")
+        parser.add_argument("--concurrency", type=int, default=500, help="Clients sending requests at the same time")
+        parser.add_argument("--requests", type=int, default=5000, help="Total number of requests")
+        parser.add_argument("--header", action="append", default=[], help='Extra header, e.g. "Authorization: Bearer <token>"')
+        parser.add_argument("--timeout", type=float, default=60.0, help="Seconds before a request counts as failed")
+
+    def handle(self, *args, **options):
+        targets = []
+        for url in options["urls"]:
+            parts = urlsplit(url)
+            if parts.scheme != "http" or not parts.hostname:
+                raise CommandError(f"Only absolute http:// URLs are supported: {url}")
+            path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+            targets.append((parts.hostname, parts.port or 80, path))
+
+        headers = []
+        for header in options["header"]:
+            name, sep, value = header.partition(":")
+            if not sep:
+                raise CommandError(f"Headers look like 'Name: value', got {header!r}")
+            headers.append((name.strip(), value.strip()))
+
+        results, elapsed = asyncio.run(self.run(
+            targets, headers, options["concurrency"], options["requests"], options["timeout"]
+        ))
+        self.report(results, elapsed, options["concurrency"])
+
+    async def run(self, targets, headers, concurrency, total, timeout) -> Tuple[List[Tuple[Optional[int], float]], float]:
+        results: List[Tuple[Optional[int], float]] = []
+        counter = iter(range(total))
+
+        async def client():
+            for i in counter:
+                host, port, path = targets[i % len(targets)]
+                started = time.perf_counter()
+                try:
+                    status = await asyncio.wait_for(self.request(host, port, path, headers), timeout)
+                except (OSError, asyncio.TimeoutError, ValueError):
+                    status = None
+                results.append((status, time.perf_counter() - started))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return results, time.perf_counter() - started
+
+    async def request(self, host: str, port: int, path: str, headers) -> int:
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            lines = [f"GET {path} HTTP/1.1", f"Host: {host}:{port}", "Connection: close"]
+            lines += [f"{name}: {value}" for name, value in headers]
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+            await writer.drain()
+            status_line = await reader.readline()
+            await reader.read()
+            return int(status_line.split()[1])
+        finally:
+            writer.close()
+
+    def report(self, results, elapsed: float, concurrency: int) -> None:
+        statuses = Counter("failed" if status is None else status for status, _ in results)
+        latencies = sorted(duration * 1000 for status, duration in results if status is not None)
+        self.stdout.write(f"Requests:    {len(results)} with {concurrency} concurrent clients in {elapsed:.2f}s")
+        self.stdout.write(f"Throughput:  {len(results) / elapsed:.1f} requests/s")
+        self.stdout.write("Responses:   " + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items(), key=str)))
+        if latencies:
+            quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+            self.stdout.write(
+                f"Latency ms:  p50 {quantiles[49]:.1f}  p95 {quantiles[94]:.1f}  "
+                f"p99 {quantiles[98]:.1f}  max {latencies[-1]:.1f}"
+            )
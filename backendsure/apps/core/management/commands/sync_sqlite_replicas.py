@@ -0,0 +1,45 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the SQLite primary into each SQLite replica, for trying the replica "
+        "router locally. Repeats every --lag seconds to simulate replication lag."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lag", type=float, default=2.0, help="Seconds between copies")
+        parser.add_argument("--once", action="store_true", help="Copy once and exit")
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        replicas = [settings.DATABASES[alias] for alias in settings.DATABASE_REPLICAS]
+        if not replicas:
+            raise CommandError("No replicas configured; set DATABASE_REPLICA_SQLITE_FILES.")
+        for database in [primary, *replicas]:
+            if database["ENGINE"] != "django.db.backends.sqlite3":
+                raise CommandError("sync_sqlite_replicas only works with SQLite databases.")
+
+        while True:
+            self.sync(primary["NAME"], [replica["NAME"] for replica in replicas])
+            self.stdout.write(f"Replicas synced from {primary['NAME']}")
+            if options["once"]:
+                return
+            time.sleep(options["lag"])
+
+    def sync(self, primary_name, replica_names):
+        source = sqlite3.connect(str(primary_name))
+        try:
+            for replica_name in replica_names:
+                target = sqlite3.connect(str(replica_name))
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+        finally:
+            source.close()
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:18
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_occurred_at(apps, schema_editor):
+    UserAction = apps.get_model("core", "UserAction")
+    UserAction.objects.update(occurred_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useraction',
+            name='actor',
+            field=models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='useraction',
+            name='changes',
+            field=models.JSONField(null=True),
+        ),
+        migrations.AddField(
+            model_name='useraction',
+            name='object_id',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='useraction',
+            name='object_type',
+            field=models.CharField(max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='useraction',
+            name='occurred_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='useraction',
+            index=models.Index(fields=['occurred_at'], name='useraction_occurred_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useraction',
+            index=models.Index(fields=['actor', 'occurred_at'], name='useraction_actor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useraction',
+            index=models.Index(fields=['object_type', 'object_id', 'occurred_at'], name='useraction_object_idx'),
+        ),
+        migrations.RunPython(backfill_occurred_at, migrations.RunPython.noop),
+    ]
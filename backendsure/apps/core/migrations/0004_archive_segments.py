@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('model_label', models.CharField(max_length=100)),
+                ('file', models.CharField(max_length=255)),
+                ('row_count', models.PositiveIntegerField()),
+                ('first_id', models.BigIntegerField()),
+                ('last_id', models.BigIntegerField()),
+                ('oldest_at', models.DateTimeField()),
+                ('newest_at', models.DateTimeField()),
+                ('size', models.PositiveBigIntegerField()),
+                ('sha256', models.CharField(max_length=64)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model_label', 'newest_at'], name='archivesegment_model_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchiveIndexEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=120)),
+                ('segment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='index_entries', to='core.archivesegment')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('key', 'segment'), name='archiveindex_key_segment_unique')],
+            },
+        ),
+    ]
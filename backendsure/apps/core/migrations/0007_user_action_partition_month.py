@@ -0,0 +1,41 @@
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_partition_month(apps, schema_editor):
+    """Put every existing audit log entry in the partition of its month."""
+    UserAction = apps.get_model("core", "UserAction")
+    actions = []
+    for action in UserAction.objects.only("id", "occurred_at").iterator():
+        action.partition_month = timezone.localdate(action.occurred_at).replace(day=1)
+        actions.append(action)
+    UserAction.objects.bulk_update(actions, ["partition_month"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_cache_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useraction',
+            name='partition_month',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_partition_month, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='useraction',
+            name='partition_month',
+            field=models.DateField(editable=False),
+        ),
+        migrations.RemoveIndex(
+            model_name='useraction',
+            name='useraction_occurred_idx',
+        ),
+        migrations.AddIndex(
+            model_name='useraction',
+            index=models.Index(fields=['partition_month', 'occurred_at'], name='useraction_partition_idx'),
+        ),
+    ]
@@ -1,4 +1,9 @@
+from datetime import date
+
 from django.db import models
+from django.utils import timezone
+
+from apps.core.constants import IdempotencyKeyStatuses
 
 # Create your models here.
 class AbstractBaseModel(models.Model):
@@ -10,9 +15,103 @@ class AbstractBaseModel(models.Model):
         
         
 class UserAction(AbstractBaseModel):
+    occurred_at = models.DateTimeField(default=timezone.now)
+    # Monthly partition key: first day of the occurred_at month. Queries name
+    # the partitions of their window and archival moves whole partitions.
+    partition_month = models.DateField(editable=False)
     action_title = models.CharField(max_length=255)
     action_type = models.CharField(max_length=255)
     action_description = models.TextField(null=True)
+    actor = models.ForeignKey("users.User", on_delete=models.SET_NULL, null=True, db_constraint=False, db_index=False, related_name="+")
+    object_type = models.CharField(max_length=100, null=True)
+    object_id = models.CharField(max_length=64, null=True)
+    changes = models.JSONField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["partition_month", "occurred_at"], name="useraction_partition_idx"),
+            models.Index(fields=["actor", "occurred_at"], name="useraction_actor_idx"),
+            models.Index(fields=["object_type", "object_id", "occurred_at"], name="useraction_object_idx"),
+        ]
     
     def __str__(self):
-        return self.action_title
\ No newline at end of file
+        return self.action_title
+
+    def save(self, *args, **kwargs):
+        self.partition_month = partition_of(self.occurred_at)
+        super().save(*args, **kwargs)
+
+
+def partition_of(moment) -> date:
+    """The audit log partition (month) ``moment`` falls in."""
+    return timezone.localdate(moment).replace(day=1)
+
+
+class IdempotencyKey(AbstractBaseModel):
+    """A client supplied ``Idempotency-Key`` and the response of the request that first used it."""
+    key = models.CharField(max_length=255)
+    scope = models.CharField(max_length=64)
+    request_hash = models.CharField(max_length=64)
+    status = models.CharField(
+        max_length=32,
+        choices=IdempotencyKeyStatuses.choices(),
+        default=IdempotencyKeyStatuses.PROCESSING.value
+    )
+    response_status = models.PositiveSmallIntegerField(null=True)
+    response_body = models.JSONField(null=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["scope", "key"], name="idempotency_scope_key_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["expires_at"], name="idempotency_expires_idx"),
+        ]
+
+    def __str__(self):
+        return self.key
+
+
+class ArchiveSegment(AbstractBaseModel):
+    """One compressed JSONL file of rows moved out of a hot table by ``apps.core.archival``."""
+    model_label = models.CharField(max_length=100)
+    file = models.CharField(max_length=255)
+    row_count = models.PositiveIntegerField()
+    first_id = models.BigIntegerField()
+    last_id = models.BigIntegerField()
+    oldest_at = models.DateTimeField()
+    newest_at = models.DateTimeField()
+    size = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["model_label", "newest_at"], name="archivesegment_model_idx"),
+        ]
+
+    def __str__(self):
+        return self.file
+
+
+class ArchiveIndexEntry(models.Model):
+    """Which segments hold rows for a lookup key (a policy, user, audited object...)."""
+    segment = models.ForeignKey(ArchiveSegment, on_delete=models.CASCADE, related_name="index_entries")
+    key = models.CharField(max_length=120)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["key", "segment"], name="archiveindex_key_segment_unique"),
+        ]
+
+
+class ReferenceDataVersion(models.Model):
+    """
+    Version of one kind of reference data, bumped whenever a row of it changes,
+    so every process knows when its ``apps.core.reference_data`` snapshots are stale.
+    """
+    namespace = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.namespace} v{self.version}"
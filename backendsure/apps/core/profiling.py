@@ -0,0 +1,414 @@
+"""
+Per-request performance profiling.
+
+``PerformanceProfilerMiddleware`` times every request and counts its database
+queries through an ``execute_wrapper`` installed on each connection. Views
+that include ``SerializerTimingMixin`` also report the time their serializer
+spends validating input and representing objects. The numbers are aggregated
+per route into fixed-bucket histograms held in this process, and a sample of
+slow requests keeps its full query list.
+
+With QUERY_NPLUSONE_THRESHOLD set, every query is also fingerprinted (SQL
+with literals and IN lists collapsed) so a request that runs the same shaped
+query over and over, the classic N+1 from per-row relation access, is reported
+with the application line that triggered it. Views may declare a
+``query_budget`` class attribute, either a number of queries for every method
+or a dict by method such as ``{"GET": 5}``, and ``max_repeated_queries``;
+requests over budget raise QueryBudgetExceeded when QUERY_BUDGET_RAISE is on
+(the test settings) and are logged otherwise.
+
+The statistics are per process: each gunicorn worker reports its own.
+"""
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    """A request ran more queries, or more repeats of one query, than its route allows."""
+    pass
+
+
+APPS_DIR = os.path.join(str(settings.BASE_DIR), "apps") + os.sep
+
+_IN_LIST = re.compile(r"\bIN\s*\(\s*%s(?:\s*,\s*%s)*\s*\)", re.IGNORECASE)
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql: str) -> str:
+    """Shape of a query: literals become ``?`` and ``IN (%s, %s, ...)`` becomes ``IN (...)``."""
+    sql = _IN_LIST.sub("IN (...)", sql)
+    sql = _LITERALS.sub("?", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def application_call_site() -> Optional[str]:
+    """Innermost frame in the project's own apps (outside this module) on the current stack."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APPS_DIR) and filename != __file__:
+            return f"{os.path.relpath(filename, settings.BASE_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+class RequestMetrics:
+    __slots__ = (
+        "queries", "db_time", "serializer_time", "serializer_depth", "trace",
+        "repeat_threshold", "fingerprints", "repeated",
+    )
+
+    def __init__(self, trace: bool, repeat_threshold: int = 0) -> None:
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.trace: Optional[List[Tuple[str, str, float]]] = [] if trace else None
+        self.repeat_threshold = repeat_threshold
+        self.fingerprints: Dict[str, int] = {}
+        # fingerprint -> call site captured when the query first hit the threshold
+        self.repeated: Dict[str, Optional[str]] = {}
+
+
+_current_metrics: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    ``execute_wrapper`` installed on every connection when it is opened.
+
+    It reads the current request's metrics from a context variable, so queries
+    run from ``sync_to_async`` threads when served over ASGI are counted too.
+    """
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.queries += 1
+        metrics.db_time += elapsed
+        if metrics.trace is not None:
+            metrics.trace.append((context["connection"].alias, sql, elapsed))
+        if metrics.repeat_threshold:
+            shape = fingerprint(sql)
+            count = metrics.fingerprints.get(shape, 0) + 1
+            metrics.fingerprints[shape] = count
+            if count == metrics.repeat_threshold:
+                metrics.repeated[shape] = application_call_site()
+
+
+def install_query_recorder(sender, connection, **kwargs) -> None:
+    """``connection_created`` receiver."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class RouteStats:
+    __slots__ = (
+        "count", "errors", "buckets", "total_time", "max_time",
+        "db_time", "queries", "max_queries", "serializer_time", "response_bytes", "budget_violations",
+    )
+
+    def __init__(self, bucket_count: int) -> None:
+        self.count = 0
+        self.errors = 0
+        self.buckets = [0] * bucket_count
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.db_time = 0.0
+        self.queries = 0
+        self.max_queries = 0
+        self.serializer_time = 0.0
+        self.response_bytes = 0
+        self.budget_violations = 0
+
+
+class PerformanceRegistry:
+    """Per-route latency histograms and the most recent slow request traces."""
+
+    def __init__(self, bucket_bounds_ms: List[float], max_traces: int) -> None:
+        self.bucket_bounds_ms = list(bucket_bounds_ms)
+        self._routes: Dict[str, RouteStats] = {}
+        self._traces: deque = deque(maxlen=max_traces)
+        self._violations: deque = deque(maxlen=max_traces)
+        self._lock = threading.Lock()
+        self.started_at = timezone.now()
+
+    def observe(self, route: str, status_code: int, elapsed: float, metrics: RequestMetrics, response_bytes: int) -> None:
+        elapsed_ms = elapsed * 1000
+        bucket = bisect_left(self.bucket_bounds_ms, elapsed_ms)
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = RouteStats(len(self.bucket_bounds_ms) + 1)
+            stats.count += 1
+            stats.errors += int(status_code >= 500)
+            stats.buckets[bucket] += 1
+            stats.total_time += elapsed
+            stats.max_time = max(stats.max_time, elapsed)
+            stats.db_time += metrics.db_time
+            stats.queries += metrics.queries
+            stats.max_queries = max(stats.max_queries, metrics.queries)
+            stats.serializer_time += metrics.serializer_time
+            stats.response_bytes += response_bytes
+
+    def add_trace(self, trace: Dict[str, Any]) -> None:
+        self._traces.append(trace)
+
+    def add_violation(self, route: str, violation: Dict[str, Any]) -> None:
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is not None:
+                stats.budget_violations += 1
+            self._violations.append(violation)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes = {}
+            self._traces.clear()
+            self._violations.clear()
+            self.started_at = timezone.now()
+
+    def _percentile(self, stats: RouteStats, fraction: float) -> Optional[float]:
+        """Upper bound of the histogram bucket the percentile falls in (None past the last bound)."""
+        target = fraction * stats.count
+        seen = 0
+        for index, count in enumerate(stats.buckets):
+            seen += count
+            if seen >= target:
+                return self.bucket_bounds_ms[index] if index < len(self.bucket_bounds_ms) else None
+        return None
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            routes = list(self._routes.items())
+            traces = list(self._traces)
+            violations = list(self._violations)
+
+        rows = []
+        for route, stats in routes:
+            rows.append({
+                "route": route,
+                "count": stats.count,
+                "errors": stats.errors,
+                "total_ms": round(stats.total_time * 1000, 2),
+                "mean_ms": round(stats.total_time * 1000 / stats.count, 2),
+                "max_ms": round(stats.max_time * 1000, 2),
+                "p50_ms": self._percentile(stats, 0.50),
+                "p95_ms": self._percentile(stats, 0.95),
+                "p99_ms": self._percentile(stats, 0.99),
+                "mean_queries": round(stats.queries / stats.count, 2),
+                "max_queries": stats.max_queries,
+                "budget_violations": stats.budget_violations,
+                "mean_db_ms": round(stats.db_time * 1000 / stats.count, 2),
+                "mean_serializer_ms": round(stats.serializer_time * 1000 / stats.count, 2),
+                "mean_response_bytes": stats.response_bytes // stats.count,
+                "histogram": dict(zip(
+                    [f"<={bound}ms" for bound in self.bucket_bounds_ms] + ["slower"],
+                    stats.buckets,
+                )),
+            })
+        rows.sort(key=lambda row: row["total_ms"], reverse=True)
+        return {
+            "since": self.started_at,
+            "routes": rows,
+            "query_budget_violations": violations[::-1],
+            "slow_traces": traces[::-1],
+        }
+
+
+performance_registry = PerformanceRegistry(
+    bucket_bounds_ms=settings.PERF_HISTOGRAM_BUCKETS_MS,
+    max_traces=settings.PERF_TRACE_MAX,
+)
+
+
+def _route(request) -> str:
+    match = getattr(request, "resolver_match", None)
+    route = f"/{match.route}" if match is not None else "<unresolved>"
+    return f"{request.method} {route}"
+
+
+def _view_class(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return None
+    return getattr(match.func, "view_class", None) or match.func
+
+
+def query_budget(request) -> Optional[int]:
+    """The view's ``query_budget`` for the request's method: an int for every method, or a dict by method."""
+    budget = getattr(_view_class(request), "query_budget", None)
+    if isinstance(budget, dict):
+        return budget.get(request.method)
+    return budget
+
+
+def check_query_budget(request, route: str, metrics: RequestMetrics) -> None:
+    budget = query_budget(request)
+    max_repeated = getattr(_view_class(request), "max_repeated_queries", None) or metrics.repeat_threshold
+
+    problems = []
+    if budget is not None and metrics.queries > budget:
+        problems.append(f"{metrics.queries} queries against a budget of {budget}")
+    repeated = []
+    for shape, call_site in metrics.repeated.items():
+        count = metrics.fingerprints[shape]
+        if count >= max_repeated:
+            repeated.append({"count": count, "call_site": call_site, "sql": shape})
+            problems.append(f"{count} repeats of one query from {call_site or 'outside the apps'}: {shape[:200]}")
+    if not problems:
+        return
+
+    message = f"{route}: " + "; ".join(problems)
+    performance_registry.add_violation(route, {
+        "at": timezone.now(),
+        "route": route,
+        "path": request.get_full_path(),
+        "queries": metrics.queries,
+        "query_budget": budget,
+        "repeated": repeated,
+    })
+    if settings.QUERY_BUDGET_RAISE:
+        raise QueryBudgetExceeded(message)
+    logger.warning(f"Query budget exceeded on {message}")
+
+
+class PerformanceProfilerMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PERF_PROFILER_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        self.sample_rate = settings.PERF_TRACE_SAMPLE_RATE
+        self.slow_seconds = settings.PERF_SLOW_REQUEST_MS / 1000
+        self.repeat_threshold = settings.QUERY_NPLUSONE_THRESHOLD
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token, start = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        return self._finish(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        metrics, token, start = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        return self._finish(request, response, metrics, start)
+
+    def _start(self):
+        metrics = RequestMetrics(
+            trace=self.sample_rate > 0 and random.random() < self.sample_rate,
+            repeat_threshold=self.repeat_threshold,
+        )
+        return metrics, _current_metrics.set(metrics), time.perf_counter()
+
+    def _finish(self, request, response, metrics: RequestMetrics, start: float):
+        elapsed = time.perf_counter() - start
+
+        route = _route(request)
+        response_bytes = 0 if response.streaming else len(response.content)
+        performance_registry.observe(route, response.status_code, elapsed, metrics, response_bytes)
+
+        if metrics.trace is not None and elapsed >= self.slow_seconds:
+            performance_registry.add_trace({
+                "at": timezone.now(),
+                "route": route,
+                "path": request.get_full_path(),
+                "status": response.status_code,
+                "total_ms": round(elapsed * 1000, 2),
+                "db_ms": round(metrics.db_time * 1000, 2),
+                "serializer_ms": round(metrics.serializer_time * 1000, 2),
+                "queries": [
+                    {"database": alias, "sql": sql, "ms": round(duration * 1000, 3)}
+                    for alias, sql, duration in metrics.trace
+                ],
+            })
+
+        if metrics.repeated or query_budget(request) is not None:
+            check_query_budget(request, route, metrics)
+        return response
+
+
+@contextmanager
+def serializer_timer():
+    """Add the enclosed time to the request's serializer time (outermost serializer only)."""
+    metrics = _current_metrics.get()
+    if metrics is None or metrics.serializer_depth:
+        yield
+        return
+    metrics.serializer_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_time += time.perf_counter() - start
+        metrics.serializer_depth -= 1
+
+
+class TimedSerializerMixin:
+    """
+    Serializer mixin timing validation and representation for the profiler.
+
+    ``many=True`` serializers are timed through their child, so a list costs
+    one timer per item; nested serializers are counted once, in their parent.
+    """
+
+    def run_validation(self, *args, **kwargs):
+        with serializer_timer():
+            return super().run_validation(*args, **kwargs)
+
+    def to_representation(self, *args, **kwargs):
+        with serializer_timer():
+            return super().to_representation(*args, **kwargs)
+
+
+@lru_cache(maxsize=None)
+def timed_serializer(serializer_class):
+    if issubclass(serializer_class, TimedSerializerMixin):
+        return serializer_class
+    return type(
+        serializer_class.__name__,
+        (TimedSerializerMixin, serializer_class),
+        {"__module__": serializer_class.__module__, "__qualname__": serializer_class.__qualname__},
+    )
+
+
+class SerializerTimingMixin:
+    """Generic view mixin reporting the time spent in the view's serializer to the profiler."""
+
+    def get_serializer_class(self):
+        return timed_serializer(super().get_serializer_class())
@@ -0,0 +1,236 @@
+"""
+Per-process cache of the reference data purchases look up.
+
+Every purchase needs its product (with the product's scheme), gadget purchases
+its pricing and the selling outlet. These change rarely, so each process keeps
+them as small frozen snapshots and looks them up in memory: ``product(id)``,
+``gadget_pricing(id)``, ``outlet(id)`` and ``outlet_by_number(number)``
+return a snapshot, or None when there is no such row. Misses are not cached.
+
+Staleness is tracked per namespace in ``ReferenceDataVersion``. Saving or
+deleting a scheme, product, pricing or outlet bumps the versions of the
+namespaces whose snapshots embed it; the process that made the change drops
+those snapshots as soon as the transaction commits, and every other process
+notices the new version the next time it polls the table, at most once every
+REFERENCE_DATA_POLL_SECONDS. A lookup therefore costs no query at all, except
+for a single small SELECT per poll interval and one per miss.
+"""
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+
+from apps.core.models import ReferenceDataVersion
+from apps.gadgets.models import DeviceOutlet
+from apps.pricing.models import GadgetPricing
+from apps.products.models import PolicyNumberSequence, Product
+from apps.schemes.models import Scheme
+
+PRODUCTS = "products"
+GADGET_PRICINGS = "gadget_pricings"
+OUTLETS = "outlets"
+
+
+@dataclass(frozen=True)
+class SchemeSnapshot:
+    id: int
+    name: str
+    scheme_type: str
+    max_members: int
+
+
+@dataclass(frozen=True)
+class ProductSnapshot:
+    id: int
+    name: str
+    scheme_id: int
+    policy_number_prefix: Optional[str]
+    scheme: SchemeSnapshot
+
+    def next_policy_number(self) -> str:
+        """Same numbering as ``Product.next_policy_number``."""
+        (number,) = PolicyNumberSequence.allocate(self.id)
+        return f"{self.policy_number_prefix}_{number}"
+
+
+@dataclass(frozen=True)
+class GadgetPricingSnapshot:
+    id: int
+    product_id: int
+    cover_type: str
+    cover_percentage: float
+    product: ProductSnapshot
+
+
+@dataclass(frozen=True)
+class OutletSnapshot:
+    id: int
+    outlet_number: Optional[str]
+    name: str
+    agent_type: str
+    owner_id: Optional[int]
+
+
+def _scheme_snapshot(scheme: Scheme) -> SchemeSnapshot:
+    return SchemeSnapshot(
+        id=scheme.id,
+        name=scheme.name,
+        scheme_type=scheme.scheme_type,
+        max_members=scheme.max_members,
+    )
+
+
+def _product_snapshot(product: Product) -> ProductSnapshot:
+    return ProductSnapshot(
+        id=product.id,
+        name=product.name,
+        scheme_id=product.scheme_id,
+        policy_number_prefix=product.policy_number_prefix,
+        scheme=_scheme_snapshot(product.scheme),
+    )
+
+
+def _load_product(product_id: Any) -> Optional[ProductSnapshot]:
+    product = Product.objects.select_related("scheme").filter(id=product_id).first()
+    return _product_snapshot(product) if product else None
+
+
+def _load_gadget_pricing(pricing_id: Any) -> Optional[GadgetPricingSnapshot]:
+    pricing = GadgetPricing.objects.select_related("product__scheme").filter(id=pricing_id).first()
+    if pricing is None:
+        return None
+    return GadgetPricingSnapshot(
+        id=pricing.id,
+        product_id=pricing.product_id,
+        cover_type=pricing.cover_type,
+        cover_percentage=pricing.cover_percentage,
+        product=_product_snapshot(pricing.product),
+    )
+
+
+def _outlet_snapshot(outlet: Optional[DeviceOutlet]) -> Optional[OutletSnapshot]:
+    if outlet is None:
+        return None
+    return OutletSnapshot(
+        id=outlet.id,
+        outlet_number=outlet.outlet_number,
+        name=outlet.name,
+        agent_type=outlet.agent_type,
+        owner_id=outlet.owner_id,
+    )
+
+
+class ReferenceDataCache:
+    def __init__(self) -> None:
+        self._entries: Dict[str, Dict[Any, Any]] = {}
+        self._versions: Dict[str, int] = {}
+        self._polled_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, key: Any, load: Callable[[], Any]) -> Any:
+        self._poll()
+        with self._lock:
+            entries = self._entries.setdefault(namespace, {})
+            try:
+                return entries[key]
+            except KeyError:
+                pass
+        value = load()
+        if value is not None:
+            with self._lock:
+                # An invalidation while loading dropped this dict; what was
+                # loaded may predate the change, so it is not kept.
+                if self._entries.get(namespace) is entries:
+                    if len(entries) >= settings.REFERENCE_DATA_MAX_ENTRIES:
+                        entries.pop(next(iter(entries)), None)
+                    entries[key] = value
+        return value
+
+    def invalidate(self, namespaces: Iterable[str]) -> None:
+        with self._lock:
+            for namespace in namespaces:
+                self._entries.pop(namespace, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._polled_at = float("-inf")
+
+    def _poll(self) -> None:
+        now = time.monotonic()
+        if now - self._polled_at < settings.REFERENCE_DATA_POLL_SECONDS:
+            return
+        versions = dict(ReferenceDataVersion.objects.values_list("namespace", "version"))
+        with self._lock:
+            stale = [
+                namespace for namespace in self._entries
+                if versions.get(namespace) != self._versions.get(namespace)
+            ]
+            for namespace in stale:
+                self._entries.pop(namespace, None)
+            self._versions = versions
+            self._polled_at = now
+
+
+reference_data = ReferenceDataCache()
+
+
+def product(product_id: Any) -> Optional[ProductSnapshot]:
+    return reference_data.get(PRODUCTS, product_id, lambda: _load_product(product_id))
+
+
+def gadget_pricing(pricing_id: Any) -> Optional[GadgetPricingSnapshot]:
+    return reference_data.get(GADGET_PRICINGS, pricing_id, lambda: _load_gadget_pricing(pricing_id))
+
+
+def outlet(outlet_id: Any) -> Optional[OutletSnapshot]:
+    return reference_data.get(
+        OUTLETS, ("id", outlet_id), lambda: _outlet_snapshot(DeviceOutlet.objects.filter(id=outlet_id).first())
+    )
+
+
+def outlet_by_number(outlet_number: Any) -> Optional[OutletSnapshot]:
+    if not outlet_number:
+        return None
+    return reference_data.get(
+        OUTLETS,
+        ("outlet_number", outlet_number),
+        lambda: _outlet_snapshot(DeviceOutlet.objects.filter(outlet_number=outlet_number).order_by("id").first()),
+    )
+
+
+def bump_versions(namespaces: Tuple[str, ...]) -> None:
+    """Mark ``namespaces`` stale in every process once the current transaction commits."""
+    updated = ReferenceDataVersion.objects.filter(namespace__in=namespaces).update(version=F("version") + 1)
+    if updated < len(namespaces):
+        ReferenceDataVersion.objects.bulk_create(
+            [ReferenceDataVersion(namespace=namespace, version=1) for namespace in namespaces],
+            ignore_conflicts=True,
+        )
+    transaction.on_commit(lambda: reference_data.invalidate(namespaces))
+
+
+# What each model's snapshots are embedded in.
+INVALIDATES = {
+    Scheme: (PRODUCTS, GADGET_PRICINGS),
+    Product: (PRODUCTS, GADGET_PRICINGS),
+    GadgetPricing: (GADGET_PRICINGS,),
+    DeviceOutlet: (OUTLETS,),
+}
+
+
+def _reference_data_changed(sender, **kwargs) -> None:
+    bump_versions(INVALIDATES[sender])
+
+
+def connect_signals() -> None:
+    for model in INVALIDATES:
+        uid = f"core.reference_data.{model._meta.label_lower}"
+        post_save.connect(_reference_data_changed, sender=model, dispatch_uid=f"{uid}.save")
+        post_delete.connect(_reference_data_changed, sender=model, dispatch_uid=f"{uid}.delete")
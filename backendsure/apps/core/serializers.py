@@ -0,0 +1,12 @@
+from rest_framework import serializers
+
+from apps.core.models import UserAction
+
+
+class UserActionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UserAction
+        fields = [
+            "id", "occurred_at", "action_title", "action_type", "action_description",
+            "actor", "object_type", "object_id", "changes",
+        ]
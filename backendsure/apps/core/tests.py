@@ -1,3 +1,581 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+import gzip
+import hashlib
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.claims.models import Claim
+from apps.core import profiling
+from apps.core.audit import AuditLogBuffer, partition_months
+from apps.core.archival import ARCHIVED_TABLES_BY_LABEL, Archiver, find_archived, read_segment
+from apps.core.db_router import use_replicas
+from apps.core.idempotency import REPLAYED_HEADER, IdempotencyStore, idempotent
+from apps.core.profiling import RequestMetrics, query_budget, timed_serializer
+from apps.core.reference_data import ReferenceDataCache
+from apps.core.throttling import (
+    IPTokenBucketThrottle, OutletTokenBucketThrottle, UserTokenBucketThrottle, admission_controlled,
+)
+from apps.core.models import ArchiveIndexEntry, ArchiveSegment, UserAction
+from apps.gadgets.models import DeviceOutlet
+from apps.notifications.models import NotificationLog, NotificationStorage
+from apps.policies.models import Policy
+from apps.products.models import Product
+from apps.products.serializers import ProductSerializer
+from apps.schemes.models import Scheme
+from apps.users.models import User
+
+
+class PlatformMetricsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.customer = User.objects.create(username="jane", email="jane@example.com", role="Policy Owner")
+        policy = Policy.objects.create(policy_number="GDT_1", policy_owner=self.customer, status="Active")
+        Policy.objects.create(policy_number="GDT_2", policy_owner=self.customer, status="Lapsed")
+        Claim.objects.create(
+            policy=policy, description="Cracked screen", claim_type="Damage", incident_date="2026-03-01",
+            estimated_cost=1500,
+        )
+
+    def test_metrics_are_read_on_the_request_connection(self):
+        admin = User.objects.create(username="admin", email="admin@example.com", role="Admin")
+        self.client.force_authenticate(admin)
+
+        # One aggregate each for policies, claims, memberships, premiums and devices.
+        with self.assertNumQueries(5):
+            response = self.client.get("/core/metrics/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total_policies"], 2)
+        self.assertEqual(response.data["active_policies"], 1)
+        self.assertEqual(response.data["total_claims"], 1)
+        self.assertEqual(response.data["pending_claims"], 1)
+        self.assertEqual(response.data["total_amount_claimed"], 1500)
+
+    def test_metrics_are_for_admins_only(self):
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get("/core/metrics/").status_code, 403)
+
+
+class SerializerTimingTests(TestCase):
+    def test_only_views_with_the_mixin_time_their_serializer(self):
+        self.assertIs(timed_serializer(ProductSerializer), timed_serializer(ProductSerializer))
+        self.assertFalse(hasattr(serializers.BaseSerializer.is_valid, "__wrapped__"))
+
+        scheme = Scheme.objects.create(name="Funeral", scheme_type="Individual")
+        products = [Product.objects.create(name=f"Cover {i}", scheme=scheme) for i in range(3)]
+        metrics = RequestMetrics(trace=False)
+        token = profiling._current_metrics.set(metrics)
+        try:
+            ProductSerializer(products, many=True).data
+            self.assertEqual(metrics.serializer_time, 0)
+            data = timed_serializer(ProductSerializer)(products, many=True).data
+        finally:
+            profiling._current_metrics.reset(token)
+
+        self.assertEqual(len(data), 3)
+        self.assertGreater(metrics.serializer_time, 0)
+        self.assertEqual(metrics.serializer_depth, 0)
+
+
+class QueryBudgetTests(TestCase):
+    def request(self, method, budget):
+        request = RequestFactory().generic(method, "/")
+        view = type("BudgetedView", (), {"query_budget": budget})
+        request.resolver_match = SimpleNamespace(func=SimpleNamespace(view_class=view))
+        return request
+
+    def test_budget_can_be_set_per_method(self):
+        self.assertEqual(query_budget(self.request("GET", {"GET": 5})), 5)
+        self.assertIsNone(query_budget(self.request("POST", {"GET": 5})))
+        self.assertEqual(query_budget(self.request("POST", 8)), 8)
+
+
+@override_settings(IDEMPOTENCY_WAIT_SECONDS=0.05, IDEMPOTENCY_POLL_INTERVAL_SECONDS=0.01)
+class IdempotencyStoreTests(TestCase):
+    def test_wait_drops_its_event_when_it_gives_up(self):
+        store = IdempotencyStore()
+        record = store.claim("scope", "key", "hash")
+
+        self.assertEqual(store.wait("scope", "key"), record)
+        self.assertEqual(store._finished, {})
+
+
+class RecordingView(APIView):
+    permission_classes = [AllowAny]
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = []
+        self.during = None
+
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        self.calls.append(request.data)
+        if self.during:
+            return self.during()
+        return Response({"number": len(self.calls)}, status=201)
+
+
+@override_settings(IDEMPOTENCY_WAIT_SECONDS=0.05, IDEMPOTENCY_POLL_INTERVAL_SECONDS=0.01)
+class IdempotentViewTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.view = RecordingView()
+        # Completed keys are cached, and the cache outlives each test's transaction.
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def post(self, data, key="key-1"):
+        request = self.factory.post("/purchases/", data, format="json", HTTP_IDEMPOTENCY_KEY=key)
+        return self.view.dispatch(request)
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.post({"amount": 10})
+        replay = self.post({"amount": 10})
+
+        self.assertEqual(len(self.view.calls), 1)
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay.data, first.data)
+        self.assertEqual(replay[REPLAYED_HEADER], "true")
+
+    def test_key_reused_with_another_body_is_refused(self):
+        self.post({"amount": 10})
+        response = self.post({"amount": 20})
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(len(self.view.calls), 1)
+
+    def test_duplicate_while_the_first_is_running_is_a_conflict(self):
+        duplicates = []
+        self.view.during = lambda: duplicates.append(self.post({"amount": 10})) or Response({}, status=201)
+        self.post({"amount": 10})
+
+        [duplicate] = duplicates
+        self.assertEqual(duplicate.status_code, 409)
+        self.assertEqual(len(self.view.calls), 1)
+
+    def test_failed_request_releases_the_key(self):
+        self.view.during = lambda: Response({"detail": "Declined"}, status=400)
+        self.post({"amount": 10})
+        self.view.during = None
+
+        self.assertEqual(self.post({"amount": 10}).status_code, 201)
+        self.assertEqual(len(self.view.calls), 2)
+
+
+class ThrottledView(APIView):
+    permission_classes = [AllowAny]
+    throttle_scope = "tests"
+    throttle_classes = [IPTokenBucketThrottle, OutletTokenBucketThrottle, UserTokenBucketThrottle]
+
+    def post(self, request, *args, **kwargs):
+        return Response(status=201)
+
+
+class AdmissionControlledView(APIView):
+    permission_classes = [AllowAny]
+    during = None
+
+    @admission_controlled("tests")
+    def post(self, request, *args, **kwargs):
+        if self.during:
+            return self.during()
+        return Response(status=201)
+
+
+@override_settings(
+    THROTTLE_TOKEN_BUCKETS={"tests:ip": (2, 0.5)},
+    ADMISSION_MAX_IN_FLIGHT={"tests": 1},
+    ADMISSION_QUEUE_TIMEOUT_SECONDS=0.01,
+)
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def post(self, view, ip="10.0.0.1", data=None, outlet=None):
+        request = self.factory.post("/purchases/", data, format="json", REMOTE_ADDR=ip)
+        if outlet is not None:
+            force_authenticate(request, token=outlet)
+        return view.as_view()(request)
+
+    def test_token_bucket_refills_at_its_rate(self):
+        # Patching time.time moves every cache's clock, so it stays near the real one.
+        start = time.time()
+        with mock.patch("apps.core.throttling.time.time", return_value=start) as now:
+            self.assertEqual([self.post(ThrottledView).status_code for _ in range(2)], [201, 201])
+            refused = self.post(ThrottledView)
+            self.assertEqual(refused.status_code, 429)
+            self.assertEqual(refused["Retry-After"], "2")
+            # Another caller has a bucket of their own.
+            self.assertEqual(self.post(ThrottledView, ip="10.0.0.2").status_code, 201)
+
+            now.return_value = start + 2
+            self.assertEqual(self.post(ThrottledView).status_code, 201)
+            self.assertEqual(self.post(ThrottledView).status_code, 429)
+
+    @override_settings(THROTTLE_TOKEN_BUCKETS={"tests:outlet": (1, 0.001)})
+    def test_outlet_bucket_is_keyed_on_the_authenticated_outlet_only(self):
+        outlet = DeviceOutlet.objects.create(
+            agent_type="Seller", outlet_number="OUT1", name="Shop", phone_number="1", location="CBD", city="Nairobi",
+        )
+        body = {"additional_information": {"agent_id_number": "OUT1"}}
+
+        # An anonymous caller naming an outlet neither uses nor drains its bucket.
+        self.assertEqual({self.post(ThrottledView, data=body).status_code for _ in range(3)}, {201})
+        self.assertEqual(self.post(ThrottledView, outlet=outlet).status_code, 201)
+        self.assertEqual(self.post(ThrottledView, ip="10.0.0.9", outlet=outlet).status_code, 429)
+
+    @override_settings(CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "django_cache"}
+    })
+    def test_buckets_are_kept_in_the_database_cache(self):
+        call_command("createcachetable", verbosity=0)
+
+        self.assertEqual([self.post(ThrottledView).status_code for _ in range(3)], [201, 201, 429])
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT cache_key FROM django_cache")
+            self.assertEqual([key for key, in cursor.fetchall()], [":1:throttle:tests:ip:10.0.0.1"])
+
+    def test_bucket_without_a_setting_does_not_throttle(self):
+        with override_settings(THROTTLE_TOKEN_BUCKETS={}):
+            self.assertEqual({self.post(ThrottledView).status_code for _ in range(5)}, {201})
+
+    def test_request_over_the_in_flight_limit_is_shed(self):
+        shed = []
+        AdmissionControlledView.during = lambda view: shed.append(self.post(AdmissionControlledView)) or Response(status=201)
+        self.addCleanup(setattr, AdmissionControlledView, "during", None)
+
+        self.assertEqual(self.post(AdmissionControlledView).status_code, 201)
+        [response] = shed
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "2")
+        AdmissionControlledView.during = None
+        self.assertEqual(self.post(AdmissionControlledView).status_code, 201)
+
+
+class OwnPolicyNumbersView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return Response(policy_numbers(request.user))
+
+    def post(self, request, *args, **kwargs):
+        Policy.objects.create(policy_number=request.data["policy_number"], policy_owner=request.user)
+        return Response(status=201)
+
+
+urlpatterns = [path("own-policy-numbers/", OwnPolicyNumbersView.as_view())]
+
+
+def policy_numbers(owner):
+    return list(Policy.objects.filter(policy_owner_id=owner.id).order_by("id").values_list("policy_number", flat=True))
+
+
+@skipUnless("replica" in settings.DATABASES, "needs the replica database of backend.test_settings")
+@override_settings(ROOT_URLCONF="apps.core.tests", READ_YOUR_WRITES_SECONDS=5)
+class ReplicaRoutingTests(TransactionTestCase):
+    """Each database holds a different policy for the same customer, so a read shows where it went."""
+    # TestCase keeps the primary in a transaction, where every read stays on it.
+    databases = {"default", "replica"} if "replica" in settings.DATABASES else {"default"}
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # Only for the test itself: the router keeps replicas out of the flush that follows it.
+        replicas = override_settings(DATABASE_REPLICAS=["replica"])
+        replicas.enable()
+        self.addCleanup(replicas.disable)
+        self.jane = self.customer("jane")
+        self.sam = self.customer("sam")
+
+    def customer(self, username):
+        user = User.objects.create(username=username, email=f"{username}@example.com")
+        User.objects.using("replica").create(id=user.id, username=username, email=f"{username}@example.com")
+        Policy.objects.create(policy_number=f"{username}-primary", policy_owner=user)
+        Policy.objects.using("replica").create(policy_number=f"{username}-replica", policy_owner_id=user.id)
+        return user
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+        return client
+
+    def test_reads_outside_a_request_use_the_primary(self):
+        self.assertEqual(policy_numbers(self.jane), ["jane-primary"])
+
+    def test_use_replicas_reads_the_replica_until_the_block_writes(self):
+        with use_replicas():
+            self.assertEqual(policy_numbers(self.jane), ["jane-replica"])
+            with transaction.atomic():
+                self.assertEqual(policy_numbers(self.jane), ["jane-primary"])
+            Policy.objects.create(policy_number="jane-new", policy_owner=self.jane)
+            self.assertEqual(policy_numbers(self.jane), ["jane-primary", "jane-new"])
+        self.assertEqual(policy_numbers(self.jane), ["jane-primary", "jane-new"])
+        self.assertFalse(Policy.objects.using("replica").filter(policy_number="jane-new").exists())
+
+    def test_safe_requests_read_the_replica_and_writes_go_to_the_primary(self):
+        client = self.client_for(self.jane)
+        self.assertEqual(client.get("/own-policy-numbers/").data, ["jane-replica"])
+
+        self.assertEqual(client.post("/own-policy-numbers/", {"policy_number": "jane-new"}).status_code, 201)
+        self.assertTrue(Policy.objects.filter(policy_number="jane-new").exists())
+        self.assertFalse(Policy.objects.using("replica").filter(policy_number="jane-new").exists())
+
+    def test_reads_after_a_write_are_pinned_for_the_user(self):
+        self.client_for(self.jane).post("/own-policy-numbers/", {"policy_number": "jane-new"})
+
+        # Another token of the same user, without the pin cookie, still reads its write.
+        self.assertEqual(self.client_for(self.jane).get("/own-policy-numbers/").data, ["jane-primary", "jane-new"])
+        self.assertEqual(self.client_for(self.sam).get("/own-policy-numbers/").data, ["sam-replica"])
+
+    @override_settings(READ_YOUR_WRITES_SECONDS=1)
+    def test_pin_expires(self):
+        self.client_for(self.jane).post("/own-policy-numbers/", {"policy_number": "jane-new"})
+        self.assertEqual(len(self.client_for(self.jane).get("/own-policy-numbers/").data), 2)
+
+        time.sleep(1.1)
+        self.assertEqual(self.client_for(self.jane).get("/own-policy-numbers/").data, ["jane-replica"])
+
+    def test_a_throttled_read_does_not_pin(self):
+        client = self.client_for(self.jane)
+        with override_settings(THROTTLE_TOKEN_BUCKETS={"tests:user": (10, 1)}):
+            with mock.patch.object(OwnPolicyNumbersView, "throttle_classes", [UserTokenBucketThrottle]), \
+                    mock.patch.object(OwnPolicyNumbersView, "throttle_scope", "tests", create=True):
+                self.assertEqual(client.get("/own-policy-numbers/").data, ["jane-replica"])
+                self.assertEqual(client.get("/own-policy-numbers/").data, ["jane-replica"])
+
+
+class NotificationArchivalTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=media)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.customer = User.objects.create(username="jane", email="jane@example.com", role="Policy Owner")
+        self.policy = Policy.objects.create(policy_number="FUN_1", policy_owner=self.customer, status="Active")
+        self.archiver = Archiver(ARCHIVED_TABLES_BY_LABEL["notifications.notificationstorage"])
+
+    def notification(self, status, days_old=120):
+        notification = NotificationStorage.objects.create(
+            title=f"{status} reminder", policy=self.policy, user=self.customer,
+            notification_category="Payment Reminder", notification_channel="SMS", status=status,
+        )
+        NotificationStorage.objects.filter(id=notification.id).update(
+            created_at=timezone.now() - timedelta(days=days_old)
+        )
+        return notification
+
+    def test_only_old_delivered_notifications_without_logs_are_cold(self):
+        sent, read = self.notification("Sent"), self.notification("Read")
+        self.notification("Pending")
+        self.notification("Failed")
+        self.notification("Sent", days_old=10)
+        logged = self.notification("Sent")
+        NotificationLog.objects.create(user=self.customer, notification=logged, status="Sent")
+
+        self.assertEqual(set(self.archiver.cold_rows().values_list("id", flat=True)), {sent.id, read.id})
+
+    @override_settings(ARCHIVE_POLICIES={
+        "notifications.notificationstorage": {"hot_days": 90, "max_hot_rows": 1, "retention_days": None},
+    })
+    def test_max_hot_rows_does_not_archive_pending_notifications(self):
+        pending = [self.notification("Pending", days_old=1) for _ in range(3)]
+        sent = self.notification("Sent", days_old=1)
+        self.notification("Sent", days_old=1)
+
+        cold = Archiver(ARCHIVED_TABLES_BY_LABEL["notifications.notificationstorage"]).cold_rows()
+
+        self.assertEqual(list(cold.values_list("id", flat=True)), [sent.id])
+        self.assertEqual(NotificationStorage.objects.filter(id__in=[p.id for p in pending]).count(), 3)
+
+    def test_archived_rows_round_trip_through_the_segment(self):
+        notifications = [self.notification("Sent") for _ in range(3)]
+        pending = self.notification("Pending")
+        expected = list(
+            NotificationStorage.objects.filter(status="Sent").order_by("id").values("id", "title", "status", "policy_id")
+        )
+
+        result = Archiver(ARCHIVED_TABLES_BY_LABEL["notifications.notificationstorage"], chunk_size=2).run()
+
+        self.assertEqual((result.archived, result.segments), (3, 2))
+        self.assertEqual(list(NotificationStorage.objects.values_list("id", flat=True)), [pending.id])
+        segments = list(ArchiveSegment.objects.order_by("first_id"))
+        self.assertEqual([(s.first_id, s.last_id, s.row_count) for s in segments], [
+            (notifications[0].id, notifications[1].id, 2), (notifications[2].id, notifications[2].id, 1),
+        ])
+        with default_storage.open(segments[0].file, "rb") as f:
+            compressed = f.read()
+        self.assertEqual(hashlib.sha256(compressed).hexdigest(), segments[0].sha256)
+        self.assertEqual(len(gzip.decompress(compressed).splitlines()), 2)
+
+        rows = [row for segment in segments for row in read_segment(segment)]
+        self.assertEqual(
+            [{key: row[key] for key in ("id", "title", "status", "policy_id")} for row in rows], expected
+        )
+        archived = list(find_archived("notifications.notificationstorage", key=f"policy:{self.policy.id}"))
+        self.assertEqual([row["id"] for row in archived], [row["id"] for row in expected])
+        self.assertEqual(list(find_archived("notifications.notificationstorage", key="policy:0")), [])
+
+    def test_rows_stay_hot_until_their_file_is_written(self):
+        sent = self.notification("Sent")
+
+        with mock.patch.object(default_storage, "save", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.archiver.run()
+
+        self.assertTrue(NotificationStorage.objects.filter(id=sent.id).exists())
+        self.assertFalse(ArchiveSegment.objects.exists())
+
+    def test_failed_commit_removes_the_file_and_keeps_the_rows(self):
+        sent = self.notification("Sent")
+
+        with mock.patch.object(default_storage, "save", wraps=default_storage.save) as save, \
+                mock.patch.object(ArchiveIndexEntry.objects, "bulk_create", side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                self.archiver.run()
+
+        self.assertTrue(NotificationStorage.objects.filter(id=sent.id).exists())
+        self.assertFalse(ArchiveSegment.objects.exists())
+        self.assertEqual(save.call_count, 1)
+        self.assertFalse(default_storage.exists(save.call_args.args[0]))
+
+
+def moment(year, month, day):
+    return datetime(year, month, day, 12, tzinfo=dt_timezone.utc)
+
+
+class AuditLogBufferTests(TestCase):
+    def buffer(self, max_size=10, batch_size=2):
+        buffer = AuditLogBuffer(max_size=max_size, batch_size=batch_size, flush_interval=60)
+        # Flushed by hand, without the background writer.
+        buffer._start = lambda: None
+        return buffer
+
+    def entry(self, title, occurred_at=None):
+        return (occurred_at or timezone.now(), title, "Create", None, None, "policies.policy", "1", None)
+
+    def test_flush_writes_every_entry_into_its_month(self):
+        buffer = self.buffer()
+        buffer.record(self.entry("first", moment(2026, 1, 31)))
+        buffer.record(self.entry("second", moment(2026, 2, 1)))
+        buffer.record(self.entry("third", moment(2026, 2, 28)))
+
+        self.assertEqual(buffer.flush(), 3)
+        self.assertEqual(buffer.pending(), 0)
+        self.assertEqual(list(UserAction.objects.order_by("occurred_at").values_list("action_title", "partition_month")), [
+            ("first", date(2026, 1, 1)), ("second", date(2026, 2, 1)), ("third", date(2026, 2, 1)),
+        ])
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_a_full_buffer_drops_the_oldest_entries(self):
+        buffer = self.buffer(max_size=3)
+        for i in range(5):
+            buffer.record(self.entry(f"entry {i}"))
+
+        self.assertEqual((buffer.pending(), buffer.dropped), (3, 2))
+        buffer.flush()
+        self.assertEqual(
+            sorted(UserAction.objects.values_list("action_title", flat=True)), ["entry 2", "entry 3", "entry 4"]
+        )
+
+    def test_a_failed_write_counts_the_batch_as_dropped(self):
+        buffer = self.buffer()
+        for i in range(3):
+            buffer.record(self.entry(f"entry {i}"))
+
+        with mock.patch.object(UserAction.objects, "bulk_create", side_effect=RuntimeError("boom")), \
+                self.assertLogs("apps.core.audit", "ERROR"):
+            self.assertEqual(buffer.flush(), 0)
+
+        self.assertEqual((buffer.dropped, buffer.pending()), (2, 1))
+        self.assertEqual(buffer.flush(), 1)
+
+
+class AuditLogPartitionTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create(username="admin", email="admin@example.com", role="Admin")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def action(self, title, occurred_at):
+        return UserAction.objects.create(action_title=title, action_type="Update", occurred_at=occurred_at)
+
+    def test_window_names_every_month_it_touches(self):
+        self.assertEqual(partition_months(moment(2025, 12, 20), moment(2026, 2, 3)), [
+            date(2025, 12, 1), date(2026, 1, 1), date(2026, 2, 1),
+        ])
+        self.assertEqual(partition_months(moment(2026, 3, 2), moment(2026, 3, 9)), [date(2026, 3, 1)])
+
+    def test_query_reads_only_the_partitions_of_its_window(self):
+        self.action("november", moment(2025, 11, 30))
+        self.action("december", moment(2025, 12, 31))
+        self.action("january", moment(2026, 1, 2))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                "/core/audit-log/", {"since": "2025-12-30T00:00:00Z", "until": "2026-01-03T00:00:00Z"}
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["action_title"] for row in response.data["results"]], ["january", "december"])
+        (select,) = [q["sql"] for q in queries.captured_queries if 'FROM "core_useraction"' in q["sql"]]
+        self.assertIn("\"partition_month\" IN ('2025-12-01', '2026-01-01')", select)
+
+    def test_archiver_moves_whole_months_past_the_horizon(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        now = moment(2026, 7, 15)
+        older = self.action("older", moment(2025, 12, 31))
+        first = self.action("first of the month", moment(2026, 1, 1))
+        last = self.action("last of the month", moment(2026, 1, 31))
+
+        # hot_days of 180 puts the horizon on 16 January 2026: all of January stays hot.
+        archiver = Archiver(ARCHIVED_TABLES_BY_LABEL["core.useraction"], now=now)
+        self.assertEqual(list(archiver.cold_rows().values_list("id", flat=True)), [older.id])
+
+        with override_settings(MEDIA_ROOT=media):
+            self.assertEqual(archiver.run().archived, 1)
+        self.assertEqual(set(UserAction.objects.values_list("id", flat=True)), {first.id, last.id})
+
+
+@override_settings(REFERENCE_DATA_POLL_SECONDS=3600)
+class ReferenceDataCacheTests(TestCase):
+    def test_a_load_that_races_an_invalidation_is_not_cached(self):
+        cache_ = ReferenceDataCache()
+        loads = []
+
+        def load():
+            loads.append(1)
+            if len(loads) == 1:
+                # The product changes (and its namespace is dropped) while the old row is being read.
+                cache_.invalidate(["products"])
+            return f"load {len(loads)}"
+
+        self.assertEqual(cache_.get("products", 1, load), "load 1")
+        self.assertEqual(cache_.get("products", 1, load), "load 2")
+        self.assertEqual(cache_.get("products", 1, load), "load 2")
+        self.assertEqual(len(loads), 2)
 
-# Create your tests here.
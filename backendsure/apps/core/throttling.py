@@ -0,0 +1,138 @@
+"""
+Throttling and load shedding for the public, transaction-heavy endpoints.
+
+Token bucket throttles: a view sets ``throttle_scope`` and lists the bucket
+classes in ``throttle_classes``; each class keys its bucket on one thing about
+the caller (IP, outlet, user) and reads its ``(capacity, refill_per_second)``
+from THROTTLE_TOKEN_BUCKETS under ``"<scope>:<kind>"``. A bucket without a
+setting does not throttle. Buckets are only keyed on what the caller cannot
+choose freely per request: the connecting IP, the authenticated user and the
+outlet authenticated by API key. Buckets live in the default cache (a
+database table unless CACHES says otherwise), so they are shared by every
+worker; like DRF's own
+throttles the update is read-then-write, so concurrent requests can overshoot
+a bucket by a request or two. A throttled request is refused with 429 and a
+Retry-After before the view does any work.
+
+Admission control: ``admission_controlled`` caps how many requests of a kind
+run at once in this worker (ADMISSION_MAX_IN_FLIGHT). A request that cannot
+get a slot within ADMISSION_QUEUE_TIMEOUT_SECONDS is shed with 503 and a
+Retry-After instead of queueing behind the others, so a flood of heavy
+purchases cannot take every worker thread away from the rest of the API.
+"""
+from functools import wraps
+from typing import Dict, Optional
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Model
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.throttling import BaseThrottle
+
+
+class TokenBucketThrottle(BaseThrottle):
+    kind: str = ""
+
+    def get_ident_key(self, request, view) -> Optional[str]:
+        """What the bucket is keyed on; None means this throttle does not apply."""
+        raise NotImplementedError
+
+    def allow_request(self, request, view) -> bool:
+        self.retry_after = None
+        scope = getattr(view, "throttle_scope", None)
+        bucket = settings.THROTTLE_TOKEN_BUCKETS.get(f"{scope}:{self.kind}")
+        if bucket is None:
+            return True
+        ident = self.get_ident_key(request, view)
+        if ident is None:
+            return True
+
+        capacity, refill_per_second = bucket
+        key = f"throttle:{scope}:{self.kind}:{ident}"
+        now = time.time()
+        tokens, updated_at = cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        else:
+            self.retry_after = (1 - tokens) / refill_per_second
+        # Keep the bucket until it would have refilled completely anyway.
+        cache.set(key, (tokens, now), int((capacity - tokens) / refill_per_second) + 1)
+        return allowed
+
+    def wait(self) -> Optional[float]:
+        return self.retry_after
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    kind = "ip"
+
+    def get_ident_key(self, request, view):
+        return self.get_ident(request)
+
+
+class OutletTokenBucketThrottle(TokenBucketThrottle):
+    """Keyed on the outlet authenticated by API key; other callers are left to the IP and user buckets."""
+    kind = "outlet"
+
+    def get_ident_key(self, request, view):
+        if isinstance(request.auth, Model):
+            return str(request.auth.pk)
+        return None
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    kind = "user"
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return str(request.user.pk)
+        return None
+
+
+PUBLIC_ENDPOINT_THROTTLES = [IPTokenBucketThrottle, OutletTokenBucketThrottle, UserTokenBucketThrottle]
+
+
+class Overloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "The service is busy. Please retry shortly."
+    default_code = "overloaded"
+
+    def __init__(self, wait: float) -> None:
+        super().__init__()
+        # DRF's exception handler turns ``wait`` into the Retry-After header.
+        self.wait = wait
+
+
+_slots: Dict[str, threading.BoundedSemaphore] = {}
+_slots_lock = threading.Lock()
+
+
+def _slot(kind: str) -> threading.BoundedSemaphore:
+    with _slots_lock:
+        if kind not in _slots:
+            _slots[kind] = threading.BoundedSemaphore(settings.ADMISSION_MAX_IN_FLIGHT[kind])
+        return _slots[kind]
+
+
+def admission_controlled(kind: str):
+    """
+    Decorator for a DRF view method: at most ADMISSION_MAX_IN_FLIGHT[kind] of
+    these run at once in this worker; the rest are refused with 503.
+    """
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(self, request, *args, **kwargs):
+            slot = _slot(kind)
+            if not slot.acquire(timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS):
+                raise Overloaded(wait=settings.ADMISSION_RETRY_AFTER_SECONDS)
+            try:
+                return handler(self, request, *args, **kwargs)
+            finally:
+                slot.release()
+        return wrapper
+    return decorator
@@ -1,6 +1,9 @@
 from django.urls import path
-from apps.core.views import PlatformMetricsAPIView
+from apps.core.views import PlatformMetricsAPIView, AuditLogAPIView, PerformanceAPIView, ArchiveAPIView
 
 urlpatterns = [
-    path("metrics/", PlatformMetricsAPIView.as_view(), name="metrics")
+    path("metrics/", PlatformMetricsAPIView.as_view(), name="metrics"),
+    path("audit-log/", AuditLogAPIView.as_view(), name="audit-log"),
+    path("perf/", PerformanceAPIView.as_view(), name="perf"),
+    path("archive/", ArchiveAPIView.as_view(), name="archive"),
 ]
\ No newline at end of file
@@ -1,8 +1,15 @@
-from django.db.models import Sum, Count
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework import status
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework import status, generics
 
 from apps.policies.models import Policy
 from apps.claims.models import Claim
@@ -10,12 +17,19 @@ from apps.users.models import Membership
 from apps.payments.models import Premium
 from apps.gadgets.models import InsuredGadget
 from apps.core.constants import PolicyStatuses, ClaimStatuses
+from apps.core.models import UserAction
+from apps.core.serializers import UserActionSerializer
+from apps.core.async_views import AsyncAPIView
+from apps.core.audit import partition_months
+from apps.core.profiling import performance_registry
+from apps.core.archival import ARCHIVED_TABLES_BY_LABEL, find_archived
 
 
-class PlatformMetricsAPIView(APIView):
+class PlatformMetricsAPIView(AsyncAPIView):
+    """Platform wide totals, with the figures that come from the same table read by one aggregate."""
     permission_classes = [IsAuthenticated]
 
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         user = request.user
 
         if user.role != "Admin":
@@ -24,33 +38,145 @@ class PlatformMetricsAPIView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
 
+        policies = await Policy.objects.aaggregate(
+            total=Count("id"),
+            active=Count("id", filter=Q(status=PolicyStatuses.ACTIVE.value)),
+        )
+        claims = await Claim.objects.aaggregate(
+            total=Count("id"),
+            pending=Count("id", filter=Q(status__in=[
+                ClaimStatuses.PENDING.value,
+                ClaimStatuses.PENDING_VERIFICATION.value
+            ])),
+            claimed=Sum("estimated_cost"),
+        )
+        premiums = await Premium.objects.aaggregate(total=Sum("expected_amount"))
+        devices = await InsuredGadget.objects.aaggregate(total=Sum("device_cost"))
+
         metrics = {
-            "total_policies": Policy.objects.count(),
-            "active_policies": Policy.objects.filter(
-                status=PolicyStatuses.ACTIVE.value
-            ).count(),
-
-            "total_claims": Claim.objects.count(),
-            "pending_claims": Claim.objects.filter(
-                status__in=[
-                    ClaimStatuses.PENDING.value,
-                    ClaimStatuses.PENDING_VERIFICATION.value
-                ]
-            ).count(),
-
-            "policy_owners": Membership.objects.count(),
-
-            "monthly_total_premium": Premium.objects.aggregate(
-                total=Sum("expected_amount")
-            )["total"] or 0,
-
-            "total_device_value": InsuredGadget.objects.aggregate(
-                total=Sum("device_cost")
-            )["total"] or 0,
-
-            "total_amount_claimed": Claim.objects.aggregate(
-                total=Sum("estimated_cost")
-            )["total"] or 0,
+            "total_policies": policies["total"],
+            "active_policies": policies["active"],
+
+            "total_claims": claims["total"],
+            "pending_claims": claims["pending"],
+
+            "policy_owners": await Membership.objects.acount(),
+
+            "monthly_total_premium": premiums["total"] or 0,
+
+            "total_device_value": devices["total"] or 0,
+
+            "total_amount_claimed": claims["claimed"] or 0,
         }
 
         return Response(metrics, status=status.HTTP_200_OK)
+
+
+class PerformanceAPIView(APIView):
+    """Per-route timings and sampled slow request traces for this server process."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        if request.user.role != "Admin":
+            return Response(
+                {"detail": "You do not have permission to view performance metrics."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        return Response(performance_registry.report(), status=status.HTTP_200_OK)
+
+    def delete(self, request, *args, **kwargs):
+        if request.user.role != "Admin":
+            return Response(
+                {"detail": "You do not have permission to reset performance metrics."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        performance_registry.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class AuditLogPagination(CursorPagination):
+    page_size = 100
+    ordering = ("-occurred_at", "-id")
+
+
+def _parse_moment(value, param):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValidationError({param: "Use an ISO date or datetime."})
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class AuditLogAPIView(generics.ListAPIView):
+    """
+    Audit log entries within a time window (``since``/``until``, default the last day).
+
+    Every query is bounded to at most AUDIT_QUERY_MAX_DAYS and names the monthly
+    partitions of its window, so it only reads that slice of the indexes,
+    however large the table grows.
+    """
+    serializer_class = UserActionSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = AuditLogPagination
+
+    def get_queryset(self):
+        if self.request.user.role != "Admin":
+            raise PermissionDenied("You do not have permission to view the audit log.")
+
+        params = self.request.query_params
+        until = _parse_moment(params["until"], "until") if params.get("until") else timezone.now()
+        since = _parse_moment(params["since"], "since") if params.get("since") else until - timedelta(days=1)
+        if since > until:
+            raise ValidationError({"since": "Must be before until."})
+        if until - since > timedelta(days=settings.AUDIT_QUERY_MAX_DAYS):
+            raise ValidationError({"since": f"The window may not exceed {settings.AUDIT_QUERY_MAX_DAYS} days."})
+
+        queryset = UserAction.objects.filter(
+            partition_month__in=partition_months(since, until), occurred_at__gte=since, occurred_at__lt=until
+        )
+        if params.get("actor"):
+            queryset = queryset.filter(actor_id=params["actor"])
+        if params.get("object_type"):
+            queryset = queryset.filter(object_type=params["object_type"])
+            if params.get("object_id"):
+                queryset = queryset.filter(object_id=params["object_id"])
+        if params.get("action_type"):
+            queryset = queryset.filter(action_type=params["action_type"])
+        return queryset
+
+
+class ArchiveAPIView(APIView):
+    """
+    Rows moved out of an archived table, e.g. the old status history of a policy:
+    ``?model=policies.policystatusupdate&key=policy:12``, optionally within
+    ``since``/``until``. At most ARCHIVE_QUERY_MAX_ROWS rows are returned.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        if request.user.role != "Admin":
+            return Response(
+                {"detail": "You do not have permission to view archived records."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        params = request.query_params
+        model_label = params.get("model")
+        if model_label not in ARCHIVED_TABLES_BY_LABEL:
+            return Response(
+                {"model": f"Choose one of: {', '.join(ARCHIVED_TABLES_BY_LABEL)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        since = _parse_moment(params["since"], "since") if params.get("since") else None
+        until = _parse_moment(params["until"], "until") if params.get("until") else None
+
+        rows = []
+        for row in find_archived(model_label, key=params.get("key"), since=since, until=until):
+            if len(rows) == settings.ARCHIVE_QUERY_MAX_ROWS:
+                break
+            rows.append(row)
+        return Response({"count": len(rows), "results": rows}, status=status.HTTP_200_OK)
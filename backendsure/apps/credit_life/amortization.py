@@ -0,0 +1,280 @@
+"""
+Declining-term credit life cover, recomputed from each loan's amortization.
+
+A credit life policy covers what the member still owes a creditor. A loan of
+``loan_amount`` taken out on ``date_registered`` (or the policy start date)
+is repaid in ``term_months`` equal monthly instalments at ``interest_rate``
+percent a year. After ``k`` instalments the balance is
+
+    loan_amount * ((1 + r)^n - (1 + r)^k) / ((1 + r)^n - 1),   r = rate / 1200
+
+or ``loan_amount * (1 - k / n)`` for interest free loans.
+
+Declining-term cover follows that balance; level-term cover stays at the
+cover sold until the term ends, so runs are meant to move forward in time.
+Either way there is no cover after the last instalment. The premium is ``premium_rate`` times the cover, and the rate is
+fixed when the loan is sold (or, for older loans, on their first run) as the
+premium over the cover at that time.
+
+``CreditLifeAmortizer`` recomputes every creditor as of a date, one chunk of
+creditors at a time. It does the arithmetic on NumPy arrays, in whole cents,
+and stages the rows that changed in ``CreditorAmortization``. From there they
+are applied with one UPDATE for the creditors, one for their memberships and
+one for their policies. The changes in cover and premium are added to the
+``Membership`` and ``Policy`` totals as increments, in the same transaction as
+the creditors they come from. A run can therefore be repeated or resumed for
+the same date, and it leaves every other part of those totals, such as the
+member's own premium, as it was.
+``python manage.py amortize_credit_life`` runs it monthly.
+"""
+import calendar
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+import logging
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F, OuterRef, QuerySet, Subquery, Sum
+
+from apps.credit_life.models import Creditor, CreditorAmortization
+from apps.policies.models import Policy
+from apps.users.models import Membership
+
+logger = logging.getLogger(__name__)
+
+
+def instalments_paid(starts: np.ndarray, as_of: date) -> np.ndarray:
+    """
+    Whole months from each loan start (datetime64[D]) to ``as_of``. An
+    instalment falls due on the start day, or on the last day of a month that
+    is too short, as in ``schedule``.
+    """
+    as_of_day = np.datetime64(as_of, "D")
+    months = (as_of_day.astype("datetime64[M]") - starts.astype("datetime64[M]")).astype(np.int64)
+    start_day = (starts - starts.astype("datetime64[M]")).astype(np.int64)
+    as_of_day_of_month = int((as_of_day - as_of_day.astype("datetime64[M]")).astype(np.int64))
+    last_day_of_month = calendar.monthrange(as_of.year, as_of.month)[1] - 1
+    return months - (as_of_day_of_month < np.minimum(start_day, last_day_of_month))
+
+
+def balances(principal: np.ndarray, annual_rate: np.ndarray, term_months: np.ndarray, paid: np.ndarray) -> np.ndarray:
+    """Balance of each loan after ``paid`` of its ``term_months`` equal instalments."""
+    term = np.maximum(term_months, 1).astype(np.float64)
+    paid = np.clip(paid, 0, term)
+    monthly = annual_rate / 1200
+    growth_term = np.power(1 + monthly, term)
+    growth_paid = np.power(1 + monthly, paid)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annuity = principal * (growth_term - growth_paid) / (growth_term - 1)
+    return np.where(monthly > 0, annuity, principal * (1 - paid / term))
+
+
+def _add_months(start: date, months: int) -> date:
+    month = start.month - 1 + months
+    year, month = start.year + month // 12, month % 12 + 1
+    return date(year, month, min(start.day, calendar.monthrange(year, month)[1]))
+
+
+def _cents(values: List[Any]) -> np.ndarray:
+    return np.round(np.array(values, dtype=np.float64) * 100).astype(np.int64)
+
+
+def _decimal(cents: int) -> Decimal:
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def loan_start(creditor: Creditor) -> Optional[date]:
+    return creditor.date_registered or creditor.policy.start_date
+
+
+def schedule(creditor: Creditor) -> Dict[str, Any]:
+    """Month by month repayments, cover and premium of one creditor's loan."""
+    start = loan_start(creditor)
+    term = max(creditor.term_months, 1)
+    principal = float(creditor.loan_amount or creditor.outstanding_balance)
+    rate = float(creditor.interest_rate)
+    months = np.arange(term + 1)
+    balance = np.round(balances(np.full(term + 1, principal), np.full(term + 1, rate), np.full(term + 1, term), months), 2)
+
+    premium_rate = float(_premium_rate(creditor))
+    cover = balance if creditor.declining_term else np.where(months < term, float(_cover(creditor)), 0)
+    monthly = rate / 1200
+    instalment = principal * monthly / (1 - (1 + monthly) ** -term) if monthly else principal / term
+
+    rows = []
+    for k in months.tolist():
+        interest = round(float(balance[k - 1]) * monthly, 2) if k else 0.0
+        principal_paid = round(float(balance[k - 1] - balance[k]), 2) if k else 0.0
+        rows.append({
+            "instalment": k,
+            "due_date": _add_months(start, k) if start else None,
+            "payment": round(interest + principal_paid, 2) if k else 0.0,
+            "interest": interest,
+            "principal": principal_paid,
+            "balance": float(balance[k]),
+            "cover": round(float(cover[k]), 2),
+            "premium": round(float(cover[k]) * premium_rate, 2) if k < term else 0.0,
+        })
+    return {"instalment_amount": round(instalment, 2), "rows": rows}
+
+
+def _cover(creditor: Creditor) -> Decimal:
+    """Current cover; loans sold before cover was tracked are covered for their balance."""
+    return creditor.outstanding_balance if creditor.cover_amount is None else creditor.cover_amount
+
+
+def _premium_rate(creditor: Creditor) -> Decimal:
+    if creditor.premium_rate is not None:
+        return creditor.premium_rate
+    cover = _cover(creditor)
+    return creditor.premium / cover if cover else Decimal("0")
+
+
+@dataclass
+class AmortizationResult:
+    as_of: date
+    creditors: int
+    creditors_updated: int
+    memberships_updated: int
+    policies_updated: int
+
+
+class CreditLifeAmortizer:
+    """Brings the outstanding balance, cover and premium of every creditor up to ``as_of``."""
+
+    CHUNK_SIZE = 5000
+    FIELDS = (
+        "id", "membership_id", "policy_id", "loan_amount", "outstanding_balance", "premium", "premium_rate",
+        "cover_amount", "cover_as_of", "interest_rate", "term_months", "declining_term", "date_registered",
+        "policy__start_date",
+    )
+
+    def __init__(self, as_of: date, chunk_size: int = CHUNK_SIZE) -> None:
+        self.as_of = as_of
+        self.chunk_size = chunk_size
+
+    def execute(self) -> AmortizationResult:
+        result = AmortizationResult(self.as_of, 0, 0, 0, 0)
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                rows = list(
+                    Creditor.objects.select_for_update().filter(id__gt=last_id).order_by("id")
+                    .values_list(*self.FIELDS)[:self.chunk_size]
+                )
+                if not rows:
+                    break
+                updated, memberships, policies = self._amortize(rows)
+            result.creditors += len(rows)
+            result.creditors_updated += updated
+            result.memberships_updated += memberships
+            result.policies_updated += policies
+            last_id = rows[-1][0]
+
+        logger.info(
+            f"Credit life amortization as of {self.as_of}: {result.creditors_updated} of "
+            f"{result.creditors} creditors updated"
+        )
+        return result
+
+    def _amortize(self, rows: List[tuple]) -> tuple:
+        (ids, memberships, policies, loan_amounts, outstanding, premiums, premium_rates, covers, covered_as_of,
+         interest_rates, terms, declining, registered, policy_starts) = (list(column) for column in zip(*rows))
+
+        outstanding_cents = _cents(outstanding)
+        premium_cents = _cents(premiums)
+        first_run = np.array([value is None for value in covered_as_of])
+        # Loans sold before cover was tracked are covered for their balance.
+        cover_cents = np.where(
+            np.array([value is None for value in covers]), outstanding_cents,
+            _cents([0 if value is None else value for value in covers]),
+        )
+        rates = np.array([np.nan if value is None else float(value) for value in premium_rates])
+        missing_rate = np.isnan(rates)
+        rates[missing_rate] = np.divide(
+            premium_cents, cover_cents, out=np.zeros(len(rows)), where=cover_cents > 0
+        )[missing_rate]
+
+        starts = np.array(
+            [start or policy_start for start, policy_start in zip(registered, policy_starts)], dtype="datetime64[D]"
+        )
+        terms = np.maximum(np.array(terms, dtype=np.int64), 1)
+        paid = np.where(np.isnat(starts), 0, instalments_paid(starts, self.as_of))
+        principal = np.where(np.array(loan_amounts, dtype=np.float64) > 0,
+                             np.array(loan_amounts, dtype=np.float64), outstanding_cents / 100)
+        new_outstanding = np.round(
+            balances(principal, np.array(interest_rates, dtype=np.float64), terms, paid) * 100
+        ).astype(np.int64)
+        # Without a start date there is no schedule to follow.
+        new_outstanding = np.where(np.isnat(starts), outstanding_cents, new_outstanding)
+
+        in_term = paid < terms
+        declining = np.array(declining, dtype=bool)
+        # Level-term cover is the cover sold, which stays the current cover
+        # until the term ends.
+        new_cover = np.where(in_term, np.where(declining, new_outstanding, cover_cents), 0)
+        new_premium = np.round(new_cover * rates).astype(np.int64)
+
+        changed = (
+            first_run | missing_rate
+            | (new_outstanding != outstanding_cents) | (new_cover != cover_cents) | (new_premium != premium_cents)
+        )
+        cover_change = new_cover - cover_cents
+        premium_change = new_premium - premium_cents
+        index = np.flatnonzero(changed)
+        CreditorAmortization.objects.bulk_create(
+            [
+                CreditorAmortization(
+                    creditor_id=ids[i],
+                    membership_id=memberships[i],
+                    policy_id=policies[i],
+                    outstanding_balance=_decimal(new_outstanding[i]),
+                    cover_amount=_decimal(new_cover[i]),
+                    premium=_decimal(new_premium[i]),
+                    premium_rate=Decimal(repr(float(rates[i]))).quantize(Decimal("1e-10")),
+                    cover_change=_decimal(cover_change[i]),
+                    premium_change=_decimal(premium_change[i]),
+                )
+                for i in index.tolist()
+            ],
+            batch_size=1000,
+        )
+        # The chunk is a contiguous id range, which keeps the statements below small.
+        staged = CreditorAmortization.objects.filter(pk__gte=ids[0], pk__lte=ids[-1])
+
+        def staged_value(field):
+            return Subquery(staged.filter(creditor_id=OuterRef("pk")).values(field)[:1])
+
+        Creditor.objects.filter(id__in=staged.values("creditor_id")).update(
+            outstanding_balance=staged_value("outstanding_balance"),
+            cover_amount=staged_value("cover_amount"),
+            premium=staged_value("premium"),
+            premium_rate=staged_value("premium_rate"),
+            cover_as_of=self.as_of,
+        )
+        memberships_updated = self._apply_changes(
+            Membership, "membership", staged,
+            cover_fields=("main_member_cover_amount", "total_cover_amount"),
+            premium_fields=("main_member_premium", "total_premium"),
+        )
+        policies_updated = self._apply_changes(
+            Policy, "policy", staged, cover_fields=("cover_amount",), premium_fields=("premium",),
+        )
+        staged.delete()
+        return len(index), memberships_updated, policies_updated
+
+    @staticmethod
+    def _apply_changes(model, owner: str, staged: QuerySet, cover_fields: tuple, premium_fields: tuple) -> int:
+        """Add the staged cover and premium changes of each membership or policy to its totals."""
+        changes = staged.exclude(cover_change=0, premium_change=0)
+        per_owner = changes.filter(**{owner: OuterRef("pk")}).order_by().values(owner)
+
+        def total(field):
+            return Subquery(per_owner.annotate(total=Sum(field)).values("total")[:1])
+
+        return model.objects.filter(id__in=changes.values(owner)).update(
+            **{field: F(field) + total("cover_change") for field in cover_fields},
+            **{field: F(field) + total("premium_change") for field in premium_fields},
+        )
@@ -0,0 +1,25 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.credit_life.amortization import CreditLifeAmortizer
+
+
+class Command(BaseCommand):
+    help = (
+        "Bring the outstanding balance, cover and premium of every credit life loan up to a date "
+        "and adjust membership and policy totals (run monthly). Safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--as-of", type=date.fromisoformat, help="Date to amortize to (defaults to today)")
+        parser.add_argument("--chunk-size", type=int, default=CreditLifeAmortizer.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        as_of = options["as_of"] or timezone.localdate()
+        result = CreditLifeAmortizer(as_of=as_of, chunk_size=options["chunk_size"]).execute()
+        self.stdout.write(self.style.SUCCESS(
+            f"{result.as_of}: {result.creditors_updated} of {result.creditors} creditors updated, "
+            f"{result.memberships_updated} memberships and {result.policies_updated} policies adjusted"
+        ))
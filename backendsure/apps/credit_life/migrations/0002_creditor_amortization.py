@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:22
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_life', '0001_initial'),
+        ('policies', '0015_policy_policy_document_hash'),
+        ('users', '0011_user_identity_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='creditor',
+            name='cover_amount',
+            field=models.DecimalField(decimal_places=2, max_digits=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='creditor',
+            name='cover_as_of',
+            field=models.DateField(null=True),
+        ),
+        migrations.AddField(
+            model_name='creditor',
+            name='interest_rate',
+            field=models.DecimalField(decimal_places=4, default=Decimal('0'), help_text='Annual interest rate in percent', max_digits=7),
+        ),
+        migrations.AddField(
+            model_name='creditor',
+            name='premium_rate',
+            field=models.DecimalField(decimal_places=10, max_digits=20, null=True),
+        ),
+        migrations.CreateModel(
+            name='CreditorAmortization',
+            fields=[
+                ('creditor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='credit_life.creditor')),
+                ('outstanding_balance', models.DecimalField(decimal_places=2, max_digits=100)),
+                ('cover_amount', models.DecimalField(decimal_places=2, max_digits=100)),
+                ('premium', models.DecimalField(decimal_places=2, max_digits=100)),
+                ('premium_rate', models.DecimalField(decimal_places=10, max_digits=20)),
+                ('cover_change', models.DecimalField(decimal_places=2, max_digits=100)),
+                ('premium_change', models.DecimalField(decimal_places=2, max_digits=100)),
+                ('membership', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.membership')),
+                ('policy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='policies.policy')),
+            ],
+        ),
+    ]
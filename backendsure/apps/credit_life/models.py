@@ -20,6 +20,32 @@ class Creditor(AbstractBaseModel):
     premium = models.DecimalField(max_digits=100, decimal_places=2, default=Decimal('0'))
     term_months = models.IntegerField(default=1)
     declining_term = models.BooleanField(default=True)
+    interest_rate = models.DecimalField(max_digits=7, decimal_places=4, default=Decimal('0'), help_text="Annual interest rate in percent")
+    # Kept current by apps.credit_life.amortization; the premium is
+    # premium_rate times the cover.
+    cover_amount = models.DecimalField(max_digits=100, decimal_places=2, null=True)
+    premium_rate = models.DecimalField(max_digits=20, decimal_places=10, null=True)
+    cover_as_of = models.DateField(null=True)
     
     def __str__(self):
         return self.creditor_name
+
+
+class CreditorAmortization(models.Model):
+    """
+    A creditor's figures staged by an amortization run, so they can be applied
+    to creditors, memberships and policies in a few set-based UPDATEs; the rows
+    only live within the run's transaction.
+    """
+    creditor = models.OneToOneField(Creditor, on_delete=models.CASCADE, primary_key=True, related_name="+")
+    membership = models.ForeignKey("users.Membership", on_delete=models.CASCADE, related_name="+")
+    policy = models.ForeignKey("policies.Policy", on_delete=models.CASCADE, related_name="+")
+    outstanding_balance = models.DecimalField(max_digits=100, decimal_places=2)
+    cover_amount = models.DecimalField(max_digits=100, decimal_places=2)
+    premium = models.DecimalField(max_digits=100, decimal_places=2)
+    premium_rate = models.DecimalField(max_digits=20, decimal_places=10)
+    cover_change = models.DecimalField(max_digits=100, decimal_places=2)
+    premium_change = models.DecimalField(max_digits=100, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.creditor_id}: {self.cover_amount}"
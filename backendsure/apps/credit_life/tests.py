@@ -1,3 +1,85 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from apps.core import reference_data
+from apps.credit_life.amortization import _add_months, balances, instalments_paid
+from apps.credit_life.models import Creditor
+from apps.payments.models import Premium
+from apps.policies.models import Policy
+from apps.products.models import PolicyNumberSequence, Product
+from apps.sales.credit_life_purchase.credit_life_purchase import CreditLifePolicyPurchaseService
+from apps.schemes.models import Scheme
+from apps.users.models import Membership
+
+
+@override_settings(REFERENCE_DATA_POLL_SECONDS=3600)
+class CreditLifePurchaseTests(TestCase):
+    def setUp(self):
+        scheme = Scheme.objects.create(name="Credit Life", scheme_type="Individual")
+        self.product = Product.objects.create(name="Credit Life", scheme=scheme, policy_number_prefix="CRL")
+        PolicyNumberSequence.objects.create(product=self.product)
+        reference_data.reference_data.clear()
+        reference_data.product(self.product.id)
+
+    def purchase(self, email, creditors):
+        return {
+            "product": self.product.id,
+            "start_date": "2026-02-01",
+            "members": [{"first_name": "C", "last_name": "L", "email": email, "premium": 5, "cover_amount": 0}],
+            "creditors": [
+                {"creditor_name": f"Bank{i}", "outstanding_balance": 1000 * (i + 1), "premium": 10 * (i + 1)}
+                for i in range(creditors)
+            ],
+            "payment_details": {"bank_name": "Y"},
+        }
+
+    def test_query_count_does_not_grow_with_creditors(self):
+        with self.assertNumQueries(16):
+            CreditLifePolicyPurchaseService(self.purchase("one@example.com", 1)).execute()
+        with self.assertNumQueries(16):
+            result = CreditLifePolicyPurchaseService(self.purchase("four@example.com", 4)).execute()
+
+        policy = Policy.objects.get(id=result["policy_id"])
+        membership = Membership.objects.get(id=result["membership_id"])
+        self.assertEqual(policy.premium, Decimal("100"))
+        self.assertEqual(policy.cover_amount, Decimal("10000"))
+        self.assertEqual(membership.main_member_premium, Decimal("105"))
+        self.assertEqual(membership.total_premium, Decimal("100"))
+        self.assertEqual(Creditor.objects.filter(membership=membership).count(), 4)
+        self.assertEqual(Premium.objects.get(policy=policy).expected_amount, Decimal("100"))
+
+
+class AmortizationTests(SimpleTestCase):
+    def test_balance_follows_the_repayments(self):
+        principal, monthly_rate, term = 12000.0, 0.01, 12
+        instalment = principal * monthly_rate / (1 - (1 + monthly_rate) ** -term)
+        expected = [principal]
+        for _ in range(term):
+            expected.append(expected[-1] * (1 + monthly_rate) - instalment)
+
+        paid = np.arange(term + 1)
+        result = balances(np.full(term + 1, principal), np.full(term + 1, 12.0), np.full(term + 1, term), paid)
+
+        np.testing.assert_allclose(result, expected, atol=1e-6)
+
+    def test_interest_free_loans_decline_evenly_and_stop_at_the_term(self):
+        result = balances(np.full(4, 1200.0), np.zeros(4), np.full(4, 12), np.array([-1, 3, 12, 15]))
+        np.testing.assert_allclose(result, [1200, 900, 0, 0])
+
+    def test_instalment_falls_due_on_the_start_day_of_each_month(self):
+        starts = np.array(["2026-01-31", "2026-01-15", "2025-02-28"], dtype="datetime64[D]")
+        self.assertEqual(instalments_paid(starts, date(2026, 2, 14)).tolist(), [0, 0, 11])
+        # A loan taken out on the 31st pays on the last day of shorter months.
+        self.assertEqual(instalments_paid(starts, date(2026, 2, 27)).tolist(), [0, 1, 11])
+        self.assertEqual(instalments_paid(starts, date(2026, 2, 28)).tolist(), [1, 1, 12])
+        self.assertEqual(instalments_paid(starts, date(2026, 3, 30)).tolist(), [1, 2, 13])
+        self.assertEqual(instalments_paid(starts, date(2026, 3, 31)).tolist(), [2, 2, 13])
+
+    def test_paid_instalments_match_the_schedule_due_dates(self):
+        start = date(2026, 1, 31)
+        due_dates = [_add_months(start, k) for k in range(1, 13)]
+        for k, due in enumerate(due_dates, start=1):
+            self.assertEqual(instalments_paid(np.array([start], dtype="datetime64[D]"), due).tolist(), [k], due)
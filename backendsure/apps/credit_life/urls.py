@@ -0,0 +1,7 @@
+from django.urls import path
+
+from apps.credit_life.views import CreditorScheduleAPIView
+
+urlpatterns = [
+    path("creditors/<int:pk>/schedule/", CreditorScheduleAPIView.as_view(), name="creditor-schedule"),
+]
@@ -1,3 +1,36 @@
-from django.shortcuts import render
+from django.utils import timezone
+from rest_framework import generics
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
-# Create your views here.
+from apps.credit_life.amortization import schedule
+from apps.credit_life.models import Creditor
+
+
+class CreditorScheduleAPIView(generics.RetrieveAPIView):
+    """Repayment schedule of a creditor's loan, with the cover and premium of every month."""
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = Creditor.objects.select_related("policy")
+        if self.request.user.role != "Admin":
+            queryset = queryset.filter(membership__user=self.request.user)
+        return queryset
+
+    def retrieve(self, request, *args, **kwargs):
+        creditor = self.get_object()
+        return Response({
+            "creditor": creditor.id,
+            "creditor_name": creditor.creditor_name,
+            "loan_reference": creditor.loan_reference,
+            "loan_amount": creditor.loan_amount,
+            "interest_rate": creditor.interest_rate,
+            "term_months": creditor.term_months,
+            "declining_term": creditor.declining_term,
+            "outstanding_balance": creditor.outstanding_balance,
+            "cover_amount": creditor.cover_amount,
+            "premium": creditor.premium,
+            "cover_as_of": creditor.cover_as_of,
+            "today": timezone.localdate(),
+            **schedule(creditor),
+        })
@@ -0,0 +1,9 @@
+from django.contrib import admin
+
+from apps.documents.models import DocumentBatch
+
+# Register your models here.
+@admin.register(DocumentBatch)
+class DocumentBatchAdmin(admin.ModelAdmin):
+    list_display = ["id", "document_type", "scheme", "policy", "status", "total", "generated", "skipped", "failed", "created_at"]
+    list_filter = ["document_type", "status"]
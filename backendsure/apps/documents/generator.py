@@ -0,0 +1,276 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.db.models import Count, F, Model, QuerySet
+from django.template import loader
+from django.utils import timezone
+
+from apps.core.constants import DocumentTypes, DocumentBatchStatuses
+from apps.documents.models import DocumentBatch
+from apps.documents.renderer import init_worker, render_document
+from apps.policies.models import Policy
+from apps.users.models import Membership
+
+logger = logging.getLogger(__name__)
+
+
+def _display(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, Decimal):
+        return f"{value:,.2f}"
+    return str(value)
+
+
+class DocumentSource:
+    """What to render for one document type, and where the result is stored."""
+    template_name: str
+    model: type
+    file_field: str
+    hash_field: str
+
+    def queryset(self, batch: DocumentBatch) -> QuerySet:
+        raise NotImplementedError
+
+    def context(self, instance: Model) -> Dict[str, str]:
+        raise NotImplementedError
+
+    def file_name(self, instance: Model, content_hash: str) -> str:
+        raise NotImplementedError
+
+
+class PolicyScheduleSource(DocumentSource):
+    template_name = "documents/policy_schedule.html"
+    model = Policy
+    file_field = "policy_document"
+    hash_field = "policy_document_hash"
+
+    def queryset(self, batch: DocumentBatch) -> QuerySet:
+        policies = Policy.objects.all()
+        if batch.policy_id:
+            policies = policies.filter(id=batch.policy_id)
+        if batch.scheme_id:
+            policies = policies.filter(product__scheme_id=batch.scheme_id)
+        return (
+            policies
+            .select_related("product__scheme", "policy_owner")
+            .annotate(member_count=Count("policymemberships"))
+        )
+
+    def context(self, policy: Policy) -> Dict[str, str]:
+        owner = policy.policy_owner
+        product = policy.product
+        return {
+            "title": f"Policy Schedule {policy.policy_number}",
+            "issuer": settings.DOCUMENT_ISSUER_NAME,
+            "policy_number": policy.policy_number,
+            "product": product.name if product else "",
+            "scheme": product.scheme.name if product else "",
+            "policy_owner": policy.policy_owner_name(),
+            "owner_email": owner.email if owner else "",
+            "owner_phone": _display(owner.phone_number) if owner else "",
+            "owner_id_number": _display(owner.id_number) if owner else "",
+            "status": policy.status,
+            "start_date": _display(policy.start_date),
+            "maturity_date": _display(policy.maturity_date),
+            "premium": _display(policy.premium),
+            "cover_amount": _display(policy.cover_amount),
+            "payment_method": policy.payment_method,
+            "members": _display(policy.member_count),
+        }
+
+    def file_name(self, policy: Policy, content_hash: str) -> str:
+        return f"policy_documents/{policy.id}/schedule-{content_hash[:16]}.pdf"
+
+
+class MembershipCertificateSource(DocumentSource):
+    template_name = "documents/membership_certificate.html"
+    model = Membership
+    file_field = "membership_certificate"
+    hash_field = "membership_certificate_hash"
+
+    def queryset(self, batch: DocumentBatch) -> QuerySet:
+        memberships = Membership.objects.all()
+        if batch.policy_id:
+            memberships = memberships.filter(policy_id=batch.policy_id)
+        if batch.scheme_id:
+            memberships = memberships.filter(scheme_group__scheme_id=batch.scheme_id)
+        return memberships.select_related("user", "policy__product", "scheme_group__scheme")
+
+    def context(self, membership: Membership) -> Dict[str, str]:
+        user = membership.user
+        policy = membership.policy
+        return {
+            "title": f"Membership Certificate {policy.policy_number}-{membership.id}",
+            "issuer": settings.DOCUMENT_ISSUER_NAME,
+            "certificate_number": f"{policy.policy_number}-{membership.id}",
+            "member_name": user.get_full_name() or user.username,
+            "member_id_number": _display(user.id_number),
+            "policy_number": policy.policy_number,
+            "product": policy.product.name if policy.product else "",
+            "scheme": membership.scheme_group.scheme.name,
+            "status": membership.status,
+            "start_date": _display(policy.start_date),
+            "main_member_cover_amount": _display(membership.main_member_cover_amount),
+            "dependent_cover_amount": _display(membership.dependent_cover_amount),
+            "total_cover_amount": _display(membership.total_cover_amount),
+            "total_premium": _display(membership.total_premium),
+        }
+
+    def file_name(self, membership: Membership, content_hash: str) -> str:
+        return f"membership_certificates/{membership.id}/certificate-{content_hash[:16]}.pdf"
+
+
+DOCUMENT_SOURCES = {
+    DocumentTypes.POLICY_SCHEDULE.value: PolicyScheduleSource(),
+    DocumentTypes.MEMBERSHIP_CERTIFICATE.value: MembershipCertificateSource(),
+}
+
+
+@dataclass
+class _PendingDocument:
+    instance: Model
+    context: Dict[str, str]
+    content_hash: str
+
+
+class DocumentGenerator:
+    """
+    Renders the documents of a batch to PDF across a pool of worker processes.
+
+    The parent process reads the rows in chunks and builds each document's
+    context; the workers only render. A document whose template and context
+    hash to the value stored alongside its file is skipped, so re-running a
+    scheme only renders what actually changed. Progress is written to the
+    batch after every chunk.
+    """
+
+    def __init__(
+        self,
+        batch: DocumentBatch,
+        workers: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        object_ids: Optional[List[int]] = None,
+    ) -> None:
+        self.batch = batch
+        self.source = DOCUMENT_SOURCES[batch.document_type]
+        self.object_ids = object_ids
+        self.workers = settings.DOCUMENT_GENERATION_WORKERS if workers is None else workers
+        self.chunk_size = chunk_size or settings.DOCUMENT_GENERATION_CHUNK_SIZE
+        self.template_hash = hashlib.sha256(
+            loader.get_template(self.source.template_name).template.source.encode()
+        ).hexdigest()
+
+    def execute(self) -> DocumentBatch:
+        batch = self.batch
+        queryset = self.source.queryset(batch)
+        if self.object_ids is not None:
+            queryset = queryset.filter(id__in=self.object_ids)
+        batch.status = DocumentBatchStatuses.RUNNING.value
+        batch.total = queryset.count()
+        batch.generated = batch.skipped = batch.failed = 0
+        batch.started_at = timezone.now()
+        batch.save(update_fields=["status", "total", "generated", "skipped", "failed", "started_at", "updated_at"])
+
+        executor = None
+        try:
+            if self.workers > 1:
+                # Forked workers must not share the parent's open database connections.
+                connections.close_all()
+                executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker)
+            for chunk in self._chunks(queryset):
+                self._process_chunk(chunk, executor)
+        except Exception as e:
+            logger.exception(f"Document batch {batch.id} failed")
+            batch.status = DocumentBatchStatuses.FAILED.value
+            batch.error = str(e)
+        else:
+            batch.status = DocumentBatchStatuses.COMPLETED.value
+        finally:
+            if executor:
+                executor.shutdown()
+
+        batch.finished_at = timezone.now()
+        batch.save(update_fields=["status", "error", "finished_at", "updated_at"])
+        logger.info(
+            f"Document batch {batch.id}: {batch.generated} generated, {batch.skipped} skipped, {batch.failed} failed"
+        )
+        return batch
+
+    def content_hash(self, context: Dict[str, str]) -> str:
+        payload = json.dumps({"template": self.template_hash, "context": context}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def is_current(self, instance: Model, content_hash: Optional[str] = None) -> bool:
+        """Whether the stored file of ``instance`` was rendered from its current template and context."""
+        if content_hash is None:
+            content_hash = self.content_hash(self.source.context(instance))
+        return bool(getattr(instance, self.source.file_field)) and getattr(instance, self.source.hash_field) == content_hash
+
+    def _chunks(self, queryset: QuerySet) -> Iterator[List[Model]]:
+        last_id = 0
+        while True:
+            chunk = list(queryset.filter(id__gt=last_id).order_by("id")[:self.chunk_size])
+            if not chunk:
+                return
+            yield chunk
+            last_id = chunk[-1].id
+
+    def _process_chunk(self, chunk: List[Model], executor: Optional[ProcessPoolExecutor]) -> None:
+        source = self.source
+        pending: Dict[int, _PendingDocument] = {}
+        skipped = 0
+        for instance in chunk:
+            context = self.source.context(instance)
+            content_hash = self.content_hash(context)
+            if not self.batch.force and self.is_current(instance, content_hash):
+                skipped += 1
+                continue
+            pending[instance.id] = _PendingDocument(instance, context, content_hash)
+
+        jobs = [(object_id, source.template_name, document.context) for object_id, document in pending.items()]
+        if executor:
+            rendered = executor.map(render_document, jobs, chunksize=max(1, len(jobs) // (self.workers * 4)))
+        else:
+            rendered = map(render_document, jobs)
+
+        updated: List[Model] = []
+        stale_files: List[str] = []
+        failed = 0
+        for object_id, pdf, error in rendered:
+            document = pending[object_id]
+            if error:
+                failed += 1
+                logger.error(f"Failed to render {source.template_name} for {source.model.__name__} {object_id}: {error}")
+                continue
+            instance = document.instance
+            previous = getattr(instance, source.file_field)
+            if previous:
+                stale_files.append(previous.name)
+            name = default_storage.save(source.file_name(instance, document.content_hash), ContentFile(pdf))
+            setattr(instance, source.file_field, name)
+            setattr(instance, source.hash_field, document.content_hash)
+            updated.append(instance)
+
+        if updated:
+            source.model.objects.bulk_update(updated, [source.file_field, source.hash_field])
+        for name in stale_files:
+            default_storage.delete(name)
+
+        DocumentBatch.objects.filter(id=self.batch.id).update(
+            generated=F("generated") + len(updated),
+            skipped=F("skipped") + skipped,
+            failed=F("failed") + failed,
+        )
+        self.batch.generated += len(updated)
+        self.batch.skipped += skipped
+        self.batch.failed += failed
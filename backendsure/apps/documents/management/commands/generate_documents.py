@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.constants import DocumentTypes, DocumentBatchStatuses
+from apps.documents.generator import DocumentGenerator
+from apps.documents.models import DocumentBatch
+
+
+class Command(BaseCommand):
+    help = "Render queued document batches, or a new batch for a scheme or policy, to PDF."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--type", choices=[t.value for t in DocumentTypes], help="Document type for a new batch")
+        parser.add_argument("--scheme", type=int, help="Scheme id for a new batch")
+        parser.add_argument("--policy", type=int, help="Policy id for a new batch")
+        parser.add_argument("--force", action="store_true", help="Re-render documents whose inputs are unchanged")
+        parser.add_argument("--workers", type=int, help="Overrides DOCUMENT_GENERATION_WORKERS")
+
+    def handle(self, *args, **options):
+        if options["type"]:
+            if not options["scheme"] and not options["policy"]:
+                raise CommandError("--type needs a --scheme or --policy")
+            batches = [DocumentBatch.objects.create(
+                document_type=options["type"],
+                scheme_id=options["scheme"],
+                policy_id=options["policy"],
+                force=options["force"],
+            )]
+        else:
+            batches = list(DocumentBatch.objects.filter(status=DocumentBatchStatuses.PENDING.value).order_by("id"))
+
+        for batch in batches:
+            # Claim the batch so overlapping runs do not render it twice.
+            claimed = DocumentBatch.objects.filter(
+                id=batch.id, status=DocumentBatchStatuses.PENDING.value
+            ).update(status=DocumentBatchStatuses.RUNNING.value)
+            if not claimed:
+                continue
+            batch = DocumentGenerator(batch, workers=options["workers"]).execute()
+            self.stdout.write(self.style.SUCCESS(
+                f"{batch}: {batch.generated} generated, {batch.skipped} skipped, {batch.failed} failed"
+            ))
@@ -0,0 +1,31 @@
+from django.db import models
+
+from apps.core.models import AbstractBaseModel
+from apps.core.constants import DocumentTypes, DocumentBatchStatuses
+# Create your models here.
+class DocumentBatch(AbstractBaseModel):
+    """A run of policy schedules or membership certificates for a scheme or a single policy."""
+    document_type = models.CharField(max_length=255, choices=DocumentTypes.choices())
+    scheme = models.ForeignKey("schemes.Scheme", on_delete=models.CASCADE, null=True, blank=True)
+    policy = models.ForeignKey("policies.Policy", on_delete=models.CASCADE, null=True, blank=True)
+    requested_by = models.ForeignKey("users.User", on_delete=models.SET_NULL, null=True, blank=True)
+    force = models.BooleanField(default=False)
+    status = models.CharField(max_length=255, choices=DocumentBatchStatuses.choices(), default=DocumentBatchStatuses.PENDING.value)
+    total = models.IntegerField(default=0)
+    generated = models.IntegerField(default=0)
+    skipped = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.document_type} batch #{self.id} ({self.status})"
+
+    @property
+    def processed(self):
+        return self.generated + self.skipped + self.failed
+
+    @property
+    def progress(self):
+        return round(100 * self.processed / self.total, 1) if self.total else 0.0
@@ -0,0 +1,157 @@
+"""
+PDF rendering for generated documents.
+
+Templates live under ``templates/documents`` and use a small HTML subset that
+maps onto ReportLab flowables: ``h1``/``h2`` headings, ``p`` paragraphs (with
+``b``/``i``/``br`` inline) and ``table``/``tr``/``th``/``td`` key-value tables.
+
+Everything here runs inside the generation worker processes. Compiled templates,
+the stylesheet and the logo are loaded once per worker and reused for every
+document that worker renders.
+"""
+from functools import lru_cache
+from html import escape
+from html.parser import HTMLParser
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Tuple
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.template import loader
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+
+INLINE_TAGS = {"b": "b", "strong": "b", "i": "i", "em": "i"}
+BLOCK_STYLES = {"h1": "Title", "h2": "Heading2", "p": "BodyText"}
+
+_templates: Dict[str, Any] = {}
+
+
+def init_worker() -> None:
+    """Process pool initializer; spawned workers need Django set up before rendering."""
+    if not apps.ready:
+        django.setup()
+
+
+def get_template(template_name: str):
+    template = _templates.get(template_name)
+    if template is None:
+        template = _templates[template_name] = loader.get_template(template_name)
+    return template
+
+
+@lru_cache(maxsize=None)
+def _stylesheet():
+    return getSampleStyleSheet()
+
+
+@lru_cache(maxsize=None)
+def _logo(path: Optional[str]) -> Optional[bytes]:
+    if not path:
+        return None
+    with open(path, "rb") as logo_file:
+        return logo_file.read()
+
+
+class _FlowableBuilder(HTMLParser):
+    """Turns the rendered template markup into a list of ReportLab flowables."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.styles = _stylesheet()
+        self.flowables: List[Any] = []
+        self.block: Optional[str] = None
+        self.text: List[str] = []
+        self.rows: Optional[List[List[Paragraph]]] = None
+        self.header_rows: List[int] = []
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag in BLOCK_STYLES or tag in ("th", "td"):
+            self.block = tag
+            self.text = []
+        elif tag in INLINE_TAGS and self.block:
+            self.text.append(f"<{INLINE_TAGS[tag]}>")
+        elif tag == "br" and self.block:
+            self.text.append("<br/>")
+        elif tag == "table":
+            self.rows = []
+            self.header_rows = []
+        elif tag == "tr" and self.rows is not None:
+            self.rows.append([])
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in INLINE_TAGS and self.block:
+            self.text.append(f"</{INLINE_TAGS[tag]}>")
+        elif tag in BLOCK_STYLES and self.block == tag:
+            self.flowables.append(Paragraph(self._text(), self.styles[BLOCK_STYLES[tag]]))
+            self.block = None
+        elif tag in ("th", "td") and self.block == tag and self.rows:
+            style = self.styles["Heading4" if tag == "th" else "BodyText"]
+            self.rows[-1].append(Paragraph(self._text(), style))
+            if tag == "th" and len(self.rows) - 1 not in self.header_rows:
+                self.header_rows.append(len(self.rows) - 1)
+            self.block = None
+        elif tag == "table" and self.rows is not None:
+            self.flowables.append(self._table())
+            self.flowables.append(Spacer(1, 4 * mm))
+            self.rows = None
+
+    def handle_data(self, data: str) -> None:
+        if self.block:
+            self.text.append(escape(data, quote=False))
+
+    def _text(self) -> str:
+        return " ".join("".join(self.text).split())
+
+    def _table(self) -> Table:
+        rows = [row for row in self.rows if row]
+        table = Table(rows, hAlign="LEFT", colWidths=[60 * mm, None] if rows and len(rows[0]) == 2 else None)
+        style = [
+            ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ]
+        for row in self.header_rows:
+            style.append(("BACKGROUND", (0, row), (-1, row), colors.whitesmoke))
+        table.setStyle(TableStyle(style))
+        return table
+
+
+def render_pdf(template_name: str, context: Dict[str, Any]) -> bytes:
+    markup = get_template(template_name).render(context)
+    builder = _FlowableBuilder()
+    builder.feed(markup)
+    builder.close()
+
+    flowables = builder.flowables
+    logo = _logo(settings.DOCUMENT_LOGO_PATH)
+    if logo:
+        flowables = [Image(BytesIO(logo), width=40 * mm, height=15 * mm, kind="proportional", hAlign="LEFT")] + flowables
+
+    output = BytesIO()
+    document = SimpleDocTemplate(
+        output,
+        pagesize=A4,
+        title=context.get("title", ""),
+        author=settings.DOCUMENT_ISSUER_NAME,
+        leftMargin=20 * mm,
+        rightMargin=20 * mm,
+        topMargin=20 * mm,
+        bottomMargin=20 * mm,
+    )
+    document.build(flowables)
+    return output.getvalue()
+
+
+def render_document(job: Tuple[int, str, Dict[str, Any]]) -> Tuple[int, Optional[bytes], Optional[str]]:
+    """Pool entry point: ``(object_id, template_name, context)`` -> ``(object_id, pdf, error)``."""
+    object_id, template_name, context = job
+    try:
+        return object_id, render_pdf(template_name, context), None
+    except Exception as e:
+        return object_id, None, str(e)
@@ -0,0 +1,21 @@
+from rest_framework import serializers
+
+from apps.documents.models import DocumentBatch
+
+
+class DocumentBatchSerializer(serializers.ModelSerializer):
+    processed = serializers.ReadOnlyField()
+    progress = serializers.ReadOnlyField()
+
+    class Meta:
+        model = DocumentBatch
+        fields = "__all__"
+        read_only_fields = [
+            "requested_by", "status", "total", "generated", "skipped", "failed",
+            "error", "started_at", "finished_at",
+        ]
+
+    def validate(self, attrs):
+        if not attrs.get("scheme") and not attrs.get("policy"):
+            raise serializers.ValidationError("Provide a scheme or a policy to generate documents for.")
+        return attrs
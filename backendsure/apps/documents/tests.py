@@ -0,0 +1,115 @@
+import shutil
+import tempfile
+from decimal import Decimal
+
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.core.constants import DocumentBatchStatuses, DocumentTypes
+from apps.documents.generator import DocumentGenerator
+from apps.documents.models import DocumentBatch
+from apps.policies.models import Policy
+from apps.products.models import Product
+from apps.schemes.models import Scheme, SchemeGroup
+from apps.users.models import Membership, User
+
+POLICY_SCHEDULE = DocumentTypes.POLICY_SCHEDULE.value
+MEMBERSHIP_CERTIFICATE = DocumentTypes.MEMBERSHIP_CERTIFICATE.value
+
+
+class DocumentTestCase(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media, DOCUMENT_GENERATION_CHUNK_SIZE=2)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.scheme = Scheme.objects.create(name="Funeral", scheme_type="Individual")
+        self.product = Product.objects.create(name="Family Cover", scheme=self.scheme, policy_number_prefix="FAM")
+        self.owner = User.objects.create(username="jane", email="jane@example.com", role="Policy Owner")
+        self.policies = [self.policy(i) for i in range(3)]
+
+    def policy(self, i):
+        policy = Policy.objects.create(
+            policy_number=f"FAM_{i}", product=self.product, policy_owner=self.owner, premium=Decimal("100"),
+        )
+        scheme_group = SchemeGroup.objects.create(scheme=self.scheme, policy=policy)
+        Membership.objects.create(user=self.owner, policy=policy, scheme_group=scheme_group)
+        return policy
+
+    def run_batch(self, document_type=POLICY_SCHEDULE, workers=0, **fields):
+        batch = DocumentBatch.objects.create(document_type=document_type, scheme=self.scheme, **fields)
+        return DocumentGenerator(batch, workers=workers).execute()
+
+
+class DocumentGeneratorTests(DocumentTestCase):
+    def test_batch_renders_every_document_of_the_scheme(self):
+        batch = self.run_batch()
+
+        self.assertEqual(batch.status, DocumentBatchStatuses.COMPLETED.value)
+        self.assertEqual((batch.total, batch.generated, batch.skipped, batch.failed), (3, 3, 0, 0))
+        for policy in self.policies:
+            policy.refresh_from_db()
+            self.assertEqual(len(policy.policy_document_hash), 64)
+            with default_storage.open(policy.policy_document.name, "rb") as document:
+                self.assertEqual(document.read(5), b"%PDF-")
+        self.assertEqual(DocumentBatch.objects.get(id=batch.id).generated, 3)
+
+    def test_unchanged_documents_are_skipped(self):
+        self.run_batch()
+        self.assertEqual((self.run_batch().generated, self.run_batch().skipped), (0, 3))
+
+        changed = self.policies[1]
+        Policy.objects.filter(id=changed.id).update(premium=Decimal("150"))
+        previous = Policy.objects.get(id=changed.id).policy_document.name
+        batch = self.run_batch()
+
+        self.assertEqual((batch.generated, batch.skipped), (1, 2))
+        changed.refresh_from_db()
+        self.assertNotEqual(changed.policy_document.name, previous)
+        self.assertFalse(default_storage.exists(previous))
+
+    def test_force_renders_current_documents_again(self):
+        self.run_batch()
+        self.assertEqual(self.run_batch(force=True).generated, 3)
+
+    def test_process_pool_renders_the_same_documents(self):
+        in_process = self.run_batch(MEMBERSHIP_CERTIFICATE)
+        hashes = dict(Membership.objects.values_list("id", "membership_certificate_hash"))
+        Membership.objects.update(membership_certificate_hash=None)
+
+        pooled = self.run_batch(MEMBERSHIP_CERTIFICATE, workers=2)
+
+        self.assertEqual((in_process.generated, pooled.generated, pooled.failed), (3, 3, 0))
+        self.assertEqual(dict(Membership.objects.values_list("id", "membership_certificate_hash")), hashes)
+
+
+class OnDemandDocumentTests(DocumentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.url = f"/documents/policies/{self.policies[0].id}/schedule/"
+
+    def test_only_a_render_is_recorded_as_a_batch(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.data["regenerated"])
+        self.assertEqual(DocumentBatch.objects.count(), 1)
+
+        again = self.client.get(self.url)
+        self.assertEqual(again.data, {**first.data, "regenerated": False})
+        self.assertEqual(DocumentBatch.objects.count(), 1)
+
+        Policy.objects.filter(id=self.policies[0].id).update(premium=Decimal("150"))
+        self.assertTrue(self.client.get(self.url).data["regenerated"])
+        self.assertEqual(DocumentBatch.objects.count(), 2)
+
+    def test_other_customers_cannot_fetch_the_document(self):
+        other = User.objects.create(username="sam", email="sam@example.com", role="Policy Owner")
+        self.client.force_authenticate(other)
+
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.assertFalse(DocumentBatch.objects.exists())
@@ -0,0 +1,13 @@
+from django.urls import path
+
+from apps.documents.views import (
+    DocumentBatchAPIView, DocumentBatchDetailAPIView,
+    PolicyScheduleAPIView, MembershipCertificateAPIView
+)
+
+urlpatterns = [
+    path("batches/", DocumentBatchAPIView.as_view(), name="document-batches"),
+    path("batches/<int:pk>/", DocumentBatchDetailAPIView.as_view(), name="document-batch-details"),
+    path("policies/<int:pk>/schedule/", PolicyScheduleAPIView.as_view(), name="policy-schedule"),
+    path("memberships/<int:pk>/certificate/", MembershipCertificateAPIView.as_view(), name="membership-certificate"),
+]
@@ -0,0 +1,120 @@
+from django.shortcuts import get_object_or_404
+from rest_framework import status, generics
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+
+from apps.core.constants import DocumentTypes
+from apps.documents.generator import DocumentGenerator
+from apps.documents.models import DocumentBatch
+from apps.documents.serializers import DocumentBatchSerializer
+from apps.policies.models import Policy
+from apps.users.models import Membership
+
+# Create your views here.
+def _require_admin(request):
+    if request.user.role != "Admin":
+        return Response(
+            {"detail": "You do not have permission to manage document batches."},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    return None
+
+
+class DocumentBatchAPIView(generics.ListCreateAPIView):
+    """
+    Queue a batch of policy schedules or membership certificates.
+
+    Batches are picked up by the ``generate_documents`` management command;
+    poll the batch detail endpoint for progress.
+    """
+    queryset = DocumentBatch.objects.all().order_by("-created_at")
+    serializer_class = DocumentBatchSerializer
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request, *args, **kwargs):
+        return _require_admin(request) or super().list(request, *args, **kwargs)
+
+    def create(self, request, *args, **kwargs):
+        return _require_admin(request) or super().create(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        serializer.save(requested_by=self.request.user)
+
+
+class DocumentBatchDetailAPIView(generics.RetrieveAPIView):
+    queryset = DocumentBatch.objects.all()
+    serializer_class = DocumentBatchSerializer
+    permission_classes = [IsAuthenticated]
+
+    lookup_field = "pk"
+
+    def retrieve(self, request, *args, **kwargs):
+        return _require_admin(request) or super().retrieve(request, *args, **kwargs)
+
+
+class _OnDemandDocumentAPIView(generics.GenericAPIView):
+    """
+    Returns a document, rendering it first if it is missing or out of date.
+
+    A document that is still current is served without writing anything; only
+    a render is recorded as a single-document batch.
+    """
+    permission_classes = [IsAuthenticated]
+    document_type = None
+    file_field = None
+
+    def get_instance(self, pk):
+        raise NotImplementedError
+
+    def get(self, request, pk, *args, **kwargs):
+        instance, policy, owner_id = self.get_instance(pk)
+        if request.user.role != "Admin" and request.user.id != owner_id:
+            return Response(
+                {"detail": "You do not have permission to view this document."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        batch = DocumentBatch(
+            document_type=self.document_type,
+            policy=policy,
+            requested_by=request.user,
+        )
+        generator = DocumentGenerator(batch, workers=0, object_ids=[instance.id])
+        if generator.is_current(generator.source.queryset(batch).get(id=instance.id)):
+            return self._document_response(request, instance, regenerated=False)
+
+        batch.save()
+        batch = generator.execute()
+        if batch.failed or batch.error:
+            return Response(
+                {"detail": "The document could not be generated, please try again later."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        instance.refresh_from_db(fields=[self.file_field])
+        return self._document_response(request, instance, regenerated=bool(batch.generated))
+
+    def _document_response(self, request, instance, regenerated):
+        document = getattr(instance, self.file_field)
+        return Response(
+            {"document": request.build_absolute_uri(document.url), "regenerated": regenerated},
+            status=status.HTTP_200_OK
+        )
+
+
+class PolicyScheduleAPIView(_OnDemandDocumentAPIView):
+    document_type = DocumentTypes.POLICY_SCHEDULE.value
+    file_field = "policy_document"
+
+    def get_instance(self, pk):
+        policy = get_object_or_404(Policy, pk=pk)
+        return policy, policy, policy.policy_owner_id
+
+
+class MembershipCertificateAPIView(_OnDemandDocumentAPIView):
+    document_type = DocumentTypes.MEMBERSHIP_CERTIFICATE.value
+    file_field = "membership_certificate"
+
+    def get_instance(self, pk):
+        membership = get_object_or_404(Membership.objects.select_related("policy"), pk=pk)
+        return membership, membership.policy, membership.user_id
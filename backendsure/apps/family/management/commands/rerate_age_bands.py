@@ -0,0 +1,26 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.family.rerating import AgeBandRerater
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-price the dependents whose age band changes on a date and adjust membership and "
+        "policy totals (run nightly). Safe to re-run; pass --date to catch up a missed night."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", type=date.fromisoformat, help="Date to re-rate on (defaults to today)")
+        parser.add_argument("--chunk-size", type=int, default=AgeBandRerater.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        on_date = options["date"] or timezone.localdate()
+        result = AgeBandRerater(on_date=on_date, chunk_size=options["chunk_size"]).execute()
+        self.stdout.write(self.style.SUCCESS(
+            f"{result.on_date}: {result.dependents_rerated} of {result.dependents} dependents re-rated, "
+            f"{result.out_of_band} out of band, {result.memberships_updated} memberships and "
+            f"{result.policies_updated} policies adjusted"
+        ))
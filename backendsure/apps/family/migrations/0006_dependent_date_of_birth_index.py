@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('family', '0005_insureddevice_insuredpet_insuredvehicle'),
+        ('policies', '0015_policy_policy_document_hash'),
+        ('schemes', '0004_schemegroup'),
+        ('users', '0011_user_identity_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dependent',
+            index=models.Index(fields=['date_of_birth'], name='dependent_dob_idx'),
+        ),
+    ]
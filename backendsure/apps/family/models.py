@@ -21,6 +21,11 @@ class Dependent(AbstractBaseModel):
     date_of_birth = models.DateField(null=True)
     status = models.CharField(max_length=255, choices=PolicyStatuses.choices(), default=PolicyStatuses.ACTIVE.value)
     dependent_type = models.CharField(max_length=255, choices=(('Dependent', 'Dependent'), ('Extended', 'Extended')))
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["date_of_birth"], name="dependent_dob_idx"),
+        ]
     
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -0,0 +1,217 @@
+"""
+Age-band re-rating of dependents.
+
+Dependent premiums come from the ``DependentPricing`` and
+``ExtendedDependentPricing`` bands of the policy's product. A band is a cover
+level and an age range, so a dependent's premium can only change on a birthday
+that takes them into a band (``min_age``) or out of one (``max_age + 1``).
+
+``AgeBandRerater`` re-rates the dependents whose age changes on a date, which
+it finds from the boundary ages alone: anyone turning ``N`` on that date was
+born on the same day ``N`` years earlier (people born on 29 February turn a
+year older on 1 March in other years). That is one indexed
+``date_of_birth IN (...)`` query, a few thousand rows a night for millions of
+lives, rather than a scan of every dependent.
+
+Each dependent keeps their cover level and is priced from the band for that
+cover, their relationship (sons and daughters fall back to ``Child`` bands)
+and their new age; extended family use the extended bands. Dependents with
+no band at their new age keep their premium and are counted as out of band.
+Changed premiums are written with one UPDATE per distinct premium, and the
+change is added to the ``Membership`` and ``Policy`` totals with one UPDATE per
+distinct total change, in the same transaction. A date can therefore be run
+again, or a missed night caught up, without counting anyone twice.
+
+Main members are not re-rated, since no date of birth is kept for them.
+``python manage.py rerate_age_bands`` runs it nightly.
+"""
+import calendar
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import logging
+
+from django.db import transaction
+from django.db.models import F
+
+from apps.core.constants import DependentTypes
+from apps.family.models import Dependent
+from apps.policies.models import Policy
+from apps.policies.status_engine import IN_FORCE_STATUSES
+from apps.pricing.models import DependentPricing, ExtendedDependentPricing
+from apps.users.models import Membership
+
+logger = logging.getLogger(__name__)
+
+EXTENDED = "Extended"
+# Relationships priced from another relationship's bands when they have none of their own.
+FALLBACK_RELATIONSHIPS = {
+    DependentTypes.SON.value: DependentTypes.CHILD.value,
+    DependentTypes.DAUGHTER.value: DependentTypes.CHILD.value,
+}
+
+Band = Tuple[int, int, Decimal]
+
+
+def age_on(date_of_birth: date, on_date: date) -> int:
+    return on_date.year - date_of_birth.year - ((on_date.month, on_date.day) < (date_of_birth.month, date_of_birth.day))
+
+
+def birthdays(on_date: date, ages: Iterable[int]) -> List[date]:
+    """Dates of birth of the people who turn one of ``ages`` on ``on_date``."""
+    dates = []
+    for age in ages:
+        year = on_date.year - age
+        if year < 1:
+            continue
+        if on_date.month == 2 and on_date.day == 29:
+            if calendar.isleap(year):
+                dates.append(date(year, 2, 29))
+            continue
+        dates.append(on_date.replace(year=year))
+        if (on_date.month, on_date.day) == (3, 1) and not calendar.isleap(on_date.year) and calendar.isleap(year):
+            dates.append(date(year, 2, 29))
+    return sorted(dates)
+
+
+class Bands:
+    """The age bands of every dependent and extended dependent pricing, by product, kind and cover level."""
+
+    def __init__(self) -> None:
+        self.bands: Dict[Tuple[int, str, Decimal], List[Band]] = defaultdict(list)
+        rows = [
+            (product_id, kind, cover_level, min_age, max_age, premium)
+            for product_id, kind, cover_level, min_age, max_age, premium in DependentPricing.objects.values_list(
+                "product_id", "dependent_type", "cover_level", "min_age", "max_age", "premium"
+            )
+        ] + [
+            (product_id, EXTENDED, cover_level, min_age, max_age, premium)
+            for product_id, cover_level, min_age, max_age, premium in ExtendedDependentPricing.objects.values_list(
+                "product_id", "cover_level", "min_age", "max_age", "premium"
+            )
+        ]
+        for product_id, kind, cover_level, min_age, max_age, premium in rows:
+            if max_age >= min_age:
+                self.bands[(product_id, kind, cover_level)].append((min_age, max_age, premium))
+        for bands in self.bands.values():
+            bands.sort()
+
+    def boundary_ages(self) -> Set[int]:
+        """Ages at which someone can move into or out of a band."""
+        return {
+            age
+            for bands in self.bands.values()
+            for min_age, max_age, _ in bands
+            for age in (min_age, max_age + 1)
+        }
+
+    def premium(self, product_id: Optional[int], dependent_type: str, relationship: str,
+                cover_amount: Decimal, age: int) -> Optional[Decimal]:
+        kinds = [EXTENDED] if dependent_type == EXTENDED else [relationship, FALLBACK_RELATIONSHIPS.get(relationship)]
+        for kind in kinds:
+            bands = self.bands.get((product_id, kind, cover_amount))
+            if not bands:
+                continue
+            for min_age, max_age, premium in bands:
+                if min_age <= age <= max_age:
+                    return premium
+            return None
+        return None
+
+
+@dataclass
+class RerateResult:
+    on_date: date
+    dependents: int
+    dependents_rerated: int
+    out_of_band: int
+    memberships_updated: int
+    policies_updated: int
+
+
+class AgeBandRerater:
+    """Re-prices the dependents whose age band can change on ``on_date``."""
+
+    CHUNK_SIZE = 5000
+    FIELDS = (
+        "id", "membership_id", "policy_id", "policy__product_id", "dependent_type", "relationship",
+        "cover_amount", "premium", "date_of_birth",
+    )
+
+    def __init__(self, on_date: date, chunk_size: int = CHUNK_SIZE) -> None:
+        self.on_date = on_date
+        self.chunk_size = chunk_size
+
+    def execute(self) -> RerateResult:
+        result = RerateResult(self.on_date, 0, 0, 0, 0, 0)
+        bands = Bands()
+        dates_of_birth = birthdays(self.on_date, bands.boundary_ages())
+        if not dates_of_birth:
+            return result
+
+        dependents = Dependent.objects.filter(
+            date_of_birth__in=dates_of_birth,
+            status__in=IN_FORCE_STATUSES,
+            policy__status__in=IN_FORCE_STATUSES,
+        )
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                rows = list(
+                    dependents.select_for_update(of=("self",)).filter(id__gt=last_id).order_by("id")
+                    .values_list(*self.FIELDS)[:self.chunk_size]
+                )
+                if not rows:
+                    break
+                rerated, out_of_band, memberships, policies = self._rerate(rows, bands)
+            result.dependents += len(rows)
+            result.dependents_rerated += rerated
+            result.out_of_band += out_of_band
+            result.memberships_updated += memberships
+            result.policies_updated += policies
+            last_id = rows[-1][0]
+
+        logger.info(
+            f"Age-band re-rating on {self.on_date}: {result.dependents_rerated} of {result.dependents} "
+            f"dependents re-rated, {result.out_of_band} out of band"
+        )
+        return result
+
+    def _rerate(self, rows: List[tuple], bands: Bands) -> tuple:
+        by_premium: Dict[Decimal, List[int]] = defaultdict(list)
+        membership_changes: Dict[int, Decimal] = defaultdict(Decimal)
+        policy_changes: Dict[int, Decimal] = defaultdict(Decimal)
+        out_of_band = 0
+        for (dependent_id, membership_id, policy_id, product_id, dependent_type, relationship,
+             cover_amount, premium, date_of_birth) in rows:
+            new_premium = bands.premium(
+                product_id, dependent_type, relationship, cover_amount, age_on(date_of_birth, self.on_date)
+            )
+            if new_premium is None:
+                out_of_band += 1
+                continue
+            if new_premium == premium:
+                continue
+            by_premium[new_premium].append(dependent_id)
+            membership_changes[membership_id] += new_premium - premium
+            policy_changes[policy_id] += new_premium - premium
+
+        for new_premium, ids in by_premium.items():
+            Dependent.objects.filter(id__in=ids).update(premium=new_premium)
+        memberships = self._apply_changes(Membership, membership_changes, ("dependent_premium", "total_premium"))
+        policies = self._apply_changes(Policy, policy_changes, ("premium",))
+        return sum(len(ids) for ids in by_premium.values()), out_of_band, memberships, policies
+
+    @staticmethod
+    def _apply_changes(model, changes: Dict[int, Decimal], fields: tuple) -> int:
+        """Add each membership's or policy's premium change to its totals, one UPDATE per distinct change."""
+        by_change: Dict[Decimal, List[int]] = defaultdict(list)
+        for owner_id, change in changes.items():
+            if change:
+                by_change[change].append(owner_id)
+        return sum(
+            model.objects.filter(id__in=ids).update(**{field: F(field) + change for field in fields})
+            for change, ids in by_change.items()
+        )
@@ -1,3 +1,29 @@
-from django.test import TestCase
+from datetime import date, timedelta
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from apps.family.rerating import age_on, birthdays
+
+
+def days(start, end):
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+class BirthdaysTests(SimpleTestCase):
+    def test_leap_day_birthdays(self):
+        # Born on 29 February: a year older on 1 March in common years, on the 29th in leap years.
+        self.assertEqual(birthdays(date(2027, 3, 1), [3]), [date(2024, 2, 29), date(2024, 3, 1)])
+        self.assertEqual(birthdays(date(2027, 2, 28), [3]), [date(2024, 2, 28)])
+        self.assertEqual(birthdays(date(2028, 2, 29), [4, 1]), [date(2024, 2, 29)])
+        self.assertEqual(birthdays(date(2028, 3, 1), [4]), [date(2024, 3, 1)])
+
+    def test_birthdays_are_exactly_the_people_whose_age_changes(self):
+        ages = range(1, 9)
+        born = [day for year in range(2018, 2028) for day in days(date(year, 2, 20), date(year, 3, 10))]
+        for on_date in [day for year in (2026, 2027, 2028) for day in days(date(year, 2, 20), date(year, 3, 10))]:
+            turning = [
+                date_of_birth for date_of_birth in born
+                if age_on(date_of_birth, on_date) != age_on(date_of_birth, on_date - timedelta(days=1))
+                and age_on(date_of_birth, on_date) in ages
+            ]
+            self.assertEqual(birthdays(on_date, ages), turning, on_date)
@@ -0,0 +1,41 @@
+from django.contrib.auth.models import AnonymousUser
+from rest_framework import authentication, exceptions, permissions
+
+from apps.gadgets.models import DeviceOutlet
+
+
+OUTLET_API_KEY_HEADER = "HTTP_X_OUTLET_API_KEY"
+
+
+class OutletAPIKeyAuthentication(authentication.BaseAuthentication):
+    """
+    Authenticates point-of-sale integrations by the ``X-Outlet-Api-Key`` header.
+
+    The outlet is looked up by the key hash on every request, one query on a
+    unique index. It is deliberately not cached: a key must stop working in
+    every worker as soon as it is rotated, which a per-process cache cannot
+    guarantee.
+    """
+
+    def authenticate(self, request):
+        raw_key = request.META.get(OUTLET_API_KEY_HEADER)
+        if not raw_key:
+            return None
+
+        outlet = DeviceOutlet.objects.select_related("owner").filter(
+            api_key_hash=DeviceOutlet.hash_api_key(raw_key)
+        ).first()
+        if outlet is None:
+            raise exceptions.AuthenticationFailed("Invalid outlet API key.")
+
+        return (outlet.owner or AnonymousUser(), outlet)
+
+    def authenticate_header(self, request):
+        return "X-Outlet-Api-Key"
+
+
+class IsDeviceOutlet(permissions.BasePermission):
+    message = "A valid outlet API key is required."
+
+    def has_permission(self, request, view):
+        return isinstance(request.auth, DeviceOutlet)
@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.gadgets.models import OutletPerformance
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the outlet performance rollups of recent months from insured "
+        "gadgets and claims (run nightly), or of all time with --all."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.OUTLET_PERFORMANCE_RECONCILE_DAYS,
+                            help="Reconcile the months covering this many past days")
+        parser.add_argument("--all", action="store_true", help="Rebuild every rollup row")
+
+    def handle(self, *args, **options):
+        since = None if options["all"] else timezone.localdate() - timedelta(days=options["days"])
+        rows = OutletPerformance.reconcile(since)
+        scope = "all time" if since is None else f"months since {since.replace(day=1)}"
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {rows} outlet performance rows for {scope}"))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gadgets', '0015_alter_deviceoutlet_business_registration_number_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deviceoutlet',
+            name='api_key_hash',
+            field=models.CharField(editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
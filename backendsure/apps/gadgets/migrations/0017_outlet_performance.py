@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:57
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gadgets', '0016_deviceoutlet_api_key_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutletPerformance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('period', models.CharField(choices=[('Day', 'Day'), ('Month', 'Month')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('policies_sold', models.IntegerField(default=0)),
+                ('gadgets_insured', models.IntegerField(default=0)),
+                ('premium', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('seller_commission', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('claims', models.IntegerField(default=0)),
+                ('device_outlet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='performance', to='gadgets.deviceoutlet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'period_start'], name='outletperf_period_idx')],
+                'constraints': [models.UniqueConstraint(fields=('device_outlet', 'period', 'period_start'), name='unique_outlet_performance_period')],
+            },
+        ),
+    ]
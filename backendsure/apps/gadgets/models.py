@@ -1,5 +1,15 @@
-from django.db import models
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, Optional, Tuple
+import hashlib
+import secrets
+
+from django.db import models, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
 from apps.core.models import AbstractBaseModel
+from apps.core.constants import RollupPeriods
 from decimal import Decimal
 
 # Create your models here.
@@ -7,6 +17,7 @@ class DeviceOutlet(AbstractBaseModel):
     owner = models.ForeignKey("users.User", on_delete=models.SET_NULL, null=True)
     agent_type = models.CharField(max_length=255, choices=(("Seller", "Seller"), ("Repair", "Repair")))
     outlet_number = models.CharField(max_length=255, null=True)
+    api_key_hash = models.CharField(max_length=64, null=True, unique=True, editable=False)
     name = models.CharField(max_length=255)
     email = models.EmailField(null=True)
     phone_number = models.CharField(max_length=255)
@@ -26,6 +37,17 @@ class DeviceOutlet(AbstractBaseModel):
     def address(self):
         return f"{self.city}, {self.country}"
 
+    @staticmethod
+    def hash_api_key(raw_key: str) -> str:
+        return hashlib.sha256(raw_key.encode()).hexdigest()
+
+    def rotate_api_key(self) -> str:
+        """Issue a new POS API key; only its hash is stored, the raw key is returned once."""
+        raw_key = secrets.token_urlsafe(32)
+        self.api_key_hash = self.hash_api_key(raw_key)
+        self.save(update_fields=["api_key_hash", "updated_at"])
+        return raw_key
+
 
 class InsuredGadget(AbstractBaseModel):
     membership = models.ForeignKey("users.Membership", on_delete=models.CASCADE, related_name="membership_gadgets")
@@ -52,7 +74,169 @@ class InsuredGadget(AbstractBaseModel):
     
 
     def calculate_commission(self, premium: Decimal):
+        self.set_commission_shares(premium)
+        self.save()
+
+    def set_commission_shares(self, premium: Decimal):
+        """Split the premium between seller, platform and insurer without saving."""
         self.seller_share = Decimal(0.1) * Decimal(premium)
         self.platform_share = Decimal(0.2) * Decimal(premium)
         self.insurer_share = Decimal(0.7) * Decimal(premium)
-        self.save()
\ No newline at end of file
+
+class OutletPerformance(AbstractBaseModel):
+    """
+    Sales, commission and claims of one outlet over a day or a month.
+
+    Purchases and claims add to the rows of their day and month as they are
+    written (``record_sales``, ``count_claim``), so dashboards and leaderboards
+    read a handful of rows instead of aggregating the whole book.
+    ``reconcile`` recomputes recent rows from the source tables.
+    """
+    device_outlet = models.ForeignKey(DeviceOutlet, on_delete=models.CASCADE, related_name="performance")
+    period = models.CharField(max_length=10, choices=RollupPeriods.choices())
+    period_start = models.DateField()
+    policies_sold = models.IntegerField(default=0)
+    gadgets_insured = models.IntegerField(default=0)
+    premium = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    seller_commission = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    claims = models.IntegerField(default=0)
+
+    COUNTERS = ("policies_sold", "gadgets_insured", "premium", "seller_commission", "claims")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["device_outlet", "period", "period_start"],
+                name="unique_outlet_performance_period",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["period", "period_start"], name="outletperf_period_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.device_outlet_id} {self.period} {self.period_start}"
+
+    @property
+    def claim_rate(self) -> float:
+        """Claims per insured gadget sold in the period."""
+        return round(self.claims / self.gadgets_insured, 4) if self.gadgets_insured else 0.0
+
+    @staticmethod
+    def periods(day: date) -> Tuple[Tuple[str, date], ...]:
+        return ((RollupPeriods.DAY.value, day), (RollupPeriods.MONTH.value, day.replace(day=1)))
+
+    @classmethod
+    def adjust(cls, device_outlet_id, day: date, **deltas) -> None:
+        """Add ``deltas`` to the outlet's rows for ``day`` and its month."""
+        periods = cls.periods(day)
+        # Make sure both rows exist, then add to them with a single UPDATE.
+        cls.objects.bulk_create(
+            [cls(device_outlet_id=device_outlet_id, period=period, period_start=period_start) for period, period_start in periods],
+            ignore_conflicts=True,
+        )
+        matching = Q()
+        for period, period_start in periods:
+            matching |= Q(period=period, period_start=period_start)
+        cls.objects.filter(matching, device_outlet_id=device_outlet_id).update(
+            **{field: F(field) + delta for field, delta in deltas.items()}
+        )
+
+    @classmethod
+    def record_sales(cls, gadgets: Iterable["InsuredGadget"]) -> None:
+        """Count freshly sold gadgets towards their sellers' rows for today."""
+        sales: Dict[int, Dict] = defaultdict(lambda: {"gadgets": 0, "policies": set(), "premium": Decimal('0'), "commission": Decimal('0')})
+        for gadget in gadgets:
+            if gadget.seller_id is None:
+                continue
+            outlet_sales = sales[gadget.seller_id]
+            outlet_sales["gadgets"] += 1
+            outlet_sales["policies"].add(gadget.policy_id)
+            outlet_sales["premium"] += Decimal(gadget.premium)
+            outlet_sales["commission"] += Decimal(gadget.seller_share)
+        today = timezone.localdate()
+        for device_outlet_id, outlet_sales in sales.items():
+            cls.adjust(
+                device_outlet_id,
+                today,
+                policies_sold=len(outlet_sales["policies"]),
+                gadgets_insured=outlet_sales["gadgets"],
+                premium=outlet_sales["premium"],
+                seller_commission=outlet_sales["commission"],
+            )
+
+    @classmethod
+    def count_claim(cls, device_outlet_id, created_at, delta: int) -> None:
+        if device_outlet_id is not None:
+            cls.adjust(device_outlet_id, timezone.localdate(created_at), claims=delta)
+
+    @classmethod
+    def reconcile(cls, since: Optional[date] = None) -> int:
+        """
+        Recompute the rows of every month from the one holding ``since`` (or of
+        all time) from insured gadgets and claims; returns the number of rows.
+
+        The rows are locked before the source tables are read, so a sale or
+        claim counted by ``adjust`` meanwhile waits and is added on top of the
+        recomputed value instead of being overwritten. Recomputed rows are
+        upserted; rows with nothing left to count are deleted.
+        """
+        from apps.claims.models import Claim
+
+        start = since.replace(day=1) if since else None
+        gadgets = InsuredGadget.objects.filter(seller__isnull=False)
+        claims = Claim.objects.filter(device_outlet__isnull=False)
+        existing = cls.objects.all()
+        if start:
+            gadgets = gadgets.filter(created_at__date__gte=start)
+            claims = claims.filter(created_at__date__gte=start)
+            existing = existing.filter(period_start__gte=start)
+
+        with transaction.atomic():
+            locked = {
+                (device_outlet_id, period, period_start): row_id
+                for row_id, device_outlet_id, period, period_start in existing.select_for_update().values_list(
+                    "id", "device_outlet_id", "period", "period_start"
+                )
+            }
+
+            totals: Dict[Tuple[int, str, date], Dict] = defaultdict(lambda: dict.fromkeys(cls.COUNTERS, 0))
+            sales = (
+                gadgets.annotate(day=TruncDate("created_at"))
+                .values("seller_id", "day")
+                .annotate(
+                    policies=Count("policy_id", distinct=True),
+                    gadgets=Count("id"),
+                    premium=Sum("premium"),
+                    commission=Sum("seller_share"),
+                )
+                .order_by()
+            )
+            for row in sales:
+                for period, period_start in cls.periods(row["day"]):
+                    counters = totals[(row["seller_id"], period, period_start)]
+                    counters["policies_sold"] += row["policies"]
+                    counters["gadgets_insured"] += row["gadgets"]
+                    counters["premium"] += row["premium"] or 0
+                    counters["seller_commission"] += row["commission"] or 0
+            claim_counts = (
+                claims.annotate(day=TruncDate("created_at"))
+                .values("device_outlet_id", "day")
+                .annotate(total=Count("id"))
+                .order_by()
+            )
+            for row in claim_counts:
+                for period, period_start in cls.periods(row["day"]):
+                    totals[(row["device_outlet_id"], period, period_start)]["claims"] += row["total"]
+
+            cls.objects.filter(id__in=[row_id for key, row_id in locked.items() if key not in totals]).delete()
+            cls.objects.bulk_create(
+                [
+                    cls(device_outlet_id=device_outlet_id, period=period, period_start=period_start, **counters)
+                    for (device_outlet_id, period, period_start), counters in totals.items()
+                ],
+                update_conflicts=True,
+                unique_fields=["device_outlet", "period", "period_start"],
+                update_fields=list(cls.COUNTERS),
+            )
+        return len(totals)
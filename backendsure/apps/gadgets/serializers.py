@@ -1,14 +1,15 @@
 from django.core.validators import URLValidator
 from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
-from apps.gadgets.models import InsuredGadget, DeviceOutlet
+from apps.core.constants import RollupPeriods
+from apps.gadgets.models import InsuredGadget, DeviceOutlet, OutletPerformance
 from apps.pricing.models import GadgetPricing, GadgetPricingComponent
 
 
 class DeviceOutletSerializer(serializers.ModelSerializer):
     class Meta:
         model = DeviceOutlet
-        fields = "__all__"
+        exclude = ("api_key_hash",)
         extra_kwargs = {"owner": {"read_only": True}}
 
 
@@ -24,6 +25,41 @@ class InsuredGadgetSerializer(serializers.ModelSerializer):
         return obj.seller.name if obj.seller else ""
 
 
+class OutletPerformanceSerializer(serializers.ModelSerializer):
+    claim_rate = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = OutletPerformance
+        fields = (
+            "period", "period_start", "policies_sold", "gadgets_insured",
+            "premium", "seller_commission", "claims", "claim_rate",
+        )
+
+
+class OutletLeaderboardEntrySerializer(OutletPerformanceSerializer):
+    outlet_id = serializers.IntegerField(source="device_outlet_id")
+    outlet_number = serializers.CharField(source="device_outlet.outlet_number")
+    outlet_name = serializers.CharField(source="device_outlet.name")
+
+    class Meta(OutletPerformanceSerializer.Meta):
+        fields = ("outlet_id", "outlet_number", "outlet_name") + OutletPerformanceSerializer.Meta.fields
+
+
+class OutletPerformanceQuerySerializer(serializers.Serializer):
+    period = serializers.ChoiceField(choices=RollupPeriods.choices(), default=RollupPeriods.DAY.value)
+    since = serializers.DateField(required=False)
+    until = serializers.DateField(required=False)
+
+
+class OutletLeaderboardQuerySerializer(serializers.Serializer):
+    METRICS = ("premium", "policies_sold", "gadgets_insured", "seller_commission")
+
+    period = serializers.ChoiceField(choices=RollupPeriods.choices(), default=RollupPeriods.MONTH.value)
+    period_start = serializers.DateField(required=False)
+    metric = serializers.ChoiceField(choices=METRICS, default="premium")
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+
 class GadgetPricingComponentSerializer(serializers.ModelSerializer):
     class Meta:
         model = GadgetPricingComponent
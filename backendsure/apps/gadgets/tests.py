@@ -1,3 +1,271 @@
-from django.test import TestCase
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.test import APIClient, APIRequestFactory
+
+from apps.claims.models import Claim
+from apps.core import reference_data
+from apps.gadgets.authentication import OutletAPIKeyAuthentication
+from apps.gadgets.models import DeviceOutlet, InsuredGadget, OutletPerformance
+from apps.policies.models import Policy
+from apps.pricing.models import GadgetPricing
+from apps.products.models import PolicyNumberSequence, Product
+from apps.sales.gadget_purchase.batch_purchase import GadgetPolicyBatchPurchaseService
+from apps.sales.gadget_purchase.policy_purchase import GadgetPolicyPurchaseService
+from apps.schemes.models import Scheme, SchemeGroup
+from apps.users.models import Membership, User
+
+
+def gadget_purchase(pricing_id, i, devices=1, email=None):
+    return {
+        "start_date": "2026-01-18",
+        "pricing": pricing_id,
+        "cover_type": "Partial Cover",
+        "policy_owner": {
+            "first_name": "B", "last_name": f"O{i}", "email": email or f"c{i}@example.com",
+            "phone_number": f"07{i:08d}", "id_number": f"{1000 + i}", "gender": "Male",
+        },
+        "devices": [
+            {"device_type": "smartphone", "device_brand": "Apple", "device_model": "14", "purchase_date": "2024-06-01",
+             "device_cost": 18000, "imei_number": f"35{i:07d}{d:06d}"}
+            for d in range(devices)
+        ],
+        "payment_details": {
+            "payment_method": "Mpesa", "account_name": "A", "phone_number": "0712345678", "debit_order_date": "5",
+        },
+        "additional_information": {"agent_id_number": "OUT1"},
+        "beneficiary": {"first_name": "K", "last_name": "O"},
+    }
+
+
+@override_settings(REFERENCE_DATA_POLL_SECONDS=3600)
+class GadgetPurchaseTests(TestCase):
+    def setUp(self):
+        scheme = Scheme.objects.create(name="Gadget", scheme_type="Individual")
+        product = Product.objects.create(name="Phone Cover", scheme=scheme, policy_number_prefix="GDT")
+        self.pricing = GadgetPricing.objects.create(product=product, cover_percentage=10)
+        PolicyNumberSequence.objects.create(product=product)
+        owner = User.objects.create(username="owner@example.com", email="owner@example.com", role="Sales Agent")
+        outlet = DeviceOutlet.objects.create(
+            owner=owner, agent_type="Seller", outlet_number="OUT1", name="Shop", phone_number="1",
+            location="Moi Avenue", city="Nairobi",
+        )
+        reference_data.reference_data.clear()
+        reference_data.gadget_pricing(self.pricing.id)
+        self.seller = reference_data.outlet(outlet.id)
+
+    def test_query_count_does_not_grow_with_devices(self):
+        with self.assertNumQueries(20):
+            GadgetPolicyPurchaseService(gadget_purchase(self.pricing.id, 1), self.seller).execute()
+        with self.assertNumQueries(20):
+            policy, membership = GadgetPolicyPurchaseService(
+                gadget_purchase(self.pricing.id, 2, devices=3), self.seller
+            ).execute()
+
+        policy.refresh_from_db()
+        membership.refresh_from_db()
+        self.assertEqual(policy.policy_owner_id, membership.user_id)
+        self.assertEqual(policy.premium, Decimal("5400"))
+        self.assertEqual(membership.total_premium, Decimal("5400"))
+        self.assertEqual(InsuredGadget.objects.filter(policy=policy).count(), 3)
+
+    def test_known_customer_is_not_created_again(self):
+        GadgetPolicyPurchaseService(gadget_purchase(self.pricing.id, 1), self.seller).execute()
+        # The same person buying again with a new phone and their email in capitals.
+        purchase = gadget_purchase(self.pricing.id, 2, email="C1@example.com")
+        purchase["policy_owner"]["id_number"] = "1001"
+        with self.assertNumQueries(17):
+            GadgetPolicyPurchaseService(purchase, self.seller).execute()
+        self.assertEqual(User.objects.filter(email_normalized="c1@example.com").count(), 1)
+        self.assertEqual(User.objects.filter(role="").count(), 1)
+
+    def test_batch_query_count_does_not_grow_with_purchases(self):
+        with self.assertNumQueries(20):
+            results = GadgetPolicyBatchPurchaseService(
+                [gadget_purchase(self.pricing.id, 10 + i) for i in range(20)], self.seller
+            ).execute()
+        self.assertTrue(all(result["status"] == "created" for result in results))
+        self.assertEqual([result["policy_number"] for result in results], [f"GDT_{i}" for i in range(1, 21)])
+
+
+class OutletAPIKeyAuthenticationTests(TestCase):
+    def setUp(self):
+        self.outlet = DeviceOutlet.objects.create(
+            agent_type="Seller", outlet_number="OUT2", name="Kiosk", phone_number="2",
+            location="Tom Mboya Street", city="Nairobi",
+        )
+        self.factory = APIRequestFactory()
+
+    def authenticate(self, raw_key):
+        return OutletAPIKeyAuthentication().authenticate(self.factory.post("/", HTTP_X_OUTLET_API_KEY=raw_key))
+
+    def test_rotated_key_stops_working_at_once(self):
+        old_key = self.outlet.rotate_api_key()
+        self.assertEqual(self.authenticate(old_key)[1], self.outlet)
+
+        new_key = self.outlet.rotate_api_key()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate(old_key)
+        self.assertEqual(self.authenticate(new_key)[1], self.outlet)
+
+
+class OutletPerformanceTests(TestCase):
+    def setUp(self):
+        self.scheme = Scheme.objects.create(name="Gadget", scheme_type="Individual")
+        product = Product.objects.create(name="Phone Cover", scheme=self.scheme, policy_number_prefix="GDT")
+        self.pricing = GadgetPricing.objects.create(product=product, cover_percentage=10)
+        self.agent = User.objects.create(username="agent", email="agent@example.com", role="Sales Agent")
+        self.shop = self.outlet("OUT1", owner=self.agent)
+        self.kiosk = self.outlet("OUT2")
+        self.customer = User.objects.create(username="jane", email="jane@example.com", role="Policy Owner")
+        self.today = timezone.localdate()
+        self.month = self.today.replace(day=1)
+
+    def outlet(self, number, owner=None):
+        return DeviceOutlet.objects.create(
+            owner=owner, agent_type="Seller", outlet_number=number, name=number, phone_number=number,
+            location="Moi Avenue", city="Nairobi",
+        )
+
+    def policy(self):
+        policy = Policy.objects.create(
+            policy_number=f"GDT_{Policy.objects.count()}", policy_owner=self.customer, status="Active"
+        )
+        scheme_group = SchemeGroup.objects.create(scheme=self.scheme, policy=policy)
+        return policy, Membership.objects.create(user=self.customer, policy=policy, scheme_group=scheme_group)
+
+    def sell(self, seller, premium, policy=None, day=None):
+        policy, membership = policy or self.policy()
+        gadget = InsuredGadget(
+            policy=policy, membership=membership, seller=seller, pricing=self.pricing, device_type="smartphone",
+            device_model="14", purchase_date=date(2026, 1, 1), premium=Decimal(premium),
+        )
+        gadget.set_commission_shares(gadget.premium)
+        gadget.save()
+        if day is not None:
+            InsuredGadget.objects.filter(id=gadget.id).update(
+                created_at=timezone.make_aware(datetime.combine(day, time(12)))
+            )
+        return gadget
+
+    def counters(self, outlet, period="Day", period_start=None):
+        row = OutletPerformance.objects.get(device_outlet=outlet, period=period, period_start=period_start or self.today)
+        return {field: getattr(row, field) for field in OutletPerformance.COUNTERS}
+
+    def test_record_sales_adds_to_the_sellers_day_and_month(self):
+        policy = self.policy()
+        gadgets = [self.sell(self.shop, 100, policy), self.sell(self.shop, 200, policy), self.sell(self.shop, 50)]
+        gadgets += [self.sell(self.kiosk, 300), self.sell(None, 1000)]
+
+        # Per outlet: one INSERT making sure the rows exist and one UPDATE of both.
+        with self.assertNumQueries(4):
+            OutletPerformance.record_sales(gadgets)
+        OutletPerformance.record_sales([self.sell(self.shop, 10)])
+
+        shop = {"policies_sold": 3, "gadgets_insured": 4, "premium": Decimal("360"), "seller_commission": Decimal("36"), "claims": 0}
+        self.assertEqual(self.counters(self.shop), shop)
+        self.assertEqual(self.counters(self.shop, "Month", self.month), shop)
+        self.assertEqual(self.counters(self.kiosk)["premium"], Decimal("300"))
+        self.assertEqual(OutletPerformance.objects.count(), 4)
+
+    def test_count_claim_adds_to_the_day_of_the_claim(self):
+        lodged = timezone.now()
+        OutletPerformance.count_claim(self.shop.id, lodged, 1)
+        OutletPerformance.count_claim(self.shop.id, lodged, 1)
+        OutletPerformance.count_claim(self.shop.id, lodged, -1)
+        OutletPerformance.count_claim(None, lodged, 1)
+
+        self.assertEqual(self.counters(self.shop)["claims"], 1)
+        self.assertEqual(self.counters(self.shop, "Month", self.month)["claims"], 1)
+        self.assertEqual(OutletPerformance.objects.count(), 2)
+
+    def test_reconcile_recomputes_rows_from_gadgets_and_claims(self):
+        last_month = self.month - timedelta(days=1)
+        gadgets = [self.sell(self.shop, 100), self.sell(self.shop, 200), self.sell(self.kiosk, 300)]
+        OutletPerformance.record_sales(gadgets)
+        self.sell(self.shop, 400, day=last_month)
+        policy, _ = self.policy()
+        Claim.objects.create(
+            policy=policy, description="Cracked screen", claim_type="Damage", incident_date=self.today,
+            device_outlet=self.shop,
+        )
+        shop_row = OutletPerformance.objects.get(device_outlet=self.shop, period="Day", period_start=self.today)
+        # Drift: a lost increment and a row for sales that no longer exist.
+        OutletPerformance.objects.filter(id=shop_row.id).update(premium=0)
+        OutletPerformance.adjust(self.kiosk.id, self.today - timedelta(days=400), premium=Decimal("5"))
+
+        self.assertEqual(OutletPerformance.reconcile(), 6)
+
+        self.assertEqual(self.counters(self.shop), {
+            "policies_sold": 2, "gadgets_insured": 2, "premium": Decimal("300"), "seller_commission": Decimal("30"), "claims": 1,
+        })
+        self.assertEqual(self.counters(self.shop, "Month", last_month.replace(day=1))["premium"], Decimal("400"))
+        self.assertEqual(self.counters(self.kiosk, "Month", self.month)["premium"], Decimal("300"))
+        self.assertEqual(OutletPerformance.objects.count(), 6)
+        # Recomputed rows are updated in place.
+        self.assertTrue(OutletPerformance.objects.filter(id=shop_row.id).exists())
+
+    def test_reconcile_since_leaves_earlier_months_alone(self):
+        earlier = self.month - timedelta(days=40)
+        OutletPerformance.adjust(self.shop.id, earlier, premium=Decimal("7"))
+        OutletPerformance.record_sales([self.sell(self.shop, 100)])
+        OutletPerformance.objects.filter(period_start__gte=self.month).update(premium=0)
+
+        OutletPerformance.reconcile(since=self.today)
+
+        self.assertEqual(self.counters(self.shop)["premium"], Decimal("100"))
+        self.assertEqual(self.counters(self.shop, "Month", earlier.replace(day=1))["premium"], Decimal("7"))
+
+    def test_increments_after_reconcile_add_to_the_recomputed_rows(self):
+        OutletPerformance.record_sales([self.sell(self.shop, 100)])
+        OutletPerformance.reconcile(since=self.today)
+        OutletPerformance.record_sales([self.sell(self.shop, 50)])
+
+        self.assertEqual(self.counters(self.shop)["premium"], Decimal("150"))
+        OutletPerformance.reconcile(since=self.today)
+        self.assertEqual(self.counters(self.shop)["premium"], Decimal("150"))
+
+    def test_dashboard_reads_the_outlets_rows(self):
+        yesterday = self.today - timedelta(days=1)
+        OutletPerformance.adjust(self.shop.id, yesterday, policies_sold=1, gadgets_insured=2, premium=Decimal("200"))
+        OutletPerformance.adjust(self.shop.id, self.today, policies_sold=1, gadgets_insured=2, premium=Decimal("100"), claims=1)
+        OutletPerformance.adjust(self.kiosk.id, self.today, premium=Decimal("999"))
+        client = APIClient()
+        client.force_authenticate(self.agent)
+        url = f"/gadgets/device-outlets/{self.shop.id}/performance/"
+
+        response = client.get(url, {"period": "Day", "since": yesterday.isoformat()})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["period_start"] for row in response.data["results"]], [yesterday.isoformat(), self.today.isoformat()])
+        self.assertEqual(
+            (response.data["totals"]["premium"], response.data["totals"]["gadgets_insured"], response.data["totals"]["claim_rate"]),
+            ("300.00", 4, 0.25),
+        )
+        monthly = client.get(url, {"period": "Month"}).data["results"]
+        self.assertEqual(sum(Decimal(row["premium"]) for row in monthly), Decimal("300"))
+
+        client.force_authenticate(self.customer)
+        self.assertEqual(client.get(url).status_code, 403)
+
+    def test_leaderboard_ranks_outlets_by_the_metric(self):
+        third = self.outlet("OUT3")
+        OutletPerformance.adjust(self.shop.id, self.today, premium=Decimal("100"), policies_sold=5)
+        OutletPerformance.adjust(self.kiosk.id, self.today, premium=Decimal("300"), policies_sold=1)
+        OutletPerformance.adjust(third.id, self.today, premium=Decimal("200"), policies_sold=3)
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        url = "/gadgets/device-outlets/leaderboard/"
+
+        by_premium = client.get(url, {"period": "Month"}).data
+        by_policies = client.get(url, {"period": "Day", "metric": "policies_sold", "limit": 2}).data
+
+        self.assertEqual(by_premium["period_start"], self.month)
+        self.assertEqual(
+            [(entry["rank"], entry["outlet_number"]) for entry in by_premium["results"]],
+            [(1, "OUT2"), (2, "OUT3"), (3, "OUT1")],
+        )
+        self.assertEqual([entry["outlet_number"] for entry in by_policies["results"]], ["OUT1", "OUT3"])
@@ -3,7 +3,8 @@ from django.urls import path
 from apps.gadgets.views import (
     DeviceOutletAPIView, DeviceOutletDetailAPIView,
     InsuredGadgetAPIView, InsuredGadgetDetailAPIView,
-    GadgetPricingAPIView, GadgetPricingDetailAPIView, DeviceOutletOnboardingAPIView
+    GadgetPricingAPIView, GadgetPricingDetailAPIView, DeviceOutletOnboardingAPIView,
+    DeviceOutletAPIKeyAPIView, DeviceOutletPerformanceAPIView, DeviceOutletLeaderboardAPIView
 )
 
 urlpatterns = [
@@ -11,5 +12,8 @@ urlpatterns = [
     path("<int:pk>/details/", InsuredGadgetDetailAPIView.as_view(), name="gadget-details"),
     path("device-outlets/", DeviceOutletAPIView.as_view(), name="device-outlets"),
     path("device-outlets/<int:pk>/details/", DeviceOutletDetailAPIView.as_view(), name="device-outlet-details"),
+    path("device-outlets/<int:pk>/api-key/", DeviceOutletAPIKeyAPIView.as_view(), name="device-outlet-api-key"),
+    path("device-outlets/<int:pk>/performance/", DeviceOutletPerformanceAPIView.as_view(), name="device-outlet-performance"),
+    path("device-outlets/leaderboard/", DeviceOutletLeaderboardAPIView.as_view(), name="device-outlet-leaderboard"),
     path("device-outlets/onboarding/", DeviceOutletOnboardingAPIView.as_view(), name="device-outlet-onboarding"),
 ]
\ No newline at end of file
@@ -1,13 +1,22 @@
-from django.db import transaction
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
 from rest_framework import status, generics
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 
+from apps.users.identity import identity_keys
 from apps.users.models import User
 
 from apps.gadgets.models import (
-    InsuredGadget, DeviceOutlet
+    InsuredGadget, DeviceOutlet, OutletPerformance
 )
+from apps.core.constants import RollupPeriods
+from apps.core.profiling import SerializerTimingMixin
+from apps.core.throttling import IPTokenBucketThrottle, admission_controlled
 from apps.pricing.models import (
     GadgetPricing, GadgetPricingComponent
 )
@@ -15,7 +24,9 @@ from apps.pricing.models import (
 
 from apps.gadgets.serializers import (
     DeviceOutletSerializer, InsuredGadgetSerializer,
-    GadgetPricingSerializer, GadgetPricingComponentSerializer, DeviceOutletOnboardingSerializer
+    GadgetPricingSerializer, GadgetPricingComponentSerializer, DeviceOutletOnboardingSerializer,
+    OutletPerformanceSerializer, OutletLeaderboardEntrySerializer,
+    OutletPerformanceQuerySerializer, OutletLeaderboardQuerySerializer
 )
 # Create your views here.
 class DeviceOutletAPIView(generics.ListCreateAPIView):
@@ -35,6 +46,115 @@ class DeviceOutletDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
     lookup_field = "pk"
 
 
+class DeviceOutletAPIKeyAPIView(generics.GenericAPIView):
+    """Issue (or rotate) the API key an outlet's point-of-sale uses for batch sales."""
+    queryset = DeviceOutlet.objects.all()
+    permission_classes = [IsAuthenticated]
+
+    lookup_field = "pk"
+
+    def post(self, request, *args, **kwargs):
+        outlet = self.get_object()
+        if outlet.owner_id != request.user.id and request.user.role != "Admin":
+            return Response(
+                {"detail": "Only the outlet owner can issue its API key."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        api_key = outlet.rotate_api_key()
+
+        return Response(
+            {
+                "outlet_number": outlet.outlet_number,
+                "api_key": api_key,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class DeviceOutletPerformanceAPIView(generics.GenericAPIView):
+    """
+    An outlet's daily or monthly sales, commission and claim rate, read from
+    the ``OutletPerformance`` rollups: the last OUTLET_PERFORMANCE_DEFAULT_DAYS
+    days or OUTLET_PERFORMANCE_DEFAULT_MONTHS months unless ``since`` is given.
+    """
+    queryset = DeviceOutlet.objects.all()
+    permission_classes = [IsAuthenticated]
+
+    lookup_field = "pk"
+
+    def get(self, request, *args, **kwargs):
+        outlet = self.get_object()
+        if outlet.owner_id != request.user.id and request.user.role != "Admin":
+            return Response(
+                {"detail": "Only the outlet owner can view its performance."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        query = OutletPerformanceQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        period = query.validated_data["period"]
+        today = timezone.localdate()
+        since = query.validated_data.get("since")
+        if since is None:
+            if period == RollupPeriods.DAY.value:
+                since = today - timedelta(days=settings.OUTLET_PERFORMANCE_DEFAULT_DAYS - 1)
+            else:
+                months_back = today.year * 12 + today.month - settings.OUTLET_PERFORMANCE_DEFAULT_MONTHS
+                since = today.replace(year=months_back // 12, month=months_back % 12 + 1, day=1)
+        until = query.validated_data.get("until", today)
+
+        rows = list(
+            OutletPerformance.objects.filter(
+                device_outlet=outlet, period=period, period_start__gte=since, period_start__lte=until
+            ).order_by("period_start")[:settings.OUTLET_PERFORMANCE_MAX_ROWS]
+        )
+        totals = OutletPerformance(
+            device_outlet=outlet,
+            **{field: sum(getattr(row, field) for row in rows) for field in OutletPerformance.COUNTERS}
+        )
+        return Response({
+            "outlet_id": outlet.id,
+            "outlet_number": outlet.outlet_number,
+            "period": period,
+            "since": since,
+            "until": until,
+            "totals": {
+                field: value for field, value in OutletPerformanceSerializer(totals).data.items()
+                if field not in ("period", "period_start")
+            },
+            "results": OutletPerformanceSerializer(rows, many=True).data,
+        })
+
+
+class DeviceOutletLeaderboardAPIView(generics.GenericAPIView):
+    """Top outlets of a day or month by premium, policies, gadgets or commission."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        query = OutletLeaderboardQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        period = query.validated_data["period"]
+        period_start = query.validated_data.get("period_start", timezone.localdate())
+        if period == RollupPeriods.MONTH.value:
+            period_start = period_start.replace(day=1)
+        metric = query.validated_data["metric"]
+
+        rows = (
+            OutletPerformance.objects.filter(period=period, period_start=period_start)
+            .select_related("device_outlet")
+            .order_by(f"-{metric}", "device_outlet_id")[:query.validated_data["limit"]]
+        )
+        return Response({
+            "period": period,
+            "period_start": period_start,
+            "metric": metric,
+            "results": [
+                {"rank": rank, **entry}
+                for rank, entry in enumerate(OutletLeaderboardEntrySerializer(rows, many=True).data, start=1)
+            ],
+        })
+
+
 def _nz(value):
     if value is None:
         return None
@@ -45,7 +165,10 @@ def _nz(value):
 class DeviceOutletOnboardingAPIView(generics.GenericAPIView):
     serializer_class = DeviceOutletOnboardingSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [IPTokenBucketThrottle]
+    throttle_scope = "onboarding"
 
+    @admission_controlled("heavy-transactions")
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -56,46 +179,59 @@ class DeviceOutletOnboardingAPIView(generics.GenericAPIView):
         outlet_details = dict(vd["outlet_details"])
 
         username = login_email.lower().strip()
-        if User.objects.filter(username=username).exists():
+        # Also refuse details that belong to another account, since they are unique.
+        existing = Q(username=username)
+        keys = identity_keys(login_email, owner_details.get("phone_number"), owner_details.get("id_number"))
+        for field, value in keys.items():
+            if value is not None:
+                existing |= Q(**{field: value})
+        if User.objects.filter(existing).exists():
             return Response(
-                {"detail": "An account with this email already exists. Try logging in."},
+                {"detail": "An account with this email, phone number or ID number already exists. Try logging in."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        with transaction.atomic():
-            user = User.objects.create_user(
-                username=username,
-                email=login_email.strip(),
-                password=password,
-                first_name=owner_details.get("first_name", "") or "",
-                last_name=owner_details.get("last_name", "") or "",
-                phone_number=_nz(owner_details.get("phone_number")),
-                id_number=_nz(owner_details.get("id_number")),
-                passport_number=_nz(owner_details.get("passport_number")),
-                gender=owner_details.get("gender") or "Male",
-                address=_nz(owner_details.get("address")),
-                town=_nz(owner_details.get("town")),
-                county=_nz(owner_details.get("county")),
-                country=_nz(owner_details.get("country")) or "Kenya",
-                role="Sales Agent",
-                occupation="Sales Agent",
-            )
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    username=username,
+                    email=login_email.strip(),
+                    password=password,
+                    first_name=owner_details.get("first_name", "") or "",
+                    last_name=owner_details.get("last_name", "") or "",
+                    phone_number=_nz(owner_details.get("phone_number")),
+                    id_number=_nz(owner_details.get("id_number")),
+                    passport_number=_nz(owner_details.get("passport_number")),
+                    gender=owner_details.get("gender") or "Male",
+                    address=_nz(owner_details.get("address")),
+                    town=_nz(owner_details.get("town")),
+                    county=_nz(owner_details.get("county")),
+                    country=_nz(owner_details.get("country")) or "Kenya",
+                    role="Sales Agent",
+                    occupation="Sales Agent",
+                )
 
-            device_outlet = DeviceOutlet.objects.create(
-                owner=user,
-                agent_type=outlet_details.get("agent_type"),
-                outlet_number=_nz(outlet_details.get("outlet_number")),
-                name=outlet_details.get("name"),
-                email=outlet_details.get("email"),
-                phone_number=outlet_details.get("phone_number"),
-                website=outlet_details.get("website"),
-                business_registration_number=_nz(
-                    outlet_details.get("business_registration_number")
-                ),
-                tax_identification_number=_nz(outlet_details.get("tax_identification_number")),
-                location=outlet_details.get("location"),
-                city=outlet_details.get("city"),
-                country=outlet_details.get("country") or "Kenya",
+                device_outlet = DeviceOutlet.objects.create(
+                    owner=user,
+                    agent_type=outlet_details.get("agent_type"),
+                    outlet_number=_nz(outlet_details.get("outlet_number")),
+                    name=outlet_details.get("name"),
+                    email=outlet_details.get("email"),
+                    phone_number=outlet_details.get("phone_number"),
+                    website=outlet_details.get("website"),
+                    business_registration_number=_nz(
+                        outlet_details.get("business_registration_number")
+                    ),
+                    tax_identification_number=_nz(outlet_details.get("tax_identification_number")),
+                    location=outlet_details.get("location"),
+                    city=outlet_details.get("city"),
+                    country=outlet_details.get("country") or "Kenya",
+                )
+        except IntegrityError:
+            # A concurrent sign up took the same details after the check above.
+            return Response(
+                {"detail": "An account with this email, phone number or ID number already exists. Try logging in."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
         return Response(
@@ -112,25 +248,26 @@ class DeviceOutletOnboardingAPIView(generics.GenericAPIView):
         )
 
 
-class InsuredGadgetAPIView(generics.ListCreateAPIView):
-    queryset = InsuredGadget.objects.all().order_by("-created_at")
+class InsuredGadgetAPIView(SerializerTimingMixin, generics.ListCreateAPIView):
+    queryset = InsuredGadget.objects.select_related("seller").order_by("-created_at")
     serializer_class = InsuredGadgetSerializer
+    query_budget = {"GET": 5}
 
 
 class InsuredGadgetDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = InsuredGadget.objects.all().order_by("-created_at")
+    queryset = InsuredGadget.objects.select_related("seller").order_by("-created_at")
     serializer_class = InsuredGadgetSerializer
 
     lookup_field = "pk"
 
 
 class GadgetPricingAPIView(generics.ListCreateAPIView):
-    queryset = GadgetPricing.objects.all().order_by("-created_at")
+    queryset = GadgetPricing.objects.prefetch_related("pricingcomponents").order_by("-created_at")
     serializer_class = GadgetPricingSerializer
 
 
 class GadgetPricingDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = GadgetPricing.objects.all().order_by("-created_at")
+    queryset = GadgetPricing.objects.prefetch_related("pricingcomponents").order_by("-created_at")
     serializer_class = GadgetPricingSerializer
 
     lookup_field = "pk"
\ No newline at end of file
@@ -5,13 +5,16 @@ from apps.payments.models import Premium, PayerDetail, Payment
 @admin.register(Premium)
 class PremiumAdmin(admin.ModelAdmin):
     list_display = ["id", "membership", "scheme_group", "policy", "expected_amount", "due_date", "status"]
+    list_select_related = ["membership__user", "scheme_group__scheme", "policy"]
     
 
 @admin.register(PayerDetail)
 class PayerDetailAdmin(admin.ModelAdmin):
     list_display = ["id", "membership", "account_name", "account_type", "account_number"]
+    list_select_related = ["membership__user"]
 
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
-    list_display = ["id", "membership", "amount", "payment_method", "reference", "status"]
\ No newline at end of file
+    list_display = ["id", "membership", "amount", "payment_method", "reference", "status"]
+    list_select_related = ["membership__user"]
\ No newline at end of file
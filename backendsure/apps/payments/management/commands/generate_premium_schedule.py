@@ -0,0 +1,27 @@
+from datetime import date, datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.payments.premium_schedule import PremiumScheduleGenerator
+
+
+class Command(BaseCommand):
+    help = "Create the premiums due in a billing month for all billable memberships. Safe to re-run."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--period", help="Billing month as YYYY-MM (defaults to the current month)")
+        parser.add_argument("--chunk-size", type=int, default=PremiumScheduleGenerator.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        period = date.today()
+        if options["period"]:
+            try:
+                period = datetime.strptime(options["period"], "%Y-%m").date()
+            except ValueError:
+                raise CommandError("--period must be in YYYY-MM format")
+
+        result = PremiumScheduleGenerator(period=period, chunk_size=options["chunk_size"]).execute()
+        self.stdout.write(self.style.SUCCESS(
+            f"{result.period_start:%Y-%m}: {result.premiums_created} premiums created "
+            f"for {result.memberships_billed} memberships"
+        ))
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0008_payerdetail_phone_number'),
+        ('policies', '0013_policy_preferred_communication_channel'),
+        ('schemes', '0004_schemegroup'),
+        ('users', '0009_user_token'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='premium',
+            constraint=models.UniqueConstraint(fields=('membership', 'due_date'), name='unique_membership_premium_due_date'),
+        ),
+    ]
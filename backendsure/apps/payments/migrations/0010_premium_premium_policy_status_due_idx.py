@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0009_premium_unique_membership_premium_due_date'),
+        ('policies', '0013_policy_preferred_communication_channel'),
+        ('schemes', '0004_schemegroup'),
+        ('users', '0009_user_token'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='premium',
+            index=models.Index(fields=['policy', 'status', 'due_date'], name='premium_policy_status_due_idx'),
+        ),
+    ]
@@ -17,6 +17,14 @@ class Premium(AbstractBaseModel):
         default=PaymentStatuses.FUTURE.value
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["membership", "due_date"], name="unique_membership_premium_due_date")
+        ]
+        indexes = [
+            models.Index(fields=["policy", "status", "due_date"], name="premium_policy_status_due_idx"),
+        ]
+
     def __str__(self):
         return f"Premium {self.id} – {self.policy.policy_number}"
     
@@ -0,0 +1,131 @@
+import calendar
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+import logging
+
+from django.db.models import Exists, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from apps.core.constants import PolicyStatuses
+from apps.payments.models import Premium, PayerDetail
+from apps.users.models import Membership
+
+logger = logging.getLogger(__name__)
+
+
+BILLABLE_STATUSES = [PolicyStatuses.CREATED.value, PolicyStatuses.ACTIVE.value]
+
+
+@dataclass
+class PremiumScheduleResult:
+    period_start: date
+    period_end: date
+    memberships_billed: int
+    premiums_created: int
+
+
+def debit_order_due_date(period_start: date, debit_order_date: Optional[str], start_date: Optional[date]) -> date:
+    """
+    Due date within the billing month for a payer's debit order day.
+
+    Falls back to the policy start day when no debit order day was captured and
+    clamps days past the end of the month (a 31st debit runs on the 30th in June).
+    """
+    digits = "".join(c for c in str(debit_order_date or "") if c.isdigit())
+    day = int(digits) if digits else 0
+    if day < 1:
+        day = start_date.day if start_date else 1
+
+    last_day = calendar.monthrange(period_start.year, period_start.month)[1]
+    return period_start.replace(day=min(day, last_day))
+
+
+class PremiumScheduleGenerator:
+    """
+    Creates the monthly premium for every billable membership in one pass.
+
+    Memberships are streamed with their payer's debit order day resolved in the
+    same query, and premiums are written with ``bulk_create(ignore_conflicts=True)``
+    against the unique (membership, due_date) constraint, so a run can be repeated
+    or resumed without creating duplicates.
+    """
+
+    CHUNK_SIZE = 5000
+
+    def __init__(self, period: date, chunk_size: int = CHUNK_SIZE) -> None:
+        self.period_start = period.replace(day=1)
+        self.period_end = self.period_start.replace(
+            day=calendar.monthrange(self.period_start.year, self.period_start.month)[1]
+        )
+        self.chunk_size = chunk_size
+
+    def execute(self) -> PremiumScheduleResult:
+        existing = self._premiums_in_period().count()
+        billed = 0
+        batch = []
+
+        for membership_id, policy_id, scheme_group_id, amount, start_date, debit_order_date in self._billable_memberships():
+            batch.append(Premium(
+                policy_id=policy_id,
+                scheme_group_id=scheme_group_id,
+                membership_id=membership_id,
+                expected_amount=amount,
+                due_date=debit_order_due_date(self.period_start, debit_order_date, start_date),
+            ))
+            if len(batch) >= self.chunk_size:
+                billed += self._flush(batch)
+                batch = []
+        billed += self._flush(batch)
+
+        created = self._premiums_in_period().count() - existing
+        logger.info(
+            f"Premium schedule {self.period_start:%Y-%m}: {billed} memberships billed, {created} premiums created"
+        )
+        return PremiumScheduleResult(
+            period_start=self.period_start,
+            period_end=self.period_end,
+            memberships_billed=billed,
+            premiums_created=created,
+        )
+
+    def _premiums_in_period(self):
+        return Premium.objects.filter(due_date__range=(self.period_start, self.period_end))
+
+    def _billable_memberships(self):
+        """
+        Memberships on in-force policies that have no premium in the period yet,
+        billed for the main member's premium plus the dependents'.
+        """
+        membership_debit_day = PayerDetail.objects.filter(
+            membership=OuterRef("pk")
+        ).order_by("-id").values("debit_order_date")[:1]
+        policy_debit_day = PayerDetail.objects.filter(
+            policy=OuterRef("policy_id")
+        ).order_by("-id").values("debit_order_date")[:1]
+        premium_in_period = self._premiums_in_period().filter(membership=OuterRef("pk"))
+
+        return (
+            Membership.objects
+            .filter(
+                status__in=BILLABLE_STATUSES,
+                policy__status__in=BILLABLE_STATUSES,
+                policy__start_date__lte=self.period_end,
+            )
+            .filter(Q(policy__maturity_date__isnull=True) | Q(policy__maturity_date__gte=self.period_start))
+            .filter(~Exists(premium_in_period))
+            .annotate(monthly_premium=F("main_member_premium") + F("dependent_premium"))
+            .filter(monthly_premium__gt=0)
+            .annotate(debit_order_date=Coalesce(Subquery(membership_debit_day), Subquery(policy_debit_day)))
+            .values_list(
+                "id", "policy_id", "scheme_group_id", "monthly_premium",
+                "policy__start_date", "debit_order_date",
+            )
+            .order_by()
+            .iterator(chunk_size=self.chunk_size)
+        )
+
+    def _flush(self, batch) -> int:
+        if batch:
+            Premium.objects.bulk_create(batch, batch_size=self.chunk_size, ignore_conflicts=True)
+        return len(batch)
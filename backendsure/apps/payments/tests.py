@@ -1,3 +1,90 @@
+from datetime import date
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from apps.core.constants import PolicyStatuses
+from apps.payments.models import PayerDetail, Premium
+from apps.payments.premium_schedule import PremiumScheduleGenerator, debit_order_due_date
+from apps.policies.models import Policy
+from apps.schemes.models import Scheme, SchemeGroup
+from apps.users.models import Membership, User
+
+
+class DebitOrderDueDateTests(TestCase):
+    def test_uses_the_debit_order_day(self):
+        self.assertEqual(debit_order_due_date(date(2026, 3, 1), "15th", None), date(2026, 3, 15))
+
+    def test_clamps_to_the_end_of_short_months(self):
+        self.assertEqual(debit_order_due_date(date(2026, 6, 1), "31", None), date(2026, 6, 30))
+        self.assertEqual(debit_order_due_date(date(2026, 2, 1), "30", None), date(2026, 2, 28))
+        self.assertEqual(debit_order_due_date(date(2028, 2, 1), "31", None), date(2028, 2, 29))
+
+    def test_falls_back_to_the_policy_start_day(self):
+        self.assertEqual(debit_order_due_date(date(2026, 4, 1), None, date(2025, 1, 31)), date(2026, 4, 30))
+        self.assertEqual(debit_order_due_date(date(2026, 4, 1), "", None), date(2026, 4, 1))
+
+
+class PremiumScheduleTests(TestCase):
+    def setUp(self):
+        self.scheme = Scheme.objects.create(name="Funeral", scheme_type="Individual")
+
+    def membership(self, name, main_member_premium, dependent_premium=Decimal("0"), status=PolicyStatuses.ACTIVE.value,
+                   start_date=date(2026, 1, 31), debit_order_date=None):
+        user = User.objects.create(username=name, email=f"{name}@example.com")
+        policy = Policy.objects.create(
+            policy_number=name.upper(), policy_owner=user, status=status, start_date=start_date
+        )
+        scheme_group = SchemeGroup.objects.create(scheme=self.scheme, policy=policy)
+        membership = Membership.objects.create(
+            user=user, policy=policy, scheme_group=scheme_group, status=status,
+            main_member_premium=main_member_premium, dependent_premium=dependent_premium,
+            # Totals written before group purchases counted the main member.
+            total_premium=dependent_premium,
+        )
+        if debit_order_date is not None:
+            PayerDetail.objects.create(policy=policy, membership=membership, debit_order_date=debit_order_date)
+        return membership
+
+    def test_bills_main_member_and_dependents(self):
+        membership = self.membership("ann", Decimal("50"), Decimal("20"), debit_order_date="25")
+
+        result = PremiumScheduleGenerator(date(2026, 3, 10)).execute()
+
+        self.assertEqual((result.memberships_billed, result.premiums_created), (1, 1))
+        premium = Premium.objects.get(membership=membership)
+        self.assertEqual(premium.expected_amount, Decimal("70"))
+        self.assertEqual(premium.due_date, date(2026, 3, 25))
+
+    def test_rerunning_a_period_creates_nothing(self):
+        self.membership("ann", Decimal("50"))
+        self.membership("ben", Decimal("40"), debit_order_date="1")
+
+        first = PremiumScheduleGenerator(date(2026, 3, 1), chunk_size=1).execute()
+        with self.assertNumQueries(3):
+            second = PremiumScheduleGenerator(date(2026, 3, 1)).execute()
+
+        self.assertEqual(first.premiums_created, 2)
+        self.assertEqual((second.memberships_billed, second.premiums_created), (0, 0))
+        self.assertEqual(Premium.objects.count(), 2)
+
+    def test_month_end_start_dates_bill_on_the_last_day_of_short_months(self):
+        membership = self.membership("ann", Decimal("50"), start_date=date(2026, 1, 31))
+
+        for month in (2, 4):
+            PremiumScheduleGenerator(date(2026, month, 1)).execute()
+
+        self.assertEqual(
+            list(Premium.objects.filter(membership=membership).order_by("due_date").values_list("due_date", flat=True)),
+            [date(2026, 2, 28), date(2026, 4, 30)],
+        )
+
+    def test_skips_memberships_that_are_not_billable(self):
+        self.membership("ann", Decimal("50"), status=PolicyStatuses.CANCELLED.value)
+        self.membership("ben", Decimal("0"))
+        self.membership("cat", Decimal("50"), start_date=date(2026, 4, 1))
+
+        result = PremiumScheduleGenerator(date(2026, 3, 1)).execute()
+
+        self.assertEqual(result.memberships_billed, 0)
+        self.assertFalse(Premium.objects.exists())
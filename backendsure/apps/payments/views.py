@@ -3,29 +3,48 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
 
+from apps.core.async_views import AsyncAPIView
+from apps.core.idempotency import idempotent
+from apps.core.profiling import SerializerTimingMixin
 from apps.payments.models import Premium, PayerDetail, Payment
 from apps.payments.serializers import (
     PremiumSerializer, PayerDetailSerializer, PaymentSerializer
 )
 # Create your views here.
-class PremiumAPIView(generics.ListCreateAPIView):
+class PremiumAPIView(SerializerTimingMixin, generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
-    queryset = Premium.objects.all().order_by("-created_at")
+    queryset = Premium.objects.select_related("policy").order_by("-created_at")
     serializer_class = PremiumSerializer
+    query_budget = {"GET": 5}
 
 class PremiumDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
-    queryset = Premium.objects.all().order_by("-created_at")
+    queryset = Premium.objects.select_related("policy").order_by("-created_at")
     serializer_class = PremiumSerializer
 
     lookup_field = "pk"
 
 
+class CustomerPremiumAPIView(AsyncAPIView):
+    """Premiums due on the signed in customer's own policies."""
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request, *args, **kwargs):
+        queryset = Premium.objects.select_related("policy").filter(
+            policy__policy_owner=request.user
+        ).order_by("-created_at")
+        return await self.paginate(queryset, PremiumSerializer)
+
+
 class PaymentAPIView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
     queryset = Payment.objects.all().order_by("-created_at")
     serializer_class = PaymentSerializer
 
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        return self.create(request, *args, **kwargs)
+
 class PaymentDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
     queryset = Payment.objects.all().order_by("-created_at")
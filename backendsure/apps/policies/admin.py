@@ -1,12 +1,34 @@
 from django.contrib import admin
 
+from apps.core.constants import PolicyStatuses
 from apps.policies.models import Policy, PolicyStatusUpdate
+from apps.policies.status_engine import PolicyStatusEngine
+
+
+def _transition_action(next_status):
+    def action(modeladmin, request, queryset):
+        result = PolicyStatusEngine().transition(
+            queryset.values_list("id", flat=True).order_by("id"), next_status
+        )
+        modeladmin.message_user(request, f"{result.policies_updated} policies moved to {next_status}.")
+    action.__name__ = f"mark_{next_status.lower()}"
+    action.short_description = f"Mark selected policies as {next_status}"
+    return action
+
+
 # Register your models here.
 @admin.register(Policy)
 class PolicyAdmin(admin.ModelAdmin):
-    list_display = ["id", "policy_number", "cover_amount", "premium", "start_date"]
+    list_display = ["id", "policy_number", "cover_amount", "premium", "start_date", "status"]
+    list_filter = ["status"]
+    actions = [
+        _transition_action(PolicyStatuses.ACTIVE.value),
+        _transition_action(PolicyStatuses.LAPSED.value),
+        _transition_action(PolicyStatuses.CANCELLED.value),
+    ]
     
     
 @admin.register(PolicyStatusUpdate)
 class PolicyStatusUpdateAdmin(admin.ModelAdmin):
-    list_display = ["id", "policy", "previous_status", "next_status", "created_at"]
\ No newline at end of file
+    list_display = ["id", "policy", "previous_status", "next_status", "created_at"]
+    list_select_related = ["policy"]
\ No newline at end of file
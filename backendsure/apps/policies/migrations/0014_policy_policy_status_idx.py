@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('policies', '0013_policy_preferred_communication_channel'),
+        ('pricing', '0009_gadgetpricingcomponent_included_and_more'),
+        ('products', '0003_product_policy_number_prefix'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='policy',
+            index=models.Index(fields=['status'], name='policy_status_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('policies', '0014_policy_policy_status_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='policy',
+            name='policy_document_hash',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+    ]
@@ -13,11 +13,17 @@ class Policy(AbstractBaseModel):
     premium = models.DecimalField(max_digits=100, decimal_places=2, default=Decimal('0'))
     cover_amount = models.DecimalField(max_digits=100, decimal_places=2, default=Decimal('0'))
     policy_document = models.FileField(upload_to="policy_documents/", null=True)
+    policy_document_hash = models.CharField(max_length=64, null=True, editable=False)
     policy_owner = models.ForeignKey("users.User", on_delete=models.SET_NULL, null=True)
     gadget_pricing = models.ForeignKey("pricing.GadgetPricing", on_delete=models.SET_NULL, null=True)
     purchase_channel = models.CharField(max_length=255, default="Direct")
     payment_method = models.CharField(max_length=255, default="Mpesa")
     preferred_communication_channel = models.CharField(max_length=255, default="Email")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status"], name="policy_status_idx"),
+        ]
     
     def __str__(self):
         return self.policy_number    
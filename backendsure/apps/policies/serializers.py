@@ -6,6 +6,7 @@ from apps.policies.models import (
 from apps.gadgets.serializers import InsuredGadgetSerializer, GadgetPricingSerializer
 from apps.payments.serializers import PremiumSerializer
 from apps.claims.serializers import ClaimSerializer
+from apps.policies.status_engine import ALLOWED_TRANSITIONS
 
 
 class PolicyStatusUpdateSerializer(serializers.ModelSerializer):
@@ -34,3 +35,16 @@ class PoliciesDetailSerializer(serializers.ModelSerializer):
         model = Policy
         fields = "__all__"
 
+
+class PolicyStatusTransitionSerializer(serializers.Serializer):
+    next_status = serializers.ChoiceField(choices=list(ALLOWED_TRANSITIONS))
+    policy_ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    policy_numbers = serializers.ListField(child=serializers.CharField(), required=False, default=list)
+    payment_references = serializers.ListField(child=serializers.CharField(), required=False, default=list)
+
+    def validate(self, attrs):
+        if not (attrs["policy_ids"] or attrs["policy_numbers"] or attrs["payment_references"]):
+            raise serializers.ValidationError(
+                "Provide policy_ids, policy_numbers or payment_references to transition."
+            )
+        return attrs
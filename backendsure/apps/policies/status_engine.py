@@ -0,0 +1,160 @@
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Iterable, List, Optional, Tuple
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from apps.core.constants import PolicyStatuses, PaymentStatuses
+from apps.policies.models import Policy, PolicyStatusUpdate
+from apps.users.models import Membership, MembershipStatusUpdate
+from apps.payments.models import Premium
+from apps.notifications.models import NotificationStorage
+
+logger = logging.getLogger(__name__)
+
+
+IN_FORCE_STATUSES = [PolicyStatuses.CREATED.value, PolicyStatuses.ACTIVE.value]
+
+# Statuses a policy may move to, keyed by the status it is moving to.
+ALLOWED_TRANSITIONS = {
+    PolicyStatuses.ACTIVE.value: [PolicyStatuses.DRAFT.value, PolicyStatuses.CREATED.value, PolicyStatuses.LAPSED.value],
+    PolicyStatuses.LAPSED.value: IN_FORCE_STATUSES,
+    PolicyStatuses.CANCELLED.value: [PolicyStatuses.DRAFT.value, PolicyStatuses.CREATED.value, PolicyStatuses.ACTIVE.value, PolicyStatuses.LAPSED.value],
+    PolicyStatuses.DEACTIVATED.value: [PolicyStatuses.CREATED.value, PolicyStatuses.ACTIVE.value, PolicyStatuses.LAPSED.value],
+}
+
+NOTIFICATION_CATEGORIES = {
+    PolicyStatuses.LAPSED.value: "Policy Lapsed",
+    PolicyStatuses.CANCELLED.value: "Policy Cancelled",
+}
+
+
+@dataclass
+class StatusTransitionResult:
+    next_status: str
+    policies_updated: int = 0
+    memberships_updated: int = 0
+    notifications_queued: int = 0
+
+
+class PolicyStatusEngine:
+    """
+    Moves policies and their memberships between statuses in bulk.
+
+    Work is done in chunks of policy ids: each chunk is one transaction with a
+    set-based UPDATE per table and bulk inserts for the status history rows and
+    queued notifications.
+    """
+
+    CHUNK_SIZE = 2000
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE) -> None:
+        self.chunk_size = chunk_size
+
+    def lapse_overdue(self, as_of: Optional[date] = None, grace_days: Optional[int] = None) -> StatusTransitionResult:
+        """Lapse in-force policies with a premium still unpaid past the grace period."""
+        as_of = as_of or date.today()
+        if grace_days is None:
+            grace_days = settings.POLICY_LAPSE_GRACE_DAYS
+        cutoff = as_of - timedelta(days=grace_days)
+
+        overdue_premiums = Premium.objects.filter(
+            policy=OuterRef("pk"),
+            due_date__lt=cutoff,
+        ).exclude(status=PaymentStatuses.PAID.value)
+
+        overdue_policies = (
+            Policy.objects
+            .filter(status__in=IN_FORCE_STATUSES)
+            .filter(Exists(overdue_premiums))
+            .values_list("id", flat=True)
+            .order_by("id")
+        )
+
+        # Keyset over the ids rather than holding a cursor open while the same rows are updated.
+        result = StatusTransitionResult(next_status=PolicyStatuses.LAPSED.value)
+        last_id = 0
+        while True:
+            chunk = list(overdue_policies.filter(id__gt=last_id)[:self.chunk_size])
+            if not chunk:
+                break
+            self._transition_chunk(chunk, PolicyStatuses.LAPSED.value, result)
+            last_id = chunk[-1]
+
+        logger.info(
+            f"Lapse run as of {as_of} (grace {grace_days} days): {result.policies_updated} policies lapsed"
+        )
+        return result
+
+    def transition(self, policy_ids: Iterable[int], next_status: str) -> StatusTransitionResult:
+        """Move the given policies (and their memberships) to ``next_status``."""
+        if next_status not in ALLOWED_TRANSITIONS:
+            raise ValueError(f"Policies cannot be moved to {next_status}")
+
+        result = StatusTransitionResult(next_status=next_status)
+        chunk: List[int] = []
+        for policy_id in policy_ids:
+            chunk.append(policy_id)
+            if len(chunk) >= self.chunk_size:
+                self._transition_chunk(chunk, next_status, result)
+                chunk = []
+        if chunk:
+            self._transition_chunk(chunk, next_status, result)
+        return result
+
+    @transaction.atomic
+    def _transition_chunk(self, policy_ids: List[int], next_status: str, result: StatusTransitionResult) -> None:
+        allowed_from = ALLOWED_TRANSITIONS[next_status]
+
+        policies: List[Tuple[int, str, str]] = list(
+            Policy.objects
+            .select_for_update()
+            .filter(id__in=policy_ids, status__in=allowed_from)
+            .values_list("id", "status", "preferred_communication_channel")
+        )
+        if not policies:
+            return
+        ids = [policy_id for policy_id, _, _ in policies]
+
+        Policy.objects.filter(id__in=ids).update(status=next_status)
+        PolicyStatusUpdate.objects.bulk_create([
+            PolicyStatusUpdate(policy_id=policy_id, previous_status=previous_status, next_status=next_status)
+            for policy_id, previous_status, _ in policies
+        ])
+
+        # Memberships move under the same rule as their policy, so a member
+        # cancelled on an active policy is not brought back by a reinstatement.
+        memberships = list(
+            Membership.objects
+            .select_for_update()
+            .filter(policy_id__in=ids, status__in=allowed_from)
+            .values_list("id", "status", "policy_id", "user_id")
+        )
+        Membership.objects.filter(id__in=[membership_id for membership_id, _, _, _ in memberships]).update(status=next_status)
+        MembershipStatusUpdate.objects.bulk_create([
+            MembershipStatusUpdate(membership_id=membership_id, previous_status=previous_status, next_status=next_status)
+            for membership_id, previous_status, _, _ in memberships
+        ])
+
+        category = NOTIFICATION_CATEGORIES.get(next_status)
+        notifications = []
+        if category:
+            channels = {policy_id: channel for policy_id, _, channel in policies}
+            notifications = NotificationStorage.objects.bulk_create([
+                NotificationStorage(
+                    title=category,
+                    policy_id=policy_id,
+                    user_id=user_id,
+                    notification_category=category,
+                    notification_channel=channels[policy_id],
+                    status="Pending",
+                )
+                for _, _, policy_id, user_id in memberships
+            ])
+
+        result.policies_updated += len(policies)
+        result.memberships_updated += len(memberships)
+        result.notifications_queued += len(notifications)
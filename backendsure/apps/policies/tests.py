@@ -1,3 +1,167 @@
+from datetime import date
+
 from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.core.constants import PolicyStatuses
+from apps.notifications.models import NotificationStorage
+from apps.payments.models import Premium
+from apps.policies.models import Policy, PolicyStatusUpdate
+from apps.policies.status_engine import PolicyStatusEngine
+from apps.schemes.models import Scheme, SchemeGroup
+from apps.users.models import Membership, MembershipStatusUpdate, User
+
+CREATED = PolicyStatuses.CREATED.value
+ACTIVE = PolicyStatuses.ACTIVE.value
+LAPSED = PolicyStatuses.LAPSED.value
+CANCELLED = PolicyStatuses.CANCELLED.value
+DEACTIVATED = PolicyStatuses.DEACTIVATED.value
+
+
+class CustomerPolicyTests(TestCase):
+    def test_lists_only_the_customers_own_policies(self):
+        jane = User.objects.create(username="jane", email="jane@example.com", role="Policy Owner")
+        sam = User.objects.create(username="sam", email="sam@example.com", role="Policy Owner")
+        for i in range(12):
+            Policy.objects.create(policy_number=f"GDT_{i}", policy_owner=jane)
+        Policy.objects.create(policy_number="GDT_SAM", policy_owner=sam)
+        client = APIClient()
+        client.force_authenticate(jane)
+
+        response = client.get("/policies/my-policies/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 12)
+        self.assertIsNotNone(response.data["next"])
+        response = client.get(response.data["next"])
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_requires_authentication(self):
+        self.assertEqual(APIClient().get("/policies/my-policies/").status_code, 401)
+
+    async def test_served_by_the_async_client(self):
+        jane = await User.objects.acreate(username="jane", email="jane@example.com", role="Policy Owner")
+        await Policy.objects.acreate(policy_number="GDT_1", policy_owner=jane)
+        headers = {"Authorization": f"Bearer {RefreshToken.for_user(jane).access_token}"}
+
+        response = await self.async_client.get("/policies/my-policies/", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 1)
+
+        response = await self.async_client.get("/policies/policies-search/?search=gdt_1", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]["policy_number"], "GDT_1")
+
+        response = await self.async_client.get("/policies/policies-search/?search=GDT_2", headers=headers)
+        self.assertEqual(response.status_code, 404)
+
+
+class PolicyStatusEngineTests(TestCase):
+    def setUp(self):
+        self.scheme = Scheme.objects.create(name="Funeral", scheme_type="Group")
+        self.count = 0
+
+    def policy(self, status, member_statuses=None):
+        """A policy in ``status`` with a membership per entry of ``member_statuses`` (default: one in ``status``)."""
+        self.count += 1
+        policy = Policy.objects.create(policy_number=f"FAM_{self.count}", status=status)
+        scheme_group = SchemeGroup.objects.create(scheme=self.scheme, policy=policy)
+        for i, member_status in enumerate(member_statuses or [status]):
+            user = User.objects.create(username=f"m{self.count}_{i}", email=f"m{self.count}_{i}@example.com")
+            Membership.objects.create(user=user, policy=policy, scheme_group=scheme_group, status=member_status)
+        return policy
+
+    def statuses(self, policy):
+        policy.refresh_from_db()
+        members = list(Membership.objects.filter(policy=policy).order_by("id").values_list("status", flat=True))
+        return policy.status, members
+
+    def test_each_transition_moves_the_policies_allowed_to_make_it(self):
+        cases = [
+            (ACTIVE, [CREATED, LAPSED], [CANCELLED, DEACTIVATED]),
+            (LAPSED, [CREATED, ACTIVE], [CANCELLED, LAPSED]),
+            (CANCELLED, [CREATED, ACTIVE, LAPSED], [DEACTIVATED]),
+            (DEACTIVATED, [CREATED, ACTIVE, LAPSED], [CANCELLED]),
+        ]
+        for next_status, allowed, refused in cases:
+            with self.subTest(next_status=next_status):
+                moved = [self.policy(status) for status in allowed]
+                kept = [self.policy(status) for status in refused]
+
+                result = PolicyStatusEngine().transition([policy.id for policy in moved + kept], next_status)
+
+                self.assertEqual((result.policies_updated, result.memberships_updated), (len(moved), len(moved)))
+                for policy in moved:
+                    self.assertEqual(self.statuses(policy), (next_status, [next_status]))
+                for policy, status in zip(kept, refused):
+                    self.assertEqual(self.statuses(policy), (status, [status]))
+                self.assertEqual(
+                    PolicyStatusUpdate.objects.filter(policy__in=moved, next_status=next_status).count(), len(moved)
+                )
+
+    def test_unknown_target_status_is_refused(self):
+        with self.assertRaises(ValueError):
+            PolicyStatusEngine().transition([self.policy(ACTIVE).id], CREATED)
+
+    def test_memberships_only_move_from_an_allowed_status(self):
+        lapsed = self.policy(LAPSED, [LAPSED, CANCELLED, DEACTIVATED])
+
+        result = PolicyStatusEngine().transition([lapsed.id], ACTIVE)
+
+        self.assertEqual(self.statuses(lapsed), (ACTIVE, [ACTIVE, CANCELLED, DEACTIVATED]))
+        self.assertEqual(result.memberships_updated, 1)
+        self.assertEqual(
+            list(MembershipStatusUpdate.objects.filter(next_status=ACTIVE).values_list("previous_status", flat=True)),
+            [LAPSED],
+        )
+
+    def test_lapse_queues_a_notification_per_member_moved(self):
+        policy = self.policy(ACTIVE, [ACTIVE, ACTIVE, CANCELLED])
+
+        result = PolicyStatusEngine().transition([policy.id], LAPSED)
+
+        self.assertEqual(result.notifications_queued, 2)
+        self.assertEqual(NotificationStorage.objects.filter(policy=policy, notification_category="Policy Lapsed").count(), 2)
+
+    def test_statements_per_chunk_do_not_grow_with_policies(self):
+        small = [self.policy(ACTIVE).id for _ in range(2)]
+        large = [self.policy(ACTIVE, [ACTIVE] * 3).id for _ in range(20)]
+
+        # Savepoint, policy lock, update, history, membership lock, update,
+        # history, notifications, release.
+        with self.assertNumQueries(9):
+            PolicyStatusEngine().transition(small, LAPSED)
+        with self.assertNumQueries(9):
+            result = PolicyStatusEngine().transition(large, LAPSED)
+        self.assertEqual((result.policies_updated, result.memberships_updated), (20, 60))
+
+    def test_chunks_are_separate_transactions(self):
+        policy_ids = [self.policy(ACTIVE).id for _ in range(5)]
+
+        with self.assertNumQueries(3 * 9):
+            result = PolicyStatusEngine(chunk_size=2).transition(policy_ids, CANCELLED)
+        self.assertEqual(result.policies_updated, 5)
+
+    def test_lapse_overdue_lapses_in_force_policies_past_the_grace_period(self):
+        overdue = self.policy(ACTIVE)
+        within_grace = self.policy(ACTIVE)
+        paid = self.policy(CREATED)
+        already_cancelled = self.policy(CANCELLED)
+        for policy, due_date, status in [
+            (overdue, date(2026, 1, 1), "Future"),
+            (within_grace, date(2026, 2, 20), "Future"),
+            (paid, date(2026, 1, 1), "Paid"),
+            (already_cancelled, date(2026, 1, 1), "Future"),
+        ]:
+            Premium.objects.create(
+                policy=policy, membership=Membership.objects.get(policy=policy), expected_amount=100,
+                due_date=due_date, status=status,
+            )
+
+        result = PolicyStatusEngine(chunk_size=1).lapse_overdue(as_of=date(2026, 3, 1), grace_days=30)
 
-# Create your tests here.
+        self.assertEqual(result.policies_updated, 1)
+        self.assertEqual(self.statuses(overdue), (LAPSED, [LAPSED]))
+        self.assertEqual(self.statuses(within_grace), (ACTIVE, [ACTIVE]))
+        self.assertEqual(self.statuses(paid), (CREATED, [CREATED]))
+        self.assertEqual(self.statuses(already_cancelled), (CANCELLED, [CANCELLED]))
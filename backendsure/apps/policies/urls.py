@@ -1,11 +1,13 @@
 from django.urls import path
 from apps.policies.views import (
     PolicyAPIView, PolicyDetailAPIView,
-    PolicySearchAPIView
+    PolicySearchAPIView, PolicyStatusTransitionAPIView, CustomerPolicyAPIView
 )
 
 urlpatterns = [
     path("", PolicyAPIView.as_view(), name="policies"),
     path("<int:pk>/details/", PolicyDetailAPIView.as_view(), name="policy-details"),
-    path("policies-search/", PolicySearchAPIView.as_view(), name="policies-search")
+    path("policies-search/", PolicySearchAPIView.as_view(), name="policies-search"),
+    path("my-policies/", CustomerPolicyAPIView.as_view(), name="customer-policies"),
+    path("status-transitions/", PolicyStatusTransitionAPIView.as_view(), name="policy-status-transitions"),
 ]
\ No newline at end of file
@@ -1,20 +1,30 @@
 from rest_framework import status, generics
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q
+from django.db.models import Q, Prefetch
 
 
 
 from apps.policies.models import Policy, PolicyStatusUpdate
-from apps.policies.serializers import PoliciesSerializer, PoliciesDetailSerializer
+from apps.policies.serializers import (
+    PoliciesSerializer, PoliciesDetailSerializer, PolicyStatusTransitionSerializer
+)
+from apps.policies.status_engine import PolicyStatusEngine
+from apps.payments.models import Payment, Premium
+from apps.gadgets.models import InsuredGadget
+from apps.core.async_views import AsyncAPIView
+from apps.core.audit import record_action
+from apps.core.constants import UserActionTypes
+from apps.core.profiling import SerializerTimingMixin
 
 # Create your views here.
-class PolicyAPIView(generics.ListCreateAPIView):
+class PolicyAPIView(SerializerTimingMixin, generics.ListCreateAPIView):
     serializer_class = PoliciesSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 5}
 
     def get_queryset(self):
-        queryset = Policy.objects.all().order_by("-created_at")
+        queryset = Policy.objects.select_related("policy_owner").order_by("-created_at")
         user = self.request.user
 
         if user.role != "Admin":
@@ -24,19 +34,30 @@ class PolicyAPIView(generics.ListCreateAPIView):
 
 
 
-class PolicyDetailAPIView(generics.RetrieveAPIView):
-    queryset = Policy.objects.all().order_by("-created_at")
+def policy_detail_queryset():
+    """Policies with everything PoliciesDetailSerializer nests loaded up front."""
+    return Policy.objects.select_related("policy_owner", "gadget_pricing").prefetch_related(
+        Prefetch("policy_gadgets", queryset=InsuredGadget.objects.select_related("seller")),
+        Prefetch("policypremiums", queryset=Premium.objects.select_related("policy")),
+        "policy_status_updates",
+        "policy_claims",
+        "gadget_pricing__pricingcomponents",
+    )
+
+
+class PolicyDetailAPIView(SerializerTimingMixin, generics.RetrieveAPIView):
+    queryset = policy_detail_queryset().order_by("-created_at")
     serializer_class = PoliciesDetailSerializer
+    query_budget = {"GET": 12}
 
     lookup_field = "pk"
 
 
 
-class PolicySearchAPIView(generics.ListAPIView):
-    serializer_class = PoliciesDetailSerializer
+class PolicySearchAPIView(AsyncAPIView):
     permission_classes = [IsAuthenticated]
 
-    def list(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         search = request.query_params.get("search")
 
         if not search:
@@ -47,15 +68,64 @@ class PolicySearchAPIView(generics.ListAPIView):
 
         search = search.upper()
 
-        queryset = Policy.objects.filter(
-            Q(policy_number=search) | Q(policy_owner__id_number=search)
-        )
+        policies = [
+            policy async for policy in policy_detail_queryset().filter(
+                Q(policy_number=search) | Q(policy_owner__id_number=search)
+            )
+        ]
 
-        if not queryset.exists():
+        if not policies:
             return Response(
                 {"detail": "Policies not found."},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        serializer = self.get_serializer(queryset, many=True)
+        serializer = PoliciesDetailSerializer(policies, many=True, context=self.get_serializer_context())
         return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class CustomerPolicyAPIView(AsyncAPIView):
+    """The signed in customer's own policies."""
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request, *args, **kwargs):
+        queryset = Policy.objects.select_related("policy_owner").filter(
+            policy_owner=request.user
+        ).order_by("-created_at")
+        return await self.paginate(queryset, PoliciesSerializer)
+
+
+class PolicyStatusTransitionAPIView(generics.GenericAPIView):
+    """Bulk status change, e.g. activating every policy paid in a bank statement."""
+    serializer_class = PolicyStatusTransitionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        if request.user.role != "Admin":
+            return Response(
+                {"detail": "You do not have permission to change policy statuses."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        policy_ids = set(data["policy_ids"])
+        if data["policy_numbers"]:
+            policy_ids.update(
+                Policy.objects.filter(policy_number__in=data["policy_numbers"]).values_list("id", flat=True)
+            )
+        if data["payment_references"]:
+            policy_ids.update(
+                Payment.objects.filter(reference__in=data["payment_references"]).values_list("membership__policy_id", flat=True)
+            )
+
+        result = PolicyStatusEngine().transition(sorted(policy_ids), data["next_status"])
+        record_action(
+            "Bulk policy status change",
+            UserActionTypes.UPDATED.value,
+            actor=request.user,
+            changes={"next_status": data["next_status"], "policy_ids": sorted(policy_ids), **result.__dict__},
+        )
+        return Response(result.__dict__, status=status.HTTP_200_OK)
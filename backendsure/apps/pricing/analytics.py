@@ -0,0 +1,374 @@
+"""
+Loss ratios, claim frequency and claim severity of the book, for pricing.
+
+The book is read once into NumPy arrays, ``PORTFOLIO_ANALYTICS_CHUNK_SIZE``
+rows per query by keyset on the primary key. Each chunk is fetched with a plain
+cursor, skipping model instances and field converters. Every grouping after
+that is a handful of ``np.bincount`` calls, so all dimensions of one report
+come from a single pass over policies, insured gadgets and claims.
+
+Policies are grouped by product, gadget pricing and start month (the
+underwriting month, so each month's claims are set against the premium written
+that month). Insured gadgets are grouped by selling outlet, device brand and
+device type. Claims are linked to policies, not devices, so a policy's claims
+are shared equally between its gadgets.
+
+* written premium is ``Policy.premium`` (``InsuredGadget.premium`` per gadget);
+* earned premium is the part of the term elapsed by ``as_of``, and the term
+  runs from the start to the maturity date, or one year without one;
+* exposure is in years in force by ``as_of`` (device years for gadgets);
+* claims are those with an incident by ``as_of``, except failed ones, at
+  their estimated cost;
+* loss ratio = incurred / earned premium, frequency = claims per exposure
+  year, severity = incurred per claim.
+
+Reports are kept in the default cache for PORTFOLIO_ANALYTICS_CACHE_SECONDS,
+so they are shared by every worker using the same cache backend;
+``python manage.py portfolio_analytics`` recomputes and re-caches one.
+"""
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from apps.claims.models import Claim
+from apps.core.constants import AnalyticsDimensions, ClaimStatuses, PolicyStatuses
+from apps.gadgets.models import DeviceOutlet, InsuredGadget
+from apps.policies.models import Policy
+from apps.pricing.models import GadgetPricing
+from apps.products.models import Product
+
+DAYS_PER_YEAR = 365.25
+UNKNOWN = "Unknown"
+MEASURES = ("units", "written_premium", "earned_premium", "exposure_years", "claims", "incurred")
+
+
+def fetch_columns(queryset: QuerySet, fields: Sequence[str], chunk_size: int) -> Iterator[List[Tuple[Any, ...]]]:
+    """
+    Yield the ``fields`` of ``queryset`` column by column, ``chunk_size`` rows at
+    a time; the first field must be ``id``.
+    """
+    last_id = 0
+    while True:
+        chunk = queryset.filter(id__gt=last_id).order_by("id").values_list(*fields)[:chunk_size]
+        sql, params = chunk.query.get_compiler(using=chunk.db).as_sql()
+        with connections[chunk.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        if not rows:
+            return
+        yield list(zip(*rows))
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1][0]
+
+
+def _ids(column: Sequence[Any]) -> np.ndarray:
+    """Foreign keys as int64, with -1 for NULL."""
+    return np.nan_to_num(np.array(column, dtype=np.float64), nan=-1).astype(np.int64)
+
+
+def _amounts(column: Sequence[Any]) -> np.ndarray:
+    return np.nan_to_num(np.array(column, dtype=np.float64))
+
+
+def _days(column: Sequence[Any]) -> np.ndarray:
+    """Dates (``date`` objects or ISO strings, depending on the backend) as datetime64[D]."""
+    return np.array(column, dtype="datetime64[D]")
+
+
+def _concatenate(chunks: List[np.ndarray], dtype: Any) -> np.ndarray:
+    return np.concatenate(chunks) if chunks else np.array([], dtype=dtype)
+
+
+class _Labels:
+    """Integer codes for free-text values, ignoring case and surrounding spaces."""
+
+    def __init__(self) -> None:
+        self.codes: Dict[str, int] = {}
+        self.labels: List[str] = []
+
+    def encode(self, column: Sequence[Any]) -> np.ndarray:
+        values = np.array(column, dtype=object)
+        values[values == None] = ""  # noqa: E711 - elementwise comparison
+        uniques, inverse = np.unique(values.astype(str), return_inverse=True)
+        mapping = np.empty(len(uniques), dtype=np.int64)
+        for i, value in enumerate(uniques):
+            label = " ".join(value.split()) or UNKNOWN
+            mapping[i] = self.codes.setdefault(label.casefold(), len(self.labels))
+            if mapping[i] == len(self.labels):
+                self.labels.append(label)
+        return mapping[inverse.reshape(-1)]
+
+
+@dataclass
+class Book:
+    """The policies, insured gadgets and claims of a report, as column arrays."""
+    as_of: date
+    # One entry per policy, in id order.
+    policy_ids: np.ndarray
+    products: np.ndarray
+    gadget_pricings: np.ndarray
+    months: np.ndarray
+    written: np.ndarray
+    earned: np.ndarray
+    exposure: np.ndarray
+    claims: np.ndarray
+    incurred: np.ndarray
+    # One entry per insured gadget; ``gadget_policies`` indexes the policy arrays.
+    gadget_policies: np.ndarray
+    outlets: np.ndarray
+    brands: np.ndarray
+    device_types: np.ndarray
+    gadget_written: np.ndarray
+    brand_labels: List[str]
+    device_type_labels: List[str]
+
+
+def days_in_force(starts: np.ndarray, maturities: np.ndarray, as_of: date) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Days each policy has been in force by ``as_of``, and the days in its term,
+    which ends at the maturity date or a year after the start. Policies without
+    a start date have no term, so are never in force.
+    """
+    started = ~np.isnat(starts)
+    ends = np.where(np.isnat(maturities), starts + np.timedelta64(365, "D"), maturities)
+    term_days = np.maximum(np.where(started, (ends - starts).astype(np.int64), 1), 1).astype(np.float64)
+    in_force_days = np.where(started, (np.minimum(ends, np.datetime64(as_of, "D")) - starts).astype(np.int64), 0)
+    return np.clip(in_force_days, 0, term_days), term_days
+
+
+def _policy_positions(policy_ids: np.ndarray, references: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Index of each referenced policy in ``policy_ids``, and which references are in the book."""
+    positions = np.searchsorted(policy_ids, references)
+    positions = np.minimum(positions, max(len(policy_ids) - 1, 0))
+    found = policy_ids[positions] == references if len(policy_ids) else np.zeros(len(references), dtype=bool)
+    return positions, found
+
+
+def load_book(
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    as_of: Optional[date] = None,
+    chunk_size: Optional[int] = None,
+) -> Book:
+    """Read the policies started between ``since`` and ``until``, with their gadgets and claims."""
+    as_of = as_of or timezone.localdate()
+    chunk_size = chunk_size or settings.PORTFOLIO_ANALYTICS_CHUNK_SIZE
+    policy_filter = {}
+    if since:
+        policy_filter["start_date__gte"] = since
+    if until:
+        policy_filter["start_date__lte"] = until
+
+    policies = Policy.objects.exclude(status=PolicyStatuses.DRAFT.value).filter(**policy_filter)
+    columns = {name: [] for name in ("ids", "products", "pricings", "starts", "maturities", "written")}
+    for ids, products, pricings, starts, maturities, written in fetch_columns(
+        policies, ("id", "product_id", "gadget_pricing_id", "start_date", "maturity_date", "premium"), chunk_size
+    ):
+        columns["ids"].append(_ids(ids))
+        columns["products"].append(_ids(products))
+        columns["pricings"].append(_ids(pricings))
+        columns["starts"].append(_days(starts))
+        columns["maturities"].append(_days(maturities))
+        columns["written"].append(_amounts(written))
+    policy_ids = _concatenate(columns["ids"], np.int64)
+    written = _concatenate(columns["written"], np.float64)
+    starts = _concatenate(columns["starts"], "datetime64[D]")
+    maturities = _concatenate(columns["maturities"], "datetime64[D]")
+
+    in_force_days, term_days = days_in_force(starts, maturities, as_of)
+    months = np.where(np.isnat(starts), -1, starts.astype("datetime64[M]").astype(np.int64))
+
+    claims = np.zeros(len(policy_ids))
+    incurred = np.zeros(len(policy_ids))
+    lodged = Claim.objects.exclude(status=ClaimStatuses.FAILED.value).filter(
+        incident_date__lte=as_of, **{f"policy__{lookup}": value for lookup, value in policy_filter.items()}
+    )
+    for _, claim_policies, costs in fetch_columns(lodged, ("id", "policy_id", "estimated_cost"), chunk_size):
+        positions, found = _policy_positions(policy_ids, _ids(claim_policies))
+        claims += np.bincount(positions[found], minlength=len(policy_ids))
+        incurred += np.bincount(positions[found], weights=_amounts(costs)[found], minlength=len(policy_ids))
+
+    gadget_columns = {name: [] for name in ("policies", "outlets", "brands", "device_types", "written")}
+    brands, device_types = _Labels(), _Labels()
+    gadgets = InsuredGadget.objects.filter(**{f"policy__{lookup}": value for lookup, value in policy_filter.items()})
+    for _, gadget_policies, outlets, gadget_brands, gadget_types, gadget_written in fetch_columns(
+        gadgets, ("id", "policy_id", "seller_id", "device_brand", "device_type", "premium"), chunk_size
+    ):
+        positions, found = _policy_positions(policy_ids, _ids(gadget_policies))
+        gadget_columns["policies"].append(positions[found])
+        gadget_columns["outlets"].append(_ids(outlets)[found])
+        gadget_columns["brands"].append(brands.encode(gadget_brands)[found])
+        gadget_columns["device_types"].append(device_types.encode(gadget_types)[found])
+        gadget_columns["written"].append(_amounts(gadget_written)[found])
+    gadget = {
+        name: _concatenate(chunks, np.float64 if name == "written" else np.int64)
+        for name, chunks in gadget_columns.items()
+    }
+
+    return Book(
+        as_of=as_of,
+        policy_ids=policy_ids,
+        products=_concatenate(columns["products"], np.int64),
+        gadget_pricings=_concatenate(columns["pricings"], np.int64),
+        months=months,
+        written=written,
+        earned=written * in_force_days / term_days,
+        exposure=in_force_days / DAYS_PER_YEAR,
+        claims=claims,
+        incurred=incurred,
+        gadget_policies=gadget["policies"],
+        outlets=gadget["outlets"],
+        brands=gadget["brands"],
+        device_types=gadget["device_types"],
+        gadget_written=gadget["written"],
+        brand_labels=brands.labels,
+        device_type_labels=device_types.labels,
+    )
+
+
+def _grouped(
+    keys: np.ndarray, written: np.ndarray, earned: np.ndarray, exposure: np.ndarray,
+    claims: np.ndarray, incurred: np.ndarray,
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Sum every measure per distinct key; returns the keys and the sums, in key order."""
+    groups, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    sums = {
+        name: np.bincount(inverse, weights=measure, minlength=len(groups))
+        for name, measure in zip(MEASURES, (np.ones(len(keys)), written, earned, exposure, claims, incurred))
+    }
+    return groups, sums
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    return np.divide(numerator, denominator, out=np.full(len(numerator), np.nan), where=denominator > 0)
+
+
+def _rows(groups: np.ndarray, sums: Dict[str, np.ndarray], labels: Dict[int, str]) -> List[Dict[str, Any]]:
+    loss_ratio = _ratio(sums["incurred"], sums["earned_premium"])
+    frequency = _ratio(sums["claims"], sums["exposure_years"])
+    severity = _ratio(sums["incurred"], sums["claims"])
+    rows = []
+    for i, key in enumerate(groups.tolist()):
+        rows.append({
+            "key": None if key < 0 else key,
+            "label": labels.get(key, UNKNOWN),
+            "units": int(sums["units"][i]),
+            "written_premium": round(float(sums["written_premium"][i]), 2),
+            "earned_premium": round(float(sums["earned_premium"][i]), 2),
+            "exposure_years": round(float(sums["exposure_years"][i]), 2),
+            "claims": round(float(sums["claims"][i]), 2),
+            "incurred": round(float(sums["incurred"][i]), 2),
+            "loss_ratio": None if np.isnan(loss_ratio[i]) else round(float(loss_ratio[i]), 4),
+            "frequency": None if np.isnan(frequency[i]) else round(float(frequency[i]), 4),
+            "severity": None if np.isnan(severity[i]) else round(float(severity[i]), 2),
+        })
+    return rows
+
+
+def _month_label(month: int) -> str:
+    return str(np.datetime64(month, "M"))
+
+
+def _labels(dimension: str, book: Book, keys: np.ndarray) -> Dict[int, str]:
+    ids = [key for key in keys.tolist() if key >= 0]
+    if dimension == AnalyticsDimensions.PRODUCT.value:
+        return dict(Product.objects.filter(id__in=ids).values_list("id", "name"))
+    if dimension == AnalyticsDimensions.GADGET_PRICING.value:
+        return {
+            pk: f"{product} ({cover_type}, {cover_percentage:g}%)"
+            for pk, product, cover_type, cover_percentage in GadgetPricing.objects.filter(id__in=ids).values_list(
+                "id", "product__name", "cover_type", "cover_percentage"
+            )
+        }
+    if dimension == AnalyticsDimensions.MONTH.value:
+        return {month: _month_label(month) for month in ids}
+    if dimension == AnalyticsDimensions.OUTLET.value:
+        return dict(DeviceOutlet.objects.filter(id__in=ids).values_list("id", "name"))
+    if dimension == AnalyticsDimensions.DEVICE_BRAND.value:
+        return dict(enumerate(book.brand_labels))
+    return dict(enumerate(book.device_type_labels))
+
+
+def analyse(book: Book) -> Dict[str, Any]:
+    """Totals and every dimension of ``book``."""
+    policy_measures = (book.written, book.earned, book.exposure, book.claims, book.incurred)
+    policy_keys = {
+        AnalyticsDimensions.PRODUCT.value: book.products,
+        AnalyticsDimensions.GADGET_PRICING.value: book.gadget_pricings,
+        AnalyticsDimensions.MONTH.value: book.months,
+    }
+
+    # A gadget carries its own premium, earns it over its policy's term and
+    # takes an equal share of the policy's claims.
+    policy_of = book.gadget_policies
+    gadgets_per_policy = np.bincount(policy_of, minlength=len(book.policy_ids))
+    share = 1 / np.maximum(gadgets_per_policy[policy_of], 1)
+    earned_fraction = _ratio(book.earned, book.written)
+    gadget_measures = (
+        book.gadget_written,
+        book.gadget_written * np.nan_to_num(earned_fraction[policy_of]),
+        book.exposure[policy_of],
+        book.claims[policy_of] * share,
+        book.incurred[policy_of] * share,
+    )
+    gadget_keys = {
+        AnalyticsDimensions.OUTLET.value: book.outlets,
+        AnalyticsDimensions.DEVICE_BRAND.value: book.brands,
+        AnalyticsDimensions.DEVICE_TYPE.value: book.device_types,
+    }
+
+    dimensions = {}
+    for keyed, measures in ((policy_keys, policy_measures), (gadget_keys, gadget_measures)):
+        for dimension, keys in keyed.items():
+            groups, sums = _grouped(keys, *measures)
+            dimensions[dimension] = _rows(groups, sums, _labels(dimension, book, groups))
+    dimensions[AnalyticsDimensions.MONTH.value].sort(key=lambda row: (row["key"] is None, row["key"] or 0))
+    for dimension in dimensions:
+        if dimension != AnalyticsDimensions.MONTH.value:
+            dimensions[dimension].sort(key=lambda row: -row["earned_premium"])
+
+    sums = {
+        name: np.array([measure.sum()], dtype=np.float64)
+        for name, measure in zip(MEASURES, (np.ones(len(book.policy_ids)), *policy_measures))
+    }
+    [totals] = _rows(np.zeros(1, dtype=np.int64), sums, {})
+    del totals["key"], totals["label"]
+    totals["gadgets"] = len(book.gadget_policies)
+    return {"totals": totals, "dimensions": dimensions}
+
+
+def _cache_key(since: Optional[date], until: Optional[date], as_of: date) -> str:
+    return f"pricing:portfolio:{since}:{until}:{as_of}"
+
+
+def portfolio_report(
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    as_of: Optional[date] = None,
+    refresh: bool = False,
+) -> Dict[str, Any]:
+    """The report for policies started between ``since`` and ``until``, from the cache unless ``refresh``."""
+    as_of = as_of or timezone.localdate()
+    key = _cache_key(since, until, as_of)
+    if not refresh:
+        report = cache.get(key)
+        if report is not None:
+            return report
+    report = {
+        "since": since,
+        "until": until,
+        "as_of": as_of,
+        "computed_at": timezone.now(),
+        **analyse(load_book(since=since, until=until, as_of=as_of)),
+    }
+    cache.set(key, report, settings.PORTFOLIO_ANALYTICS_CACHE_SECONDS)
+    return report
@@ -0,0 +1,53 @@
+from datetime import date
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from apps.core.constants import AnalyticsDimensions
+from apps.core.db_router import use_replicas
+from apps.pricing.analytics import portfolio_report
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute loss ratios, claim frequency and severity of the book by product, "
+        "gadget pricing, month, outlet, device brand and device type, and cache the "
+        "report for the portfolio analytics API."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", type=date.fromisoformat, help="Only policies started on or after this date")
+        parser.add_argument("--until", type=date.fromisoformat, help="Only policies started on or before this date")
+        parser.add_argument("--as-of", type=date.fromisoformat, help="Earn premium and exposure up to this date")
+        parser.add_argument("--dimension", action="append", choices=[value for value, _ in AnalyticsDimensions.choices()],
+                            help="Print this dimension (repeatable; all by default)")
+        parser.add_argument("--output", help="Write the whole report to this JSON file")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        with use_replicas():
+            report = portfolio_report(
+                since=options["since"], until=options["until"], as_of=options["as_of"], refresh=True
+            )
+        totals = report["totals"]
+        self.stdout.write(
+            f"{totals['units']} policies, {totals['gadgets']} gadgets as of {report['as_of']}: "
+            f"earned premium {totals['earned_premium']:,.2f}, incurred {totals['incurred']:,.2f}, "
+            f"loss ratio {totals['loss_ratio']}, frequency {totals['frequency']}, severity {totals['severity']} "
+            f"({time.monotonic() - started:.1f}s)"
+        )
+
+        for dimension in options["dimension"] or report["dimensions"]:
+            self.stdout.write(f"\n{dimension}")
+            for row in report["dimensions"][dimension]:
+                self.stdout.write(
+                    f"  {row['label'][:40]:<40} {row['units']:>9} {row['earned_premium']:>16,.2f} "
+                    f"{row['incurred']:>16,.2f}  LR {row['loss_ratio']}  F {row['frequency']}  S {row['severity']}"
+                )
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2, cls=DjangoJSONEncoder)
+            self.stdout.write(f"Report written to {options['output']}")
@@ -0,0 +1,61 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from apps.core.db_router import use_replicas
+from apps.pricing.models import GadgetPricing
+from apps.pricing.simulation import SimulationError, simulate_pricing
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate a year of claims on the devices insured under a gadget pricing and "
+        "report the expected loss ratio and its tail at the current and proposed cover percentages."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("pricing", type=int, help="Gadget pricing id")
+        parser.add_argument("--cover-percentage", type=float, action="append", default=[],
+                            help="Proposed cover percentage (repeatable)")
+        parser.add_argument("--scenarios", type=int, help="Simulated years")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes running scenarios")
+        parser.add_argument("--seed", type=int, help="Seed, for a reproducible run")
+        parser.add_argument("--output", help="Write the result to this JSON file")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            with use_replicas():
+                result = simulate_pricing(
+                    options["pricing"],
+                    cover_percentages=options["cover_percentage"],
+                    scenarios=options["scenarios"],
+                    workers=max(options["workers"], 1),
+                    seed=options["seed"],
+                )
+        except GadgetPricing.DoesNotExist:
+            raise CommandError(f"Gadget pricing {options['pricing']} does not exist")
+        except SimulationError as e:
+            raise CommandError(str(e))
+
+        fit = result["fit"]
+        self.stdout.write(
+            f"{result['scenarios']} scenarios over {result['insured_devices']} insured devices "
+            f"({time.monotonic() - started:.1f}s); fitted on {fit['source']}: "
+            f"{fit['frequency']:.4f} claims per device year, mean severity {fit['mean_severity_ratio']:.2%} of device cost"
+        )
+        for option in result["options"]:
+            tail = "  ".join(f"{name} {value}" for name, value in option["loss_ratio_percentiles"].items())
+            self.stdout.write(
+                f"  {option['cover_percentage']:g}%{' (current)' if option['current'] else ''}: "
+                f"premium {option['premium']:,.2f}, expected loss ratio {option['expected_loss_ratio']}, "
+                f"P(loss) {option['probability_of_loss']}  {tail}"
+            )
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(result, f, indent=2, cls=DjangoJSONEncoder)
+            self.stdout.write(f"Result written to {options['output']}")
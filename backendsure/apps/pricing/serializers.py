@@ -1,4 +1,6 @@
+from django.conf import settings
 from rest_framework import serializers
+from apps.core.constants import AnalyticsDimensions
 from apps.pricing.models import MainMemberPricing, DependentPricing, ExtendedDependentPricing
 
 
@@ -18,4 +20,21 @@ class DependentPricingSerializer(serializers.ModelSerializer):
 class ExtendedDependentPricingSerializer(serializers.ModelSerializer):
     class Meta:
         model = ExtendedDependentPricing
-        fields = "__all__"
\ No newline at end of file
+        fields = "__all__"
+
+
+class PortfolioAnalyticsQuerySerializer(serializers.Serializer):
+    dimension = serializers.ChoiceField(choices=AnalyticsDimensions.choices(), required=False)
+    since = serializers.DateField(required=False)
+    until = serializers.DateField(required=False)
+    as_of = serializers.DateField(required=False)
+    refresh = serializers.BooleanField(default=False)
+
+
+class PricingSimulationSerializer(serializers.Serializer):
+    cover_percentages = serializers.ListField(
+        child=serializers.FloatField(min_value=0, max_value=100), max_length=20, default=list
+    )
+    scenarios = serializers.IntegerField(min_value=100, max_value=settings.PRICING_SIMULATION_API_MAX_SCENARIOS,
+                                         required=False)
+    seed = serializers.IntegerField(min_value=0, required=False)
@@ -0,0 +1,256 @@
+"""
+Monte Carlo simulation of gadget cover percentages before they are rolled out.
+
+A gadget premium is ``device_cost * cover_percentage / 100``, so a new cover
+percentage changes the premium of the insured book but not its claims. The
+simulator therefore draws one year of claims for the devices currently insured
+under a pricing and sets each simulated loss against the premium every
+proposed percentage would have charged for the same devices.
+
+Claims are a compound Poisson process, fitted from history:
+
+* frequency: claims per device year of exposure, from every non-draft policy
+  sold under the pricing;
+* severity: a lognormal fitted to each claim's estimated cost as a fraction of
+  the insured device cost. Claims are linked to policies, not devices, so the
+  policy's mean device cost is used. A simulated claim picks an insured device
+  at random and pays that fraction of its cost, at most the whole cost.
+
+Pricings with fewer than PRICING_SIMULATION_MIN_CLAIMS claims are fitted from
+every gadget pricing instead. Each scenario draws its claim count, then the
+claims of all scenarios in a batch are drawn as flat arrays and summed per
+scenario with ``np.bincount``; batches hold at most
+PRICING_SIMULATION_BATCH_CLAIMS claims. Claim counts, devices and severities
+come from separate random streams, so the batch size does not change the
+result. With ``workers`` above one the scenarios are split between processes,
+each with its own independent random streams, so a seeded run gives the same
+result for the same number of workers.
+
+Severity needs at least two claims with an estimated cost to fit its spread;
+with fewer, ``simulate_pricing`` raises ``SimulationError`` rather than treat
+the claim size as certain.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from apps.claims.models import Claim
+from apps.core.constants import ClaimStatuses, PolicyStatuses
+from apps.gadgets.models import InsuredGadget
+from apps.pricing.analytics import DAYS_PER_YEAR, days_in_force, fetch_columns
+from apps.pricing.models import GadgetPricing
+
+IN_FORCE_STATUSES = (PolicyStatuses.CREATED.value, PolicyStatuses.ACTIVE.value)
+
+
+class SimulationError(Exception):
+    """Raised when there is not enough history or insured book to simulate."""
+    pass
+
+
+@dataclass
+class Fit:
+    source: str
+    devices: int
+    exposure_years: float
+    claims: int
+    frequency: float
+    severity_claims: int
+    severity_mu: float
+    severity_sigma: float
+
+    @property
+    def mean_severity_ratio(self) -> float:
+        return float(np.exp(self.severity_mu + self.severity_sigma ** 2 / 2))
+
+
+def _divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    return np.divide(numerator, denominator, out=np.zeros(len(numerator)), where=denominator > 0)
+
+
+def fit(pricing_id: Optional[int], as_of: date, chunk_size: Optional[int] = None) -> Fit:
+    """Fit claim frequency and severity from the policies sold under ``pricing_id`` (or every pricing)."""
+    chunk_size = chunk_size or settings.PORTFOLIO_ANALYTICS_CHUNK_SIZE
+    scope = {"policy__gadget_pricing_id": pricing_id} if pricing_id else {"policy__gadget_pricing__isnull": False}
+
+    gadgets = InsuredGadget.objects.exclude(policy__status=PolicyStatuses.DRAFT.value).filter(**scope)
+    policies, costs, exposure = [], [], []
+    for _, policy_ids, device_costs, starts, maturities in fetch_columns(
+        gadgets, ("id", "policy_id", "device_cost", "policy__start_date", "policy__maturity_date"), chunk_size
+    ):
+        in_force_days, _ = days_in_force(
+            np.array(starts, dtype="datetime64[D]"), np.array(maturities, dtype="datetime64[D]"), as_of
+        )
+        policies.append(np.array(policy_ids, dtype=np.int64))
+        costs.append(np.nan_to_num(np.array(device_costs, dtype=np.float64)))
+        exposure.append(in_force_days / DAYS_PER_YEAR)
+    policies = np.concatenate(policies) if policies else np.array([], dtype=np.int64)
+    costs = np.concatenate(costs) if costs else np.array([])
+    exposure_years = float(np.concatenate(exposure).sum()) if exposure else 0.0
+
+    # Mean insured device cost of each policy, to express claims as a fraction of it.
+    policy_ids, inverse = np.unique(policies, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    mean_cost = _divide(np.bincount(inverse, weights=costs, minlength=len(policy_ids)),
+                        np.bincount(inverse, minlength=len(policy_ids)))
+
+    # Claims of the same policies the exposure was counted over.
+    lodged = Claim.objects.exclude(status=ClaimStatuses.FAILED.value).exclude(
+        policy__status=PolicyStatuses.DRAFT.value
+    ).filter(incident_date__lte=as_of, **scope)
+    claims, ratios = 0, []
+    for _, claim_policies, estimated_costs in fetch_columns(
+        lodged, ("id", "policy_id", "estimated_cost"), chunk_size
+    ):
+        claims += len(claim_policies)
+        if not len(policy_ids):
+            continue
+        claim_policies = np.array(claim_policies, dtype=np.int64)
+        estimated_costs = np.nan_to_num(np.array(estimated_costs, dtype=np.float64))
+        positions = np.minimum(np.searchsorted(policy_ids, claim_policies), len(policy_ids) - 1)
+        insured = np.where(policy_ids[positions] == claim_policies, mean_cost[positions], 0)
+        usable = (insured > 0) & (estimated_costs > 0)
+        ratios.append(np.minimum(estimated_costs[usable] / insured[usable], 1))
+    ratios = np.concatenate(ratios) if ratios else np.array([])
+
+    logs = np.log(ratios)
+    return Fit(
+        source=f"gadget pricing {pricing_id}" if pricing_id else "all gadget pricings",
+        devices=len(costs),
+        exposure_years=round(exposure_years, 2),
+        claims=claims,
+        frequency=claims / exposure_years if exposure_years else 0.0,
+        severity_claims=len(ratios),
+        severity_mu=float(logs.mean()) if len(logs) else 0.0,
+        severity_sigma=float(logs.std(ddof=1)) if len(logs) > 1 else 0.0,
+    )
+
+
+def insured_device_costs(pricing_id: int, as_of: date, chunk_size: Optional[int] = None) -> np.ndarray:
+    """Cost of every device insured under ``pricing_id`` on ``as_of``."""
+    chunk_size = chunk_size or settings.PORTFOLIO_ANALYTICS_CHUNK_SIZE
+    gadgets = InsuredGadget.objects.filter(pricing_id=pricing_id, policy__status__in=IN_FORCE_STATUSES)
+    costs = []
+    for _, device_costs, starts, maturities in fetch_columns(
+        gadgets, ("id", "device_cost", "policy__start_date", "policy__maturity_date"), chunk_size
+    ):
+        starts = np.array(starts, dtype="datetime64[D]")
+        in_force_days, term_days = days_in_force(starts, np.array(maturities, dtype="datetime64[D]"), as_of)
+        current = (starts <= np.datetime64(as_of, "D")) & (in_force_days < term_days)
+        costs.append(np.nan_to_num(np.array(device_costs, dtype=np.float64))[current])
+    return np.concatenate(costs) if costs else np.array([])
+
+
+def simulate_losses(
+    device_costs: np.ndarray,
+    frequency: float,
+    severity_mu: float,
+    severity_sigma: float,
+    scenarios: int,
+    seed: Any = None,
+    batch_claims: Optional[int] = None,
+) -> np.ndarray:
+    """Total claims cost of the insured devices over one year, for each of ``scenarios``."""
+    batch_claims = batch_claims or settings.PRICING_SIMULATION_BATCH_CLAIMS
+    count_rng, device_rng, severity_rng = np.random.default_rng(seed).spawn(3)
+    counts = count_rng.poisson(frequency * len(device_costs), size=scenarios)
+    losses = np.zeros(scenarios)
+    if not len(device_costs):
+        return losses
+
+    # Batches of whole scenarios, each holding at most ``batch_claims`` claims
+    # (or a single scenario that has more).
+    ends = np.cumsum(counts)
+    start = 0
+    while start < scenarios:
+        offset = ends[start - 1] if start else 0
+        stop = max(int(np.searchsorted(ends, offset + batch_claims, side="right")), start + 1)
+        total = int(ends[stop - 1] - offset)
+        devices = device_rng.integers(0, len(device_costs), size=total)
+        ratios = np.minimum(severity_rng.lognormal(severity_mu, severity_sigma, size=total), 1)
+        scenario_of = np.repeat(np.arange(stop - start), counts[start:stop])
+        losses[start:stop] = np.bincount(scenario_of, weights=ratios * device_costs[devices], minlength=stop - start)
+        start = stop
+    return losses
+
+
+def _simulate_part(args) -> np.ndarray:
+    return simulate_losses(*args)
+
+
+def line_premiums(device_costs: np.ndarray, cover_percentage: float) -> np.ndarray:
+    """Premium of each device at ``cover_percentage``, rounded half up to whole units like a purchase."""
+    return np.floor(device_costs * cover_percentage / 100 + 0.5)
+
+
+def simulate_pricing(
+    pricing_id: int,
+    cover_percentages: Sequence[float] = (),
+    scenarios: Optional[int] = None,
+    workers: int = 1,
+    seed: Optional[int] = None,
+    as_of: Optional[date] = None,
+) -> Dict[str, Any]:
+    """
+    Expected loss ratio and its tail for the current and each proposed cover
+    percentage of a gadget pricing, over its insured book.
+    """
+    pricing = GadgetPricing.objects.get(pk=pricing_id)
+    as_of = as_of or timezone.localdate()
+    scenarios = scenarios or settings.PRICING_SIMULATION_SCENARIOS
+
+    fitted = fit(pricing_id, as_of)
+    if fitted.claims < settings.PRICING_SIMULATION_MIN_CLAIMS:
+        fitted = fit(None, as_of)
+    if fitted.frequency > 0 and fitted.severity_claims < 2:
+        raise SimulationError(
+            f"Claim severity needs at least 2 claims with an estimated cost to fit, {fitted.source} has "
+            f"{fitted.severity_claims}."
+        )
+    device_costs = insured_device_costs(pricing_id, as_of)
+    if not len(device_costs):
+        raise SimulationError("No devices are currently insured under this pricing.")
+
+    streams = np.random.SeedSequence(seed).spawn(max(workers, 1))
+    parts = [
+        (device_costs, fitted.frequency, fitted.severity_mu, fitted.severity_sigma, len(part), stream,
+         settings.PRICING_SIMULATION_BATCH_CLAIMS)
+        for part, stream in zip(np.array_split(np.arange(scenarios), len(streams)), streams)
+    ]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            losses = np.concatenate(list(executor.map(_simulate_part, parts)))
+    else:
+        losses = np.concatenate([_simulate_part(part) for part in parts])
+
+    percentiles = settings.PRICING_SIMULATION_PERCENTILES
+    options = []
+    for cover_percentage in dict.fromkeys([pricing.cover_percentage, *cover_percentages]):
+        premium = float(line_premiums(device_costs, cover_percentage).sum())
+        loss_ratios = losses / premium if premium else np.full(scenarios, np.inf)
+        tail = np.percentile(loss_ratios, percentiles)
+        options.append({
+            "cover_percentage": cover_percentage,
+            "current": cover_percentage == pricing.cover_percentage,
+            "premium": round(premium, 2),
+            "expected_loss": round(float(losses.mean()), 2),
+            "expected_loss_ratio": round(float(loss_ratios.mean()), 4),
+            "loss_ratio_percentiles": {f"p{p:g}": round(float(value), 4) for p, value in zip(percentiles, tail)},
+            "probability_of_loss": round(float((losses > premium).mean()), 4),
+        })
+
+    return {
+        "pricing": pricing_id,
+        "as_of": as_of,
+        "scenarios": scenarios,
+        "seed": seed,
+        "insured_devices": len(device_costs),
+        "insured_value": round(float(device_costs.sum()), 2),
+        "fit": {**asdict(fitted), "mean_severity_ratio": round(fitted.mean_severity_ratio, 4)},
+        "options": options,
+    }
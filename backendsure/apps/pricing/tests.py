@@ -1,3 +1,266 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from apps.claims.models import Claim
+from apps.gadgets.models import DeviceOutlet, InsuredGadget
+from apps.policies.models import Policy
+from apps.pricing.analytics import DAYS_PER_YEAR, analyse, load_book, portfolio_report
+from apps.pricing.models import GadgetPricing
+from apps.pricing.simulation import SimulationError, fit, insured_device_costs, simulate_losses, simulate_pricing
+from apps.products.models import Product
+from apps.schemes.models import Scheme, SchemeGroup
+from apps.users.models import Membership, User
+
+AS_OF = date(2026, 7, 1)
+
+
+class PortfolioAnalyticsTests(TestCase):
+    """
+    A small book, as of 1 July 2026:
+
+    * phone policy 1, Jan 2026, a 120 day term, fully earned: premium 1200 on
+      two Apple phones sold by the shop; one 300 claim (and a failed one);
+    * phone policy 2, Mar 2026, a year's term: premium 3650, of which 122 days
+      (1220) are earned, on a Samsung tablet sold by the kiosk; one 610 claim
+      (and one with an incident after 1 July);
+    * funeral policy, Mar 2026, a 30 day term, fully earned: premium 300, no claims;
+    * a draft phone policy, which is not part of the book.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.scheme = Scheme.objects.create(name="Retail", scheme_type="Individual")
+        self.phones = Product.objects.create(name="Phone Cover", scheme=self.scheme, policy_number_prefix="GDT")
+        self.funeral = Product.objects.create(name="Funeral", scheme=self.scheme, policy_number_prefix="FUN")
+        self.pricing = GadgetPricing.objects.create(product=self.phones, cover_type="Full Cover", cover_percentage=10)
+        self.customer = User.objects.create(username="jane", email="jane@example.com", role="Policy Owner")
+        self.shop = self.outlet("Shop")
+        self.kiosk = self.outlet("Kiosk")
+
+        first = self.policy(self.phones, date(2026, 1, 1), date(2026, 5, 1), 1200)
+        self.gadget(first, self.shop, "Apple", "smartphone", 600)
+        self.gadget(first, self.shop, "Apple ", "Smartphone", 600)
+        self.claim(first, 300)
+        self.claim(first, 999, status="Failed")
+        second = self.policy(self.phones, date(2026, 3, 1), None, 3650)
+        self.gadget(second, self.kiosk, "Samsung", "Tablet", 3650)
+        self.claim(second, 610)
+        self.claim(second, 50, incident_date=date(2026, 8, 1))
+        self.policy(self.funeral, date(2026, 3, 15), date(2026, 4, 14), 300, pricing=None)
+        draft = self.policy(self.phones, date(2026, 2, 1), None, 9999, status="Draft")
+        self.claim(draft, 100)
+
+    def outlet(self, name):
+        return DeviceOutlet.objects.create(
+            agent_type="Seller", outlet_number=name, name=name, phone_number=name, location="Moi Avenue", city="Nairobi",
+        )
+
+    def policy(self, product, start_date, maturity_date, premium, pricing=True, status="Active"):
+        return Policy.objects.create(
+            policy_number=f"{product.policy_number_prefix}_{Policy.objects.count()}", product=product,
+            gadget_pricing=self.pricing if pricing else None, start_date=start_date, maturity_date=maturity_date,
+            premium=Decimal(premium), policy_owner=self.customer, status=status,
+        )
+
+    def gadget(self, policy, seller, brand, device_type, premium):
+        scheme_group = SchemeGroup.objects.create(scheme=self.scheme, policy=policy)
+        membership = Membership.objects.create(user=self.customer, policy=policy, scheme_group=scheme_group)
+        return InsuredGadget.objects.create(
+            policy=policy, membership=membership, seller=seller, pricing=self.pricing, device_brand=brand,
+            device_type=device_type, device_model="X", purchase_date=date(2026, 1, 1), premium=Decimal(premium),
+        )
+
+    def claim(self, policy, cost, status="Pending Verification", incident_date=date(2026, 4, 1)):
+        return Claim.objects.create(
+            policy=policy, description="Cracked screen", claim_type="Damage", incident_date=incident_date,
+            estimated_cost=Decimal(cost), status=status,
+        )
+
+    def rows(self, report, dimension):
+        return {
+            row["label"]: {field: row[field] for field in ("units", "earned_premium", "incurred", "loss_ratio", "severity")}
+            for row in report["dimensions"][dimension]
+        }
+
+    def test_book_columns(self):
+        book = load_book(as_of=AS_OF)
+
+        self.assertEqual(len(book.policy_ids), 3)
+        self.assertEqual(book.written.tolist(), [1200, 3650, 300])
+        self.assertEqual(book.earned.tolist(), [1200, 1220, 300])
+        self.assertEqual((book.exposure * DAYS_PER_YEAR).round().tolist(), [120, 122, 30])
+        self.assertEqual((book.claims.tolist(), book.incurred.tolist()), ([1, 1, 0], [300, 610, 0]))
+        self.assertEqual(book.gadget_policies.tolist(), [0, 0, 1])
+        self.assertEqual(book.brand_labels, ["Apple", "Samsung"])
+        self.assertEqual(book.device_type_labels, ["Smartphone", "Tablet"])
+
+    def test_chunked_reads_give_the_same_book(self):
+        whole, chunked = load_book(as_of=AS_OF), load_book(as_of=AS_OF, chunk_size=1)
+
+        for field in ("policy_ids", "earned", "exposure", "claims", "incurred", "gadget_policies", "brands", "outlets"):
+            self.assertEqual(getattr(whole, field).tolist(), getattr(chunked, field).tolist(), field)
+
+    def test_totals(self):
+        totals = analyse(load_book(as_of=AS_OF))["totals"]
+
+        self.assertEqual(
+            {field: totals[field] for field in ("units", "gadgets", "written_premium", "earned_premium", "claims", "incurred")},
+            {"units": 3, "gadgets": 3, "written_premium": 5150.0, "earned_premium": 2720.0, "claims": 2.0, "incurred": 910.0},
+        )
+        self.assertEqual(totals["loss_ratio"], round(910 / 2720, 4))
+        self.assertEqual(totals["frequency"], round(2 / (272 / DAYS_PER_YEAR), 4))
+        self.assertEqual(totals["severity"], 455.0)
+
+    def test_policy_dimensions(self):
+        report = analyse(load_book(as_of=AS_OF))
+
+        self.assertEqual(self.rows(report, "product"), {
+            "Phone Cover": {"units": 2, "earned_premium": 2420.0, "incurred": 910.0, "loss_ratio": round(910 / 2420, 4), "severity": 455.0},
+            "Funeral": {"units": 1, "earned_premium": 300.0, "incurred": 0.0, "loss_ratio": 0.0, "severity": None},
+        })
+        self.assertEqual([row["label"] for row in report["dimensions"]["product"]], ["Phone Cover", "Funeral"])
+        self.assertEqual(report["dimensions"]["product"][0]["frequency"], round(2 / (242 / DAYS_PER_YEAR), 4))
+        self.assertEqual(self.rows(report, "month"), {
+            "2026-01": {"units": 1, "earned_premium": 1200.0, "incurred": 300.0, "loss_ratio": 0.25, "severity": 300.0},
+            "2026-03": {"units": 2, "earned_premium": 1520.0, "incurred": 610.0, "loss_ratio": round(610 / 1520, 4), "severity": 610.0},
+        })
+        pricings = report["dimensions"]["gadget_pricing"]
+        self.assertEqual(
+            [(row["label"], row["units"]) for row in pricings],
+            [("Phone Cover (Full Cover, 10%)", 2), ("Unknown", 1)],
+        )
+        self.assertIsNone(pricings[1]["key"])
+
+    def test_gadget_dimensions_share_their_policys_claims(self):
+        report = analyse(load_book(as_of=AS_OF))
+
+        self.assertEqual(self.rows(report, "outlet"), {
+            "Kiosk": {"units": 1, "earned_premium": 1220.0, "incurred": 610.0, "loss_ratio": 0.5, "severity": 610.0},
+            "Shop": {"units": 2, "earned_premium": 1200.0, "incurred": 300.0, "loss_ratio": 0.25, "severity": 300.0},
+        })
+        self.assertEqual([row["label"] for row in report["dimensions"]["outlet"]], ["Kiosk", "Shop"])
+        self.assertEqual(self.rows(report, "device_brand"), {
+            "Samsung": {"units": 1, "earned_premium": 1220.0, "incurred": 610.0, "loss_ratio": 0.5, "severity": 610.0},
+            "Apple": {"units": 2, "earned_premium": 1200.0, "incurred": 300.0, "loss_ratio": 0.25, "severity": 300.0},
+        })
+        self.assertEqual(
+            {row["label"]: row["claims"] for row in report["dimensions"]["device_type"]},
+            {"Tablet": 1.0, "Smartphone": 1.0},
+        )
+
+    def test_since_and_until_limit_the_book_to_policies_started_then(self):
+        totals = analyse(load_book(since=date(2026, 2, 1), until=date(2026, 3, 10), as_of=AS_OF))["totals"]
+
+        self.assertEqual((totals["units"], totals["gadgets"], totals["incurred"]), (1, 1, 610.0))
+
+    def test_reports_are_served_from_the_cache_until_refreshed(self):
+        report = portfolio_report(as_of=AS_OF)
+        self.claim(Policy.objects.get(premium=300), 150)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(portfolio_report(as_of=AS_OF), report)
+        self.assertEqual(portfolio_report(since=date(2026, 3, 1), as_of=AS_OF)["totals"]["incurred"], 760.0)
+        refreshed = portfolio_report(as_of=AS_OF, refresh=True)
+        self.assertEqual(refreshed["totals"]["incurred"], 1060.0)
+        self.assertEqual(portfolio_report(as_of=AS_OF), refreshed)
+
+
+@override_settings(PRICING_SIMULATION_MIN_CLAIMS=1)
+class PricingSimulationTests(TestCase):
+    """
+    Phone cover at 10%, as of 1 July 2026: a policy from 1 August 2025 (334
+    days in force) on devices costing 1000 and 3000, and one from 1 January
+    2026 (181 days) on a 500 device. Claims against them cost 500 (a quarter
+    of the first policy's mean device cost of 2000), 5000 (capped at the whole
+    cost), 250 (half the 500 device) and 0 (counted, but not for severity).
+    """
+
+    def setUp(self):
+        self.scheme = Scheme.objects.create(name="Gadget", scheme_type="Individual")
+        product = Product.objects.create(name="Phone Cover", scheme=self.scheme, policy_number_prefix="GDT")
+        self.pricing = GadgetPricing.objects.create(product=product, cover_percentage=10)
+        other_pricing = GadgetPricing.objects.create(product=product, cover_type="Full Cover", cover_percentage=20)
+        self.customer = User.objects.create(username="jane", email="jane@example.com", role="Policy Owner")
+
+        first = self.policy(self.pricing, date(2025, 8, 1), [1000, 3000])
+        second = self.policy(self.pricing, date(2026, 1, 1), [500])
+        for policy, cost in ((first, 500), (first, 5000), (second, 250), (first, 0)):
+            self.claim(policy, cost)
+        self.claim(first, 800, status="Failed")
+        self.claim(first, 800, incident_date=date(2026, 8, 1))
+        self.claim(self.policy(self.pricing, date(2026, 2, 1), [2000], status="Draft"), 800)
+        self.claim(self.policy(other_pricing, date(2026, 2, 1), [2000]), 1000)
+
+    def policy(self, pricing, start_date, device_costs, status="Active"):
+        policy = Policy.objects.create(
+            policy_number=f"GDT_{Policy.objects.count()}", gadget_pricing=pricing, start_date=start_date,
+            policy_owner=self.customer, status=status,
+        )
+        scheme_group = SchemeGroup.objects.create(scheme=self.scheme, policy=policy)
+        membership = Membership.objects.create(user=self.customer, policy=policy, scheme_group=scheme_group)
+        for cost in device_costs:
+            InsuredGadget.objects.create(
+                policy=policy, membership=membership, pricing=pricing, device_type="smartphone", device_model="X",
+                purchase_date=start_date, device_cost=Decimal(cost),
+            )
+        return policy
+
+    def claim(self, policy, cost, status="Pending Verification", incident_date=date(2026, 4, 1)):
+        return Claim.objects.create(
+            policy=policy, description="Cracked screen", claim_type="Damage", incident_date=incident_date,
+            estimated_cost=Decimal(cost), status=status,
+        )
+
+    def test_fit_on_the_pricings_history(self):
+        fitted = fit(self.pricing.id, AS_OF)
+        logs = np.log([0.25, 1, 0.5])
+
+        self.assertEqual((fitted.devices, fitted.claims, fitted.severity_claims), (3, 4, 3))
+        self.assertEqual(fitted.exposure_years, round((2 * 334 + 181) / DAYS_PER_YEAR, 2))
+        self.assertAlmostEqual(fitted.frequency, 4 / ((2 * 334 + 181) / DAYS_PER_YEAR))
+        self.assertAlmostEqual(fitted.severity_mu, logs.mean())
+        self.assertAlmostEqual(fitted.severity_sigma, logs.std(ddof=1))
+
+        everything = fit(None, AS_OF)
+        self.assertEqual((everything.devices, everything.claims, everything.severity_claims), (4, 5, 4))
+
+    def test_insured_devices_are_those_in_force(self):
+        self.assertEqual(sorted(insured_device_costs(self.pricing.id, AS_OF).tolist()), [500, 1000, 3000])
+        self.assertEqual(insured_device_costs(self.pricing.id, date(2025, 12, 31)).tolist(), [1000, 3000])
+
+    def test_seeded_runs_are_reproducible_for_the_same_workers(self):
+        run = dict(cover_percentages=[12.5], scenarios=2000, seed=7, as_of=AS_OF)
+
+        single = simulate_pricing(self.pricing.id, **run)
+        self.assertEqual(simulate_pricing(self.pricing.id, **run), single)
+        pooled = simulate_pricing(self.pricing.id, workers=2, **run)
+        self.assertEqual(simulate_pricing(self.pricing.id, workers=2, **run), pooled)
+        self.assertNotEqual(simulate_pricing(self.pricing.id, **{**run, "seed": 8})["options"], single["options"])
+
+        self.assertEqual(
+            [(option["cover_percentage"], option["current"], option["premium"]) for option in single["options"]],
+            [(10.0, True, 450.0), (12.5, False, 563.0)],
+        )
+        self.assertEqual((single["insured_devices"], single["insured_value"]), (3, 4500.0))
+
+    def test_batching_does_not_change_the_losses(self):
+        costs = np.array([1000.0, 3000.0, 500.0])
+        args = (costs, 0.8, np.log(0.4), 0.6, 500)
+
+        whole = simulate_losses(*args, seed=3, batch_claims=10**9)
+        batched = simulate_losses(*args, seed=3, batch_claims=7)
+
+        self.assertEqual(batched.tolist(), whole.tolist())
+        self.assertGreater(whole.sum(), 0)
+        self.assertTrue((whole <= costs.sum() * 20).all())
+
+    def test_severity_is_not_fitted_from_fewer_than_two_claims(self):
+        Claim.objects.exclude(estimated_cost=500).update(estimated_cost=0)
+
+        with self.assertRaisesMessage(SimulationError, "at least 2 claims"):
+            simulate_pricing(self.pricing.id, scenarios=100, seed=1, as_of=AS_OF)
@@ -2,7 +2,8 @@ from django.urls import path
 from apps.pricing.views import (
     MainMemberPricingAPIView, MainMemberPricingDetailAPIView,
     DependentPricingAPIView, DependentPricingDetailAPIView,
-    ExtendedDependentPricingAPIView, ExtendedDependentPricingDetailAPIView
+    ExtendedDependentPricingAPIView, ExtendedDependentPricingDetailAPIView,
+    PortfolioAnalyticsAPIView, GadgetPricingSimulationAPIView
 )
 
 from apps.gadgets.views import (
@@ -18,4 +19,6 @@ urlpatterns = [
     path("extended-dependent-pricing/<int:pk>/", ExtendedDependentPricingDetailAPIView.as_view(), name="extended-dependent-pricing-detail"),
     path("gadget-pricing/", GadgetPricingAPIView.as_view(), name="gadget-pricing"),
     path("gadget-pricing/<int:pk>/details/", GadgetPricingDetailAPIView.as_view(), name="gadget-pricing-details"),    
+    path("gadget-pricing/<int:pk>/simulate/", GadgetPricingSimulationAPIView.as_view(), name="gadget-pricing-simulate"),
+    path("portfolio-analytics/", PortfolioAnalyticsAPIView.as_view(), name="portfolio-analytics"),
 ]
@@ -1,10 +1,18 @@
-from rest_framework import generics
+from django.shortcuts import get_object_or_404
+from rest_framework import generics, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from apps.pricing.models import MainMemberPricing, DependentPricing, ExtendedDependentPricing
+from apps.pricing.analytics import portfolio_report
+from apps.pricing.models import MainMemberPricing, DependentPricing, ExtendedDependentPricing, GadgetPricing
+from apps.pricing.simulation import SimulationError, simulate_pricing
 from apps.pricing.serializers import (
     MainMemberPricingSerializer,
     DependentPricingSerializer,
-    ExtendedDependentPricingSerializer
+    ExtendedDependentPricingSerializer,
+    PortfolioAnalyticsQuerySerializer,
+    PricingSimulationSerializer,
 )
 
 # Create your views here.
@@ -39,4 +47,48 @@ class ExtendedDependentPricingAPIView(generics.ListCreateAPIView):
 class ExtendedDependentPricingDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
     queryset = ExtendedDependentPricing.objects.all()
     serializer_class = ExtendedDependentPricingSerializer
-    lookup_field = "pk"
\ No newline at end of file
+    lookup_field = "pk"
+
+
+class PortfolioAnalyticsAPIView(APIView):
+    """Loss ratio, frequency and severity of the book by product, pricing, month, outlet and device."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        if request.user.role != "Admin":
+            return Response(
+                {"detail": "You do not have permission to view portfolio analytics."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        query = PortfolioAnalyticsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        report = portfolio_report(
+            since=params.get("since"),
+            until=params.get("until"),
+            as_of=params.get("as_of"),
+            refresh=params["refresh"],
+        )
+        if "dimension" in params:
+            report = {**report, "dimensions": {params["dimension"]: report["dimensions"][params["dimension"]]}}
+        return Response(report)
+
+
+class GadgetPricingSimulationAPIView(APIView):
+    """Monte Carlo loss ratio of a gadget pricing's insured book at proposed cover percentages."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk, *args, **kwargs):
+        if request.user.role != "Admin":
+            return Response(
+                {"detail": "You do not have permission to simulate pricing."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        pricing = get_object_or_404(GadgetPricing, pk=pk)
+        serializer = PricingSimulationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            result = simulate_pricing(pricing.pk, **serializer.validated_data)
+        except SimulationError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
@@ -1,7 +1,19 @@
 from django.contrib import admin
+from django.db.models import Count
 from apps.products.models import Product
 
 # Register your models here.
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ["id", "name", "scheme", "policy_number_prefix", "next_policy_number", "created_at"]
\ No newline at end of file
+    list_display = ["id", "name", "scheme", "policy_number_prefix", "next_policy_number", "created_at"]
+    list_select_related = ["scheme", "policy_number_sequence"]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(policies_count=Count("policies"))
+
+    @admin.display(description="Next policy number")
+    def next_policy_number(self, obj):
+        # Shown without allocating; a product that has not sold through the sequence yet carries on from its policies.
+        sequence = getattr(obj, "policy_number_sequence", None)
+        last_value = sequence.last_value if sequence else obj.policies_count
+        return f"{obj.policy_number_prefix}_{last_value + 1}"
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def seed_policy_number_sequences(apps, schema_editor):
+    """Carry each product's numbering on from the policies it already has."""
+    Policy = apps.get_model("policies", "Policy")
+    PolicyNumberSequence = apps.get_model("products", "PolicyNumberSequence")
+    totals = Policy.objects.filter(product__isnull=False).values("product_id").annotate(total=Count("id")).order_by()
+    PolicyNumberSequence.objects.bulk_create([
+        PolicyNumberSequence(product_id=row["product_id"], last_value=row["total"]) for row in totals
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('policies', '0015_policy_policy_document_hash'),
+        ('products', '0003_product_policy_number_prefix'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PolicyNumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('last_value', models.BigIntegerField(default=0)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='policy_number_sequence', to='products.product')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(seed_policy_number_sequences, migrations.RunPython.noop),
+    ]
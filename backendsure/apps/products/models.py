@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 
 from apps.core.models import AbstractBaseModel
 # Create your models here.
@@ -12,10 +13,40 @@ class Product(AbstractBaseModel):
         return f"{self.name} ({self.scheme.name})"
     
     def next_policy_number(self):
-        policies_count = self.policies.count() + 1
-        return f"{self.policy_number_prefix}_{policies_count}"
+        (number,) = PolicyNumberSequence.allocate(self.id)
+        return f"{self.policy_number_prefix}_{number}"
     
     
+class PolicyNumberSequence(AbstractBaseModel):
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name="policy_number_sequence")
+    last_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.product_id}: {self.last_value}"
+
+    @classmethod
+    def allocate(cls, product_id, count=1) -> range:
+        """
+        Allocate the next ``count`` policy numbers of a product.
+
+        The increment is a single ``UPDATE ... SET last_value = last_value + n``,
+        which holds the row lock until the surrounding transaction ends, so
+        concurrent purchases never receive the same number. A product's first
+        allocation carries on from the policies it already has.
+        """
+        with transaction.atomic(savepoint=False):
+            if not cls.objects.filter(product_id=product_id).update(last_value=F("last_value") + count):
+                from apps.policies.models import Policy
+                existing = Policy.objects.filter(product_id=product_id).count()
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(product_id=product_id, last_value=existing + count)
+                except IntegrityError:
+                    cls.objects.filter(product_id=product_id).update(last_value=F("last_value") + count)
+            last_value = cls.objects.filter(product_id=product_id).values_list("last_value", flat=True).get()
+        return range(last_value - count + 1, last_value + 1)
+
+
 class ProductBenefit(AbstractBaseModel):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     benefit = models.CharField(max_length=255)
@@ -1,3 +1,46 @@
-from django.test import TestCase
+from django.contrib.admin.sites import site
+from django.test import RequestFactory, TestCase
 
-# Create your tests here.
+from apps.core.reference_data import product as product_snapshot
+from apps.policies.models import Policy
+from apps.products.models import PolicyNumberSequence, Product
+from apps.schemes.models import Scheme
+
+
+class PolicyNumberSequenceTests(TestCase):
+    def setUp(self):
+        scheme = Scheme.objects.create(name="Funeral", scheme_type="Individual")
+        self.product = Product.objects.create(name="Family Cover", scheme=scheme, policy_number_prefix="FAM")
+
+    def test_first_number_carries_on_from_existing_policies(self):
+        for i in (1, 2):
+            Policy.objects.create(policy_number=f"FAM_{i}", product=self.product)
+
+        self.assertEqual(self.product.next_policy_number(), "FAM_3")
+        self.assertEqual(product_snapshot(self.product.id).next_policy_number(), "FAM_4")
+        self.assertEqual(PolicyNumberSequence.objects.get(product=self.product).last_value, 4)
+
+    def test_numbers_are_not_reused_when_policies_are_deleted(self):
+        Policy.objects.create(policy_number=self.product.next_policy_number(), product=self.product)
+        Policy.objects.all().delete()
+
+        self.assertEqual(self.product.next_policy_number(), "FAM_2")
+
+    def test_a_batch_allocates_consecutive_numbers_at_once(self):
+        self.product.next_policy_number()
+
+        with self.assertNumQueries(2):
+            numbers = PolicyNumberSequence.allocate(self.product.id, 3)
+
+        self.assertEqual(list(numbers), [2, 3, 4])
+        self.assertEqual(self.product.next_policy_number(), "FAM_5")
+
+    def test_admin_shows_the_next_number_without_allocating(self):
+        Policy.objects.create(policy_number="FAM_1", product=self.product)
+        admin = site._registry[Product]
+        request = RequestFactory().get("/admin/products/product/")
+
+        self.assertEqual(admin.next_policy_number(admin.get_queryset(request).get()), "FAM_2")
+        PolicyNumberSequence.allocate(self.product.id, 4)
+        self.assertEqual(admin.next_policy_number(admin.get_queryset(request).get()), "FAM_6")
+        self.assertEqual(PolicyNumberSequence.objects.get(product=self.product).last_value, 5)
@@ -4,15 +4,19 @@ from rest_framework import generics, status
 
 from apps.products.models import Product, ProductBenefit
 from apps.products.serializers import ProductSerializer, ProductBenefitSerializer
+from apps.core.profiling import SerializerTimingMixin
+
+PRODUCT_PRICES = ("mainmemberprices", "dependentprices", "extendeddependentprices")
 
 # Create your views here.
-class ProductAPIView(generics.ListCreateAPIView):
-    queryset = Product.objects.all().order_by("-created_at")
+class ProductAPIView(SerializerTimingMixin, generics.ListCreateAPIView):
+    queryset = Product.objects.prefetch_related(*PRODUCT_PRICES).order_by("-created_at")
     serializer_class = ProductSerializer
+    query_budget = {"GET": 8}
     
     
 class ProductDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Product.objects.all().order_by("-created_at")
+    queryset = Product.objects.prefetch_related(*PRODUCT_PRICES).order_by("-created_at")
     serializer_class = ProductSerializer
     
     lookup_field = "pk"
@@ -4,15 +4,17 @@ from datetime import datetime
 
 from django.db import transaction
 from django.core.exceptions import ValidationError
-from django.contrib.auth.hashers import make_password
 import logging
 
 from apps.policies.models import Policy, PolicyStatusUpdate
-from apps.products.models import Product
+from apps.core import reference_data
+from apps.core.reference_data import ProductSnapshot
 from apps.schemes.models import SchemeGroup
+from apps.users.identity import resolve_or_create_many
 from apps.users.models import User, Membership, MembershipStatusUpdate
 from apps.payments.models import Premium, PayerDetail
 from apps.credit_life.models import Creditor
+from apps.sales.unit_of_work import PurchaseUnitOfWork
 
 logger = logging.getLogger(__name__)
 
@@ -44,12 +46,21 @@ class CreditLifePolicyPurchaseService:
             logger.info(f"Starting policy purchase for product {self.data.get('product')}")
             
             product = self._get_product()
-            policy, scheme_group = self._create_policy_and_scheme_group(product)
-            membership = self._create_membership(scheme_group)
-            
-            self._create_creditors(membership)
-            self._create_payer_details(policy, scheme_group)
-            self._create_premium_record(membership)
+            creditors = self._build_creditors()
+            totals = self._calculate_totals(creditors)
+
+            uow = PurchaseUnitOfWork()
+            policy, scheme_group = self._create_policy_and_scheme_group(uow, product, totals)
+            membership = self._create_membership(uow, scheme_group, totals)
+
+            for creditor in creditors:
+                creditor.membership = membership
+                creditor.policy = policy
+                creditor.scheme_group = scheme_group
+            uow.add_all(creditors)
+            self._create_payer_details(uow, policy, scheme_group)
+            self._create_premium_record(uow, membership)
+            uow.flush()
             
             logger.info(f"Successfully created policy {policy.policy_number}")
             
@@ -64,67 +75,82 @@ class CreditLifePolicyPurchaseService:
             logger.error(f"Policy purchase failed: {str(e)}")
             raise
     
-    def _get_product(self) -> Product:
+    def _get_product(self) -> ProductSnapshot:
         """Get and validate the product."""
-        try:
-            return Product.objects.get(id=self.data["product"])
-        except Product.DoesNotExist:
+        product = reference_data.product(self.data["product"])
+        if product is None:
             raise ValidationError(f"Product with id {self.data['product']} does not exist")
+        return product
+    
+    def _build_creditors(self) -> List[Creditor]:
+        """Creditor records for the request, not yet attached to a membership."""
+        return [
+            self._build_single_creditor(creditor_data)
+            for creditor_data in self.data.get("creditors", [])
+        ]
+    
+    def _calculate_totals(self, creditors: List[Creditor]) -> Dict[str, Decimal]:
+        """Membership and policy totals: the member's own figures plus every creditor's."""
+        member_data = self.data["members"][0]
+        creditor_premium = sum((creditor.premium for creditor in creditors), Decimal('0'))
+        creditor_cover = sum((creditor.outstanding_balance for creditor in creditors), Decimal('0'))
+        
+        return {
+            "main_member_premium": self._to_decimal(member_data.get("premium", 0)) + creditor_premium,
+            "main_member_cover_amount": self._to_decimal(member_data.get("cover_amount", 0)) + creditor_cover,
+            "total_premium": creditor_premium,
+            "total_cover_amount": creditor_cover,
+        }
     
-    def _create_policy_and_scheme_group(self, product: Product) -> Tuple[Policy, SchemeGroup]:
+    def _create_policy_and_scheme_group(
+        self, uow: PurchaseUnitOfWork, product: ProductSnapshot, totals: Dict[str, Decimal]
+    ) -> Tuple[Policy, SchemeGroup]:
         """Create policy and associated scheme group."""
-        policy = Policy.objects.create(
-            product=product,
+        policy = uow.add(Policy(
+            product_id=product.id,
             start_date=self.data["start_date"],
             policy_number=product.next_policy_number(),
-            cover_amount=Decimal('0'),
-            premium=Decimal('0')
-        )
+            cover_amount=totals["total_cover_amount"],
+            premium=totals["total_premium"]
+        ))
         
-        PolicyStatusUpdate.objects.create(policy=policy)
+        uow.add(PolicyStatusUpdate(policy=policy))
         
-        scheme_group = SchemeGroup.objects.create(
-            scheme=product.scheme,
+        scheme_group = uow.add(SchemeGroup(
+            scheme_id=product.scheme_id,
             policy=policy
-        )
+        ))
         
         return policy, scheme_group
     
-    def _create_membership(self, scheme_group: SchemeGroup) -> Membership:
+    def _create_membership(
+        self, uow: PurchaseUnitOfWork, scheme_group: SchemeGroup, totals: Dict[str, Decimal]
+    ) -> Membership:
         """Create membership for the main member."""
         member_data = self.data["members"][0]
         user = self._create_user(member_data)
         
-        membership = Membership.objects.create(
+        membership = uow.add(Membership(
             user=user,
             policy=scheme_group.policy,
             scheme_group=scheme_group,
-            main_member_premium=self._to_decimal(member_data.get("premium", 0)),
-            main_member_cover_amount=self._to_decimal(member_data.get("cover_amount", 0)),
+            main_member_premium=totals["main_member_premium"],
+            main_member_cover_amount=totals["main_member_cover_amount"],
             dependent_cover_amount=Decimal('0'),
             dependent_premium=Decimal('0'),
-            total_cover_amount=Decimal('0'),
-            total_premium=Decimal('0')
-        )
+            total_cover_amount=totals["total_cover_amount"],
+            total_premium=totals["total_premium"]
+        ))
         
-        MembershipStatusUpdate.objects.create(membership=membership)
+        uow.add(MembershipStatusUpdate(membership=membership))
         
         return membership
     
-    def _create_creditors(self, membership: Membership) -> None:
-        """Create creditor records and update membership totals."""
-        creditors = self.data.get("creditors", [])
-        
-        for creditor_data in creditors:
-            creditor = self._create_single_creditor(membership, creditor_data)
-            self._update_membership_totals(membership, creditor)
-    
-    def _create_single_creditor(self, membership: Membership, creditor_data: Dict[str, Any]) -> Creditor:
-        """Create a single creditor record."""
-        return Creditor.objects.create(
-            membership=membership,
-            policy=membership.policy,
-            scheme_group=membership.scheme_group,
+    def _build_single_creditor(self, creditor_data: Dict[str, Any]) -> Creditor:
+        """Build a single creditor record, covered for the balance still owed."""
+        outstanding_balance = self._to_decimal(creditor_data.get("outstanding_balance", 0))
+        premium = self._to_decimal(creditor_data.get("premium", 0))
+        return Creditor(
             creditor_name=self._clean_string(creditor_data.get("creditor_name", "")),
             contact_person_name=self._clean_string(creditor_data.get("contact_person_name", "")),
             contact_person_email=self._clean_string(creditor_data.get("contact_person_email", "")),
@@ -135,40 +161,20 @@ class CreditLifePolicyPurchaseService:
             date_registered=creditor_data.get("date_registered", datetime.now().date()),
             loan_reference=self._clean_string(creditor_data.get("loan_reference", "")),
             loan_amount=self._to_decimal(creditor_data.get("loan_amount", 0)),
-            outstanding_balance=self._to_decimal(creditor_data.get("outstanding_balance", 0)),
-            premium=self._to_decimal(creditor_data.get("premium", 0)),
+            outstanding_balance=outstanding_balance,
+            premium=premium,
             term_months=creditor_data.get("term_months", 1),
-            declining_term=creditor_data.get("declining_term", False)
+            declining_term=creditor_data.get("declining_term", False),
+            interest_rate=self._to_decimal(creditor_data.get("interest_rate", 0)),
+            cover_amount=outstanding_balance,
+            premium_rate=(premium / outstanding_balance).quantize(Decimal("1e-10")) if outstanding_balance else Decimal("0")
         )
     
-    def _update_membership_totals(self, membership: Membership, creditor: Creditor) -> None:
-        """Update membership and policy totals with creditor amounts."""
-        outstanding_balance = Decimal(str(creditor.outstanding_balance))
-        premium = Decimal(str(creditor.premium))
-        
-        # Update membership totals
-        membership.total_premium += premium
-        membership.total_cover_amount += outstanding_balance
-        membership.main_member_cover_amount += outstanding_balance
-        membership.main_member_premium += premium
-        
-        membership.save(update_fields=[
-            'main_member_premium',
-            'main_member_cover_amount',
-            'total_premium',
-            'total_cover_amount',
-        ])
-        
-        # Update policy totals
-        membership.policy.cover_amount += outstanding_balance
-        membership.policy.premium += premium
-        membership.policy.save(update_fields=['cover_amount', 'premium'])
-    
-    def _create_payer_details(self, policy: Policy, scheme_group: SchemeGroup) -> None:
+    def _create_payer_details(self, uow: PurchaseUnitOfWork, policy: Policy, scheme_group: SchemeGroup) -> None:
         """Create payer details for the policy."""
         payment_details = self.data.get("payment_details", {})
         
-        PayerDetail.objects.create(
+        uow.add(PayerDetail(
             policy=policy,
             scheme_group=scheme_group,
             bank_name=self._clean_string(payment_details.get('bank_name', '')),
@@ -178,40 +184,39 @@ class CreditLifePolicyPurchaseService:
             branch_code=self._clean_string(payment_details.get('branch_code', '')),
             debit_order_date=payment_details.get('debit_order_date'),
             source_of_funds=self._clean_string(payment_details.get('source_of_funds', ''))
-        )
+        ))
     
-    def _create_premium_record(self, membership: Membership) -> None:
+    def _create_premium_record(self, uow: PurchaseUnitOfWork, membership: Membership) -> None:
         """Create premium record for the membership."""
-        Premium.objects.create(
+        uow.add(Premium(
             policy=membership.policy,
             scheme_group=membership.scheme_group,
             membership=membership,
             expected_amount=membership.policy.premium,
-            balance=membership.policy.premium,
-            expected_date=membership.policy.start_date
-        )
+            due_date=membership.policy.start_date
+        ))
     
     def _create_user(self, user_data: Dict[str, Any]) -> User:
-        """Create a new user with the provided data."""
+        """Find the customer by email, phone or ID number, or create them."""
         required_user_fields = ["first_name", "last_name", "email"]
         missing_fields = [field for field in required_user_fields if not user_data.get(field)]
         
         if missing_fields:
             raise ValidationError(f"Missing required user fields: {', '.join(missing_fields)}")
         
-        return User.objects.create(
-            first_name=self._clean_string(user_data["first_name"]),
-            last_name=self._clean_string(user_data["last_name"]),
-            email=self._clean_string(user_data["email"]),
-            gender=self._clean_string(user_data.get("gender", "")),
-            phone_number=self._clean_string(user_data.get("phone_number", "")),
-            id_number=self._clean_string(user_data.get("id_number", "")),
-            address=self._clean_string(user_data.get("address", "")),
-            town=self._clean_string(user_data.get("town", "")),
-            country=self._clean_string(user_data.get("country", "")),
-            username=self._clean_string(user_data["email"]),
-            password=make_password(self.DEFAULT_PASSWORD)
-        )
+        [user] = resolve_or_create_many([{
+            "first_name": self._clean_string(user_data["first_name"]),
+            "last_name": self._clean_string(user_data["last_name"]),
+            "email": self._clean_string(user_data["email"]),
+            "gender": self._clean_string(user_data.get("gender", "")),
+            "phone_number": self._clean_string(user_data.get("phone_number", "")),
+            "id_number": self._clean_string(user_data.get("id_number", "")),
+            "address": self._clean_string(user_data.get("address", "")),
+            "town": self._clean_string(user_data.get("town", "")),
+            "country": self._clean_string(user_data.get("country", "")),
+            "username": self._clean_string(user_data["email"]),
+        }], password=self.DEFAULT_PASSWORD)
+        return user
     
     @staticmethod
     def _clean_string(value: str) -> str:
@@ -0,0 +1,51 @@
+from decimal import Decimal
+from typing import Any, Dict
+
+from rest_framework import serializers
+
+from apps.business.models import InsuredBusiness
+from apps.sales.product_line_purchase.engine import ProductLineHandler
+
+
+class InsuredBusinessSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=255)
+    registration_number = serializers.CharField(max_length=50)
+    industry = serializers.CharField(max_length=100)
+    contact_email = serializers.EmailField()
+    size = serializers.ChoiceField(choices=InsuredBusiness.BUSINESS_SIZES)
+    annual_revenue = serializers.IntegerField(min_value=0)
+    employee_count = serializers.IntegerField(min_value=0)
+    has_security_measures = serializers.BooleanField(required=False, default=False)
+    has_incident_response_plan = serializers.BooleanField(required=False, default=False)
+    cover_limit = serializers.IntegerField(min_value=0)
+    premium = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0)
+    cover_type = serializers.ChoiceField(choices=InsuredBusiness.COVER_TYPES)
+    # Cyber purchases carry only the fields above; the rest are the SME package covers.
+    property_cover = serializers.IntegerField(min_value=0, required=False, default=0)
+    public_liability_cover = serializers.IntegerField(min_value=0, required=False, default=0)
+    employer_liability_cover = serializers.IntegerField(min_value=0, required=False, default=0)
+    interruption_cover = serializers.IntegerField(min_value=0, required=False, default=0)
+    theft_cover = serializers.BooleanField(required=False, default=False)
+    money_in_transit = serializers.BooleanField(required=False, default=False)
+    electronic_equipment_cover = serializers.IntegerField(min_value=0, required=False, default=0)
+    premises_type = serializers.ChoiceField(choices=InsuredBusiness.PREMISES_TYPES, required=False, default="")
+
+
+class CyberPurchaseHandler(ProductLineHandler):
+    product_types = ("cyber", "sme")
+    items_key = "businesses"
+    item_serializer_class = InsuredBusinessSerializer
+    model = InsuredBusiness
+
+    def validate_items(self, items):
+        registrations = [item["registration_number"] for item in items]
+        if len(set(registrations)) != len(registrations):
+            raise serializers.ValidationError("Each business can only be insured once per policy.")
+        insured = InsuredBusiness.objects.filter(registration_number__in=registrations).values_list(
+            "registration_number", flat=True
+        ).first()
+        if insured:
+            raise serializers.ValidationError(f"Business {insured} is already insured.")
+
+    def cover_amount(self, item: Dict[str, Any]) -> Decimal:
+        return Decimal(item["cover_limit"])
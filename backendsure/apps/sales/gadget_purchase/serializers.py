@@ -1,5 +1,6 @@
 from decimal import Decimal
 
+from django.conf import settings
 from rest_framework import serializers
 
 
@@ -53,4 +54,11 @@ class GadgetPolicyPurchaseSerializer(serializers.Serializer):
                 raise serializers.ValidationError(
                     f"Device {i + 1} device_cost must be greater than zero."
                 )
-        return value
\ No newline at end of file
+        return value
+
+class GadgetPolicyBatchPurchaseSerializer(serializers.Serializer):
+    purchases = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=settings.SALES_BATCH_MAX_SIZE,
+    )
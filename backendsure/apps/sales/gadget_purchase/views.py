@@ -3,26 +3,97 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 
 
-from apps.sales.gadget_purchase.serializers import GadgetPolicyPurchaseSerializer
+from apps.sales.gadget_purchase.serializers import (
+    GadgetPolicyPurchaseSerializer, GadgetPolicyBatchPurchaseSerializer
+)
 from apps.sales.gadget_purchase.policy_purchase import GadgetPolicyPurchaseService
+from apps.sales.gadget_purchase.batch_purchase import GadgetPolicyBatchPurchaseService
 
-from apps.gadgets.models import DeviceOutlet
+from apps.core import reference_data
+from apps.gadgets.authentication import OutletAPIKeyAuthentication, IsDeviceOutlet
+from apps.core.audit import record_action
+from apps.core.idempotency import idempotent
+from apps.core.throttling import PUBLIC_ENDPOINT_THROTTLES, admission_controlled
+from apps.core.constants import UserActionTypes
 
 class GadgetPolicyPurchaseAPIView(generics.CreateAPIView):
     serializer_class = GadgetPolicyPurchaseSerializer
     permission_classes = [AllowAny]
+    throttle_classes = PUBLIC_ENDPOINT_THROTTLES
+    throttle_scope = "purchase"
 
+    @idempotent
+    @admission_controlled("heavy-transactions")
     def post(self, request, *args, **kwargs):
         serializer = self.serializer_class(data=request.data)
 
         if serializer.is_valid(raise_exception=True):
-            seller = DeviceOutlet.objects.filter(
-                outlet_number=serializer.validated_data['additional_information'].get('agent_id_number')
-            ).first()
+            seller = reference_data.outlet_by_number(
+                serializer.validated_data['additional_information'].get('agent_id_number')
+            )
             
-            GadgetPolicyPurchaseService(
+            policy, _ = GadgetPolicyPurchaseService(
                 data=serializer.validated_data,
                 seller=seller
             ).execute()
+            record_action("Gadget policy purchased", UserActionTypes.CREATED.value, actor=request.user, target=policy)
             return Response({"success": "Gadget policy purchased successfully"}, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class GadgetPolicyBatchPurchaseAPIView(generics.GenericAPIView):
+    """
+    End-of-day point-of-sale batch for a device outlet.
+
+    Every purchase is validated before anything is written; valid purchases are
+    then created together and the response carries one result per purchase.
+    """
+    serializer_class = GadgetPolicyBatchPurchaseSerializer
+    authentication_classes = [OutletAPIKeyAuthentication]
+    permission_classes = [IsDeviceOutlet]
+    throttle_classes = PUBLIC_ENDPOINT_THROTTLES
+    throttle_scope = "purchase"
+
+    @idempotent
+    @admission_controlled("heavy-transactions")
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        purchases = serializer.validated_data["purchases"]
+
+        results = [None] * len(purchases)
+        valid_indexes = []
+        valid_purchases = []
+        for index, purchase in enumerate(purchases):
+            item_serializer = GadgetPolicyPurchaseSerializer(data=purchase)
+            if item_serializer.is_valid():
+                valid_indexes.append(index)
+                valid_purchases.append(item_serializer.validated_data)
+            else:
+                results[index] = {"status": "rejected", "errors": item_serializer.errors}
+
+        if valid_purchases:
+            created = GadgetPolicyBatchPurchaseService(
+                purchases=valid_purchases,
+                seller=reference_data.outlet(request.auth.pk)
+            ).execute()
+            for index, result in zip(valid_indexes, created):
+                results[index] = result
+
+        results = [{"index": index, **result} for index, result in enumerate(results)]
+        created_count = sum(1 for result in results if result["status"] == "created")
+        record_action(
+            "Outlet batch purchase",
+            UserActionTypes.CREATED.value,
+            actor=request.user,
+            target=request.auth,
+            changes={"created": created_count, "rejected": len(results) - created_count},
+        )
+        return Response(
+            {
+                "created": created_count,
+                "rejected": len(results) - created_count,
+                "results": results,
+            },
+            status=status.HTTP_201_CREATED if created_count == len(results) else status.HTTP_207_MULTI_STATUS
+        )
@@ -2,16 +2,17 @@ from decimal import Decimal
 from typing import Any, Dict, List, Tuple
 from django.db import transaction
 from django.core.exceptions import ValidationError
-from django.contrib.auth.hashers import make_password
 import logging
 
 from apps.policies.models import Policy, PolicyStatusUpdate
-from apps.products.models import Product
+from apps.core import reference_data
+from apps.core.reference_data import ProductSnapshot
 from apps.schemes.models import SchemeGroup
-from apps.payments.models import Premium
 from apps.family.models import Dependent, Beneficiary
+from apps.users.identity import resolve_or_create_many
 from apps.users.models import User, Membership, MembershipStatusUpdate
 from apps.payments.models import Premium, PayerDetail
+from apps.sales.unit_of_work import PurchaseUnitOfWork
 
 logger = logging.getLogger(__name__)
 
@@ -62,13 +63,16 @@ class GroupPolicyPurchaseService:
             product = self._get_product()
             financial_summary = self._calculate_financial_totals()
             
+            uow = PurchaseUnitOfWork()
             policy, scheme_group = self._create_policy_and_scheme(
+                uow=uow,
                 product=product,
                 premium=financial_summary['total_premium'],
                 cover_amount=financial_summary['total_cover_amount']
             )
             
             self._create_memberships_batch(
+                uow=uow,
                 scheme_group=scheme_group,
                 members=self.data.get('members', []),
                 dependents=self.data.get('dependents', []),
@@ -76,10 +80,12 @@ class GroupPolicyPurchaseService:
             )
             
             self._create_payer_details(
+                uow=uow,
                 payment_details=self.data.get('payment_details', {}),
                 policy=policy,
                 scheme_group=scheme_group
             )
+            uow.flush()
             
             logger.info(f"Successfully created group policy {policy.policy_number}")
             return policy, scheme_group
@@ -88,14 +94,12 @@ class GroupPolicyPurchaseService:
             logger.error(f"Failed to create group policy: {str(e)}")
             raise PolicyCreationError(f"Policy creation failed: {str(e)}") from e
     
-    def _get_product(self) -> Product:
+    def _get_product(self) -> ProductSnapshot:
         """Get and validate product"""
-        try:
-            return Product.objects.select_related('scheme').get(
-                id=self.data['product']
-            )
-        except Product.DoesNotExist:
+        product = reference_data.product(self.data['product'])
+        if product is None:
             raise ValidationError(f"Product with id {self.data['product']} does not exist")
+        return product
     
     def _calculate_financial_totals(self) -> Dict[str, Decimal]:
         """Calculate total premiums and cover amounts"""
@@ -132,70 +136,59 @@ class GroupPolicyPurchaseService:
     
     def _create_policy_and_scheme(
         self, 
-        product: Product, 
+        uow: PurchaseUnitOfWork,
+        product: ProductSnapshot, 
         premium: Decimal, 
         cover_amount: Decimal
     ) -> Tuple[Policy, SchemeGroup]:
         """Create policy and associated scheme group"""
-        policy = Policy.objects.create(
-            product=product,
+        policy = uow.add(Policy(
+            product_id=product.id,
             start_date=self.data['start_date'],
             policy_number=product.next_policy_number(),
             premium=premium,
             cover_amount=cover_amount
-        )
+        ))
         
-        PolicyStatusUpdate.objects.create(policy=policy)
+        uow.add(PolicyStatusUpdate(policy=policy))
         
-        scheme_group = SchemeGroup.objects.create(
-            scheme=product.scheme,
+        scheme_group = uow.add(SchemeGroup(
+            scheme_id=product.scheme_id,
             policy=policy
-        )
+        ))
         
         return policy, scheme_group
     
     def _create_memberships_batch(
         self,
+        uow: PurchaseUnitOfWork,
         scheme_group: SchemeGroup,
         members: List[Dict[str, Any]],
         dependents: List[Dict[str, Any]],
         beneficiaries: List[Dict[str, Any]]
     ) -> None:
         """Create all memberships with their associated records"""
-        for member_data in members:
-            try:
-                self._create_single_membership(
-                    scheme_group=scheme_group,
-                    member_data=member_data,
-                    dependents=dependents,
-                    beneficiaries=beneficiaries
-                )
-            except Exception as e:
-                logger.error(f"Failed to create membership for {member_data.get('email', 'unknown')}: {str(e)}")
-                raise
+        users = self._create_users(members)
+        for member_data, user in zip(members, users):
+            self._create_single_membership(
+                uow=uow,
+                scheme_group=scheme_group,
+                user=user,
+                member_data=member_data,
+                dependents=dependents,
+                beneficiaries=beneficiaries
+            )
     
     def _create_single_membership(
         self,
+        uow: PurchaseUnitOfWork,
         scheme_group: SchemeGroup,
+        user: User,
         member_data: Dict[str, Any],
         dependents: List[Dict[str, Any]],
         beneficiaries: List[Dict[str, Any]]
     ) -> None:
         """Create a single membership with all associated records"""
-        # Create user
-        user = self._create_user(member_data)
-        
-        # Create membership
-        membership = Membership.objects.create(
-            user=user,
-            policy=scheme_group.policy,
-            scheme_group=scheme_group,
-            main_member_premium=Decimal(str(member_data.get('premium', 0))),
-            main_member_cover_amount=Decimal(str(member_data.get('cover_amount', 0)))
-        )
-        
-        MembershipStatusUpdate.objects.create(membership=membership)
-        
         # Filter dependents and beneficiaries for this member
         member_dependents = self._filter_by_main_member(
             dependents, member_data.get('id_number', '')
@@ -204,14 +197,32 @@ class GroupPolicyPurchaseService:
             beneficiaries, member_data.get('id_number', '')
         )
         
-        # Calculate total premium including dependents
+        # Calculate the membership totals before anything is written
+        main_member_premium = Decimal(str(member_data.get('premium', 0)))
+        main_member_cover = Decimal(str(member_data.get('cover_amount', 0)))
         dependent_premium_total = sum(
             (Decimal(str(dep.get('premium', 0))) for dep in member_dependents),
             Decimal('0')
         )
-        total_membership_premium = (
-            Decimal(str(member_data.get('premium', 0))) + dependent_premium_total
+        dependent_cover_total = sum(
+            (Decimal(str(dep.get('cover_amount', 0))) for dep in member_dependents),
+            Decimal('0')
         )
+        total_membership_premium = main_member_premium + dependent_premium_total
+        
+        membership = uow.add(Membership(
+            user=user,
+            policy=scheme_group.policy,
+            scheme_group=scheme_group,
+            main_member_premium=main_member_premium,
+            main_member_cover_amount=main_member_cover,
+            dependent_premium=dependent_premium_total,
+            dependent_cover_amount=dependent_cover_total,
+            total_premium=total_membership_premium,
+            total_cover_amount=main_member_cover + dependent_cover_total
+        ))
+        
+        uow.add(MembershipStatusUpdate(membership=membership))
         
         logger.info(
             f"Creating membership for {member_data.get('first_name', 'Unknown')} "
@@ -219,35 +230,39 @@ class GroupPolicyPurchaseService:
         )
         
         # Create associated records
-        self._create_premium(membership, total_membership_premium)
-        self._create_dependents(membership, member_dependents)
-        self._create_beneficiaries(membership, member_beneficiaries)
+        self._create_premium(uow, membership, total_membership_premium)
+        self._create_dependents(uow, membership, member_dependents)
+        self._create_beneficiaries(uow, membership, member_beneficiaries)
     
-    def _create_user(self, member_data: Dict[str, Any]) -> User:
-        """Create a user with proper validation"""
-        email = member_data.get('email', '').strip()
-        if not email:
+    def _create_users(self, members: List[Dict[str, Any]]) -> List[User]:
+        """Find each member by email, phone or ID number, creating the ones not yet registered"""
+        emails = [member_data.get('email', '').strip() for member_data in members]
+        if not all(emails):
             raise ValidationError("Email is required for member")
-            
-        # Check if user already exists
-        if User.objects.filter(email=email).exists():
-            raise ValidationError(f"User with email {email} already exists")
         
-        user = User.objects.create(
-            first_name=member_data.get('first_name', '').strip(),
-            last_name=member_data.get('last_name', '').strip(),
-            email=email,
-            username=email,  # Use email as username
-            gender=member_data.get('gender'),
-            phone_number=member_data.get('phone_number', '').strip(),
-            id_number=member_data.get('id_number', '').strip(),
-            address=member_data.get('address', '').strip(),
-            town=member_data.get('town', '').strip(),
-            country=member_data.get('country', '').strip(),
-            password=make_password('TempPassword123!')  # Use proper password hashing
-        )
+        users = resolve_or_create_many([
+            {
+                'first_name': member_data.get('first_name', '').strip(),
+                'last_name': member_data.get('last_name', '').strip(),
+                'email': email,
+                'username': email,  # Use email as username
+                'gender': member_data.get('gender'),
+                'phone_number': member_data.get('phone_number', '').strip(),
+                'id_number': member_data.get('id_number', '').strip(),
+                'address': member_data.get('address', '').strip(),
+                'town': member_data.get('town', '').strip(),
+                'country': member_data.get('country', '').strip(),
+            }
+            for member_data, email in zip(members, emails)
+        ], password='TempPassword123!')
         
-        return user
+        # A person can only be a member of the group once
+        seen = {}
+        for email, user in zip(emails, users):
+            if id(user) in seen:
+                raise ValidationError(f"Members {seen[id(user)]} and {email} are the same person")
+            seen[id(user)] = email
+        return users
     
     def _filter_by_main_member(
         self, 
@@ -266,22 +281,13 @@ class GroupPolicyPurchaseService:
     
     def _create_dependents(
         self, 
+        uow: PurchaseUnitOfWork,
         membership: Membership, 
         dependents: List[Dict[str, Any]]
     ) -> None:
-        """Create dependents and update membership totals"""
-        if not dependents:
-            return
-            
-        dependent_objects = []
-        total_dependent_premium = Decimal('0')
-        total_dependent_cover = Decimal('0')
-        
-        for dependent_data in dependents:
-            premium = Decimal(str(dependent_data.get('premium', 0)))
-            cover_amount = Decimal(str(dependent_data.get('cover_amount', 0)))
-            
-            dependent = Dependent(
+        """Create dependents"""
+        uow.add_all(
+            Dependent(
                 membership=membership,
                 policy=membership.policy,
                 scheme_group=membership.scheme_group,
@@ -292,42 +298,23 @@ class GroupPolicyPurchaseService:
                 passport_number=dependent_data.get('passport_number', '').strip(),
                 gender=dependent_data.get('gender'),
                 relationship=dependent_data.get('relationship'),
-                premium=premium,
-                cover_amount=cover_amount,
+                premium=Decimal(str(dependent_data.get('premium', 0))),
+                cover_amount=Decimal(str(dependent_data.get('cover_amount', 0))),
                 date_of_birth=dependent_data.get('date_of_birth'),
                 status='Active',
                 dependent_type='Dependent'
             )
-            
-            dependent_objects.append(dependent)
-            total_dependent_premium += premium
-            total_dependent_cover += cover_amount
-        
-        # Bulk create dependents
-        Dependent.objects.bulk_create(dependent_objects)
-        
-        # Update membership totals
-        membership.dependent_premium += total_dependent_premium
-        membership.dependent_cover_amount += total_dependent_cover
-        membership.total_premium += total_dependent_premium
-        membership.total_cover_amount += total_dependent_cover
-        membership.save(update_fields=[
-            'dependent_premium', 
-            'dependent_cover_amount', 
-            'total_premium', 
-            'total_cover_amount'
-        ])
+            for dependent_data in dependents
+        )
     
     def _create_beneficiaries(
         self, 
+        uow: PurchaseUnitOfWork,
         membership: Membership, 
         beneficiaries: List[Dict[str, Any]]
     ) -> None:
-        """Create beneficiaries in bulk"""
-        if not beneficiaries:
-            return
-            
-        beneficiary_objects = [
+        """Create beneficiaries"""
+        uow.add_all(
             Beneficiary(
                 membership=membership,
                 policy=membership.policy,
@@ -344,23 +331,21 @@ class GroupPolicyPurchaseService:
                 status='Active'
             )
             for beneficiary_data in beneficiaries
-        ]
-        
-        Beneficiary.objects.bulk_create(beneficiary_objects)
+        )
     
-    def _create_premium(self, membership: Membership, amount: Decimal) -> None:
+    def _create_premium(self, uow: PurchaseUnitOfWork, membership: Membership, amount: Decimal) -> None:
         """Create premium record"""
-        Premium.objects.create(
+        uow.add(Premium(
             policy=membership.policy,
             scheme_group=membership.scheme_group,
             membership=membership,
             expected_amount=amount,
-            balance=amount,
-            expected_date=membership.policy.start_date
-        )
+            due_date=membership.policy.start_date
+        ))
     
     def _create_payer_details(
         self, 
+        uow: PurchaseUnitOfWork,
         payment_details: Dict[str, Any], 
         policy: Policy, 
         scheme_group: SchemeGroup
@@ -370,7 +355,7 @@ class GroupPolicyPurchaseService:
             logger.warning(f"No payment details provided for policy {policy.policy_number}")
             return
             
-        PayerDetail.objects.create(
+        uow.add(PayerDetail(
             policy=policy,
             scheme_group=scheme_group,
             bank_name=payment_details.get('bank_name', '').strip(),
@@ -380,7 +365,7 @@ class GroupPolicyPurchaseService:
             branch_code=payment_details.get('branch_code', '').strip(),
             debit_order_date=payment_details.get('debit_order_date'),
             source_of_funds=payment_details.get('source_of_funds', '').strip()
-        )
+        ))
 
 
 # Usage example:
@@ -0,0 +1,42 @@
+from typing import Any, Dict
+
+from rest_framework import serializers
+
+from apps.family.models import InsuredVehicle
+from apps.sales.product_line_purchase.engine import ProductLineHandler
+
+
+class InsuredVehicleSerializer(serializers.Serializer):
+    registration_number = serializers.CharField(max_length=255)
+    make = serializers.CharField(max_length=255)
+    model = serializers.CharField(max_length=255)
+    year_of_manufacture = serializers.IntegerField(min_value=1900)
+    engine_number = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    chassis_number = serializers.CharField(source="chasis", max_length=255, required=False, allow_blank=True)
+    usage_type = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    color = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    vehicle_value = serializers.DecimalField(max_digits=100, decimal_places=2, min_value=0)
+    cover_type = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    # The windscreen limit is sent as an amount; only whether it is covered is stored.
+    windscreen_cover = serializers.DecimalField(max_digits=100, decimal_places=2, required=False, default=0)
+    political_violence_cover = serializers.BooleanField(source="political_violence_covered", required=False, default=False)
+    excess_protector = serializers.BooleanField(required=False, default=False)
+    cover_amount = serializers.DecimalField(max_digits=100, decimal_places=2, min_value=0)
+    premium = serializers.DecimalField(max_digits=100, decimal_places=2, min_value=0)
+
+
+class MotorPurchaseHandler(ProductLineHandler):
+    product_types = ("motor",)
+    items_key = "vehicles"
+    item_serializer_class = InsuredVehicleSerializer
+    model = InsuredVehicle
+
+    def validate_items(self, items):
+        registrations = [item["registration_number"].upper() for item in items]
+        if len(set(registrations)) != len(registrations):
+            raise serializers.ValidationError("Each vehicle can only be insured once per policy.")
+
+    def item_fields(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        fields = dict(item)
+        fields["windscreen_covered"] = fields.pop("windscreen_cover") > 0
+        return fields
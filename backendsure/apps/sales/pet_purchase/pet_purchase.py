@@ -0,0 +1,25 @@
+from rest_framework import serializers
+
+from apps.family.models import InsuredPet
+from apps.sales.product_line_purchase.engine import ProductLineHandler
+
+
+class InsuredPetSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=255)
+    type = serializers.CharField(source="pet_type", max_length=255)
+    breed = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    gender = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    date_of_birth = serializers.DateField(required=False, allow_null=True)
+    microchip_number = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    cover_type = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    neutered = serializers.BooleanField(required=False, default=False)
+    vaccinated = serializers.BooleanField(required=False, default=False)
+    cover_amount = serializers.DecimalField(max_digits=100, decimal_places=2, min_value=0)
+    premium = serializers.DecimalField(max_digits=100, decimal_places=2, min_value=0)
+
+
+class PetPurchaseHandler(ProductLineHandler):
+    product_types = ("pet", "pet_insurance")
+    items_key = "pets"
+    item_serializer_class = InsuredPetSerializer
+    model = InsuredPet
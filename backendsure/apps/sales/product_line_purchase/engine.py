@@ -0,0 +1,169 @@
+"""
+Purchase engine for product lines that insure a list of items.
+
+Motor, pet and cyber/SME purchases all create the same policy, scheme group,
+membership, beneficiaries, payer details and premium around a list of insured
+items; only the items differ. A ``ProductLineHandler`` describes one line:
+the payload key its items come under, how they are validated, and how each
+becomes a row of its model. ``ProductLinePurchaseService`` does the rest for
+every line and writes it through the purchase unit of work, so a purchase
+costs one INSERT per table however many items it insures.
+
+Lines are registered in ``apps.sales.product_line_purchase.registry``.
+"""
+from decimal import Decimal
+from typing import Any, Dict, List, Tuple
+import uuid
+
+from django.db import transaction
+from django.db.models import Model
+
+from apps.core.reference_data import ProductSnapshot
+from apps.family.models import Beneficiary
+from apps.notifications.models import NotificationStorage
+from apps.payments.models import PayerDetail, Premium
+from apps.policies.models import Policy, PolicyStatusUpdate
+from apps.schemes.models import SchemeGroup
+from apps.users.identity import resolve_or_create_many
+from apps.users.models import Membership, MembershipStatusUpdate, User
+from apps.sales.unit_of_work import PurchaseUnitOfWork
+
+
+class ProductLineHandler:
+    """How one product line's insured items are validated and stored."""
+    product_types: Tuple[str, ...] = ()
+    items_key: str
+    item_serializer_class: type
+    model: type
+
+    def validate_items(self, items: List[Dict[str, Any]]) -> None:
+        """Checks across all items of a purchase; raise ``serializers.ValidationError``."""
+
+    def item_fields(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Field values for the item's row, excluding policy, membership and scheme group."""
+        return dict(item)
+
+    def cover_amount(self, item: Dict[str, Any]) -> Decimal:
+        return Decimal(str(item["cover_amount"]))
+
+    def premium(self, item: Dict[str, Any]) -> Decimal:
+        return Decimal(str(item["premium"]))
+
+    def build_item(self, item: Dict[str, Any], policy: Policy, membership: Membership) -> Model:
+        return self.model(
+            policy=policy,
+            membership=membership,
+            scheme_group=membership.scheme_group,
+            **self.item_fields(item)
+        )
+
+
+class ProductLinePurchaseService:
+    """Creates a policy for a product line from a validated ``ProductLinePurchaseSerializer`` payload."""
+
+    DEFAULT_PASSWORD = "1234"
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        self.data = data
+        self.handler: ProductLineHandler = data["product_line"]
+
+    @transaction.atomic
+    def execute(self) -> Tuple[Policy, Membership]:
+        product: ProductSnapshot = self.data["product"]
+        items = self.data["items"]
+        total_premium = sum((self.handler.premium(item) for item in items), Decimal("0"))
+        total_cover = sum((self.handler.cover_amount(item) for item in items), Decimal("0"))
+
+        uow = PurchaseUnitOfWork()
+        owner = self._resolve_owner()
+        additional_information = self.data.get("additional_information", {})
+        policy = uow.add(Policy(
+            product_id=product.id,
+            start_date=self.data["start_date"],
+            policy_number=product.next_policy_number(),
+            cover_amount=total_cover,
+            premium=total_premium,
+            policy_owner=owner,
+            purchase_channel="Agent" if additional_information.get("purchase_via_agent") else "Direct",
+            payment_method=self.data["payment_details"].get("payment_method") or "Mpesa",
+            preferred_communication_channel=additional_information.get("preferred_communication_channel", "Email"),
+        ))
+        uow.add(PolicyStatusUpdate(policy=policy))
+        scheme_group = uow.add(SchemeGroup(scheme_id=product.scheme_id, policy=policy))
+
+        membership = uow.add(Membership(
+            user=owner,
+            policy=policy,
+            scheme_group=scheme_group,
+            main_member_premium=total_premium,
+            main_member_cover_amount=total_cover,
+            total_premium=total_premium,
+            total_cover_amount=total_cover,
+        ))
+        uow.add(MembershipStatusUpdate(membership=membership))
+
+        uow.add_all(self.handler.build_item(item, policy, membership) for item in items)
+        uow.add_all(
+            Beneficiary(
+                membership=membership,
+                policy=policy,
+                scheme_group=scheme_group,
+                first_name=beneficiary.get("first_name", ""),
+                last_name=beneficiary.get("last_name", ""),
+                email=beneficiary.get("email") or None,
+                phone_number=beneficiary.get("phone_number") or None,
+                id_number=beneficiary.get("id_number", ""),
+                passport_number=beneficiary.get("passport_number", ""),
+                gender=beneficiary.get("gender", ""),
+                relationship=beneficiary.get("relationship", ""),
+                percentage=Decimal(str(beneficiary.get("percentage", 0))),
+                date_of_birth=beneficiary.get("date_of_birth"),
+            )
+            for beneficiary in self.data.get("beneficiaries", [])
+        )
+        uow.add(PayerDetail(
+            membership=membership,
+            policy=policy,
+            scheme_group=scheme_group,
+            **self._payer_detail_fields()
+        ))
+        uow.add(Premium(
+            policy=policy,
+            scheme_group=scheme_group,
+            membership=membership,
+            expected_amount=total_premium,
+            due_date=policy.start_date,
+        ))
+        uow.add(NotificationStorage(
+            user=owner,
+            title="Policy Purchase Successful",
+            notification_category="New Policy",
+            notification_channel=policy.preferred_communication_channel,
+            status="Pending",
+            policy=policy,
+        ))
+        uow.flush()
+        return policy, membership
+
+    def _resolve_owner(self) -> User:
+        """The known customer with this email, phone or ID number, or a new, not yet activated one."""
+        owner = self.data["owner"]
+        [user] = resolve_or_create_many(
+            [{**owner, "username": owner["email"], "token": uuid.uuid4(), "is_active": False}],
+            password=self.DEFAULT_PASSWORD,
+        )
+        return user
+
+    def _payer_detail_fields(self) -> Dict[str, Any]:
+        payment_details = self.data["payment_details"]
+        return {
+            "payment_method": payment_details.get("payment_method") or "Mpesa",
+            "bank_name": payment_details.get("bank_name", ""),
+            "account_type": payment_details.get("account_type", ""),
+            "account_name": payment_details.get("account_name", ""),
+            "account_number": payment_details.get("account_number", ""),
+            "branch_code": payment_details.get("branch_code", ""),
+            "phone_number": payment_details.get("phone_number", ""),
+            "debit_order_date": payment_details.get("debit_order_date"),
+            "source_of_funds": payment_details.get("source_of_funds", ""),
+        }
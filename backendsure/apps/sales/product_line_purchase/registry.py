@@ -0,0 +1,20 @@
+"""
+Product lines sold through ``PolicyPurchaseAPIView``, by ``product_type``.
+
+A new line adds a ``ProductLineHandler`` under its own purchase package and
+lists it here.
+"""
+from apps.sales.cyber_purchase.cyber_purchase import CyberPurchaseHandler
+from apps.sales.motor_purchase.motor_purchase import MotorPurchaseHandler
+from apps.sales.pet_purchase.pet_purchase import PetPurchaseHandler
+
+PRODUCT_LINES = [
+    MotorPurchaseHandler(),
+    PetPurchaseHandler(),
+    CyberPurchaseHandler(),
+]
+PRODUCT_LINES_BY_TYPE = {
+    product_type: handler
+    for handler in PRODUCT_LINES
+    for product_type in handler.product_types
+}
@@ -1,14 +1,16 @@
 from decimal import Decimal
 from typing import Any, Dict, Tuple
 from django.db import transaction
-from django.contrib.auth.hashers import make_password
 
 from apps.policies.models import Policy, PolicyStatusUpdate
-from apps.products.models import Product
+from apps.core import reference_data
+from apps.core.reference_data import ProductSnapshot
 from apps.schemes.models import SchemeGroup
 from apps.payments.models import Premium, PayerDetail
 from apps.family.models import Dependent, Beneficiary
+from apps.users.identity import resolve_or_create_many
 from apps.users.models import User, Membership, MembershipStatusUpdate
+from apps.sales.unit_of_work import PurchaseUnitOfWork
 
 
 class RetailPolicyPurchaseService:
@@ -34,140 +36,131 @@ class RetailPolicyPurchaseService:
     @transaction.atomic
     def execute(self) -> Tuple[Policy, Membership]:
         """Execute the policy purchase process."""
-        try:
-            product = self._get_product()
-            policy, scheme_group = self._create_policy_and_scheme_group(product)
-            membership = self._create_main_membership(scheme_group)
-            
-            # Calculate totals
-            dependent_totals = self._calculate_dependent_totals()
-            total_amounts = self._calculate_total_amounts(membership, dependent_totals)
-            
-            # Update membership and policy with totals
-            self._update_membership_totals(membership, dependent_totals, total_amounts)
-            self._update_policy_totals(policy, total_amounts)
-            
-            # Create related entities
-            self._create_dependents(membership)
-            self._create_beneficiaries(membership)
-            self._create_payer_details(membership)
-            self._create_premium_record(membership, total_amounts['total_premium'])
-            
-            return policy, membership
-            
-        except Exception as e:
-            # Log the error here if you have logging configured
-            raise e
-    
-    def _get_product(self) -> Product:
+        product = self._get_product()
+
+        # Every total is known before the first row is written.
+        main_member_data = self.data["members"][0]
+        main_member_totals = {
+            "cover_amount": Decimal(str(main_member_data.get("cover_amount", 0))),
+            "premium": Decimal(str(main_member_data.get("premium", 0))),
+        }
+        dependent_totals = self._calculate_dependent_totals()
+        total_amounts = self._calculate_total_amounts(main_member_totals, dependent_totals)
+
+        uow = PurchaseUnitOfWork()
+        policy, scheme_group = self._create_policy_and_scheme_group(uow, product, total_amounts)
+        membership = self._create_main_membership(
+            uow, scheme_group, main_member_data, main_member_totals, dependent_totals, total_amounts
+        )
+        self._create_dependents(uow, membership)
+        self._create_beneficiaries(uow, membership)
+        self._create_payer_details(uow, membership)
+        self._create_premium_record(uow, membership, total_amounts["total_premium"])
+        uow.flush()
+
+        return policy, membership
+
+    def _get_product(self) -> ProductSnapshot:
         """Retrieve and validate product."""
-        try:
-            return Product.objects.get(id=self.data["product"])
-        except Product.DoesNotExist:
+        product = reference_data.product(self.data["product"])
+        if product is None:
             raise ValueError(f"Product with id {self.data['product']} does not exist")
-    
-    def _create_policy_and_scheme_group(self, product: Product) -> Tuple[Policy, SchemeGroup]:
+        return product
+
+    def _create_policy_and_scheme_group(
+        self, uow: PurchaseUnitOfWork, product: ProductSnapshot, total_amounts: Dict[str, Decimal]
+    ) -> Tuple[Policy, SchemeGroup]:
         """Create policy and associated scheme group."""
-        policy = Policy.objects.create(
-            product=product,
+        policy = uow.add(Policy(
+            product_id=product.id,
             start_date=self.data.get("start_date"),
             policy_number=product.next_policy_number(),
-            cover_amount=Decimal('0'),  # Initialize with 0, will be updated later
-            premium=Decimal('0')  # Initialize with 0, will be updated later
-        )
-        
-        PolicyStatusUpdate.objects.create(policy=policy)
-        
-        scheme_group = SchemeGroup.objects.create(
-            scheme=product.scheme,
+            cover_amount=total_amounts["total_cover"],
+            premium=total_amounts["total_premium"]
+        ))
+
+        uow.add(PolicyStatusUpdate(policy=policy))
+
+        scheme_group = uow.add(SchemeGroup(
+            scheme_id=product.scheme_id,
             policy=policy
-        )
-        
+        ))
+
         return policy, scheme_group
-    
-    def _create_main_membership(self, scheme_group: SchemeGroup) -> Membership:
+
+    def _create_main_membership(
+        self,
+        uow: PurchaseUnitOfWork,
+        scheme_group: SchemeGroup,
+        main_member_data: Dict[str, Any],
+        main_member_totals: Dict[str, Decimal],
+        dependent_totals: Dict[str, Decimal],
+        total_amounts: Dict[str, Decimal],
+    ) -> Membership:
         """Create main member user and membership."""
-        main_member_data = self.data["members"][0]
-        
         user = self._create_user(main_member_data)
-        
-        membership = Membership.objects.create(
+
+        membership = uow.add(Membership(
             user=user,
             policy=scheme_group.policy,
             scheme_group=scheme_group,
-            main_member_premium=Decimal(str(main_member_data.get("premium", 0))),
-            main_member_cover_amount=Decimal(str(main_member_data.get("cover_amount", 0))),
-            dependent_cover_amount=Decimal('0'),
-            dependent_premium=Decimal('0'),
-            total_cover_amount=Decimal('0'),
-            total_premium=Decimal('0')
-        )
-        
-        MembershipStatusUpdate.objects.create(membership=membership)
-        
+            main_member_premium=main_member_totals["premium"],
+            main_member_cover_amount=main_member_totals["cover_amount"],
+            dependent_cover_amount=dependent_totals["cover_amount"],
+            dependent_premium=dependent_totals["premium"],
+            total_cover_amount=total_amounts["total_cover"],
+            total_premium=total_amounts["total_premium"]
+        ))
+
+        uow.add(MembershipStatusUpdate(membership=membership))
+
         return membership
-    
+
     def _create_user(self, user_data: Dict[str, Any]) -> User:
-        """Create a new user with the provided data."""
-        user = User.objects.create(
-            first_name=user_data.get("first_name", ""),
-            last_name=user_data.get("last_name", ""),
-            email=user_data.get("email", ""),
-            gender=user_data.get("gender", ""),
-            phone_number=user_data.get("phone_number", ""),
-            id_number=user_data.get("id_number", ""),
-            address=user_data.get("address", ""),
-            town=user_data.get("town", ""),
-            country=user_data.get("country", ""),
-            username=user_data.get("email", ""),
-            password=make_password(self.DEFAULT_PASSWORD)
-        )
-        
+        """Find the customer by email, phone or ID number, or create them."""
+        [user] = resolve_or_create_many([{
+            "first_name": user_data.get("first_name", ""),
+            "last_name": user_data.get("last_name", ""),
+            "email": user_data.get("email", ""),
+            "gender": user_data.get("gender", ""),
+            "phone_number": user_data.get("phone_number", ""),
+            "id_number": user_data.get("id_number", ""),
+            "address": user_data.get("address", ""),
+            "town": user_data.get("town", ""),
+            "country": user_data.get("country", ""),
+            "username": user_data.get("email", ""),
+        }], password=self.DEFAULT_PASSWORD)
         return user
-    
+
     def _calculate_dependent_totals(self) -> Dict[str, Decimal]:
         """Calculate total cover amounts and premiums for dependents."""
         dependents = self.data.get("dependents", [])
-        
+
         total_cover = sum(
-            Decimal(str(dependent.get("cover_amount", 0))) 
-            for dependent in dependents
+            (Decimal(str(dependent.get("cover_amount", 0))) for dependent in dependents),
+            Decimal('0')
         )
         total_premium = sum(
-            Decimal(str(dependent.get("premium", 0))) 
-            for dependent in dependents
+            (Decimal(str(dependent.get("premium", 0))) for dependent in dependents),
+            Decimal('0')
         )
-        
+
         return {
             "cover_amount": total_cover,
             "premium": total_premium
         }
-    
-    def _calculate_total_amounts(self, membership: Membership, dependent_totals: Dict[str, Decimal]) -> Dict[str, Decimal]:
+
+    def _calculate_total_amounts(self, main_member_totals: Dict[str, Decimal], dependent_totals: Dict[str, Decimal]) -> Dict[str, Decimal]:
         """Calculate total amounts for the entire policy."""
-        total_cover = membership.main_member_cover_amount + dependent_totals["cover_amount"]
-        total_premium = membership.main_member_premium + dependent_totals["premium"]
-        
+        total_cover = main_member_totals["cover_amount"] + dependent_totals["cover_amount"]
+        total_premium = main_member_totals["premium"] + dependent_totals["premium"]
+
         return {
             "total_cover": total_cover,
             "total_premium": total_premium
         }
-    
-    def _update_membership_totals(self, membership: Membership, dependent_totals: Dict[str, Decimal], total_amounts: Dict[str, Decimal]) -> None:
-        """Update membership with calculated totals."""
-        membership.dependent_cover_amount = dependent_totals["cover_amount"]
-        membership.dependent_premium = dependent_totals["premium"]
-        membership.total_cover_amount = total_amounts["total_cover"]
-        membership.total_premium = total_amounts["total_premium"]
-        membership.save()
-    
-    def _update_policy_totals(self, policy: Policy, total_amounts: Dict[str, Decimal]) -> None:
-        """Update policy with calculated totals."""
-        policy.cover_amount = total_amounts["total_cover"]
-        policy.premium = total_amounts["total_premium"]
-        policy.save()
-    
-    def _create_dependents(self, membership: Membership) -> None:
+
+    def _create_dependents(self, uow: PurchaseUnitOfWork, membership: Membership) -> None:
         """Create dependent records."""
         dependents_data = self.data.get("dependents", [])
         
@@ -191,11 +184,10 @@ class RetailPolicyPurchaseService:
             )
             for dependent in dependents_data
         ]
-        
-        if dependent_objects:
-            Dependent.objects.bulk_create(dependent_objects)
+
+        uow.add_all(dependent_objects)
     
-    def _create_beneficiaries(self, membership: Membership) -> None:
+    def _create_beneficiaries(self, uow: PurchaseUnitOfWork, membership: Membership) -> None:
         """Create beneficiary records."""
         beneficiaries_data = self.data.get("beneficiaries", [])
         
@@ -217,15 +209,14 @@ class RetailPolicyPurchaseService:
             )
             for beneficiary in beneficiaries_data
         ]
-        
-        if beneficiary_objects:
-            Beneficiary.objects.bulk_create(beneficiary_objects)
+
+        uow.add_all(beneficiary_objects)
     
-    def _create_payer_details(self, membership: Membership) -> None:
+    def _create_payer_details(self, uow: PurchaseUnitOfWork, membership: Membership) -> None:
         """Create payer details record."""
         payment_details = self.data.get("payment_details", {})
         
-        PayerDetail.objects.create(
+        uow.add(PayerDetail(
             membership=membership,
             bank_name=payment_details.get("bank_name", ""),
             account_type=payment_details.get("account_type", ""),
@@ -234,15 +225,14 @@ class RetailPolicyPurchaseService:
             branch_code=payment_details.get("branch_code", ""),
             debit_order_date=payment_details.get("debit_order_date"),
             source_of_funds=payment_details.get("source_of_funds", "")
-        )
+        ))
     
-    def _create_premium_record(self, membership: Membership, amount: Decimal) -> None:
+    def _create_premium_record(self, uow: PurchaseUnitOfWork, membership: Membership, amount: Decimal) -> None:
         """Create premium record."""
-        Premium.objects.create(
+        uow.add(Premium(
             policy=membership.policy,
             scheme_group=membership.scheme_group,
             membership=membership,
             expected_amount=amount,
-            balance=amount,
-            expected_date=membership.policy.start_date
-        )
\ No newline at end of file
+            due_date=membership.policy.start_date
+        ))
\ No newline at end of file
@@ -1,5 +1,9 @@
 from rest_framework import serializers
 
+from apps.core import reference_data
+from apps.sales.product_line_purchase.registry import PRODUCT_LINES_BY_TYPE
+
+
 class PolicyPurchaseSerializer(serializers.Serializer):
     product = serializers.IntegerField()
     product_type = serializers.CharField(max_length=255, required=False, allow_blank=True)
@@ -10,3 +14,59 @@ class PolicyPurchaseSerializer(serializers.Serializer):
     beneficiaries = serializers.JSONField(required=False, allow_null=True)
     payment_details = serializers.JSONField(required=False, allow_null=True)
     creditors = serializers.JSONField(required=False, allow_null=True)
+
+
+class ProductLineOwnerSerializer(serializers.Serializer):
+    first_name = serializers.CharField(max_length=150)
+    last_name = serializers.CharField(max_length=150)
+    email = serializers.EmailField()
+    phone_number = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    id_number = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    gender = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    date_of_birth = serializers.DateField(required=False, allow_null=True)
+    address = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    ward = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    county = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    sub_county = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    town = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    country = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    occupation = serializers.CharField(max_length=255, required=False, allow_blank=True)
+
+
+class ProductLinePurchaseSerializer(serializers.Serializer):
+    """
+    A purchase for one of the registered product lines. The insured items come
+    under the line's own key (``vehicles``, ``pets``, ``businesses``) and are
+    validated by its handler into ``items``.
+    """
+    product = serializers.IntegerField()
+    product_type = serializers.ChoiceField(choices=list(PRODUCT_LINES_BY_TYPE))
+    start_date = serializers.DateField()
+    owner = ProductLineOwnerSerializer()
+    payment_details = serializers.DictField(required=False, default=dict)
+    beneficiaries = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+    additional_information = serializers.DictField(required=False, default=dict)
+
+    def validate_product(self, value):
+        product = reference_data.product(value)
+        if product is None:
+            raise serializers.ValidationError(f'Invalid pk "{value}" - object does not exist.')
+        return product
+
+    def validate(self, attrs):
+        handler = PRODUCT_LINES_BY_TYPE[attrs["product_type"]]
+        raw_items = self.initial_data.get(handler.items_key)
+        if not isinstance(raw_items, list) or not raw_items:
+            raise serializers.ValidationError({handler.items_key: ["Provide at least one item to insure."]})
+
+        items = handler.item_serializer_class(data=raw_items, many=True)
+        if not items.is_valid():
+            raise serializers.ValidationError({handler.items_key: items.errors})
+        try:
+            handler.validate_items(items.validated_data)
+        except serializers.ValidationError as e:
+            raise serializers.ValidationError({handler.items_key: e.detail})
+
+        attrs["product_line"] = handler
+        attrs["items"] = items.validated_data
+        return attrs
@@ -1,3 +1,217 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+import json
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.business.models import InsuredBusiness
+from apps.core import reference_data
+from apps.core.audit import audit_log_buffer
+from apps.family.models import Dependent, InsuredPet, InsuredVehicle
+from apps.payments.models import Premium
+from apps.policies.models import Policy
+from apps.products.models import PolicyNumberSequence, Product
+from apps.sales.group_purchase.group_purchase import GroupPolicyPurchaseService
+from apps.sales.retail_purchase.retail_purchase import RetailPolicyPurchaseService
+from apps.sales.unit_of_work import PurchaseUnitOfWork
+from apps.schemes.models import Scheme
+from apps.users.models import Membership, User
+
+SALES_DIR = Path(__file__).resolve().parent
+
+
+@override_settings(REFERENCE_DATA_POLL_SECONDS=3600)
+class PurchaseTestCase(TestCase):
+    """Purchases against a funeral product whose snapshot is cached and numbering started, so queries are the purchase's own."""
+
+    def setUp(self):
+        scheme = Scheme.objects.create(name="Funeral", scheme_type="Individual")
+        self.product = Product.objects.create(name="Family Cover", scheme=scheme, policy_number_prefix="FAM")
+        PolicyNumberSequence.objects.create(product=self.product)
+        reference_data.reference_data.clear()
+        reference_data.product(self.product.id)
+
+
+def retail_purchase(product_id, email, dependents):
+    return {
+        "product": product_id,
+        "start_date": "2026-02-01",
+        "members": [{"first_name": "R", "last_name": "M", "email": email, "premium": 100, "cover_amount": 10000}],
+        "dependents": [
+            {"first_name": "D", "premium": 20, "cover_amount": 2000, "relationship": "Child", "gender": "Male"}
+            for _ in range(dependents)
+        ],
+        "beneficiaries": [{"first_name": "B", "percentage": 50}, {"first_name": "C", "percentage": 50}],
+        "payment_details": {"bank_name": "X"},
+    }
+
+
+class RetailPurchaseTests(PurchaseTestCase):
+    def test_query_count_does_not_grow_with_dependents(self):
+        with self.assertNumQueries(17):
+            RetailPolicyPurchaseService(retail_purchase(self.product.id, "one@example.com", 1)).execute()
+        with self.assertNumQueries(17):
+            policy, membership = RetailPolicyPurchaseService(retail_purchase(self.product.id, "five@example.com", 5)).execute()
+
+        policy.refresh_from_db()
+        membership.refresh_from_db()
+        self.assertEqual(policy.premium, Decimal("200"))
+        self.assertEqual(policy.cover_amount, Decimal("20000"))
+        self.assertEqual(membership.dependent_premium, Decimal("100"))
+        self.assertEqual(membership.total_premium, Decimal("200"))
+        self.assertEqual(Dependent.objects.filter(policy=policy).count(), 5)
+        self.assertEqual(Premium.objects.get(policy=policy).expected_amount, Decimal("200"))
+
+
+class GroupPurchaseTests(PurchaseTestCase):
+    def purchase(self, members, dependents):
+        return {
+            "product": self.product.id,
+            "start_date": "2026-02-01",
+            "members": [
+                {"first_name": f"G{i}", "last_name": "M", "email": f"g{i}@example.com", "id_number": f"G{i}",
+                 "premium": 50, "cover_amount": 5000, "gender": "Male"}
+                for i in range(members)
+            ],
+            "dependents": [
+                {"first_name": "D", "main_member_id_number": f"G{i % members}", "gender": "Male",
+                 "relationship": "Child", "premium": 10, "cover_amount": 1000}
+                for i in range(dependents)
+            ],
+            "beneficiaries": [
+                {"first_name": "B", "main_member_id_number": "G0", "gender": "Male", "relationship": "Child",
+                 "percentage": 100}
+            ],
+            "payment_details": {"bank_name": "Z"},
+        }
+
+    def test_query_count_does_not_grow_with_members(self):
+        with self.assertNumQueries(17):
+            policy, _ = GroupPolicyPurchaseService(self.purchase(members=5, dependents=7)).execute()
+
+        policy.refresh_from_db()
+        self.assertEqual(policy.premium, Decimal("320"))
+        memberships = Membership.objects.filter(policy=policy).order_by("id")
+        self.assertEqual(
+            [membership.main_member_premium for membership in memberships], [Decimal("50")] * 5
+        )
+        self.assertEqual(
+            [membership.total_premium for membership in memberships],
+            [Decimal("70"), Decimal("70"), Decimal("60"), Decimal("60"), Decimal("60")],
+        )
+        self.assertEqual(
+            [membership.total_cover_amount for membership in memberships],
+            [Decimal("7000"), Decimal("7000"), Decimal("6000"), Decimal("6000"), Decimal("6000")],
+        )
+        self.assertEqual(
+            [premium.expected_amount for premium in Premium.objects.filter(policy=policy).order_by("id")],
+            [Decimal("70"), Decimal("70"), Decimal("60"), Decimal("60"), Decimal("60")],
+        )
+
+    def test_larger_group_costs_the_same_queries(self):
+        with self.assertNumQueries(17):
+            GroupPolicyPurchaseService(self.purchase(members=20, dependents=40)).execute()
+
+
+class PurchaseUnitOfWorkTests(PurchaseTestCase):
+    def test_increments_to_the_same_row_are_merged(self):
+        _, membership = RetailPolicyPurchaseService(retail_purchase(self.product.id, "u@example.com", 0)).execute()
+
+        uow = PurchaseUnitOfWork()
+        uow.increment(membership, total_premium=Decimal("5"))
+        uow.increment(membership, total_premium=Decimal("2"), total_cover_amount=Decimal("1"))
+        with self.assertNumQueries(1):
+            uow.flush()
+
+        membership.refresh_from_db()
+        self.assertEqual(membership.total_premium, Decimal("107"))
+        self.assertEqual(membership.total_cover_amount, Decimal("10001"))
+
+
+class ProductLinePurchaseTests(PurchaseTestCase):
+    """The sample payloads shipped with each product line, posted to the purchase endpoint."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # Purchases are audited; write the entries inside the test's transaction.
+        self.addCleanup(audit_log_buffer.flush)
+        self.client = APIClient()
+
+    def sample(self, path):
+        return {**json.loads((SALES_DIR / path).read_text()), "product": self.product.id}
+
+    def purchase(self, data):
+        response = self.client.post("/sales/policy-purchase/", data, format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+        return Policy.objects.get(policy_number=response.data["policy_number"])
+
+    def assert_totals(self, policy, premium, cover_amount):
+        self.assertEqual((policy.premium, policy.cover_amount), (Decimal(premium), Decimal(cover_amount)))
+        membership = Membership.objects.get(policy=policy)
+        self.assertEqual(
+            (membership.total_premium, membership.total_cover_amount), (Decimal(premium), Decimal(cover_amount))
+        )
+        self.assertEqual(Premium.objects.get(policy=policy).expected_amount, Decimal(premium))
+
+    def test_motor(self):
+        policy = self.purchase(self.sample("motor_purchase/motor_insurance.json"))
+
+        self.assert_totals(policy, "12000", "7000000")
+        vehicles = list(InsuredVehicle.objects.filter(policy=policy).order_by("registration_number"))
+        self.assertEqual([v.registration_number for v in vehicles], ["KDA123X", "KEA123X"])
+        self.assertEqual(vehicles[0].chasis, "JTD123456789XYZ")
+        self.assertTrue(vehicles[0].windscreen_covered and vehicles[0].political_violence_covered)
+        owner = policy.policy_owner
+        self.assertEqual((owner.email, owner.date_of_birth, owner.sub_county), (
+            "james.mutuku@example.com", date(1987, 2, 10), "Machakos Town",
+        ))
+
+    def test_pet(self):
+        policy = self.purchase(self.sample("pet_purchase/pet_purchase.json"))
+
+        self.assert_totals(policy, "650", "300000")
+        pets = InsuredPet.objects.filter(policy=policy).order_by("name")
+        self.assertEqual(
+            [(pet.name, pet.pet_type, pet.cover_type) for pet in pets],
+            [("Jessy", "dog", "accident_only"), ("Max", "dog", "comprehensive")],
+        )
+
+    def test_cyber(self):
+        policy = self.purchase(self.sample("cyber_purchase/cyber_purchase.json"))
+
+        self.assert_totals(policy, "5000", "10000000")
+        business = InsuredBusiness.objects.get(policy=policy)
+        self.assertEqual((business.name, business.property_cover, business.premises_type), ("TengenezaPay Ltd", 0, ""))
+
+    def test_sme(self):
+        policy = self.purchase(self.sample("cyber_purchase/sme_purchase.json"))
+
+        self.assert_totals(policy, "5000", "10000000")
+        business = InsuredBusiness.objects.get(policy=policy)
+        self.assertEqual(
+            (business.property_cover, business.theft_cover, business.premises_type), (3000000, True, "rented")
+        )
+
+    def test_an_insured_business_cannot_be_bought_again(self):
+        self.purchase(self.sample("cyber_purchase/sme_purchase.json"))
+
+        response = self.client.post("/sales/policy-purchase/", self.sample("cyber_purchase/sme_purchase.json"), format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(InsuredBusiness.objects.count(), 1)
+
+    def test_items_are_validated_before_anything_is_written(self):
+        data = self.sample("motor_purchase/motor_insurance.json")
+        data["vehicles"][1]["registration_number"] = "kda123x"
+        duplicate = self.client.post("/sales/policy-purchase/", data, format="json")
+        missing = self.client.post("/sales/policy-purchase/", {**data, "vehicles": []}, format="json")
+
+        self.assertEqual((duplicate.status_code, missing.status_code), (400, 400))
+        self.assertIn("vehicles", duplicate.data)
+        self.assertFalse(Policy.objects.exists())
+        self.assertFalse(User.objects.exists())
@@ -0,0 +1,88 @@
+"""
+Unit of work shared by the purchase services.
+
+A purchase builds every row it needs in memory, with all totals already
+computed, and registers them with ``add``. ``flush`` then writes them with one
+``bulk_create`` per model, parents before children, so a purchase costs one
+INSERT per table it touches however many members, dependents, creditors or
+devices it carries. Rows may point at parents that are not saved yet; their
+foreign keys are filled in once the parents have been inserted.
+
+Changes to rows that already exist are queued with ``increment`` and applied
+after the inserts as ``F()`` updates, one UPDATE per row, so they add to the
+value in the database instead of overwriting it with a stale in-memory one.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, Iterable, List, Tuple, TypeVar
+
+from django.db import transaction
+from django.db.models import F, Model
+
+from apps.business.models import InsuredBusiness
+from apps.credit_life.models import Creditor
+from apps.family.models import Beneficiary, Dependent, InsuredPet, InsuredVehicle
+from apps.gadgets.models import InsuredGadget
+from apps.notifications.models import NotificationStorage
+from apps.payments.models import PayerDetail, Premium
+from apps.policies.models import Policy, PolicyStatusUpdate
+from apps.schemes.models import SchemeGroup
+from apps.users.models import Membership, MembershipStatusUpdate, User
+
+# Every model a purchase writes, parents before the rows that reference them.
+FLUSH_ORDER = [
+    User,
+    Policy,
+    PolicyStatusUpdate,
+    SchemeGroup,
+    Membership,
+    MembershipStatusUpdate,
+    Dependent,
+    Beneficiary,
+    Creditor,
+    PayerDetail,
+    Premium,
+    InsuredGadget,
+    InsuredVehicle,
+    InsuredPet,
+    InsuredBusiness,
+    NotificationStorage,
+]
+
+ModelT = TypeVar("ModelT", bound=Model)
+
+
+class PurchaseUnitOfWork:
+    """Rows to insert and increments to apply, written together by ``flush``."""
+
+    def __init__(self) -> None:
+        self._new: Dict[type, List[Model]] = defaultdict(list)
+        self._increments: Dict[int, Tuple[Model, Dict[str, Decimal]]] = {}
+
+    def add(self, instance: ModelT) -> ModelT:
+        model = type(instance)
+        if model not in FLUSH_ORDER:
+            raise ValueError(f"{model.__name__} has no place in the purchase flush order")
+        self._new[model].append(instance)
+        return instance
+
+    def add_all(self, instances: Iterable[ModelT]) -> List[ModelT]:
+        return [self.add(instance) for instance in instances]
+
+    def increment(self, instance: Model, **amounts: Decimal) -> None:
+        """Add ``amounts`` to fields of an existing row; increments to the same row are merged."""
+        _, pending = self._increments.setdefault(id(instance), (instance, {}))
+        for field, amount in amounts.items():
+            pending[field] = pending.get(field, Decimal("0")) + amount
+
+    @transaction.atomic(savepoint=False)
+    def flush(self) -> None:
+        for model in FLUSH_ORDER:
+            instances = self._new.pop(model, None)
+            if instances:
+                model.objects.bulk_create(instances)
+        for instance, amounts in self._increments.values():
+            type(instance).objects.filter(pk=instance.pk).update(
+                **{field: F(field) + amount for field, amount in amounts.items()}
+            )
+        self._increments.clear()
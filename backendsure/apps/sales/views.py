@@ -2,19 +2,52 @@ from django.shortcuts import render
 from rest_framework import generics, status
 from rest_framework.response import Response
 
-from apps.sales.serializers import PolicyPurchaseSerializer
+from apps.core.audit import record_action
+from apps.core.constants import UserActionTypes
+from apps.core.idempotency import idempotent
+from apps.core.throttling import PUBLIC_ENDPOINT_THROTTLES, admission_controlled
+from apps.sales.serializers import PolicyPurchaseSerializer, ProductLinePurchaseSerializer
+from apps.sales.product_line_purchase.engine import ProductLinePurchaseService
+from apps.sales.product_line_purchase.registry import PRODUCT_LINES_BY_TYPE
 from apps.sales.retail_purchase.retail_purchase import RetailPolicyPurchaseService
 from apps.sales.group_purchase.group_purchase import GroupPolicyPurchaseService
 from apps.sales.credit_life_purchase.credit_life_purchase import CreditLifePolicyPurchaseService
 # Create your views here.
 class PolicyPurchaseAPIView(generics.CreateAPIView):
+    """
+    Purchases dispatched on ``product_type``: the registered product lines
+    (motor, pet, cyber/SME), and retail for anything else.
+    """
     serializer_class = PolicyPurchaseSerializer
+    throttle_classes = PUBLIC_ENDPOINT_THROTTLES
+    throttle_scope = "purchase"
     
+    @idempotent
+    @admission_controlled("heavy-transactions")
     def post(self, request, *args, **kwargs):
+        product_type = request.data.get("product_type")
+        if product_type in PRODUCT_LINES_BY_TYPE:
+            return self.purchase_product_line(request)
+
         data = request.data 
         serializer = self.serializer_class(data=data)
         
         if serializer.is_valid(raise_exception=True):
             RetailPolicyPurchaseService(data=data).execute()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    def purchase_product_line(self, request):
+        serializer = ProductLinePurchaseSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        policy, _ = ProductLinePurchaseService(data=serializer.validated_data).execute()
+        record_action(
+            f"{serializer.validated_data['product_type']} policy purchased",
+            UserActionTypes.CREATED.value,
+            actor=request.user,
+            target=policy,
+        )
+        return Response(
+            {"success": "Policy purchased successfully", "policy_number": policy.policy_number},
+            status=status.HTTP_201_CREATED
+        )
@@ -9,7 +9,9 @@ from apps.schemes.serializers import SchemeSerializer
 
 # Create your views here.
 class SchemeAPIView(generics.ListCreateAPIView):
-    queryset= Scheme.objects.all()
+    queryset= Scheme.objects.prefetch_related(
+        "products__mainmemberprices", "products__dependentprices", "products__extendeddependentprices"
+    )
     serializer_class = SchemeSerializer
     
     def post(self, request, *args, **kwargs):
@@ -18,7 +20,9 @@ class SchemeAPIView(generics.ListCreateAPIView):
     
 
 class SchemeDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
-    queryset= Scheme.objects.all()
+    queryset= Scheme.objects.prefetch_related(
+        "products__mainmemberprices", "products__dependentprices", "products__extendeddependentprices"
+    )
     serializer_class = SchemeSerializer
     
     lookup_field = "pk"
\ No newline at end of file
@@ -10,7 +10,9 @@ class UsersAdmin(admin.ModelAdmin):
 @admin.register(Membership)
 class MembershipAdmin(admin.ModelAdmin):
     list_display = ["id", "user", "main_member_premium", "total_cover_amount", "total_premium", "created_at"]
+    list_select_related = ["user"]
 
 @admin.register(MembershipStatusUpdate)
 class MembershipStatusUpdateAdmin(admin.ModelAdmin):
-    list_display = ["id", "membership", "previous_status", "next_status", "created_at"]
\ No newline at end of file
+    list_display = ["id", "membership", "previous_status", "next_status", "created_at"]
+    list_select_related = ["membership__user"]
\ No newline at end of file
@@ -0,0 +1,355 @@
+"""
+Offline resolution of duplicate customers.
+
+Purchases made before the identity index created a new ``User`` for the same
+person whenever their details were spelled differently. Comparing every pair
+of customers is quadratic, so ``find_duplicates`` first puts each customer
+into blocks, one per blocking key (E.164 phone number, normalized ID number,
+email, and a hash of their sorted name tokens), and compares customers only
+with the others in the same blocks. Blocks are compared in parallel worker
+processes; blocks larger than CUSTOMER_MERGE_MAX_BLOCK_SIZE (a shop's phone
+number typed in for every walk-in customer) say nothing about identity and are
+skipped.
+
+Matching pairs are grouped into clusters, and each cluster becomes one entry
+of a ``MergePlan``: the user that survives and the users merged into it. A
+plan is plain JSON, so it can be written out, reviewed and applied later.
+``apply_plan`` re-points every foreign key to the merged users (memberships,
+policies, notifications and the rest) at the survivor, copies over details the
+survivor is missing and deletes the merged users, CUSTOMER_MERGE_CHUNK_SIZE
+clusters per transaction.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from difflib import SequenceMatcher
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import hashlib
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Q, Value, When
+
+from apps.core.audit import record_action
+from apps.core.constants import UserActionTypes
+from apps.users.identity import (
+    IDENTITY_FIELDS, identity_keys, name_tokens, normalize_email, normalize_id_number, normalize_phone,
+)
+from apps.users.models import User
+
+logger = logging.getLogger(__name__)
+
+# Details copied from merged users when the survivor has none.
+MERGED_DETAIL_FIELDS = (
+    "first_name", "last_name", "email", "phone_number", "id_number", "passport_number",
+    "gender", "address", "ward", "town", "county", "country", "occupation",
+)
+
+Record = Dict[str, Any]
+Match = Tuple[int, int, str]
+
+
+def customers():
+    """Users that came in through a purchase: no staff, agents, brokers or admins."""
+    return User.objects.filter(is_staff=False, is_superuser=False).filter(
+        Q(role="") | Q(role="Policy Owner") | Q(role__isnull=True)
+    )
+
+
+def to_record(row: Dict[str, Any]) -> Record:
+    """What the comparison needs to know about a customer, as a picklable dict."""
+    return {
+        "id": row["id"],
+        "email": normalize_email(row["email"]),
+        "phone": normalize_phone(row["phone_number"]),
+        "id_number": normalize_id_number(row["id_number"]),
+        "name": name_tokens(row["first_name"], row["last_name"]),
+    }
+
+
+def blocking_keys(record: Record) -> List[str]:
+    keys = []
+    if record["phone"]:
+        keys.append(f"phone:{record['phone']}")
+    if record["id_number"]:
+        keys.append(f"id:{record['id_number']}")
+    if record["email"]:
+        keys.append(f"email:{record['email']}")
+    if record["name"]:
+        keys.append("name:" + hashlib.sha1(" ".join(record["name"]).encode()).hexdigest()[:16])
+    return keys
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        return sum(x != y for x, y in zip(a, b)) <= 1
+    shorter, longer = sorted((a, b), key=len)
+    return any(longer[:i] + longer[i + 1:] == shorter for i in range(len(longer)))
+
+
+def _similar_names(a: Tuple[str, ...], b: Tuple[str, ...], threshold: float) -> bool:
+    if not a or not b:
+        return False
+    # A middle name given on one purchase and not the other.
+    if set(a) <= set(b) or set(b) <= set(a):
+        return True
+    return SequenceMatcher(None, " ".join(a), " ".join(b)).ratio() >= threshold
+
+
+def match_reason(a: Record, b: Record, name_threshold: float) -> Optional[str]:
+    """Why ``a`` and ``b`` are the same person, or None if they may not be."""
+    if a["id_number"] and a["id_number"] == b["id_number"]:
+        return "id_number"
+    if a["email"] and a["email"] == b["email"]:
+        return "email"
+    # Families share a phone number, so it only counts with the same name.
+    if a["phone"] and a["phone"] == b["phone"] and _similar_names(a["name"], b["name"], name_threshold):
+        return "phone_and_name"
+    if (
+        a["name"] and a["name"] == b["name"]
+        and a["id_number"] and b["id_number"]
+        and _within_one_edit(a["id_number"], b["id_number"])
+    ):
+        return "name_and_mistyped_id_number"
+    return None
+
+
+def compare_blocks(blocks: Sequence[Sequence[Record]], name_threshold: float) -> List[Match]:
+    """Matching pairs within each block. Runs in a worker process, so it touches neither settings nor the database."""
+    matches = []
+    for block in blocks:
+        for i, a in enumerate(block):
+            for b in block[i + 1:]:
+                reason = match_reason(a, b, name_threshold)
+                if reason:
+                    matches.append((min(a["id"], b["id"]), max(a["id"], b["id"]), reason))
+    return matches
+
+
+@dataclass
+class MergeCluster:
+    survivor: int
+    merged: List[int]
+    evidence: List[Match] = field(default_factory=list)
+
+
+@dataclass
+class MergePlan:
+    customers: int = 0
+    blocks: int = 0
+    skipped_blocks: int = 0
+    clusters: List[MergeCluster] = field(default_factory=list)
+
+    @property
+    def merged_users(self) -> int:
+        return sum(len(cluster.merged) for cluster in self.clusters)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MergePlan":
+        clusters = [
+            MergeCluster(
+                survivor=cluster["survivor"],
+                merged=list(cluster["merged"]),
+                evidence=[tuple(match) for match in cluster.get("evidence", [])],
+            )
+            for cluster in data["clusters"]
+        ]
+        return cls(data.get("customers", 0), data.get("blocks", 0), data.get("skipped_blocks", 0), clusters)
+
+
+class _DisjointSet:
+    def __init__(self) -> None:
+        self.parent: Dict[int, int] = {}
+
+    def find(self, item: int) -> int:
+        root = self.parent.setdefault(item, item)
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while item != root:
+            parent = self.parent[item]
+            self.parent[item] = root
+            item = parent
+        return root
+
+    def union(self, a: int, b: int) -> None:
+        self.parent[self.find(a)] = self.find(b)
+
+
+def _chunks(items: Sequence, size: int) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def find_duplicates(workers: int = 1, batch_size: int = 500) -> MergePlan:
+    """
+    A merge plan for every cluster of customers that are the same person.
+
+    Blocks are handed to ``workers`` processes ``batch_size`` at a time; with a
+    single worker they are compared in this process.
+    """
+    max_block_size = settings.CUSTOMER_MERGE_MAX_BLOCK_SIZE
+    name_threshold = settings.CUSTOMER_MERGE_NAME_SIMILARITY
+    plan = MergePlan()
+
+    blocks: Dict[str, List[Record]] = {}
+    rows = customers().values("id", "first_name", "last_name", "email", "phone_number", "id_number")
+    for row in rows.iterator(chunk_size=5000):
+        record = to_record(row)
+        plan.customers += 1
+        for key in blocking_keys(record):
+            blocks.setdefault(key, []).append(record)
+
+    comparable = []
+    for key, block in blocks.items():
+        if len(block) < 2:
+            continue
+        if len(block) > max_block_size:
+            plan.skipped_blocks += 1
+            logger.warning(f"Skipping block {key.split(':')[0]} of {len(block)} customers")
+            continue
+        comparable.append(block)
+    plan.blocks = len(comparable)
+
+    batches = list(_chunks(comparable, batch_size))
+    if workers > 1 and len(batches) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(compare_blocks, batches, [name_threshold] * len(batches)))
+    else:
+        results = [compare_blocks(batch, name_threshold) for batch in batches]
+
+    # The same pair turns up in every block the two share.
+    matches = sorted({(a, b): reason for result in results for a, b, reason in result}.items())
+    clusters = _DisjointSet()
+    for (a, b), _ in matches:
+        clusters.union(a, b)
+    members: Dict[int, List[int]] = {}
+    for user_id in list(clusters.parent):
+        members.setdefault(clusters.find(user_id), []).append(user_id)
+    evidence: Dict[int, List[Match]] = {}
+    for (a, b), reason in matches:
+        evidence.setdefault(clusters.find(a), []).append((a, b, reason))
+
+    ranking = _survivor_ranking([user_id for ids in members.values() for user_id in ids])
+    for root, ids in sorted(members.items(), key=lambda item: min(item[1])):
+        survivor = min(ids, key=ranking.__getitem__)
+        plan.clusters.append(MergeCluster(
+            survivor=survivor,
+            merged=sorted(user_id for user_id in ids if user_id != survivor),
+            evidence=evidence[root],
+        ))
+    return plan
+
+
+def _survivor_ranking(user_ids: List[int]) -> Dict[int, tuple]:
+    """Sort keys that put the user to keep first: active, then logged in most recently, then oldest."""
+    ranking = {}
+    for batch in _chunks(user_ids, 5000):
+        for user_id, is_active, last_login in User.objects.filter(id__in=batch).values_list("id", "is_active", "last_login"):
+            ranking[user_id] = (not is_active, -last_login.timestamp() if last_login else 0, user_id)
+    return ranking
+
+
+@dataclass
+class MergeResult:
+    clusters: int = 0
+    merged_users: int = 0
+    skipped_clusters: int = 0
+
+
+def user_foreign_keys() -> List[Tuple[type, str]]:
+    """(model, column) of every foreign key to ``User``."""
+    return [
+        (relation.related_model, relation.field.attname)
+        for relation in User._meta.related_objects
+        if relation.one_to_many or relation.one_to_one
+    ]
+
+
+def apply_plan(plan: MergePlan, chunk_size: Optional[int] = None) -> MergeResult:
+    """
+    Carry out ``plan``, ``chunk_size`` clusters per transaction. Clusters whose
+    users no longer all exist (merged or deleted since the plan was made) are
+    skipped, so a plan can be applied again after a failure.
+    """
+    result = MergeResult()
+    for clusters in _chunks(plan.clusters, chunk_size or settings.CUSTOMER_MERGE_CHUNK_SIZE):
+        chunk_result = _apply_chunk(clusters)
+        result.clusters += chunk_result.clusters
+        result.merged_users += chunk_result.merged_users
+        result.skipped_clusters += chunk_result.skipped_clusters
+    return result
+
+
+@transaction.atomic
+def _apply_chunk(clusters: Sequence[MergeCluster]) -> MergeResult:
+    result = MergeResult()
+    user_ids = {user_id for cluster in clusters for user_id in [cluster.survivor, *cluster.merged]}
+    users = customers().select_for_update().in_bulk(user_ids)
+    applicable = [
+        cluster for cluster in clusters
+        if all(user_id in users for user_id in [cluster.survivor, *cluster.merged])
+    ]
+    result.skipped_clusters = len(clusters) - len(applicable)
+    clusters = applicable
+    survivor_of = {merged: cluster.survivor for cluster in clusters for merged in cluster.merged}
+    if not survivor_of:
+        return result
+
+    for model, column in user_foreign_keys():
+        model._base_manager.filter(**{f"{column}__in": list(survivor_of)}).update(**{
+            column: Case(
+                *[When(**{column: merged}, then=Value(survivor)) for merged, survivor in survivor_of.items()],
+                output_field=model._meta.get_field(column),
+            ),
+        })
+
+    survivors = [users[cluster.survivor] for cluster in clusters]
+    for cluster, survivor in zip(clusters, survivors):
+        for merged in sorted((users[user_id] for user_id in cluster.merged), key=lambda user: user.id):
+            for name in MERGED_DETAIL_FIELDS:
+                if not getattr(survivor, name) and getattr(merged, name):
+                    setattr(survivor, name, getattr(merged, name))
+    User.objects.filter(id__in=list(survivor_of)).delete()
+
+    # The merged users' identity keys are free now; a key still held by a user
+    # outside the cluster (someone sharing a family phone) stays with them.
+    for survivor in survivors:
+        for name, value in identity_keys(survivor.email, survivor.phone_number, survivor.id_number).items():
+            setattr(survivor, name, value)
+    holders = _identity_key_holders(survivors)
+    for survivor in survivors:
+        for name in IDENTITY_FIELDS:
+            value = getattr(survivor, name)
+            if value is not None and holders.setdefault((name, value), survivor.id) != survivor.id:
+                setattr(survivor, name, None)
+    User.objects.bulk_update(survivors, [*MERGED_DETAIL_FIELDS, *IDENTITY_FIELDS])
+
+    for cluster in clusters:
+        record_action(
+            "Duplicate customers merged",
+            UserActionTypes.UPDATED.value,
+            target=users[cluster.survivor],
+            changes={"merged_user_ids": cluster.merged, "evidence": [list(match) for match in cluster.evidence]},
+        )
+    result.clusters = len(clusters)
+    result.merged_users = len(survivor_of)
+    return result
+
+
+def _identity_key_holders(survivors: Iterable[User]) -> Dict[Tuple[str, str], int]:
+    lookup = Q(pk__in=[])
+    for name in IDENTITY_FIELDS:
+        values = {getattr(survivor, name) for survivor in survivors} - {None}
+        if values:
+            lookup |= Q(**{f"{name}__in": values})
+    holders = {}
+    for user in User.objects.filter(lookup).only("id", *IDENTITY_FIELDS):
+        for name in IDENTITY_FIELDS:
+            if getattr(user, name) is not None:
+                holders[(name, getattr(user, name))] = user.id
+    return holders
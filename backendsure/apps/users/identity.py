@@ -0,0 +1,207 @@
+"""
+Customer identity index.
+
+Every user carries normalized copies of the three things a customer is
+recognised by: email (``email_normalized``), phone number in E.164 form
+(``phone_e164``) and national ID number (``id_number_normalized``). Each is
+unique across users, so a person is one ``User`` however the purchase that
+brought them in spelled their details, and finding them is an index lookup.
+``User.save`` keeps the columns current; rows built for ``bulk_create`` get
+them from ``resolve_or_create_many``. A key another user already holds is
+left empty on save, as the backfill did for existing duplicates, so saving a
+user never fails on the index; serializers that take these details refuse
+them up front with ``taken_identity_keys``.
+
+``resolve_or_create_many`` is how purchase paths find their customers: it
+matches a whole batch of people against the index in one query, reuses the
+users it finds and creates the rest. A person is the user holding their ID
+number or email; a phone number alone identifies them only when the names
+agree too, since families and shops share phones. Details that contradict
+the user a key points at (the same phone with another ID number) make a new
+user rather than a match. When a concurrent purchase creates one of the same
+people first, the insert fails on the index and the batch is resolved again.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+import re
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+IDENTITY_FIELDS = ("id_number_normalized", "email_normalized", "phone_e164")
+# Keys that identify a person on their own. Two people holding different
+# values of one of these are different people.
+PERSONAL_FIELDS = ("id_number_normalized", "email_normalized")
+
+
+def normalize_email(value: Any) -> Optional[str]:
+    email = str(value or "").strip().lower()
+    return email or None
+
+
+def normalize_phone(value: Any) -> Optional[str]:
+    """
+    E.164 form of a phone number; numbers without a country code are taken to
+    be in CUSTOMER_PHONE_DEFAULT_COUNTRY_CODE. None when it cannot be a number.
+    """
+    raw = str(value or "").strip()
+    digits = re.sub(r"\D", "", raw)
+    country_code = settings.CUSTOMER_PHONE_DEFAULT_COUNTRY_CODE
+    if raw.startswith("+"):
+        pass
+    elif digits.startswith("00"):
+        digits = digits[2:]
+    elif digits.startswith("0"):
+        digits = country_code + digits[1:]
+    elif not (digits.startswith(country_code) and len(digits) > settings.CUSTOMER_PHONE_NATIONAL_LENGTH):
+        digits = country_code + digits
+    if not 8 <= len(digits) <= 15:
+        return None
+    return f"+{digits}"
+
+
+def normalize_id_number(value: Any) -> Optional[str]:
+    id_number = re.sub(r"[^0-9A-Za-z]", "", str(value or "")).upper()
+    return id_number or None
+
+
+def name_tokens(first_name: Any, last_name: Any) -> Tuple[str, ...]:
+    return tuple(sorted(re.findall(r"[a-z]+", f"{first_name or ''} {last_name or ''}".lower())))
+
+
+def identity_keys(email: Any, phone_number: Any, id_number: Any) -> Dict[str, Optional[str]]:
+    return {
+        "email_normalized": normalize_email(email),
+        "phone_e164": normalize_phone(phone_number),
+        "id_number_normalized": normalize_id_number(id_number),
+    }
+
+
+def taken_identity_keys(keys: Dict[str, Optional[str]], exclude_pk: Any = None) -> Set[str]:
+    """The fields of ``keys`` whose value a user other than ``exclude_pk`` already holds."""
+    present = {field: value for field, value in keys.items() if value is not None}
+    if not present:
+        return set()
+    lookup = Q(pk__in=[])
+    for field, value in present.items():
+        lookup |= Q(**{field: value})
+    taken = set()
+    for row in get_user_model().objects.filter(lookup).exclude(pk=exclude_pk).values_list(*present):
+        taken.update(field for field, value in zip(present, row) if value == present[field])
+    return taken
+
+
+def resolve_or_create_many(
+    people: Sequence[Dict[str, Any]],
+    password: Optional[str] = None,
+    defaults: Optional[Dict[str, Any]] = None,
+    attempts: int = 3,
+) -> List[Any]:
+    """
+    The user for each person, in order.
+
+    ``people`` are ``User`` field values; their ``email``, ``phone_number`` and
+    ``id_number`` are matched against the index with a single query. People
+    that match an existing user, or an earlier person in the batch, get that
+    user. The rest become new users with ``defaults`` and ``password`` (hashed
+    once for the batch), bulk created here in a savepoint so that losing a
+    race to a concurrent purchase only means resolving the batch again.
+    """
+    User = get_user_model()
+    keys = [
+        identity_keys(person.get("email"), person.get("phone_number"), person.get("id_number"))
+        for person in people
+    ]
+    hashed_password = None
+    for attempt in range(attempts):
+        users, new_users = _resolve(people, keys, defaults or {})
+        if not new_users:
+            return users
+        if hashed_password is None:
+            hashed_password = make_password(password)
+        for user in new_users:
+            user.password = hashed_password
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(new_users)
+        except IntegrityError:
+            # A concurrent purchase created one of these people first.
+            if attempt == attempts - 1:
+                raise
+            continue
+        return users
+
+
+def _resolve(people: Sequence[Dict[str, Any]], keys: List[Dict[str, Optional[str]]], defaults: Dict[str, Any]) -> tuple:
+    """The user for each person, existing or unsaved, and the unsaved ones."""
+    User = get_user_model()
+    usernames = {person["username"] for person in people if person.get("username")}
+    lookup = Q(username__in=usernames)
+    for field in IDENTITY_FIELDS:
+        values = {person_keys[field] for person_keys in keys} - {None}
+        if values:
+            lookup |= Q(**{f"{field}__in": values})
+    known: Dict[tuple, Any] = {}
+    taken_usernames = set()
+    for user in User.objects.filter(lookup).order_by("id"):
+        taken_usernames.add(user.username)
+        for field in IDENTITY_FIELDS:
+            value = getattr(user, field)
+            if value is not None:
+                known.setdefault((field, value), user)
+
+    users: List[Any] = []
+    new_users: List[Any] = []
+    for person, person_keys in zip(people, keys):
+        user = _match(person, person_keys, known)
+        if user is None:
+            user = User(**{**defaults, **person, **person_keys})
+            # Keys held by someone else stay empty, as on save.
+            for field in IDENTITY_FIELDS:
+                if (field, person_keys[field]) in known:
+                    setattr(user, field, None)
+            user.username = _free_username(user.username, taken_usernames)
+            taken_usernames.add(user.username)
+            new_users.append(user)
+        # Later people in the batch match this one by any of its keys.
+        for field in IDENTITY_FIELDS:
+            if person_keys[field] is not None:
+                known.setdefault((field, person_keys[field]), user)
+        users.append(user)
+    return users, new_users
+
+
+def _match(person: Dict[str, Any], person_keys: Dict[str, Optional[str]], known: Dict[tuple, Any]) -> Any:
+    """The known user that is this person, or None when there is none or the keys disagree on who it is."""
+    # Users earlier in the batch are not saved yet, so they are told apart by identity.
+    candidates = {
+        id(known[(field, person_keys[field])]): known[(field, person_keys[field])]
+        for field in PERSONAL_FIELDS if (field, person_keys[field]) in known
+    }
+    if len(candidates) > 1:
+        return None
+    if candidates:
+        [user] = candidates.values()
+    else:
+        user = known.get(("phone_e164", person_keys["phone_e164"]))
+        if user is None or not person_keys["phone_e164"]:
+            return None
+        names = name_tokens(person.get("first_name"), person.get("last_name"))
+        if not names or names != name_tokens(user.first_name, user.last_name):
+            return None
+    for field in PERSONAL_FIELDS:
+        value = getattr(user, field)
+        if value is not None and person_keys[field] is not None and value != person_keys[field]:
+            return None
+    return user
+
+
+def _free_username(username: str, taken: Set[str]) -> str:
+    """``username``, suffixed when another user already has it."""
+    candidate, suffix = username, 1
+    while candidate in taken:
+        suffix += 1
+        candidate = f"{username}-{suffix}"
+    return candidate
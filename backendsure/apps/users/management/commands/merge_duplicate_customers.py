@@ -0,0 +1,47 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.users.customer_merge import MergePlan, apply_plan, find_duplicates
+
+
+class Command(BaseCommand):
+    help = (
+        "Find customers that are the same person by comparing them within blocks "
+        "of shared phone number, ID number, email or name, and write a merge plan; "
+        "with --apply, or --plan, merge them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes comparing blocks")
+        parser.add_argument("--output", help="Write the merge plan to this JSON file")
+        parser.add_argument("--plan", help="Apply a merge plan written earlier instead of finding duplicates")
+        parser.add_argument("--apply", action="store_true", help="Merge the duplicates found")
+        parser.add_argument("--chunk-size", type=int, help="Clusters merged per transaction")
+
+    def handle(self, *args, **options):
+        if options["plan"]:
+            try:
+                with open(options["plan"]) as f:
+                    plan = MergePlan.from_dict(json.load(f))
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f"Cannot read merge plan {options['plan']}: {e}")
+        else:
+            plan = find_duplicates(workers=max(options["workers"], 1))
+            self.stdout.write(
+                f"{plan.customers} customers compared in {plan.blocks} blocks "
+                f"({plan.skipped_blocks} oversized blocks skipped): "
+                f"{len(plan.clusters)} duplicate clusters, {plan.merged_users} users to merge"
+            )
+            if options["output"]:
+                with open(options["output"], "w") as f:
+                    json.dump(plan.to_dict(), f, indent=2)
+                self.stdout.write(f"Merge plan written to {options['output']}")
+
+        if options["plan"] or options["apply"]:
+            result = apply_plan(plan, chunk_size=options["chunk_size"])
+            self.stdout.write(
+                f"{result.merged_users} users merged into {result.clusters} customers, "
+                f"{result.skipped_clusters} clusters skipped because their users changed"
+            )
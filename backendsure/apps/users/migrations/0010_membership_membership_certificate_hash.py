@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_user_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='membership',
+            name='membership_certificate_hash',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+    ]
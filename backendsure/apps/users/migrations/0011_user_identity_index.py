@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:48
+
+from django.db import migrations, models
+
+from apps.users.identity import identity_keys
+
+
+def backfill_identity_keys(apps, schema_editor):
+    """
+    Index existing users. Where several already share a key only the oldest
+    gets it; the others stay out of the index for that key.
+    """
+    User = apps.get_model("users", "User")
+    taken = set()
+    users = []
+    for user in User.objects.order_by("id").only("id", "email", "phone_number", "id_number").iterator():
+        for field, value in identity_keys(user.email, user.phone_number, user.id_number).items():
+            if (field, value) in taken:
+                value = None
+            elif value is not None:
+                taken.add((field, value))
+            setattr(user, field, value)
+        users.append(user)
+    User.objects.bulk_update(
+        users, ["email_normalized", "phone_e164", "id_number_normalized"], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0010_membership_membership_certificate_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='email_normalized',
+            field=models.CharField(editable=False, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='id_number_normalized',
+            field=models.CharField(editable=False, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='phone_e164',
+            field=models.CharField(editable=False, max_length=16, null=True),
+        ),
+        migrations.RunPython(backfill_identity_keys, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(fields=('email_normalized',), name='unique_user_email_normalized'),
+        ),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(fields=('phone_e164',), name='unique_user_phone_e164'),
+        ),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(fields=('id_number_normalized',), name='unique_user_id_number_normalized'),
+        ),
+    ]
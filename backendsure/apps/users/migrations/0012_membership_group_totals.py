@@ -0,0 +1,28 @@
+from django.db import migrations
+from django.db.models import F, Q
+
+
+def include_main_member_in_totals(apps, schema_editor):
+    """
+    Group purchases stored the dependents' figures alone as the membership
+    totals. Where a total still equals the dependents' part while the main
+    member has one of their own, add the main member's part back.
+    """
+    Membership = apps.get_model("users", "Membership")
+    Membership.objects.filter(
+        ~Q(main_member_premium=0), total_premium=F("dependent_premium")
+    ).update(total_premium=F("main_member_premium") + F("dependent_premium"))
+    Membership.objects.filter(
+        ~Q(main_member_cover_amount=0), total_cover_amount=F("dependent_cover_amount")
+    ).update(total_cover_amount=F("main_member_cover_amount") + F("dependent_cover_amount"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_user_identity_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(include_main_member_in_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_membership_group_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='date_of_birth',
+            field=models.DateField(null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='sub_county',
+            field=models.CharField(max_length=255, null=True),
+        ),
+    ]
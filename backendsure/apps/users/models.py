@@ -8,6 +8,7 @@ import uuid
 from django.contrib.auth.models import AbstractUser
 from apps.core.models import AbstractBaseModel
 from apps.core.constants import PolicyStatuses
+from apps.users.identity import identity_keys, taken_identity_keys
 # Create your models here.
 class User(AbstractUser, AbstractBaseModel):
     role = models.CharField(max_length=50, choices=(("Policy Owner", "Policy Owner"), ("Sales Agent", "Sales Agent"), ("Broker", "Broker"), ("Admin", "Admin")))
@@ -15,23 +16,50 @@ class User(AbstractUser, AbstractBaseModel):
     id_number = models.CharField(max_length=255, null=True)
     passport_number = models.CharField(max_length=255, null=True)
     gender = models.CharField(max_length=255, choices=(("Male", "Male"), ("Female", "Female")))
+    date_of_birth = models.DateField(null=True)
     address = models.CharField(max_length=255, null=True)
     ward = models.CharField(max_length=255, null=True)
     town = models.CharField(max_length=255, null=True)
     county = models.CharField(max_length=255, null=True)
+    sub_county = models.CharField(max_length=255, null=True)
     country = models.CharField(max_length=255, null=True)
     occupation = models.CharField(max_length=255, null=True)
     token = models.UUIDField(blank=True, null=True)
+    # Customer identity index, see apps.users.identity.
+    email_normalized = models.CharField(max_length=255, null=True, editable=False)
+    phone_e164 = models.CharField(max_length=16, null=True, editable=False)
+    id_number_normalized = models.CharField(max_length=255, null=True, editable=False)
+
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            models.UniqueConstraint(fields=["email_normalized"], name="unique_user_email_normalized"),
+            models.UniqueConstraint(fields=["phone_e164"], name="unique_user_phone_e164"),
+            models.UniqueConstraint(fields=["id_number_normalized"], name="unique_user_id_number_normalized"),
+        ]
 
     def __str__(self):
         return self.get_full_name() if self.first_name else self.username
 
+    def save(self, *args, **kwargs):
+        keys = identity_keys(self.email, self.phone_number, self.id_number)
+        # Keys this user does not hold yet are only taken when no other user holds them.
+        claimed = {field: value for field, value in keys.items() if value != getattr(self, field)}
+        for field in taken_identity_keys(claimed, exclude_pk=self.pk):
+            keys[field] = None
+        for field, value in keys.items():
+            setattr(self, field, value)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"email", "phone_number", "id_number"} & set(update_fields):
+            kwargs["update_fields"] = set(update_fields) | set(keys)
+        super().save(*args, **kwargs)
+
 
 class Membership(AbstractBaseModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     policy = models.ForeignKey("policies.Policy", on_delete=models.CASCADE, related_name="policymemberships")
     scheme_group = models.ForeignKey("schemes.SchemeGroup", on_delete=models.CASCADE)
     membership_certificate = models.FileField(upload_to="membership_certificates", null=True)
+    membership_certificate_hash = models.CharField(max_length=64, null=True, editable=False)
     dependent_premium = models.DecimalField(max_digits=100, decimal_places=2, default=Decimal('0'))
     main_member_premium = models.DecimalField(max_digits=100, decimal_places=2, default=Decimal('0'))
     total_premium = models.DecimalField(max_digits=100, decimal_places=2, default=Decimal('0'))
@@ -5,16 +5,39 @@ from rest_framework import serializers
 from apps.core.data_maps import LoggedInUserDataMap
 
 
+from apps.users.identity import identity_keys, taken_identity_keys
 from apps.users.models import User, Membership
 
 
-class RegisterUserSerializer(serializers.ModelSerializer):
+class UniqueIdentityMixin:
+    """Refuses an email, phone number or ID number that already belongs to another user."""
+
+    IDENTITY_MESSAGES = {
+        "email_normalized": ("email", "A user with this email already exists."),
+        "phone_e164": ("phone_number", "A user with this phone number already exists."),
+        "id_number_normalized": ("id_number", "A user with this ID number already exists."),
+    }
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+
+        def value(field):
+            return attrs[field] if field in attrs else getattr(self.instance, field, None)
+
+        keys = identity_keys(value("email"), value("phone_number"), value("id_number"))
+        taken = taken_identity_keys(keys, exclude_pk=getattr(self.instance, "pk", None))
+        if taken:
+            raise serializers.ValidationError(dict(self.IDENTITY_MESSAGES[field] for field in sorted(taken)))
+        return attrs
+
+
+class RegisterUserSerializer(UniqueIdentityMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = "__all__"
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(UniqueIdentityMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ("id", "username", "email", "phone_number", "role", "first_name", "last_name")
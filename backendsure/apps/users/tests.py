@@ -1,3 +1,178 @@
-from django.test import TestCase
+from unittest import mock
+import json
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.core.audit import audit_log_buffer
+from apps.core.models import UserAction
+from apps.policies.models import Policy
+from apps.users import identity
+from apps.users.customer_merge import MergePlan, apply_plan, find_duplicates
+from apps.users.identity import resolve_or_create_many
+from apps.users.models import User
+
+
+class UserIdentityIndexTests(TestCase):
+    def setUp(self):
+        self.jane = User.objects.create(username="jane", email="Jane@Example.com", phone_number="0712345678")
+
+    def test_save_indexes_normalized_keys(self):
+        self.assertEqual(self.jane.email_normalized, "jane@example.com")
+        self.assertEqual(self.jane.phone_e164, "+254712345678")
+
+    def test_save_leaves_a_key_held_by_another_user_empty(self):
+        other = User.objects.create(username="other", email="other@example.com", phone_number="+254 712 345 678")
+        self.assertIsNone(other.phone_e164)
+        self.assertEqual(other.email_normalized, "other@example.com")
+
+        other.first_name = "Other"
+        other.save()
+        self.assertIsNone(User.objects.get(pk=other.pk).phone_e164)
+
+    def test_registration_refuses_details_of_another_user(self):
+        response = APIClient().post("/users/register/", {
+            "username": "jane2",
+            "email": "jane2@example.com",
+            "phone_number": "254712345678",
+            "password": "secret-pass",
+            "gender": "Female",
+            "role": "Policy Owner",
+        }, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("phone_number", response.data)
+
+    def test_resolve_reuses_a_user_created_concurrently(self):
+        resolve = identity._resolve
+
+        def racing(people, keys, defaults):
+            resolved = resolve(people, keys, defaults)
+            if not User.objects.filter(email_normalized="sam@example.com").exists():
+                User.objects.create(username="sam-elsewhere", email="sam@example.com")
+            return resolved
+
+        with mock.patch.object(identity, "_resolve", side_effect=racing):
+            [user] = resolve_or_create_many([{"username": "sam", "email": "SAM@example.com"}])
+
+        self.assertEqual(user.username, "sam-elsewhere")
+        self.assertEqual(User.objects.filter(email_normalized="sam@example.com").count(), 1)
+
+
+class ResolveOrCreateTests(TestCase):
+    def setUp(self):
+        self.jane = User.objects.create(
+            username="jane@example.com", first_name="Jane", last_name="Wanjiru", email="jane@example.com",
+            phone_number="0712345678", id_number="12345678",
+        )
+
+    def test_id_number_or_email_identify_a_person(self):
+        users = resolve_or_create_many([
+            {"username": "a", "first_name": "J", "id_number": "12 345 678"},
+            {"username": "b", "first_name": "J", "email": "JANE@example.com"},
+        ])
+
+        self.assertEqual([user.pk for user in users], [self.jane.pk, self.jane.pk])
+
+    def test_phone_identifies_a_person_only_with_the_same_name(self):
+        same, sister = resolve_or_create_many([
+            {"username": "wanjiru", "first_name": "wanjiru", "last_name": "JANE", "phone_number": "+254712345678"},
+            {"username": "mary", "first_name": "Mary", "last_name": "Wanjiru", "phone_number": "0712345678"},
+        ])
+
+        self.assertEqual(same.pk, self.jane.pk)
+        self.assertNotEqual(sister.pk, self.jane.pk)
+        self.assertIsNone(sister.phone_e164)
+
+    def test_conflicting_keys_make_a_new_user(self):
+        by_phone, by_email = resolve_or_create_many([
+            {"username": "jw", "first_name": "Jane", "last_name": "Wanjiru", "phone_number": "0712345678",
+             "id_number": "99999999"},
+            {"username": "jane@example.com", "first_name": "Jane", "email": "jane@example.com",
+             "id_number": "88888888"},
+        ])
+
+        self.assertNotIn(self.jane.pk, (by_phone.pk, by_email.pk))
+        self.assertEqual((by_phone.id_number_normalized, by_phone.phone_e164), ("99999999", None))
+        self.assertEqual((by_email.id_number_normalized, by_email.email_normalized), ("88888888", None))
+        self.assertEqual(by_email.username, "jane@example.com-2")
+
+    def test_keys_pointing_at_different_users_make_a_new_user(self):
+        User.objects.create(username="sam", email="sam@example.com")
+
+        [user] = resolve_or_create_many([{"username": "x", "email": "sam@example.com", "id_number": "12345678"}])
+
+        self.assertEqual(User.objects.count(), 3)
+        self.assertEqual((user.email_normalized, user.id_number_normalized), (None, None))
+
+    def test_later_people_in_a_batch_match_earlier_ones(self):
+        first, second, third = resolve_or_create_many([
+            {"username": "p1", "first_name": "Paul", "email": "paul@example.com", "phone_number": "0799000000"},
+            {"username": "p2", "first_name": "paul", "phone_number": "0799000000"},
+            {"username": "p3", "first_name": "Pam", "phone_number": "0799000000"},
+        ])
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, third)
+        self.assertEqual(User.objects.filter(first_name__in=["Paul", "Pam"]).count(), 2)
+
+
+@override_settings(CUSTOMER_MERGE_MAX_BLOCK_SIZE=3)
+class CustomerMergeTests(TestCase):
+    def customer(self, username, first_name, last_name, **details):
+        return User.objects.create(
+            username=username, first_name=first_name, last_name=last_name, role="Policy Owner", **details
+        )
+
+    def setUp(self):
+        self.jane = self.customer("jane", "Jane", "Wanjiru", email="jane@example.com",
+                                  phone_number="0712345678", id_number="12345678")
+        # The same email typed differently, and her most recent login.
+        self.jane_again = self.customer("jane2", "jane", "wanjiru", email="JANE@example.com",
+                                        last_login=timezone.now())
+        # Her phone with her middle name added.
+        self.jane_akinyi = self.customer("jane3", "Wanjiru", "Jane Akinyi", phone_number="+254 712 345 678")
+        # Family on the same phone are not the same person.
+        self.peter = self.customer("peter", "Peter", "Wanjiru", phone_number="0712345678")
+        self.mary = self.customer("mary", "Mary", "Atieno", id_number="87654321")
+        self.mary_typo = self.customer("mary2", "Mary", "Atieno", id_number="87654320")
+        User.objects.create(username="agent", first_name="Jane", last_name="Wanjiru",
+                            email="jane@example.com", role="Sales Agent")
+        # A shop's phone typed in for every walk-in customer.
+        for i, name in enumerate(("Ann", "Ben", "Cate", "Dan")):
+            self.customer(f"walkin{i}", name, "Shop", phone_number="0700000000")
+
+    def test_duplicates_are_clustered_through_any_matching_pair(self):
+        plan = find_duplicates()
+
+        self.assertEqual(plan.customers, 10)
+        self.assertEqual(plan.skipped_blocks, 1)
+        self.assertEqual(
+            [(cluster.survivor, cluster.merged) for cluster in plan.clusters],
+            [
+                (self.jane_again.id, [self.jane.id, self.jane_akinyi.id]),
+                (self.mary.id, [self.mary_typo.id]),
+            ],
+        )
+        self.assertEqual(
+            {reason for _, _, reason in plan.clusters[0].evidence}, {"email", "phone_and_name"}
+        )
+        self.assertEqual(plan.clusters[1].evidence, [(self.mary.id, self.mary_typo.id, "name_and_mistyped_id_number")])
+
+    def test_plan_survives_json_and_is_applied_once(self):
+        policy = Policy.objects.create(policy_number="FAM_1", policy_owner=self.jane, status="Active")
+        plan = MergePlan.from_dict(json.loads(json.dumps(find_duplicates().to_dict())))
+
+        result = apply_plan(plan)
+        audit_log_buffer.flush()
+
+        self.assertEqual((result.clusters, result.merged_users), (2, 3))
+        self.assertEqual(UserAction.objects.filter(action_title="Duplicate customers merged").count(), 2)
+        self.assertFalse(User.objects.filter(id__in=[self.jane.id, self.jane_akinyi.id, self.mary_typo.id]).exists())
+        policy.refresh_from_db()
+        self.assertEqual(policy.policy_owner_id, self.jane_again.id)
+        survivor = User.objects.get(id=self.jane_again.id)
+        self.assertEqual((survivor.phone_number, survivor.id_number), ("0712345678", "12345678"))
+        self.assertEqual(survivor.phone_e164, "+254712345678")
+        self.assertEqual(apply_plan(plan).skipped_clusters, 2)
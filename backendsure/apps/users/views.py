@@ -1,4 +1,5 @@
 from apps.users.models import User, Membership
+from apps.core.profiling import SerializerTimingMixin
 
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework.response import Response
@@ -46,10 +47,11 @@ class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
 
-class MembershipAPIView(generics.ListCreateAPIView):
-    queryset = Membership.objects.all().order_by("-created_at")
+class MembershipAPIView(SerializerTimingMixin, generics.ListCreateAPIView):
+    queryset = Membership.objects.select_related("user", "policy").order_by("-created_at")
     serializer_class = MembershipSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = {"GET": 5}
 
 
 
@@ -56,10 +56,13 @@ INSTALLED_APPS = [
     "apps.gadgets",
     "apps.claims",
     "apps.notifications",
+    "apps.documents",
 ]
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "apps.core.profiling.PerformanceProfilerMiddleware",
+    "apps.core.db_router.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -100,6 +103,33 @@ DATABASES = {
     }
 }
 
+# Read replicas. Locally, point DATABASE_REPLICA_SQLITE_FILES at one or more
+# SQLite files (comma separated) and keep them fed with `manage.py sync_sqlite_replicas`.
+DATABASE_REPLICAS = []
+for index, replica_file in enumerate(filter(None, os.environ.get("DATABASE_REPLICA_SQLITE_FILES", "").split(","))):
+    alias = f"replica_{index + 1}"
+    DATABASES[alias] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": replica_file,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["apps.core.db_router.PrimaryReplicaRouter"]
+
+# How long a client's reads stay on the primary after it writes.
+READ_YOUR_WRITES_SECONDS = 5
+
+# Shared cache: throttle buckets, idempotency locks and read-your-writes pins
+# have to be seen by every worker. The table is created by the core migrations
+# (or `manage.py createcachetable`); a Redis or Memcached backend can replace it.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "django_cache",
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -215,4 +245,145 @@ SITE_EMAIL = "digicafeteria@gmail.com"
 EMAIL_SUBJECT = "CoverKit"
 
 
-FRONTEND_BASE_URL = "http://localhost:5173"
\ No newline at end of file
+FRONTEND_BASE_URL = "http://localhost:5173"
+
+# Point-of-sale batch submissions
+SALES_BATCH_MAX_SIZE = 500
+
+
+# Policy status engine
+POLICY_LAPSE_GRACE_DAYS = 30
+
+# Claims
+CLAIM_NUMBER_PREFIX = "CLM"
+CLAIMS_WORKLIST_PAGE_SIZE = 50
+
+# Claim document uploads
+CLAIM_DOCUMENT_MAX_SIZE = 100 * 1024 * 1024
+CLAIM_DOCUMENT_CHUNK_MAX_SIZE = 8 * 1024 * 1024
+CLAIM_DOCUMENT_UPLOAD_TEMP_DIR = os.path.join(BASE_DIR, "uploads_tmp")
+
+# Policy schedules and membership certificates
+DOCUMENT_GENERATION_WORKERS = os.cpu_count() or 1
+DOCUMENT_GENERATION_CHUNK_SIZE = 200
+DOCUMENT_ISSUER_NAME = "CoverKit"
+DOCUMENT_LOGO_PATH = None
+
+# Audit log
+AUDIT_BUFFER_MAX_SIZE = 100_000
+AUDIT_FLUSH_BATCH_SIZE = 500
+AUDIT_FLUSH_INTERVAL_SECONDS = 2
+AUDIT_QUERY_MAX_DAYS = 31
+
+# Request profiling (see /core/perf/)
+PERF_PROFILER_ENABLED = True
+PERF_TRACE_SAMPLE_RATE = 0.0
+PERF_SLOW_REQUEST_MS = 500
+PERF_TRACE_MAX = 50
+PERF_HISTOGRAM_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+# Query budgets: repeated identical-shape queries in one request are reported
+# from this many repeats (0 disables fingerprinting); over-budget requests
+# are logged, and raise under backend.test_settings.
+QUERY_NPLUSONE_THRESHOLD = 10
+QUERY_BUDGET_RAISE = False
+
+# Idempotency-Key support on purchase, payment and claim endpoints
+IDEMPOTENCY_KEY_TTL_HOURS = 24
+IDEMPOTENCY_WAIT_SECONDS = 10
+IDEMPOTENCY_POLL_INTERVAL_SECONDS = 0.05
+IDEMPOTENCY_LOCK_SECONDS = 300
+
+# Throttling of the public purchase endpoints: token buckets of
+# (capacity, refill per second) keyed "<throttle_scope>:<ip|outlet|user>".
+# Buckets live in the default cache (CACHES), shared by every worker.
+THROTTLE_TOKEN_BUCKETS = {
+    "purchase:ip": (30, 0.5),
+    "purchase:outlet": (300, 5),
+    "purchase:user": (60, 1),
+    "onboarding:ip": (5, 1 / 60),
+}
+
+# Admission control: heavy transactions allowed to run at once per worker;
+# the rest are shed with 503 after waiting ADMISSION_QUEUE_TIMEOUT_SECONDS.
+ADMISSION_MAX_IN_FLIGHT = {
+    "heavy-transactions": 4,
+}
+ADMISSION_QUEUE_TIMEOUT_SECONDS = 0.05
+ADMISSION_RETRY_AFTER_SECONDS = 2
+
+# Archival of append-only tables (python manage.py archive_tables): rows older
+# than hot_days, and the oldest rows beyond max_hot_rows, move to compressed
+# files under ARCHIVE_STORAGE_PREFIX; archive files are deleted after
+# retention_days (None keeps them forever).
+ARCHIVE_CHUNK_SIZE = 5000
+ARCHIVE_STORAGE_PREFIX = "archives"
+ARCHIVE_QUERY_MAX_ROWS = 1000
+ARCHIVE_POLICIES = {
+    "notifications.notificationlog": {"hot_days": 90, "max_hot_rows": 1_000_000, "retention_days": 2 * 365},
+    "notifications.notificationstorage": {"hot_days": 90, "max_hot_rows": 1_000_000, "retention_days": 2 * 365},
+    "policies.policystatusupdate": {"hot_days": 365, "max_hot_rows": 2_000_000, "retention_days": None},
+    "users.membershipstatusupdate": {"hot_days": 365, "max_hot_rows": 2_000_000, "retention_days": None},
+    "core.useraction": {"hot_days": 180, "max_hot_rows": 5_000_000, "retention_days": 7 * 365},
+}
+
+# Customer identity index: phone numbers without a country code are taken to
+# be in this country; numbers longer than the national length already have one.
+CUSTOMER_PHONE_DEFAULT_COUNTRY_CODE = "254"
+CUSTOMER_PHONE_NATIONAL_LENGTH = 9
+
+# Duplicate customer merging (python manage.py merge_duplicate_customers):
+# blocks bigger than CUSTOMER_MERGE_MAX_BLOCK_SIZE are not compared, customers
+# sharing a phone number must have names at least this similar (0 to 1), and
+# a plan is applied CUSTOMER_MERGE_CHUNK_SIZE clusters per transaction.
+CUSTOMER_MERGE_MAX_BLOCK_SIZE = 200
+CUSTOMER_MERGE_NAME_SIMILARITY = 0.85
+CUSTOMER_MERGE_CHUNK_SIZE = 500
+
+# Reference data cache (apps.core.reference_data): how often each process
+# checks for changed products, pricings and outlets, and how many snapshots of
+# each kind it keeps.
+REFERENCE_DATA_POLL_SECONDS = 5
+REFERENCE_DATA_MAX_ENTRIES = 10000
+
+# Outlet performance rollups: the default range of the outlet dashboard, the
+# most rows it returns, and how many past days the nightly
+# reconcile_outlet_performance run recomputes (whole months are recomputed).
+OUTLET_PERFORMANCE_DEFAULT_DAYS = 30
+OUTLET_PERFORMANCE_DEFAULT_MONTHS = 12
+OUTLET_PERFORMANCE_MAX_ROWS = 400
+OUTLET_PERFORMANCE_RECONCILE_DAYS = 2
+
+# Claim risk scoring (apps.claims.risk): points added by each signal (the
+# score is capped at 100), how soon after cover starts or a device is bought
+# an incident counts as early, and the claim history windows: any earlier
+# claim on the same IMEI within CLAIM_RISK_IMEI_WINDOW_DAYS, or at least
+# "claims" other claims by the customer or outlet within "days".
+CLAIM_RISK_POINTS = {
+    "incident_before_cover": 50,
+    "early_incident": 30,
+    "incident_before_purchase": 40,
+    "recent_device_purchase": 15,
+    "repeat_imei": 35,
+    "customer_velocity": 20,
+    "outlet_velocity": 10,
+}
+CLAIM_RISK_EARLY_DAYS = 30
+CLAIM_RISK_IMEI_WINDOW_DAYS = 365
+CLAIM_RISK_CUSTOMER_VELOCITY = {"days": 90, "claims": 2}
+CLAIM_RISK_OUTLET_VELOCITY = {"days": 30, "claims": 20}
+
+# Portfolio analytics (apps.pricing.analytics): rows read per query, and how
+# long a computed report is served from the cache.
+PORTFOLIO_ANALYTICS_CHUNK_SIZE = 100_000
+PORTFOLIO_ANALYTICS_CACHE_SECONDS = 6 * 60 * 60
+
+# Gadget pricing simulation (apps.pricing.simulation): scenarios run by
+# default and at most through the API, the claims drawn per batch, the claims
+# a pricing needs before it is fitted on its own history rather than every
+# gadget pricing's, and the loss ratio percentiles reported.
+PRICING_SIMULATION_SCENARIOS = 10_000
+PRICING_SIMULATION_API_MAX_SCENARIOS = 20_000
+PRICING_SIMULATION_BATCH_CLAIMS = 2_000_000
+PRICING_SIMULATION_MIN_CLAIMS = 30
+PRICING_SIMULATION_PERCENTILES = (50, 75, 90, 95, 99, 99.5)
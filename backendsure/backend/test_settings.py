@@ -0,0 +1,17 @@
+"""
+Settings for the test suite: ``python manage.py test --settings=backend.test_settings``.
+"""
+from backend.settings import *  # noqa: F401,F403
+
+# Fail the test that pushes a view over its query budget instead of logging it.
+QUERY_BUDGET_RAISE = True
+
+# A second database for the primary/replica router tests; it only receives
+# reads when a test lists it in DATABASE_REPLICAS.
+DATABASES = {
+    **DATABASES,  # noqa: F405
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db.replica.sqlite3",  # noqa: F405
+    },
+}
@@ -33,6 +33,8 @@ urlpatterns = [
     path("claims/", include("apps.claims.urls")),
     path("core/", include("apps.core.urls")),
     path("sales/", include("apps.sales.urls")),
+    path("credit-life/", include("apps.credit_life.urls")),
+    path("documents/", include("apps.documents.urls")),
 ]
 
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file